@@ -5,3 +5,6 @@ class APIConfig(AppConfig):
     name = "apps.api"
     label = "api"
     default_auto_field = "django.db.models.BigAutoField"
+
+    def ready(self):
+        from . import signals  # noqa F401
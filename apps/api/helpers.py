@@ -1,6 +1,7 @@
 from django.http import HttpRequest
 from rest_framework_api_key.permissions import KeyParser
 
+from apps.api.key_cache import get_verified_key, remember_local, remember_verified_key
 from apps.api.models import UserAPIKey
 from apps.users.models import CustomUser
 
@@ -9,14 +10,43 @@ def get_user_from_request(request: HttpRequest) -> CustomUser | None:
     if request is None:
         return None
     if request.user.is_anonymous:
-        user_api_key = _get_api_key_object(request, UserAPIKey)
-        return user_api_key.user
+        return get_user_from_api_key(_get_api_key(request))
     else:
         return request.user
 
 
-def _get_api_key_object(request, model_class):
-    return model_class.objects.get_from_key(_get_api_key(request))
+def get_user_from_api_key(key: str | None, model_class=UserAPIKey) -> CustomUser | None:
+    """
+    Verify an API key and return its user, or None if the key is invalid, revoked or expired.
+    Successful verifications are cached (see apps.api.key_cache) so repeat calls skip the hasher.
+    """
+    if not key:
+        return None
+
+    entry, user = get_verified_key(key)
+    if entry is None:
+        try:
+            api_key = _get_api_key_object_from_key(key, model_class)
+        except model_class.DoesNotExist:
+            return None
+        if api_key.has_expired:
+            return None
+        user = api_key.user
+        remember_verified_key(api_key, key, user=user)
+        return user
+
+    if entry.revoked or entry.has_expired:
+        return None
+    if user is None:
+        user = CustomUser.objects.filter(pk=entry.user_id).first()
+        if user is None:
+            return None
+        remember_local(key, entry, user)
+    return user
+
+
+def _get_api_key_object_from_key(key, model_class):
+    return model_class.objects.get_from_key(key)
 
 
 def _get_api_key(request):
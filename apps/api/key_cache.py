@@ -0,0 +1,128 @@
+"""
+Short-lived cache of verified user API keys.
+
+Verifying an ``Api-Key`` header means a DB lookup plus a password-hasher check, which adds up
+for high-frequency service-to-service callbacks (e.g. ingestion progress updates). Once a key
+has been verified we remember it in two layers:
+
+- a process-local dict (``API_KEY_LOCAL_CACHE_TTL`` seconds, also holds the user instance)
+- the shared Django cache / Redis (``API_KEY_CACHE_TTL`` seconds, ids only)
+
+Entries are keyed by the key prefix and store a SHA-256 digest of the full key, so a request
+carrying the right prefix but the wrong secret never matches. The hashed key stored in the DB
+is untouched. Saving or deleting a ``UserAPIKey`` (e.g. revoking it) drops its entries via signals.
+"""
+
+import contextlib
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+
+CACHE_KEY_PREFIX = "api_key_verified"
+
+
+@dataclass(frozen=True)
+class VerifiedAPIKey:
+    key_id: str
+    user_id: int
+    digest: str
+    expires_at: float | None = None
+    revoked: bool = False
+
+    @property
+    def has_expired(self) -> bool:
+        return self.expires_at is not None and self.expires_at < time.time()
+
+    def matches(self, key: str) -> bool:
+        return constant_time_compare(self.digest, _digest(key))
+
+
+_local_entries: dict[str, tuple[VerifiedAPIKey, Any, float]] = {}
+_local_lock = threading.Lock()
+
+
+def _digest(key: str) -> str:
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def _prefix(key: str) -> str:
+    return key.partition(".")[0]
+
+
+def _cache_key(prefix: str) -> str:
+    return f"{CACHE_KEY_PREFIX}:{prefix}"
+
+
+def _local_ttl() -> float:
+    return getattr(settings, "API_KEY_LOCAL_CACHE_TTL", 5)
+
+
+def _shared_ttl() -> int:
+    return getattr(settings, "API_KEY_CACHE_TTL", 300)
+
+
+def get_verified_key(key: str) -> tuple[VerifiedAPIKey | None, Any]:
+    """
+    Returns ``(entry, user)`` for a previously verified key, or ``(None, None)`` on a miss.
+    ``user`` is only populated from the process-local layer; callers load it by ``entry.user_id`` otherwise.
+    """
+    prefix = _prefix(key)
+    now = time.monotonic()
+
+    with _local_lock:
+        local = _local_entries.get(prefix)
+    if local:
+        entry, user, stored_at = local
+        if now - stored_at < _local_ttl() and entry.matches(key):
+            return entry, user
+        with _local_lock:
+            _local_entries.pop(prefix, None)
+
+    try:
+        entry = cache.get(_cache_key(prefix))
+    except Exception:
+        # A cache outage must never block authentication, just slow it down
+        entry = None
+    if entry is not None and entry.matches(key):
+        return entry, None
+    return None, None
+
+
+def remember_verified_key(api_key, key: str, user=None) -> VerifiedAPIKey:
+    """Cache a key that has just passed full verification"""
+    entry = VerifiedAPIKey(
+        key_id=api_key.pk,
+        user_id=api_key.user_id,
+        digest=_digest(key),
+        expires_at=api_key.expiry_date.timestamp() if api_key.expiry_date else None,
+        revoked=api_key.revoked,
+    )
+    with contextlib.suppress(Exception):
+        cache.set(_cache_key(api_key.prefix), entry, _shared_ttl())
+    if user is not None:
+        remember_local(key, entry, user)
+    return entry
+
+
+def remember_local(key: str, entry: VerifiedAPIKey, user) -> None:
+    with _local_lock:
+        _local_entries[_prefix(key)] = (entry, user, time.monotonic())
+
+
+def invalidate_prefix(prefix: str) -> None:
+    """Forget a key everywhere this process can reach; other processes drop it within the local TTL"""
+    with _local_lock:
+        _local_entries.pop(prefix, None)
+    with contextlib.suppress(Exception):
+        cache.delete(_cache_key(prefix))
+
+
+def clear_local_cache() -> None:
+    with _local_lock:
+        _local_entries.clear()
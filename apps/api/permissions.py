@@ -5,7 +5,7 @@ from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_api_key.permissions import BaseHasAPIKey
 
-from .helpers import get_user_from_request
+from .helpers import get_user_from_api_key
 from .models import UserAPIKey
 
 
@@ -13,15 +13,19 @@ class HasUserAPIKey(BaseHasAPIKey):
     model = UserAPIKey
 
     def has_permission(self, request: HttpRequest, view: typing.Any) -> bool:
-        has_perm = super().has_permission(request, view)
-        if has_perm:
-            # if they have permission, also populate the request.user object for convenience
-            request.user = get_user_from_request(request)
+        # verification results are cached briefly, so repeated internal callbacks skip the hasher
+        key_user = get_user_from_api_key(self.get_key(request), self.model)
+        if key_user is None:
+            return False
 
-            if request.user and not request.user.is_active:
-                has_perm = False
+        # if they have permission, also populate the request.user object for convenience
+        if request.user.is_anonymous:
+            request.user = key_user
 
-        return has_perm
+        if request.user and not request.user.is_active:
+            return False
+
+        return True
 
     def authenticate_header(self, request):
         return "Api-Key"
@@ -0,0 +1,19 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .key_cache import invalidate_prefix
+from .models import UserAPIKey
+
+
+@receiver(post_save, sender=UserAPIKey)
+@receiver(post_delete, sender=UserAPIKey)
+def invalidate_verified_api_key(sender, instance, **kwargs):
+    """
+    Drop cached verifications whenever a key is revoked, updated or deleted.
+    Runs after commit so a concurrent request cannot re-cache the row as it was before the change.
+    """
+    if instance.prefix:
+        transaction.on_commit(partial(invalidate_prefix, instance.prefix))
@@ -0,0 +1,95 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.api import key_cache
+from apps.api.helpers import get_user_from_api_key
+from apps.api.models import UserAPIKey
+
+User = get_user_model()
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class VerifiedKeyCacheTest(SimpleTestCase):
+    def setUp(self):
+        key_cache.clear_local_cache()
+        key_cache.cache.clear()
+        self.api_key = SimpleNamespace(
+            pk="abcd1234.hashed", prefix="abcd1234", user_id=7, expiry_date=None, revoked=False
+        )
+
+    def test_hit_requires_full_key(self):
+        """Test that a cached prefix never matches a different secret"""
+        key_cache.remember_verified_key(self.api_key, "abcd1234.secret", user="user")
+        entry, user = key_cache.get_verified_key("abcd1234.secret")
+        self.assertEqual(entry.user_id, 7)
+        self.assertEqual(user, "user")
+
+        entry, user = key_cache.get_verified_key("abcd1234.wrong")
+        self.assertIsNone(entry)
+        self.assertIsNone(user)
+
+    def test_shared_layer_used_after_local_expiry(self):
+        """Test that the shared cache still answers once the local entry is gone"""
+        key_cache.remember_verified_key(self.api_key, "abcd1234.secret", user="user")
+        key_cache.clear_local_cache()
+        entry, user = key_cache.get_verified_key("abcd1234.secret")
+        self.assertEqual(entry.key_id, "abcd1234.hashed")
+        self.assertIsNone(user)
+
+    def test_invalidate_prefix(self):
+        """Test that invalidation clears both layers"""
+        key_cache.remember_verified_key(self.api_key, "abcd1234.secret", user="user")
+        key_cache.invalidate_prefix("abcd1234")
+        entry, _ = key_cache.get_verified_key("abcd1234.secret")
+        self.assertIsNone(entry)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class APIKeyCacheAuthenticationTest(TestCase):
+    def setUp(self):
+        key_cache.clear_local_cache()
+        key_cache.cache.clear()
+        self.user = User.objects.create_user(username="testuser", email="test@example.com", password="testpass123")
+        self.api_key_obj, self.api_key = UserAPIKey.objects.create_key(name="Cached Key", user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Api-Key {self.api_key}")
+
+    def test_repeat_requests_skip_verification(self):
+        """Test that only the first request verifies the key against the DB"""
+        with mock.patch.object(
+            UserAPIKey.objects, "get_from_key", wraps=UserAPIKey.objects.get_from_key
+        ) as get_from_key:
+            for _ in range(3):
+                response = self.client.get(reverse("api:health"))
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_from_key.call_count, 1)
+
+    def test_revoked_key_is_rejected(self):
+        """Test that revoking a key invalidates its cached verification"""
+        self.assertEqual(self.client.get(reverse("api:health")).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.api_key_obj.revoked = True
+            self.api_key_obj.save()
+        self.assertIsNone(get_user_from_api_key(self.api_key))
+        self.assertEqual(self.client.get(reverse("api:health")).status_code, 401)
+
+    def test_invalidation_waits_for_commit(self):
+        """Test that cached verifications are only dropped once the key change commits"""
+        self.assertEqual(self.client.get(reverse("api:health")).status_code, 200)
+        cache_key = key_cache._cache_key(self.api_key_obj.prefix)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.api_key_obj.revoked = True
+            self.api_key_obj.save()
+        self.assertIsNotNone(key_cache.cache.get(cache_key))
+        self.assertEqual(len(callbacks), 1)
+
+        callbacks[0]()
+        self.assertIsNone(key_cache.cache.get(cache_key))
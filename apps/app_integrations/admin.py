@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import ConnectedApp, SupportedApp, NangoConnection
+from .models import ConnectedApp, GoogleDriveSyncState, NangoConnection, SupportedApp
 
 
 @admin.register(ConnectedApp)
@@ -41,3 +41,11 @@ class NangoConnectionAdmin(admin.ModelAdmin):
             "classes": ("collapse",)
         })
     )
+
+
+@admin.register(GoogleDriveSyncState)
+class GoogleDriveSyncStateAdmin(admin.ModelAdmin):
+    list_display = ("user", "root_folder_id", "status", "processed_items", "total_items", "last_synced_at")
+    search_fields = ("user__email", "root_folder_id")
+    list_filter = ("status",)
+    readonly_fields = ("start_page_token", "celery_task_id", "stats", "created_at", "updated_at")
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_integrations', '0003_remove_nangoconnection_config_and_more'),
+        ('opie', '0003_add_chunking_strategy'),
+        ('teams', '0002_team_billing_details_last_changed_team_customer_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GoogleDriveSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('root_folder_id', models.CharField(blank=True, default='', help_text='Drive folder the sync is scoped to (empty = whole drive)', max_length=255)),
+                ('max_depth', models.PositiveSmallIntegerField(default=10)),
+                ('start_page_token', models.CharField(blank=True, help_text='Drive Changes API token to resume incremental sync from', max_length=255, null=True)),
+                ('status', models.CharField(choices=[('idle', 'Idle'), ('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='idle', max_length=20)),
+                ('celery_task_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('total_items', models.PositiveIntegerField(default=0)),
+                ('processed_items', models.PositiveIntegerField(default=0)),
+                ('stats', models.JSONField(blank=True, default=dict)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('last_full_sync_at', models.DateTimeField(blank=True, null=True)),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('team', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='teams.team')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='google_drive_sync_states', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'root_folder_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='GoogleDriveSyncedItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('drive_id', models.CharField(max_length=255)),
+                ('is_folder', models.BooleanField(default=False)),
+                ('name', models.CharField(max_length=255)),
+                ('parent_drive_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('depth', models.PositiveSmallIntegerField(default=0)),
+                ('md5_checksum', models.CharField(blank=True, max_length=64, null=True)),
+                ('modified_time', models.CharField(blank=True, max_length=64, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('collection', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='opie.collection')),
+                ('file', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='opie.file')),
+                ('sync_state', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='app_integrations.googledrivesyncstate')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sync_state', 'is_folder'], name='app_integra_sync_st_c428b7_idx')],
+                'unique_together': {('sync_state', 'drive_id')},
+            },
+        ),
+    ]
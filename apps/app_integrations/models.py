@@ -123,3 +123,97 @@ class NangoConnection(models.Model):
             return f"https://{self.subdomain}.atlassian.net"
         
         return None
+
+
+class GoogleDriveSyncState(models.Model):
+    """
+    Persistent state for a user's Google Drive -> Collections sync.
+
+    Holds the Drive Changes API ``startPageToken`` so that subsequent syncs only
+    apply deltas instead of crawling the whole drive again, plus the progress
+    counters reported by ``get_sync_status``.
+    """
+
+    STATUS_IDLE = "idle"
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_COMPLETED = "completed"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_IDLE, "Idle"),
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_COMPLETED, "Completed"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="google_drive_sync_states"
+    )
+    team = models.ForeignKey("teams.Team", on_delete=models.SET_NULL, null=True, blank=True)
+    root_folder_id = models.CharField(
+        max_length=255, blank=True, default="", help_text="Drive folder the sync is scoped to (empty = whole drive)"
+    )
+    max_depth = models.PositiveSmallIntegerField(default=10)
+    start_page_token = models.CharField(
+        max_length=255, blank=True, null=True, help_text="Drive Changes API token to resume incremental sync from"
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_IDLE)
+    celery_task_id = models.CharField(max_length=255, blank=True, null=True)
+    total_items = models.PositiveIntegerField(default=0)
+    processed_items = models.PositiveIntegerField(default=0)
+    stats = models.JSONField(default=dict, blank=True)
+    last_error = models.TextField(blank=True, null=True)
+    last_full_sync_at = models.DateTimeField(null=True, blank=True)
+    last_synced_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("user", "root_folder_id")
+
+    def __str__(self):
+        return f"{self.user.email} - Google Drive sync ({self.get_status_display()})"
+
+    @property
+    def in_progress(self):
+        """Queued or running, unless the sync stopped reporting progress (lost task, crashed worker)"""
+        if self.status not in (self.STATUS_QUEUED, self.STATUS_RUNNING):
+            return False
+        stale_after = timedelta(minutes=settings.GOOGLE_DRIVE_SYNC_STALE_MINUTES)
+        return self.updated_at is None or now() - self.updated_at < stale_after
+
+    @property
+    def progress_percentage(self):
+        if not self.total_items:
+            return 100.0 if self.status == self.STATUS_COMPLETED else 0.0
+        return round(min(self.processed_items / self.total_items, 1.0) * 100, 1)
+
+
+class GoogleDriveSyncedItem(models.Model):
+    """
+    Maps a Drive file or folder onto the Collection / File it was mirrored into,
+    so incremental changes can be applied without re-listing the drive.
+    """
+
+    sync_state = models.ForeignKey(GoogleDriveSyncState, on_delete=models.CASCADE, related_name="items")
+    drive_id = models.CharField(max_length=255)
+    is_folder = models.BooleanField(default=False)
+    name = models.CharField(max_length=255)
+    parent_drive_id = models.CharField(max_length=255, blank=True, null=True)
+    depth = models.PositiveSmallIntegerField(default=0)
+    md5_checksum = models.CharField(max_length=64, blank=True, null=True)
+    modified_time = models.CharField(max_length=64, blank=True, null=True)
+    collection = models.ForeignKey("opie.Collection", on_delete=models.SET_NULL, null=True, blank=True)
+    file = models.ForeignKey("opie.File", on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("sync_state", "drive_id")
+        indexes = [
+            models.Index(fields=["sync_state", "is_folder"]),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.drive_id})"
@@ -0,0 +1,28 @@
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True)
+def sync_google_drive_task(self, sync_state_id: int):
+    """
+    Run a Google Drive sync in the background.
+    The first run crawls the drive; later runs apply only Changes API deltas.
+    """
+    from .models import GoogleDriveSyncState
+    from .views.google_drive_sync import GoogleDriveSync
+
+    try:
+        state = GoogleDriveSyncState.objects.select_related("user", "team").get(id=sync_state_id)
+    except GoogleDriveSyncState.DoesNotExist:
+        logger.error(f"GoogleDriveSyncState with ID {sync_state_id} not found. Aborting.")
+        return
+
+    state.celery_task_id = self.request.id
+    state.save(update_fields=["celery_task_id", "updated_at"])
+
+    sync_service = GoogleDriveSync(user=state.user, team=state.team, state=state)
+    sync_service.sync_all(root_folder_id=state.root_folder_id or None, max_depth=state.max_depth)
+    return sync_service.serializable_stats()
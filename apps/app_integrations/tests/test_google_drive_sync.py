@@ -0,0 +1,148 @@
+"""
+Tests for the Google Drive sync engine applying Changes API deltas to collections and files.
+"""
+
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from apps.app_integrations.models import GoogleDriveSyncState
+from apps.app_integrations.views.google_drive_sync import GOOGLE_DRIVE_FOLDER_MIME_TYPE, GoogleDriveSync
+from apps.opie.models import Collection, File
+
+User = get_user_model()
+
+ROOT_ID = "drive-root"
+
+IN_MEMORY_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+def _folder(drive_id, name, parent=ROOT_ID):
+    return {
+        "fileId": drive_id,
+        "file": {"id": drive_id, "name": name, "mimeType": GOOGLE_DRIVE_FOLDER_MIME_TYPE, "parents": [parent]},
+    }
+
+
+def _file(drive_id, name, parent=ROOT_ID, md5="md5-1"):
+    return {
+        "fileId": drive_id,
+        "file": {
+            "id": drive_id,
+            "name": name,
+            "mimeType": "text/plain",
+            "parents": [parent],
+            "md5Checksum": md5,
+            "size": "5",
+        },
+    }
+
+
+def _removed(drive_id):
+    return {"fileId": drive_id, "removed": True}
+
+
+@override_settings(STORAGES=IN_MEMORY_STORAGES)
+class GoogleDriveSyncChangesTest(TestCase):
+    """Test that Drive changes are mirrored into collections and files."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="user", email="user@test.com", password="pass")
+        self.state = GoogleDriveSyncState.objects.create(user=self.user)
+        self.sync = GoogleDriveSync(self.user, state=self.state, max_workers=1)
+        patcher = mock.patch.object(
+            GoogleDriveSync,
+            "download_file",
+            side_effect=lambda file_id, filename: ContentFile(b"hello", name=filename),
+        )
+        self.download = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_apply_changes_mirrors_new_tree(self):
+        """Test that a new sub-tree is attached regardless of the order Drive reports it in."""
+        self.sync.apply_changes(
+            [_file("f1", "notes.txt", parent="sub"), _folder("sub", "Sub", parent="top"), _folder("top", "Top")],
+            root_id=ROOT_ID,
+        )
+
+        top = Collection.objects.get(name="Top", parent=None)
+        sub = Collection.objects.get(name="Sub", parent=top)
+        synced_file = File.objects.get(title="notes.txt")
+        self.assertEqual(synced_file.collection, sub)
+        self.assertEqual(self.state.items.get(drive_id="f1").file, synced_file)
+        self.assertEqual(self.state.items.get(drive_id="sub").depth, 2)
+        self.assertEqual(self.sync.sync_stats["files_downloaded"], 1)
+
+    def test_unchanged_file_is_not_downloaded_again(self):
+        """Test that a file whose checksum did not change is skipped."""
+        self.sync.apply_changes([_file("f1", "notes.txt")], root_id=ROOT_ID)
+        self.sync.apply_changes([_file("f1", "notes.txt")], root_id=ROOT_ID)
+
+        self.assertEqual(self.download.call_count, 1)
+        self.assertEqual(File.objects.filter(title="notes.txt").count(), 1)
+
+    def test_changed_file_replaces_stale_copy(self):
+        """Test that a file changed upstream replaces the previously synced copy."""
+        self.sync.apply_changes([_file("f1", "notes.txt")], root_id=ROOT_ID)
+        stale_id = self.state.items.get(drive_id="f1").file_id
+
+        self.sync.apply_changes([_file("f1", "notes.txt", md5="md5-2")], root_id=ROOT_ID)
+
+        item = self.state.items.get(drive_id="f1")
+        self.assertNotEqual(item.file_id, stale_id)
+        self.assertFalse(File.objects.filter(pk=stale_id).exists())
+        self.assertEqual(self.sync.sync_stats["files_updated"], 1)
+
+    def test_rename_and_move_reuse_existing_rows(self):
+        """Test that renamed folders and moved files keep their collection and file rows."""
+        self.sync.apply_changes(
+            [_folder("a", "A"), _folder("b", "B"), _file("f1", "notes.txt", parent="a")], root_id=ROOT_ID
+        )
+        collection_a = Collection.objects.get(name="A")
+        file_id = self.state.items.get(drive_id="f1").file_id
+
+        self.sync.apply_changes([_folder("a", "Renamed"), _file("f1", "notes.txt", parent="b")], root_id=ROOT_ID)
+
+        collection_a.refresh_from_db()
+        self.assertEqual(collection_a.name, "Renamed")
+        moved = File.objects.get(pk=file_id)
+        self.assertEqual(moved.collection, Collection.objects.get(name="B"))
+        self.assertEqual(self.download.call_count, 1)
+
+    def test_depth_limit(self):
+        """Test that folders below ``max_depth`` and their files are not mirrored."""
+        self.sync.apply_changes(
+            [_folder("top", "Top"), _folder("deep", "Deep", parent="top"), _file("f1", "deep.txt", parent="deep")],
+            root_id=ROOT_ID,
+            max_depth=1,
+        )
+
+        self.assertTrue(Collection.objects.filter(name="Top").exists())
+        self.assertFalse(Collection.objects.filter(name="Deep").exists())
+        self.assertFalse(File.objects.filter(title="deep.txt").exists())
+        self.download.assert_not_called()
+
+    def test_removing_folder_deletes_only_synced_files(self):
+        """Test that removing a folder keeps files the sync did not create in its collection."""
+        self.sync.apply_changes(
+            [_folder("top", "Top"), _folder("sub", "Sub", parent="top"), _file("f1", "notes.txt", parent="sub")],
+            root_id=ROOT_ID,
+        )
+        sub = Collection.objects.get(name="Sub")
+        manual = File.objects.create(
+            title="manual.txt", file=ContentFile(b"mine", name="manual.txt"), uploaded_by=self.user, collection=sub
+        )
+
+        self.sync.apply_changes([_removed("top")], root_id=ROOT_ID)
+
+        self.assertFalse(File.objects.filter(title="notes.txt").exists())
+        manual.refresh_from_db()
+        self.assertIsNone(manual.collection)
+        self.assertFalse(Collection.objects.filter(name__in=["Top", "Sub"]).exists())
+        self.assertFalse(self.state.items.exists())
+        self.assertEqual(self.sync.sync_stats["files_removed"], 1)
@@ -10,6 +10,11 @@ from .views.google_drive import (
     revoke_google_drive_access,
     upload_file_to_google_drive,
 )
+from .views.google_drive_sync import (
+    get_sync_status,
+    preview_google_drive_structure,
+    start_google_drive_sync,
+)
 from .views.views import list_supported_apps
 
 from .views.nango import (
@@ -58,12 +63,15 @@ urlpatterns = [
     path("gdrive/upload/", upload_file_to_google_drive, name="gdrive_upload"),
     path("gdrive/download/<str:file_id>/", download_file_from_google_drive, name="gdrive_download"),
     path("gdrive/docs/markdown/", create_google_doc_from_markdown, name="gdrive_docs_from_markdown"),
+    path("gdrive/sync/", start_google_drive_sync, name="gdrive_sync_start"),
+    path("gdrive/sync/status/", get_sync_status, name="gdrive_sync_status"),
+    path("gdrive/sync/preview/", preview_google_drive_structure, name="gdrive_sync_preview"),
     path("apps/", list_supported_apps, name="list-supported-apps"),
     path("connections/", list_connected_integrations, name="list_connected_integrations"),
     path("integrations/", get_nango_integrations, name="get_nango_integrations"),
-    path("nangosession/", get_nango_session, name = "get_nango_session"),
-    path("test-nango/", test_nango_connection, name = "test_nango_connection"),
-    path("connectionsave/", save_nango_session, name = "save_nango_session"),
+    path("nangosession/", get_nango_session, name="get_nango_session"),
+    path("test-nango/", test_nango_connection, name="test_nango_connection"),
+    path("connectionsave/", save_nango_session, name="save_nango_session"),
     path("revokesession/", revoke_nango_connection, name="revoke_nango_connection"),
     path("nango/delete/", delete_nango_integration, name="delete_nango_integration"),
     path("nango/gdrive/files/", list_google_drive_files, name="list_google_drive_files"),
@@ -3,14 +3,15 @@ import logging
 import mimetypes
 import os
 import tempfile
-from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
 from urllib.parse import urlparse
 
 import requests
 from django.conf import settings
 from django.core.files import File
-from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 from django.db import transaction
 from django.http import JsonResponse
@@ -22,8 +23,10 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 
-from apps.app_integrations.models import ConnectedApp, SupportedApp
+from apps.app_integrations.models import ConnectedApp, GoogleDriveSyncedItem, GoogleDriveSyncState, SupportedApp
+from apps.app_integrations.tasks import sync_google_drive_task
 from apps.opie.models import Collection, File as OpieFile
+from apps.opie.services.file_import_service import FileImportItem, FileImportService
 from apps.teams.models import Team
 from apps.users.models import CustomUser
 
@@ -42,21 +45,55 @@ SUPPORTED_MIME_TYPES = {
     "application/vnd.google-apps.presentation": "gslides",
 }
 
+DRIVE_API_BASE_URL = "https://www.googleapis.com/drive/v3"
+DRIVE_FILE_FIELDS = "id, name, mimeType, createdTime, modifiedTime, size, parents, webViewLink, md5Checksum, trashed"
+
+# Downloads are streamed in 1MB chunks; anything above 8MB spills from memory to a temp file
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# Persist progress to the sync state every N processed files
+PROGRESS_FLUSH_INTERVAL = 25
+
+
 class GoogleDriveSync:
-    """Google Drive sync service that mirrors folder structure and files into collections"""
-    
-    def __init__(self, user: CustomUser, team: Optional[Team] = None):
+    """
+    Google Drive sync service that mirrors folder structure and files into collections.
+
+    The first run crawls the drive (following ``nextPageToken`` on every listing) and
+    records the Changes API ``startPageToken`` on the ``GoogleDriveSyncState``. Later
+    runs only apply the deltas returned by the Changes API. Downloads are streamed to
+    storage in chunks through a bounded thread pool.
+    """
+
+    def __init__(
+        self,
+        user: CustomUser,
+        team: Optional[Team] = None,
+        state: Optional[GoogleDriveSyncState] = None,
+        max_workers: Optional[int] = None,
+    ):
         self.user = user
         self.team = team
+        self.state = state
+        self.max_workers = max_workers or getattr(settings, "GOOGLE_DRIVE_SYNC_MAX_WORKERS", 4)
         self.access_token = None
         self.sync_stats = {
             "collections_created": 0,
             "files_downloaded": 0,
+            "files_updated": 0,
+            "files_removed": 0,
             "files_skipped": 0,
+            "changes_applied": 0,
+            "mode": "full",
             "errors": [],
             "start_time": timezone.now(),
         }
-        
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._folder_items: Dict[str, GoogleDriveSyncedItem] = {}
+        self._last_progress_flush = 0
+
     def authenticate(self) -> bool:
         """Get valid Google Drive access token"""
         try:
@@ -67,58 +104,139 @@ class GoogleDriveSync:
         except Exception as e:
             self.sync_stats["errors"].append(f"Authentication failed: {str(e)}")
             return False
-    
+
+    # ------------------------------------------------------------------
+    # Drive API helpers
+    # ------------------------------------------------------------------
+
+    def _session(self) -> requests.Session:
+        """One pooled HTTP session per worker thread (requests.Session is not thread-safe)."""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers["Authorization"] = f"Bearer {self.access_token}"
+            self._local.session = session
+        return session
+
+    def _record_error(self, message: str) -> None:
+        with self._lock:
+            self.sync_stats["errors"].append(message)
+        logger.error(message)
+
+    def _increment(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self.sync_stats[key] += amount
+
     def get_google_drive_files(self, folder_id: Optional[str] = None, page_token: Optional[str] = None) -> Dict:
-        """Fetch files and folders from Google Drive"""
-        headers = {"Authorization": f"Bearer {self.access_token}"}
+        """Fetch a single page of files and folders from Google Drive"""
         params = {
             "pageSize": 1000,
-            "fields": "nextPageToken, files(id, name, mimeType, createdTime, modifiedTime, size, parents, webViewLink)",
+            "fields": f"nextPageToken, files({DRIVE_FILE_FIELDS})",
             "spaces": "drive",
+            "q": f"'{folder_id or 'root'}' in parents and trashed = false",
         }
-        
-        if folder_id:
-            params["q"] = f"'{folder_id}' in parents"
-        else:
-            params["q"] = "trashed=false"
-            
+
         if page_token:
             params["pageToken"] = page_token
-            
+
         try:
-            response = requests.get(
-                "https://www.googleapis.com/drive/v3/files",
-                headers=headers,
-                params=params,
-                timeout=30,
-            )
+            response = self._session().get(f"{DRIVE_API_BASE_URL}/files", params=params, timeout=30)
             response.raise_for_status()
             return response.json()
         except requests.RequestException as e:
-            self.sync_stats["errors"].append(f"Failed to fetch Google Drive files: {str(e)}")
+            self._record_error(f"Failed to fetch Google Drive files: {str(e)}")
             return {"files": [], "nextPageToken": None}
-    
-    def download_file(self, file_id: str, filename: str) -> Optional[ContentFile]:
-        """Download a file from Google Drive"""
-        headers = {"Authorization": f"Bearer {self.access_token}"}
-        
+
+    def iter_folder(self, folder_id: Optional[str] = None) -> Iterator[Dict]:
+        """Yield every child of a folder, following ``nextPageToken`` until exhausted"""
+        page_token = None
+        while True:
+            drive_data = self.get_google_drive_files(folder_id, page_token)
+            yield from drive_data.get("files", [])
+            page_token = drive_data.get("nextPageToken")
+            if not page_token:
+                break
+
+    def get_root_folder_id(self, root_folder_id: Optional[str] = None) -> Optional[str]:
+        """Resolve the concrete Drive ID of the sync root ('root' is only an alias)"""
+        if root_folder_id:
+            return root_folder_id
+        try:
+            response = self._session().get(f"{DRIVE_API_BASE_URL}/files/root", params={"fields": "id"}, timeout=30)
+            response.raise_for_status()
+            return response.json().get("id")
+        except requests.RequestException as e:
+            self._record_error(f"Failed to resolve Google Drive root folder: {str(e)}")
+            return None
+
+    def get_start_page_token(self) -> Optional[str]:
+        """Fetch the Changes API token representing 'now'"""
         try:
-            response = requests.get(
-                f"https://www.googleapis.com/drive/v3/files/{file_id}?alt=media",
-                headers=headers,
+            response = self._session().get(f"{DRIVE_API_BASE_URL}/changes/startPageToken", timeout=30)
+            response.raise_for_status()
+            return response.json().get("startPageToken")
+        except requests.RequestException as e:
+            self._record_error(f"Failed to fetch Google Drive start page token: {str(e)}")
+            return None
+
+    def list_changes(self, page_token: str) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Return every change since ``page_token`` and the token to resume from next time.
+        Returns ``None`` as the new token if the listing failed part-way.
+        """
+        changes = []
+        params = {
+            "pageSize": 1000,
+            "spaces": "drive",
+            "includeRemoved": "true",
+            "fields": f"nextPageToken, newStartPageToken, changes(fileId, removed, file({DRIVE_FILE_FIELDS}))",
+        }
+        while True:
+            params["pageToken"] = page_token
+            try:
+                response = self._session().get(f"{DRIVE_API_BASE_URL}/changes", params=params, timeout=30)
+                response.raise_for_status()
+            except requests.RequestException as e:
+                self._record_error(f"Failed to list Google Drive changes: {str(e)}")
+                return changes, None
+
+            data = response.json()
+            changes.extend(data.get("changes", []))
+            if data.get("newStartPageToken"):
+                return changes, data["newStartPageToken"]
+            page_token = data.get("nextPageToken")
+            if not page_token:
+                return changes, None
+
+    def download_file(self, file_id: str, filename: str) -> Optional[File]:
+        """
+        Stream a file from Google Drive in chunks. Small files stay in memory,
+        larger ones spill to a temporary file so memory use is bounded.
+        """
+        spool = tempfile.SpooledTemporaryFile(max_size=DOWNLOAD_SPOOL_MAX_SIZE)
+        try:
+            with self._session().get(
+                f"{DRIVE_API_BASE_URL}/files/{file_id}",
+                params={"alt": "media"},
                 stream=True,
                 timeout=60,
-            )
-            response.raise_for_status()
-            
-            # Read content into memory
-            content = response.content
-            return ContentFile(content, name=filename)
-            
+            ) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    if chunk:
+                        spool.write(chunk)
+            spool.seek(0)
+            return File(spool, name=filename)
+
         except requests.RequestException as e:
-            self.sync_stats["errors"].append(f"Failed to download {filename}: {str(e)}")
+            spool.close()
+            self._record_error(f"Failed to download {filename}: {str(e)}")
             return None
-    
+
+    # ------------------------------------------------------------------
+    # Collections / files
+    # ------------------------------------------------------------------
+
     def get_or_create_collection(self, name: str, parent: Optional[Collection] = None, 
                                 collection_type: str = "folder") -> Collection:
         """Get or create a collection, maintaining hierarchy"""
@@ -133,7 +251,7 @@ class GoogleDriveSync:
         )
         
         if created:
-            self.sync_stats["collections_created"] += 1
+            self._increment("collections_created")
             logger.info(f"Created collection: {name}")
             
         return collection
@@ -153,186 +271,484 @@ class GoogleDriveSync:
             return False
             
         # Skip very large files (optional size limit)
-        if size and size > 100 * 1024 * 1024:  # 100MB limit
+        if size and int(size) > 100 * 1024 * 1024:  # 100MB limit
             return False
             
         return True
-    
-    def sync_file(self, file_data: Dict, collection: Optional[Collection] = None) -> bool:
+
+    def _track_item(self, drive_data: Dict, is_folder: bool, depth: int, **fields) -> Optional[GoogleDriveSyncedItem]:
+        """Record the Drive ID -> Collection/File mapping used by incremental syncs"""
+        if not self.state:
+            return None
+        parents = drive_data.get("parents") or []
+        item, _ = GoogleDriveSyncedItem.objects.update_or_create(
+            sync_state=self.state,
+            drive_id=drive_data["id"],
+            defaults={
+                "is_folder": is_folder,
+                "name": drive_data["name"][:255],
+                "parent_drive_id": parents[0] if parents else None,
+                "depth": depth,
+                "md5_checksum": drive_data.get("md5Checksum"),
+                "modified_time": drive_data.get("modifiedTime"),
+                **fields,
+            },
+        )
+        return item
+
+    def sync_file(
+        self,
+        file_data: Dict,
+        collection: Optional[Collection] = None,
+        depth: int = 0,
+        existing_item: Optional[GoogleDriveSyncedItem] = None,
+    ) -> bool:
         """Sync a single file from Google Drive"""
-        file_id = file_data["id"]
-        name = file_data["name"]
-        mime_type = file_data["mimeType"]
-        size = file_data.get("size")
-        
-        # Check if file should be synced
-        if not self.should_sync_file(mime_type, size):
-            self.sync_stats["files_skipped"] += 1
-            logger.info(f"Skipping file: {name} (type: {mime_type})")
-            return False
-        
-        # Check if file already exists (by name and collection)
-        existing_file = OpieFile.objects.filter(
-            title=name,
-            collection=collection,
-            uploaded_by=self.user
-        ).first()
-        
-        if existing_file:
-            logger.info(f"File already exists: {name}")
-            return True
-        
-        # Download file from Google Drive
-        content_file = self.download_file(file_id, name)
-        if not content_file:
-            return False
-        
-        try:
-            # Create file record
-            file_obj = OpieFile.objects.create(
-                title=name,
-                description=f"Synced from Google Drive: {name}",
-                file=content_file,
-                file_type=self.get_file_type_from_mime(mime_type),
-                uploaded_by=self.user,
-                team=self.team,
-                collection=collection,
-                collection_order=0,
-                filesize=len(content_file),
+        return bool(self._sync_file_batch([(file_data, collection, depth, existing_item)]))
+
+    def _filter_file_jobs(self, jobs: List[Tuple]) -> List[Tuple]:
+        """
+        Drop unsupported and unchanged files before anything is downloaded.
+        Files new to this sync are checked against the library with one query.
+        """
+        candidates = []
+        for job in jobs:
+            file_data, collection, depth, existing_item = job
+            if not self.should_sync_file(file_data["mimeType"], file_data.get("size")):
+                self._increment("files_skipped")
+                logger.info(f"Skipping file: {file_data['name']} (type: {file_data['mimeType']})")
+                self._mark_processed()
+                continue
+            if existing_item and existing_item.file_id:
+                if existing_item.md5_checksum and existing_item.md5_checksum == file_data.get("md5Checksum"):
+                    logger.info(f"File unchanged: {file_data['name']}")
+                    self._mark_processed()
+                    continue
+            candidates.append(job)
+
+        new_names = {job[0]["name"] for job in candidates if not (job[3] and job[3].file_id)}
+        existing_files = {}
+        if new_names:
+            existing_files = {
+                (f.collection_id, f.title): f
+                for f in OpieFile.objects.filter(uploaded_by=self.user, title__in=new_names).only(
+                    "id", "title", "collection_id"
+                )
+            }
+
+        pending = []
+        for job in candidates:
+            file_data, collection, depth, existing_item = job
+            if not (existing_item and existing_item.file_id):
+                existing_file = existing_files.get((getattr(collection, "id", None), file_data["name"]))
+                if existing_file:
+                    logger.info(f"File already exists: {file_data['name']}")
+                    self._track_item(file_data, is_folder=False, depth=depth, collection=collection, file=existing_file)
+                    self._mark_processed()
+                    continue
+            pending.append(job)
+        return pending
+
+    def _download_batch(self, jobs: List[Tuple]) -> List[Optional[File]]:
+        """Download a batch of files concurrently; the pool only talks to Drive, never the DB"""
+
+        def download(job):
+            return self.download_file(job[0]["id"], job[0]["name"])
+
+        if self.max_workers <= 1 or len(jobs) <= 1:
+            return [download(job) for job in jobs]
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="gdrive-sync") as executor:
+            return list(executor.map(download, jobs))
+
+    def _sync_file_batch(self, jobs: List[Tuple]) -> int:
+        """Download one batch and register it through the bulk import service. Returns files synced."""
+        jobs = self._filter_file_jobs(jobs)
+        if not jobs:
+            return 0
+
+        downloads = self._download_batch(jobs)
+        items = []
+        item_jobs = []
+        for job, content_file in zip(jobs, downloads, strict=True):
+            if not content_file:
+                self._mark_processed()
+                continue
+            file_data, collection, _, _ = job
+            items.append(
+                FileImportItem(
+                    title=file_data["name"],
+                    content=content_file,
+                    collection=collection,
+                    description=f"Synced from Google Drive: {file_data['name']}",
+                    file_type=self.get_file_type_from_mime(file_data["mimeType"]),
+                    size=content_file.size,
+                    external_id=file_data["id"],
+                )
             )
-            
-            self.sync_stats["files_downloaded"] += 1
-            logger.info(f"Successfully synced file: {name}")
-            return True
-            
+            item_jobs.append(job)
+
+        synced = 0
+        try:
+            result = FileImportService(
+                uploaded_by=self.user, team=self.team, max_workers=self.max_workers
+            ).import_files(items, skip_existing=False)
+
+            for failed_item, error in result.failed:
+                self._record_error(f"Failed to create file {failed_item.title}: {error}")
+
+            for index, (file_data, collection, depth, existing_item) in enumerate(item_jobs):
+                file_obj = result.file_for(index)
+                if not file_obj:
+                    continue
+                if existing_item and existing_item.file_id:
+                    # Replace the stale copy of a file that changed upstream
+                    stale_file = existing_item.file
+                    self._increment("files_updated")
+                    if stale_file:
+                        stale_file.delete()
+                else:
+                    self._increment("files_downloaded")
+                self._track_item(file_data, is_folder=False, depth=depth, collection=collection, file=file_obj)
+                synced += 1
         except Exception as e:
-            self.sync_stats["errors"].append(f"Failed to create file {name}: {str(e)}")
-            return False
-    
+            self._record_error(f"Failed to register file batch: {str(e)}")
+        finally:
+            for item in items:
+                item.content.close()
+                self._mark_processed()
+        logger.info(f"Synced {synced}/{len(items)} files in batch")
+        return synced
+
+    def _run_file_jobs(self, jobs: List[Tuple]) -> None:
+        """Download and register files in batches of ``GOOGLE_DRIVE_SYNC_BATCH_SIZE``"""
+        batch_size = getattr(settings, "GOOGLE_DRIVE_SYNC_BATCH_SIZE", 25)
+        for start in range(0, len(jobs), batch_size):
+            self._sync_file_batch(jobs[start : start + batch_size])
+
+    # ------------------------------------------------------------------
+    # Progress reporting
+    # ------------------------------------------------------------------
+
+    def _add_total(self, amount: int) -> None:
+        if self.state and amount:
+            with self._lock:
+                self.state.total_items += amount
+            self._flush_progress(force=True)
+
+    def _mark_processed(self) -> None:
+        if not self.state:
+            return
+        with self._lock:
+            self.state.processed_items += 1
+        self._flush_progress()
+
+    def _flush_progress(self, force: bool = False) -> None:
+        """Persist progress counters so ``get_sync_status`` can report them mid-sync"""
+        if not self.state:
+            return
+        with self._lock:
+            if not force and self.state.processed_items - self._last_progress_flush < PROGRESS_FLUSH_INTERVAL:
+                return
+            self._last_progress_flush = self.state.processed_items
+            values = {
+                "total_items": self.state.total_items,
+                "processed_items": self.state.processed_items,
+                "stats": self.serializable_stats(),
+                # Heartbeat: a running sync that stops updating is considered stale
+                "updated_at": timezone.now(),
+            }
+        GoogleDriveSyncState.objects.filter(pk=self.state.pk).update(**values)
+
+    def serializable_stats(self) -> Dict:
+        stats = dict(self.sync_stats)
+        stats["errors"] = list(stats["errors"])
+        for key in ("start_time", "end_time"):
+            if stats.get(key):
+                stats[key] = stats[key].isoformat()
+        return stats
+
+    # ------------------------------------------------------------------
+    # Full crawl
+    # ------------------------------------------------------------------
+
     def sync_folder_structure(self, folder_id: Optional[str] = None, 
                              parent_collection: Optional[Collection] = None,
                              depth: int = 0, max_depth: int = 10) -> None:
-        """Recursively sync folder structure from Google Drive"""
-        if depth > max_depth:
-            logger.warning(f"Max depth reached: {max_depth}")
-            return
-        
-        # Get files and folders from Google Drive
-        drive_data = self.get_google_drive_files(folder_id)
-        files = drive_data.get("files", [])
-        
-        # Separate folders and files
-        folders = [f for f in files if f["mimeType"] == GOOGLE_DRIVE_FOLDER_MIME_TYPE]
-        regular_files = [f for f in files if f["mimeType"] != GOOGLE_DRIVE_FOLDER_MIME_TYPE]
-        
-        # Process folders first (to maintain hierarchy)
-        for folder_data in folders:
-            folder_name = folder_data["name"]
-            folder_id = folder_data["id"]
-            
-            # Create or get collection for this folder
-            collection = self.get_or_create_collection(
-                name=folder_name,
-                parent=parent_collection,
-                collection_type="folder"
-            )
-            
-            # Recursively sync subfolder
-            self.sync_folder_structure(
-                folder_id=folder_id,
-                parent_collection=collection,
-                depth=depth + 1,
-                max_depth=max_depth
-            )
-        
-        # Process files in current folder
-        for file_data in regular_files:
-            self.sync_file(file_data, parent_collection)
-    
+        """
+        Crawl the folder tree breadth-first, creating collections as folders are
+        discovered, then download all files through the worker pool.
+        """
+        queue = deque([(folder_id, parent_collection, depth)])
+        file_jobs = []
+
+        while queue:
+            current_folder_id, current_collection, current_depth = queue.popleft()
+            if current_depth > max_depth:
+                logger.warning(f"Max depth reached: {max_depth}")
+                continue
+
+            for item in self.iter_folder(current_folder_id):
+                if item["mimeType"] == GOOGLE_DRIVE_FOLDER_MIME_TYPE:
+                    # Create or get collection for this folder
+                    collection = self.get_or_create_collection(
+                        name=item["name"], parent=current_collection, collection_type="folder"
+                    )
+                    self._track_item(item, is_folder=True, depth=current_depth + 1, collection=collection)
+                    queue.append((item["id"], collection, current_depth + 1))
+                else:
+                    file_jobs.append((item, current_collection, current_depth))
+
+        self._add_total(len(file_jobs))
+        self._run_file_jobs(file_jobs)
+
+    # ------------------------------------------------------------------
+    # Incremental sync
+    # ------------------------------------------------------------------
+
+    def _load_folder_items(self) -> None:
+        self._folder_items = {
+            item.drive_id: item for item in self.state.items.filter(is_folder=True).select_related("collection")
+        }
+
+    def _resolve_parent(self, drive_data: Dict, root_id: str) -> Optional[Tuple[Optional[Collection], int]]:
+        """Return (collection, depth) for a Drive item's parent, or None if it is outside the synced tree"""
+        for parent_id in drive_data.get("parents") or []:
+            if parent_id == root_id:
+                return None, 0
+            parent_item = self._folder_items.get(parent_id)
+            if parent_item:
+                return parent_item.collection, parent_item.depth
+        return None
+
+    def _remove_item(self, item: GoogleDriveSyncedItem) -> None:
+        if item.is_folder:
+            self._folder_items.pop(item.drive_id, None)
+            if item.collection:
+                self._remove_collection(item.collection)
+        elif item.file:
+            item.file.delete()
+            self._increment("files_removed")
+        item.delete()
+
+    def _remove_collection(self, collection: Collection) -> None:
+        """
+        Delete a mirrored folder's collection with its sub-collections and the files this sync put
+        into them. Files that are not tracked by this sync are kept (they lose their collection).
+        """
+        collections = [collection, *collection.get_descendants()]
+        removed_items = self.state.items.filter(collection__in=collections)
+        files = OpieFile.objects.filter(pk__in=removed_items.filter(is_folder=False).values("file_id"))
+        for file_obj in files:
+            file_obj.delete()
+            self._increment("files_removed")
+        for drive_id in removed_items.filter(is_folder=True).values_list("drive_id", flat=True):
+            self._folder_items.pop(drive_id, None)
+        removed_items.delete()
+        # Sub-collections cascade
+        collection.delete()
+
+    def apply_changes(self, changes: List[Dict], root_id: str, max_depth: int = 10) -> None:
+        """Apply a batch of Drive changes to the mirrored collections and files"""
+        self._load_folder_items()
+        change_ids = {change["fileId"] for change in changes}
+        tracked = {
+            item.drive_id: item for item in self.state.items.filter(drive_id__in=change_ids).select_related("file")
+        }
+
+        folder_changes = []
+        file_changes = []
+        for change in changes:
+            drive_data = change.get("file") or {}
+            item = tracked.get(change["fileId"])
+            if change.get("removed") or drive_data.get("trashed"):
+                if item:
+                    self._remove_item(item)
+                self._increment("changes_applied")
+                continue
+            if drive_data.get("mimeType") == GOOGLE_DRIVE_FOLDER_MIME_TYPE:
+                folder_changes.append((drive_data, item))
+            elif drive_data:
+                file_changes.append((drive_data, item))
+
+        # Folders first, repeating until no more can be placed so that a new
+        # sub-tree is attached regardless of the order Drive reports it in.
+        pending = folder_changes
+        while pending:
+            deferred = []
+            for drive_data, item in pending:
+                parent = self._resolve_parent(drive_data, root_id)
+                if parent is None:
+                    deferred.append((drive_data, item))
+                    continue
+                parent_collection, parent_depth = parent
+                if parent_depth + 1 > max_depth:
+                    continue
+                if item and item.collection:
+                    collection = item.collection
+                    if collection.name != drive_data["name"] or collection.parent_id != getattr(
+                        parent_collection, "id", None
+                    ):
+                        collection.name = drive_data["name"]
+                        collection.parent = parent_collection
+                        collection.save(update_fields=["name", "parent", "updated_at"])
+                else:
+                    collection = self.get_or_create_collection(drive_data["name"], parent=parent_collection)
+                self._folder_items[drive_data["id"]] = self._track_item(
+                    drive_data, is_folder=True, depth=parent_depth + 1, collection=collection
+                )
+                self._increment("changes_applied")
+            if len(deferred) == len(pending):
+                # Remaining folders are outside the synced tree (or were moved out of it)
+                for _drive_data, item in deferred:
+                    if item:
+                        self._remove_item(item)
+                break
+            pending = deferred
+
+        file_jobs = []
+        for drive_data, item in file_changes:
+            parent = self._resolve_parent(drive_data, root_id)
+            if parent is None:
+                if item:
+                    self._remove_item(item)
+                continue
+            parent_collection, parent_depth = parent
+            if item and item.collection_id != getattr(parent_collection, "id", None) and item.file:
+                # Moved between synced folders: re-home the existing file instead of re-downloading
+                OpieFile.objects.filter(pk=item.file_id).update(collection=parent_collection)
+                item.collection = parent_collection
+                item.save(update_fields=["collection", "updated_at"])
+            file_jobs.append((drive_data, parent_collection, parent_depth, item))
+
+        self._add_total(len(file_jobs))
+        self._run_file_jobs(file_jobs)
+        self._increment("changes_applied", len(file_jobs))
+
+    # ------------------------------------------------------------------
+    # Entry point
+    # ------------------------------------------------------------------
+
     def sync_all(self, root_folder_id: Optional[str] = None, max_depth: int = 10) -> Dict:
-        """Main sync method - syncs entire Google Drive or specific folder"""
+        """
+        Main sync method - syncs entire Google Drive or specific folder.
+        Applies only Changes API deltas when the sync state already holds a page token.
+        """
         if not self.authenticate():
+            self._finish(failed=True)
             return self.sync_stats
         
         logger.info(f"Starting Google Drive sync for user: {self.user.email}")
-        
+
+        if self.state:
+            self.state.status = GoogleDriveSyncState.STATUS_RUNNING
+            self.state.total_items = 0
+            self.state.processed_items = 0
+            self.state.last_error = None
+            self.state.save(update_fields=["status", "total_items", "processed_items", "last_error", "updated_at"])
+
         try:
-            # Start sync from root or specified folder
-            self.sync_folder_structure(
-                folder_id=root_folder_id,
-                parent_collection=None,
-                depth=0,
-                max_depth=max_depth
-            )
-            
-            self.sync_stats["end_time"] = timezone.now()
-            duration = self.sync_stats["end_time"] - self.sync_stats["start_time"]
-            self.sync_stats["duration_seconds"] = duration.total_seconds()
-            
+            root_id = self.get_root_folder_id(root_folder_id)
+            if self.state and self.state.start_page_token and root_id:
+                self.sync_stats["mode"] = "incremental"
+                changes, new_token = self.list_changes(self.state.start_page_token)
+                if not new_token:
+                    # Partial listing: keep the stored token so the next run lists these changes again
+                    self._finish(failed=True)
+                    return self.sync_stats
+                self.apply_changes(changes, root_id=root_id, max_depth=max_depth)
+            else:
+                # Take the token before crawling so changes made mid-crawl are picked up next time
+                new_token = self.get_start_page_token() if self.state else None
+                self.sync_folder_structure(
+                    folder_id=root_folder_id, parent_collection=None, depth=0, max_depth=max_depth
+                )
+                if self.state:
+                    self.state.last_full_sync_at = timezone.now()
+
+            if self.state and new_token:
+                self.state.start_page_token = new_token
+
+            self._finish(failed=False)
             logger.info(f"Google Drive sync completed. Stats: {self.sync_stats}")
-            
+
         except Exception as e:
             self.sync_stats["errors"].append(f"Sync failed: {str(e)}")
             logger.error(f"Google Drive sync failed: {str(e)}")
-        
+            self._finish(failed=True)
+
         return self.sync_stats
 
+    def _finish(self, failed: bool) -> None:
+        self.sync_stats["end_time"] = timezone.now()
+        duration = self.sync_stats["end_time"] - self.sync_stats["start_time"]
+        self.sync_stats["duration_seconds"] = duration.total_seconds()
+
+        if not self.state:
+            return
+        self.state.status = GoogleDriveSyncState.STATUS_FAILED if failed else GoogleDriveSyncState.STATUS_COMPLETED
+        self.state.stats = self.serializable_stats()
+        self.state.last_synced_at = self.sync_stats["end_time"]
+        if failed and self.sync_stats["errors"]:
+            self.state.last_error = self.sync_stats["errors"][-1]
+        self.state.save()
+
 
 # API Views
 @extend_schema(
     tags=["Google Drive Sync"],
     summary="Start Google Drive sync",
-    description="Sync files and folders from Google Drive into the hierarchical collections system",
+    description=(
+        "Queue a background sync of files and folders from Google Drive into the hierarchical collections system. "
+        "The first sync crawls the drive; later syncs only apply changes since the previous run. "
+        "Poll the sync status endpoint for progress."
+    ),
     request={
         "application/json": {
             "type": "object",
             "properties": {
                 "root_folder_id": {
                     "type": "string",
-                    "description": "Optional: Google Drive folder ID to start sync from. If not provided, syncs entire drive."
+                    "description": "Optional: Google Drive folder ID to start sync from. If not provided, syncs entire drive.",
                 },
                 "max_depth": {
                     "type": "integer",
                     "description": "Maximum folder depth to sync (default: 10)",
-                    "default": 10
+                    "default": 10,
                 },
-                "team_id": {
-                    "type": "integer",
-                    "description": "Optional: Team ID to associate synced files with"
-                }
-            }
+                "team_id": {"type": "integer", "description": "Optional: Team ID to associate synced files with"},
+                "full_resync": {
+                    "type": "boolean",
+                    "description": "Discard the stored change token and crawl the whole drive again (default: false)",
+                    "default": False,
+                },
+            },
         }
     },
     responses={
-        200: {
+        202: {
             "type": "object",
             "properties": {
                 "message": {"type": "string"},
-                "sync_stats": {
-                    "type": "object",
-                    "properties": {
-                        "collections_created": {"type": "integer"},
-                        "files_downloaded": {"type": "integer"},
-                        "files_skipped": {"type": "integer"},
-                        "errors": {"type": "array", "items": {"type": "string"}},
-                        "duration_seconds": {"type": "number"}
-                    }
-                }
-            }
+                "sync_id": {"type": "integer"},
+                "status": {"type": "string"},
+                "mode": {"type": "string"},
+            },
         },
         400: {"type": "object", "properties": {"error": {"type": "string"}}},
-        401: {"type": "object", "properties": {"error": {"type": "string"}}}
-    }
+        401: {"type": "object", "properties": {"error": {"type": "string"}}},
+        409: {"type": "object", "properties": {"error": {"type": "string"}}},
+    },
 )
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def start_google_drive_sync(request):
-    """Start Google Drive sync process"""
+    """Queue a Google Drive sync for the current user"""
     try:
-        root_folder_id = request.data.get("root_folder_id")
+        root_folder_id = request.data.get("root_folder_id") or ""
         max_depth = int(request.data.get("max_depth", 10))
         team_id = request.data.get("team_id")
-        
+        full_resync = str(request.data.get("full_resync", "false")).lower() in ("1", "true", "yes")
+
         # Validate max_depth
         if max_depth < 1 or max_depth > 20:
             return Response(
@@ -356,25 +772,56 @@ def start_google_drive_sync(request):
                     {"error": "Team not found"},
                     status=status.HTTP_404_NOT_FOUND
                 )
-        
+
+        with transaction.atomic():
+            sync_state, _ = GoogleDriveSyncState.objects.select_for_update().get_or_create(
+                user=request.user, root_folder_id=root_folder_id
+            )
+            if sync_state.in_progress:
+                return Response(
+                    {"error": "A Google Drive sync is already in progress", "sync_id": sync_state.id},
+                    status=status.HTTP_409_CONFLICT,
+                )
+
+            # A deeper tree than previously mirrored can't be derived from deltas alone
+            if full_resync or max_depth > sync_state.max_depth:
+                sync_state.start_page_token = None
+            sync_state.max_depth = max_depth
+            sync_state.team = team
+            previous_status = sync_state.status
+            sync_state.status = GoogleDriveSyncState.STATUS_QUEUED
+            sync_state.total_items = 0
+            sync_state.processed_items = 0
+            sync_state.save()
+
         # Start sync process
-        sync_service = GoogleDriveSync(user=request.user, team=team)
-        sync_stats = sync_service.sync_all(
-            root_folder_id=root_folder_id,
-            max_depth=max_depth
+        try:
+            result = sync_google_drive_task.delay(sync_state.id)
+        except Exception as e:
+            # Nothing will pick the sync up: don't leave it blocking later requests
+            logger.error(f"Failed to queue Google Drive sync {sync_state.id}: {str(e)}")
+            GoogleDriveSyncState.objects.filter(pk=sync_state.pk).update(
+                status=previous_status, last_error=f"Failed to queue sync: {str(e)}", updated_at=timezone.now()
+            )
+            return Response(
+                {"error": "Google Drive sync could not be queued, try again later"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        GoogleDriveSyncState.objects.filter(pk=sync_state.pk).update(celery_task_id=result.id)
+
+        return Response(
+            {
+                "message": "Google Drive sync queued",
+                "sync_id": sync_state.id,
+                "status": GoogleDriveSyncState.STATUS_QUEUED,
+                "mode": "incremental" if sync_state.start_page_token else "full",
+            },
+            status=status.HTTP_202_ACCEPTED,
         )
-        
-        return Response({
-            "message": "Google Drive sync completed successfully",
-            "sync_stats": sync_stats
-        })
-        
+
     except Exception as e:
         logger.error(f"Google Drive sync failed: {str(e)}")
-        return Response(
-            {"error": f"Sync failed: {str(e)}"},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
+        return Response({"error": f"Sync failed: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 @extend_schema(
@@ -443,10 +890,9 @@ def preview_google_drive_structure(request):
         def explore_folder(folder_id: Optional[str], depth: int = 0) -> Dict:
             if depth > max_depth:
                 return {"name": "...", "type": "truncated"}
-            
-            drive_data = sync_service.get_google_drive_files(folder_id)
-            files = drive_data.get("files", [])
-            
+
+            files = list(sync_service.iter_folder(folder_id))
+
             folders = [f for f in files if f["mimeType"] == GOOGLE_DRIVE_FOLDER_MIME_TYPE]
             regular_files = [f for f in files if f["mimeType"] != GOOGLE_DRIVE_FOLDER_MIME_TYPE]
             
@@ -509,6 +955,15 @@ def preview_google_drive_structure(request):
     tags=["Google Drive Sync"],
     summary="Get sync status and history",
     description="Get information about previous sync operations and current status",
+    parameters=[
+        {
+            "name": "root_folder_id",
+            "in": "query",
+            "description": "Google Drive folder ID the sync was started from (omit for whole-drive sync)",
+            "required": False,
+            "schema": {"type": "string"},
+        }
+    ],
     responses={
         200: {
             "type": "object",
@@ -518,15 +973,28 @@ def preview_google_drive_structure(request):
                     "properties": {
                         "timestamp": {"type": "string", "format": "date-time"},
                         "status": {"type": "string"},
-                        "stats": {"type": "object"}
-                    }
+                        "stats": {"type": "object"},
+                    },
                 },
                 "connected_status": {"type": "boolean"},
+                "sync": {
+                    "type": "object",
+                    "properties": {
+                        "sync_id": {"type": "integer"},
+                        "status": {"type": "string"},
+                        "mode": {"type": "string"},
+                        "total_items": {"type": "integer"},
+                        "processed_items": {"type": "integer"},
+                        "progress_percentage": {"type": "number"},
+                        "last_full_sync_at": {"type": "string", "format": "date-time"},
+                        "last_error": {"type": "string"},
+                    },
+                },
                 "total_synced_files": {"type": "integer"},
-                "total_synced_collections": {"type": "integer"}
-            }
+                "total_synced_collections": {"type": "integer"},
+            },
         }
-    }
+    },
 )
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
@@ -536,13 +1004,27 @@ def get_sync_status(request):
         # Check connection status
         try:
             google_drive_app = SupportedApp.objects.get(key="google_drive")
-            connected_app = ConnectedApp.objects.get(user=request.user, app_id=google_drive_app.id)
-            connected_status = True
-            last_sync_time = connected_app.updated_at
-        except (SupportedApp.DoesNotExist, ConnectedApp.DoesNotExist):
+            connected_status = ConnectedApp.objects.filter(user=request.user, app_id=google_drive_app.id).exists()
+        except SupportedApp.DoesNotExist:
             connected_status = False
-            last_sync_time = None
-        
+
+        sync_state = GoogleDriveSyncState.objects.filter(
+            user=request.user, root_folder_id=request.query_params.get("root_folder_id", "")
+        ).first()
+        last_sync_time = sync_state.last_synced_at if sync_state else None
+        sync_info = None
+        if sync_state:
+            sync_info = {
+                "sync_id": sync_state.id,
+                "status": sync_state.status,
+                "mode": "incremental" if sync_state.start_page_token else "full",
+                "total_items": sync_state.total_items,
+                "processed_items": sync_state.processed_items,
+                "progress_percentage": sync_state.progress_percentage,
+                "last_full_sync_at": sync_state.last_full_sync_at,
+                "last_error": sync_state.last_error,
+            }
+
         # Count synced files and collections
         synced_files = OpieFile.objects.filter(
             uploaded_by=request.user,
@@ -553,15 +1035,19 @@ def get_sync_status(request):
             description__icontains="Synced from Google Drive"
         ).count()
         
-        return Response({
-            "connected_status": connected_status,
-            "last_sync": {
-                "timestamp": last_sync_time,
-                "status": "connected" if connected_status else "disconnected"
-            },
-            "total_synced_files": synced_files,
-            "total_synced_collections": synced_collections
-        })
+        return Response(
+            {
+                "connected_status": connected_status,
+                "last_sync": {
+                    "timestamp": last_sync_time,
+                    "status": "connected" if connected_status else "disconnected",
+                    "stats": sync_state.stats if sync_state else {},
+                },
+                "sync": sync_info,
+                "total_synced_files": synced_files,
+                "total_synced_collections": synced_collections,
+            }
+        )
         
     except Exception as e:
         logger.error(f"Failed to get sync status: {str(e)}")
@@ -0,0 +1,192 @@
+"""
+Cached, generation-versioned access data for documents.
+
+Cached values are never deleted one by one. Each entry is stored with the generation
+counters it was computed at, and writes that can change the outcome bump a counter, which
+makes every entry built on the old value stale. An entry and the counters it depends on
+are read together in one ``get_many`` (see ``get_entry``). The counters are:
+
+- the global generation: document link reach, creation of non-restricted documents,
+  moves and deletions, and team-scoped accesses;
+- one generation per user: the user's own document accesses, link traces and team
+  memberships;
+- the attachments generation: changes to any document's ``attachments`` list;
+- the tree generation: document moves, which rewrite materialized paths;
+- one generation per document path: accesses, link settings and deletion state of that
+  document. A per-document entry embeds the counters of every prefix of its path, so
+  bumping one path invalidates the whole subtree below it with a single write.
+
+Counters are bumped once the writing transaction commits. Bumped earlier, a concurrent
+reader could recompute from the state committed before the write and cache it under the
+new generation, serving it (e.g. a revoked access) until the entry expires.
+"""
+
+import hashlib
+from dataclasses import dataclass
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.transaction import on_commit
+
+GENERATION_KEY = "docs:generation"
+USER_GENERATION_KEY = "docs:generation:user:{user_id}"
+ATTACHMENTS_GENERATION_KEY = "docs:generation:attachments"
+TREE_GENERATION_KEY = "docs:generation:tree"
+PATH_GENERATION_KEY = "docs:generation:path:{path}"
+
+READABLE_PATHS_KEY = "docs:readable:{user}"
+ATTACHMENT_PATHS_KEY = "docs:attachment:{key_hash}"
+
+
+def _ttl():
+    return settings.DOCS_ACCESS_CACHE_TIMEOUT
+
+
+def _get_counters(*keys):
+    """Read several generation counters in one round trip, treating missing ones as 0"""
+    values = cache.get_many(keys)
+    return tuple(values.get(key, 0) for key in keys)
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Counter not set yet (or evicted): any value different from what readers saw works
+        cache.set(key, 1, None)
+
+
+def _bump(key):
+    # Immediate outside a transaction
+    on_commit(partial(_incr, key))
+
+
+def get_entry(key, generation_keys):
+    """
+    Read the entry cached under ``key`` and the generation counters it depends on in one
+    round trip. Returns ``(value, generation)``: ``value`` is None when the entry is missing
+    or was computed at another generation, and ``generation`` is what to store it with.
+    """
+    values = cache.get_many([key, *generation_keys])
+    generation = ".".join(str(values.get(generation_key, 0)) for generation_key in generation_keys)
+    entry = values.get(key)
+    if entry is not None and entry[0] == generation:
+        return entry[1], generation
+    return None, generation
+
+
+def set_entry(key, generation, value):
+    """Cache ``value`` under ``key`` with the generation returned by ``get_entry``"""
+    cache.set(key, (generation, value), _ttl())
+
+
+def _generation_keys(user=None):
+    keys = [GENERATION_KEY]
+    if user is not None and user.is_authenticated:
+        keys.append(USER_GENERATION_KEY.format(user_id=user.pk))
+    return keys
+
+
+def get_generation(user=None):
+    """
+    Return a string combining the global generation and, for authenticated users,
+    the user's own generation.
+    """
+    return ".".join(str(value) for value in _get_counters(*_generation_keys(user)))
+
+
+def bump_generation(user_id=None):
+    """Invalidate cached access data for one user, or for everyone when ``user_id`` is None"""
+    if user_id is None:
+        _bump(GENERATION_KEY)
+    else:
+        _bump(USER_GENERATION_KEY.format(user_id=user_id))
+
+
+def bump_attachments_generation():
+    """Invalidate the attachment key -> document paths index"""
+    _bump(ATTACHMENTS_GENERATION_KEY)
+
+
+def document_generation_keys(path, steplen, user=None):
+    """
+    The counters per-document data depends on: the tree generation, the user's generation
+    for authenticated users, and the generation of each ancestor path of ``path`` (itself
+    included).
+    """
+    keys = [TREE_GENERATION_KEY]
+    if user is not None and user.is_authenticated:
+        keys.append(USER_GENERATION_KEY.format(user_id=user.pk))
+    keys.extend(PATH_GENERATION_KEY.format(path=path[:end]) for end in range(steplen, len(path) + 1, steplen))
+    return keys
+
+
+def get_document_entry(key, path, steplen, user=None):
+    """``get_entry`` for data cached on the document at ``path``"""
+    return get_entry(key, document_generation_keys(path, steplen, user=user))
+
+
+def bump_path_generation(path):
+    """Invalidate per-document cached data for the document at ``path`` and all its descendants"""
+    _bump(PATH_GENERATION_KEY.format(path=path))
+
+
+def bump_tree_generation():
+    """Invalidate per-document cached data for every document, after paths were rewritten"""
+    _bump(TREE_GENERATION_KEY)
+
+
+@dataclass(frozen=True)
+class ReadablePaths:
+    """
+    The minimal set of document paths a user can read per se. Any descendant of one of
+    these roots is readable. Together with materialized-path prefixes this behaves like a
+    path trie: ``covers`` checks one prefix per tree level.
+    """
+
+    roots: frozenset
+    steplen: int
+
+    def covers(self, path):
+        """Whether ``path`` is one of the roots or a descendant of one, in O(depth)"""
+        for end in range(self.steplen, len(path) + 1, self.steplen):
+            if path[:end] in self.roots:
+                return True
+        return False
+
+
+def get_readable_paths(user, queryset=None):
+    """
+    Return the ReadablePaths for ``user`` from the cache, building it with a single
+    query on a miss.
+    """
+    # pylint: disable=import-outside-toplevel
+    from apps.docs.api.utils import filter_root_paths
+    from apps.docs.models import Document
+
+    queryset = Document.objects.all() if queryset is None else queryset
+    user_key = user.pk if user.is_authenticated else "anonymous"
+    cache_key = READABLE_PATHS_KEY.format(user=user_key)
+
+    readable, generation = get_entry(cache_key, _generation_keys(user))
+    if readable is None:
+        paths = list(queryset.readable_per_se(user).order_by("path").values_list("path", flat=True).distinct())
+        readable = ReadablePaths(roots=frozenset(filter_root_paths(paths, skip_sorting=True)), steplen=Document.steplen)
+        set_entry(cache_key, generation, readable)
+    return readable
+
+
+def get_attachment_paths(key, queryset=None):
+    """Return the paths of all documents whose ``attachments`` include ``key``, via a cached index"""
+    # pylint: disable=import-outside-toplevel
+    from apps.docs.models import Document
+
+    queryset = Document.objects.all() if queryset is None else queryset
+    cache_key = ATTACHMENT_PATHS_KEY.format(key_hash=hashlib.sha256(key.encode("utf-8")).hexdigest())
+
+    paths, generation = get_entry(cache_key, [ATTACHMENTS_GENERATION_KEY])
+    if paths is None:
+        paths = list(queryset.filter(attachments__contains=[key]).order_by("path").values_list("path", flat=True))
+        set_entry(cache_key, generation, paths)
+    return paths
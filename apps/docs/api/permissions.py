@@ -12,6 +12,8 @@ from apps.docs.models import DocumentAccess, RoleChoices, get_trashbin_cutoff
 ACTION_FOR_METHOD_TO_PERMISSION = {
     "versions_detail": {"DELETE": "versions_destroy", "GET": "versions_retrieve"},
     "children": {"GET": "children_list", "POST": "children_create"},
+    "ai_transform_stream": {"POST": "ai_transform"},
+    "ai_translate_stream": {"POST": "ai_translate"},
 }
 
 
@@ -316,7 +316,12 @@ class DocumentSerializer(ListDocumentSerializer):
         "attachments" field for access control.
         """
         content = self.validated_data.get("content", "")
-        extracted_attachments = set(utils.extract_attachments(content))
+        if self.instance and content:
+            # Reuses the stored projection when the content is unchanged, and otherwise
+            # hands the one computed here to the document so it isn't computed again
+            extracted_attachments = set(self.instance.projection_for(content).attachments)
+        else:
+            extracted_attachments = set(utils.extract_attachments(content))
 
         existing_attachments = set(self.instance.attachments or []) if self.instance else set()
         new_attachments = extracted_attachments - existing_attachments
@@ -2,6 +2,7 @@
 
 # pylint: disable=too-many-lines
 
+import json
 import logging
 import uuid
 from urllib.parse import unquote, urlparse
@@ -30,11 +31,10 @@ from rest_framework import response as drf_response
 from rest_framework.permissions import AllowAny
 from rest_framework.throttling import UserRateThrottle
 
-from apps.docs import authentication, enums, models
-from apps.docs.services.ai_services import AIService
+from apps.docs import access_cache, authentication, enums, models
+from apps.docs.services.ai_services import AIConcurrencyLimitExceeded, AIService, AIStreamSlot
 from apps.docs.services.collaboration_services import CollaborationService
 from apps.docs.services.config_services import get_footer_json
-from apps.docs.utils import extract_attachments, filter_descendants
 from apps.teams.models import Membership
 from apps.users.models import CustomUser
 
@@ -370,6 +370,20 @@ class ResourceAccessViewsetMixin:
         serializer.save()
 
 
+class AIEventStreamResponse(StreamingHttpResponse):
+    """Streaming response that gives the user's AI stream slot back when it is closed."""
+
+    def __init__(self, *args, slot, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.slot = slot
+
+    def close(self):
+        try:
+            self.slot.release()
+        finally:
+            super().close()
+
+
 class DocumentMetadata(drf.metadata.SimpleMetadata):
     """Custom metadata class to add information"""
 
@@ -515,6 +529,11 @@ class DocumentViewSet(
         Returns: JSON response with the translated text.
         Throttled by: AIDocumentRateThrottle, AIUserRateThrottle.
 
+    12. **AI Streaming**: Same as AI Transform / AI Translate, streamed as server-sent events.
+        Example: POST /documents/{id}/ai-transform/stream/, POST /documents/{id}/ai-translate/stream/
+        Answers are cached by (action, language, model, text) and the number of concurrent
+        streams per user is limited by AI_STREAM_MAX_CONCURRENCY_PER_USER.
+
     ### Ordering: created_at, updated_at, is_favorite, title
 
         Example:
@@ -1018,8 +1037,8 @@ class DocumentViewSet(
 
         # Duplicate the document instance
         link_kwargs = {"link_reach": document.link_reach, "link_role": document.link_role} if with_accesses else {}
-        extracted_attachments = set(extract_attachments(document.content))
-        attachments = list(extracted_attachments & set(document.attachments))
+        projection = document.get_projection()
+        attachments = list(set(projection.attachments) & set(document.attachments))
         duplicated_document = document.add_sibling(
             "right",
             title=capfirst(_("copy of {title}").format(title=document.title)),
@@ -1030,6 +1049,9 @@ class DocumentViewSet(
             **link_kwargs,
         )
 
+        # Same content, so the projection can be reused as is
+        models.DocumentProjection.store(duplicated_document, projection)
+
         # Always add the logged-in user as OWNER
         accesses_to_create = [
             models.DocumentAccess(
@@ -1056,6 +1078,14 @@ class DocumentViewSet(
         # Bulk create all the duplicated accesses
         models.DocumentAccess.objects.bulk_create(accesses_to_create)
 
+        # bulk_create skips the access signals and save(): invalidate the access caches
+        # the way they would, once the transaction commits
+        duplicated_document.invalidate_nb_accesses_cache()
+        for user_id in {access.user_id for access in accesses_to_create if access.user_id}:
+            access_cache.bump_generation(user_id=user_id)
+        if any(access.team for access in accesses_to_create):
+            access_cache.bump_generation()
+
         return drf_response.Response({"id": str(duplicated_document.id)}, status=status.HTTP_201_CREATED)
 
     @drf.decorators.action(detail=True, methods=["get"], url_path="versions")
@@ -1289,17 +1319,12 @@ class DocumentViewSet(
         key = f"{url_params['pk']:s}/{url_params['attachment']:s}"
 
         # Look for a document to which the user has access and that includes this attachment
-        # We must look into all descendants of any document to which the user has access per se
-        readable_per_se_paths = self.queryset.readable_per_se(user).order_by("path").values_list("path", flat=True)
-
-        attachments_documents = self.queryset.filter(attachments__contains=[key]).only("path").order_by("path")
-        readable_attachments_paths = filter_descendants(
-            [doc.path for doc in attachments_documents],
-            readable_per_se_paths,
-            skip_sorting=True,
-        )
+        # We must look into all descendants of any document to which the user has access per se.
+        # Both sides are cached and invalidated by generation (see apps.docs.access_cache).
+        readable_paths = access_cache.get_readable_paths(user, self.queryset)
+        attachments_paths = access_cache.get_attachment_paths(key, self.queryset)
 
-        if not readable_attachments_paths:
+        if not any(readable_paths.covers(path) for path in attachments_paths):
             logger.debug("User '%s' lacks permission for attachment", user)
             raise drf.exceptions.PermissionDenied()
 
@@ -1364,6 +1389,89 @@ class DocumentViewSet(
 
         return drf.response.Response(response, status=drf.status.HTTP_200_OK)
 
+    def _ai_event_stream(self, chunks, slot):
+        """
+        Wrap AI answer chunks as server-sent events, releasing the user's stream slot at the
+        end of the stream or, if the client went away before, when the response is closed.
+        """
+
+        async def event_stream():
+            try:
+                async for chunk in chunks:
+                    yield f"data: {json.dumps({'delta': chunk})}\n\n"
+                yield f"data: {json.dumps({'done': True})}\n\n"
+            except Exception as e:
+                logger.exception("AI stream failed")
+                yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            finally:
+                await slot.arelease()
+
+        response = AIEventStreamResponse(event_stream(), slot=slot, content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    def _acquire_ai_stream_slot(self, request):
+        """Take one of the user's concurrent AI stream slots or raise a 429."""
+        identity = (
+            f"user_{request.user.id!s}"
+            if request.user.is_authenticated
+            else f"anonymous_{utils.AIUserRateThrottle().get_ident(request)}"
+        )
+        slot = AIStreamSlot(identity)
+        try:
+            slot.acquire()
+        except AIConcurrencyLimitExceeded as e:
+            raise drf.exceptions.Throttled(detail=str(e)) from e
+        return slot
+
+    @drf.decorators.action(
+        detail=True,
+        methods=["post"],
+        name="Stream a transformation action on a piece of text with AI",
+        url_path="ai-transform/stream",
+        throttle_classes=[utils.AIDocumentRateThrottle, utils.AIUserRateThrottle],
+    )
+    def ai_transform_stream(self, request, *args, **kwargs):
+        """
+        POST /api/v1/documents/<resource_id>/ai-transform/stream
+        Same payload as ai-transform. Returns the processed text as server-sent events:
+        {"delta": str} chunks, then {"done": true} (or {"error": str}).
+        """
+        # Check permissions first
+        self.get_object()
+
+        serializer = serializers.AITransformSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        service = AIService()
+        slot = self._acquire_ai_stream_slot(request)
+        chunks = service.stream_transform(serializer.validated_data["text"], serializer.validated_data["action"])
+        return self._ai_event_stream(chunks, slot)
+
+    @drf.decorators.action(
+        detail=True,
+        methods=["post"],
+        name="Stream a translation of a piece of text with AI",
+        url_path="ai-translate/stream",
+        throttle_classes=[utils.AIDocumentRateThrottle, utils.AIUserRateThrottle],
+    )
+    def ai_translate_stream(self, request, *args, **kwargs):
+        """
+        POST /api/v1/documents/<resource_id>/ai-translate/stream
+        Same payload as ai-translate. Returns the translated text as server-sent events.
+        """
+        # Check permissions first
+        self.get_object()
+
+        serializer = serializers.AITranslateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        service = AIService()
+        slot = self._acquire_ai_stream_slot(request)
+        chunks = service.stream_translate(serializer.validated_data["text"], serializer.validated_data["language"])
+        return self._ai_event_stream(chunks, slot)
+
     @drf.decorators.action(
         detail=True,
         methods=["get"],
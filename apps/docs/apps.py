@@ -1,12 +1,13 @@
 """Impress Core application"""
 
-# from django.apps import AppConfig
-# from django.utils.translation import gettext_lazy as _
+from django.apps import AppConfig
 
 
-# class CoreConfig(AppConfig):
-#     """Configuration class for the impress core app."""
+class DocsConfig(AppConfig):
+    """Configuration class for the docs app."""
 
-#     name = "core"
-#     app_label = "core"
-#     verbose_name = _("impress core application")
+    name = "apps.docs"
+    label = "docs"
+
+    def ready(self):
+        from . import signals  # noqa F401
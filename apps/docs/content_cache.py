@@ -0,0 +1,347 @@
+"""
+Tiered read-through cache for document content stored in object storage.
+
+Reads go through three tiers:
+
+1. a process-local LRU bounded by bytes, keyed by storage key and holding one version;
+2. the shared Django cache (Redis), holding a pointer to the latest known version of each
+   key and the content of that version;
+3. the storage backend, queried with a conditional GET against the version held locally
+   (generation-match on GCS) so an unchanged object is not downloaded again.
+
+Writes go through to the backend and refresh both cache tiers; the shared version pointer
+only ever moves to a newer version. The backend is pluggable with the
+``DOCS_CONTENT_BACKEND`` setting, e.g. ``FileSystemContentBackend`` in tests.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+from apps.opie.utils.gcs_utils import get_storage_client
+
+VERSION_KEY = "docs:content:version:{key_hash}"
+CONTENT_KEY = "docs:content:{key_hash}:{version}"
+
+# Tiers a read can be served from
+LOCAL = "local"
+SHARED = "shared"
+REVALIDATED = "revalidated"
+BACKEND = "backend"
+
+
+@dataclass(frozen=True)
+class StoredContent:
+    """Content bytes with the backend version (GCS generation) they were read at."""
+
+    data: bytes
+    version: str
+
+
+@dataclass(frozen=True)
+class VersionInfo:
+    """Metadata of one stored version of an object."""
+
+    version_id: str
+    last_modified: datetime
+    size: int
+    etag: str = ""
+
+
+class ContentBackend:
+    """Storage backend interface for document content."""
+
+    def fetch(self, key, if_version_not_match=None) -> StoredContent | None:
+        """
+        Return the stored content, or None when its version is ``if_version_not_match``.
+        Raise FileNotFoundError when there is no object for ``key``.
+        """
+        raise NotImplementedError
+
+    def store(self, key, data) -> str:
+        """Store ``data`` under ``key`` and return the new version"""
+        raise NotImplementedError
+
+    def list_versions(self, key):
+        """Return a VersionInfo for every stored version of ``key``, in any order."""
+        raise NotImplementedError
+
+    def version_order(self, version):
+        """Return a sortable value for ``version``: later writes of a key sort higher."""
+        raise NotImplementedError
+
+
+class GCSContentBackend(ContentBackend):
+    """Google Cloud Storage backend. Versions are object generations."""
+
+    def __init__(self, bucket_name=None):
+        self.bucket_name = bucket_name or settings.GCS_DOCS_BUCKET_NAME
+
+    def _blob(self, key):
+        return get_storage_client().bucket(self.bucket_name).blob(key)
+
+    def fetch(self, key, if_version_not_match=None):
+        # pylint: disable=import-outside-toplevel
+        from google.api_core import exceptions as gcs_exceptions
+
+        blob = self._blob(key)
+        try:
+            data = blob.download_as_bytes(
+                if_generation_not_match=int(if_version_not_match) if if_version_not_match else None
+            )
+        except gcs_exceptions.NotModified:
+            return None
+        except gcs_exceptions.NotFound as e:
+            raise FileNotFoundError(f"Blob {key} not found in bucket {self.bucket_name}") from e
+        return StoredContent(data=data, version=str(blob.generation))
+
+    def store(self, key, data):
+        blob = self._blob(key)
+        blob.upload_from_string(data)
+        return str(blob.generation)
+
+    def list_versions(self, key):
+        blobs = get_storage_client().list_blobs(self.bucket_name, prefix=key, versions=True)
+        return [
+            VersionInfo(
+                version_id=str(blob.generation),
+                last_modified=blob.time_created,
+                size=blob.size or 0,
+                etag=blob.etag or "",
+            )
+            for blob in blobs
+            if blob.name == key
+        ]
+
+    def version_order(self, version):
+        return int(version)
+
+
+class FileSystemContentBackend(ContentBackend):
+    """Local directory backend, for tests and development. Versions are mtime and size."""
+
+    def __init__(self, root=None):
+        self.root = Path(root or settings.DOCS_CONTENT_FILESYSTEM_ROOT)
+
+    def _path(self, key):
+        path = (self.root / key).resolve()
+        if not path.is_relative_to(self.root.resolve()):
+            raise ValueError(f"Invalid content key: {key}")
+        return path
+
+    @staticmethod
+    def _version(path):
+        stat = path.stat()
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    def fetch(self, key, if_version_not_match=None):
+        path = self._path(key)
+        try:
+            version = self._version(path)
+            if if_version_not_match is not None and version == if_version_not_match:
+                return None
+            return StoredContent(data=path.read_bytes(), version=version)
+        except FileNotFoundError as e:
+            raise FileNotFoundError(f"No content for {key}") from e
+
+    def store(self, key, data):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        previous_mtime_ns = path.stat().st_mtime_ns if path.exists() else None
+        path.write_bytes(data)
+        # Writes within the same clock tick must still produce distinct versions
+        stat = path.stat()
+        if previous_mtime_ns is not None and stat.st_mtime_ns <= previous_mtime_ns:
+            os.utime(path, ns=(stat.st_atime_ns, previous_mtime_ns + 1))
+        return self._version(path)
+
+    def list_versions(self, key):
+        # Only the current version is kept on the file system
+        path = self._path(key)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return []
+        return [
+            VersionInfo(
+                version_id=self._version(path),
+                last_modified=datetime.fromtimestamp(stat.st_mtime_ns / 1e9, tz=UTC),
+                size=stat.st_size,
+            )
+        ]
+
+    def version_order(self, version):
+        # store() keeps mtimes strictly increasing per key
+        return int(version.partition("-")[0])
+
+
+class LocalLRU:
+    """Thread-safe LRU of StoredContent per key, bounded by the total size of the data."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        if len(entry.data) > self.max_bytes:
+            self.discard(key)
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous.data)
+            self._entries[key] = entry
+            self.size += len(entry.data)
+            while self.size > self.max_bytes:
+                _key, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted.data)
+
+    def discard(self, key):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous.data)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+class ContentCache:
+    """Read-through, write-through content cache in front of a ContentBackend."""
+
+    def __init__(self, backend, local_max_bytes, shared_max_bytes, timeout):
+        self.backend = backend
+        self.local = LocalLRU(local_max_bytes)
+        self.shared_max_bytes = shared_max_bytes
+        self.timeout = timeout
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    @staticmethod
+    def _key_hash(key):
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.requests = dict.fromkeys((LOCAL, SHARED, REVALIDATED, BACKEND), 0)
+            self.bytes_served = dict.fromkeys((LOCAL, SHARED, REVALIDATED, BACKEND), 0)
+
+    def _served(self, tier, entry):
+        with self._stats_lock:
+            self.requests[tier] += 1
+            self.bytes_served[tier] += len(entry.data)
+        return entry.data
+
+    @property
+    def hit_ratio(self):
+        """Share of reads that did not download the content from the backend"""
+        total = sum(self.requests.values())
+        return (total - self.requests[BACKEND]) / total if total else 0.0
+
+    def get_stats(self):
+        return {
+            "requests": dict(self.requests),
+            "bytes_served": dict(self.bytes_served),
+            "hit_ratio": self.hit_ratio,
+            "local_bytes": self.local.size,
+        }
+
+    def _remember(self, key, entry):
+        key_hash = self._key_hash(key)
+        version_key = VERSION_KEY.format(key_hash=key_hash)
+        values = {}
+        if len(entry.data) <= self.shared_max_bytes:
+            values[CONTENT_KEY.format(key_hash=key_hash, version=entry.version)] = entry.data
+        # A slower concurrent writer must not move the pointer back to the version it wrote
+        latest = cache.get(version_key)
+        if latest is None or self.backend.version_order(entry.version) >= self.backend.version_order(latest):
+            values[version_key] = entry.version
+            self.local.put(key, entry)
+        if values:
+            cache.set_many(values, self.timeout)
+
+    def _cached(self, key):
+        """Return (entry, tier) for the latest version known to the cache tiers, if held"""
+        key_hash = self._key_hash(key)
+        version = cache.get(VERSION_KEY.format(key_hash=key_hash))
+        local = self.local.get(key)
+        if version is None:
+            return local, None
+        if local is not None and local.version == version:
+            return local, LOCAL
+        data = cache.get(CONTENT_KEY.format(key_hash=key_hash, version=version))
+        if data is not None:
+            entry = StoredContent(data=data, version=version)
+            self.local.put(key, entry)
+            return entry, SHARED
+        return local, None
+
+    def get(self, key):
+        """Return the content bytes for ``key``. Raise FileNotFoundError if there is none."""
+        candidate, tier = self._cached(key)
+        if tier is not None:
+            return self._served(tier, candidate)
+
+        # Revalidate whatever version is held locally instead of downloading blindly
+        stored = self.backend.fetch(key, if_version_not_match=candidate.version if candidate else None)
+        if stored is None:
+            self._remember(key, candidate)
+            return self._served(REVALIDATED, candidate)
+
+        self._remember(key, stored)
+        return self._served(BACKEND, stored)
+
+    def put(self, key, data):
+        """Write ``data`` through to the backend unless it is the latest cached content"""
+        current, tier = self._cached(key)
+        if tier is not None and current.data == data:
+            return current.version
+
+        version = self.backend.store(key, data)
+        self._remember(key, StoredContent(data=data, version=version))
+        return version
+
+
+_content_cache = None
+_content_cache_lock = threading.Lock()
+
+
+def get_content_cache():
+    """Return the process-wide ContentCache built from settings."""
+    global _content_cache  # pylint: disable=global-statement
+    if _content_cache is None:
+        with _content_cache_lock:
+            if _content_cache is None:
+                _content_cache = ContentCache(
+                    backend=import_string(settings.DOCS_CONTENT_BACKEND)(),
+                    local_max_bytes=settings.DOCS_CONTENT_LOCAL_CACHE_MAX_BYTES,
+                    shared_max_bytes=settings.DOCS_CONTENT_SHARED_CACHE_MAX_BYTES,
+                    timeout=settings.DOCS_CONTENT_CACHE_TIMEOUT,
+                )
+    return _content_cache
+
+
+def reset_content_cache():
+    """Drop the process-wide ContentCache, e.g. after changing settings in tests."""
+    global _content_cache  # pylint: disable=global-statement
+    with _content_cache_lock:
+        _content_cache = None
@@ -0,0 +1,23 @@
+# apps/docs/management/commands/reconcile_document_versions.py
+
+from django.core.management.base import BaseCommand
+
+from apps.docs.tasks import reconcile_document_versions
+
+
+class Command(BaseCommand):
+    help = "Reconcile the local document version index with object storage"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Reconcile all documents instead of those updated since the last run",
+        )
+
+    def handle(self, *args, **options):
+        result = reconcile_document_versions(full=options["full"])
+        self.stdout.write(
+            f"[INFO] Reconciled {result['documents']} documents: "
+            f"{result['added']} versions added, {result['removed']} removed"
+        )
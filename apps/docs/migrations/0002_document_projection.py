@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 21:43
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('docs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentProjection',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='primary key for the record as UUID', primary_key=True, serialize=False, verbose_name='id')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='date and time at which a record was created', verbose_name='created on')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='date and time at which a record was last updated', verbose_name='updated on')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('text', models.TextField(blank=True)),
+                ('attachments', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), blank=True, default=list, size=None)),
+                ('document', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='projection', to='docs.document')),
+            ],
+            options={
+                'verbose_name': 'Document projection',
+                'verbose_name_plural': 'Document projections',
+                'db_table': 'impress_document_projection',
+            },
+        ),
+    ]
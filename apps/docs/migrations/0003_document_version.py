@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-18 21:50
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('docs', '0002_document_projection'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentVersion',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='primary key for the record as UUID', primary_key=True, serialize=False, verbose_name='id')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='date and time at which a record was created', verbose_name='created on')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='date and time at which a record was last updated', verbose_name='updated on')),
+                ('version_id', models.CharField(max_length=255)),
+                ('last_modified', models.DateTimeField()),
+                ('size', models.BigIntegerField(default=0)),
+                ('etag', models.CharField(blank=True, max_length=255)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='docs.document')),
+            ],
+            options={
+                'verbose_name': 'Document version',
+                'verbose_name_plural': 'Document versions',
+                'db_table': 'impress_document_version',
+                'ordering': ('-last_modified', '-version_id'),
+                'indexes': [models.Index(fields=['document', '-last_modified', '-version_id'], name='document_version_recent_idx')],
+                'constraints': [models.UniqueConstraint(fields=('document', 'version_id'), name='unique_document_version')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:27
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('docs', '0003_document_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReconciliationMarker',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='primary key for the record as UUID', primary_key=True, serialize=False, verbose_name='id')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='date and time at which a record was created', verbose_name='created on')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='date and time at which a record was last updated', verbose_name='updated on')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('reconciled_until', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Reconciliation marker',
+                'verbose_name_plural': 'Reconciliation markers',
+                'db_table': 'impress_reconciliation_marker',
+            },
+        ),
+    ]
@@ -5,7 +5,7 @@ Declare and configure the models for the impress core application
 # pylint: disable=too-many-lines
 
 import contextlib
-import hashlib
+import io
 import smtplib
 import uuid
 from collections import defaultdict
@@ -16,7 +16,6 @@ from botocore.exceptions import ClientError
 from django.conf import settings
 from django.contrib.postgres.fields import ArrayField
 from django.contrib.sites.models import Site
-from django.core.cache import cache
 from django.core.files.storage import default_storage
 from django.core.mail import send_mail
 from django.db import models, transaction
@@ -25,12 +24,14 @@ from django.template.loader import render_to_string
 from django.utils import timezone
 from django.utils.translation import get_language, override
 from django.utils.translation import gettext_lazy as _
+from google.api_core.exceptions import NotFound
 from rest_framework.exceptions import ValidationError
 from treebeard.mp_tree import MP_Node, MP_NodeManager, MP_NodeQuerySet
 
 # Removed: from google.cloud import storage
 # Reason: Use get_storage_client() instead to ensure proper GCS credentials
 # (bh-opie-storage service account with object permissions)
+from apps.docs import access_cache, content_cache, utils
 from apps.teams.models import Membership
 from apps.users.models import CustomUser
 from apps.opie.utils.gcs_utils import get_storage_client
@@ -328,6 +329,7 @@ class Document(MP_Node, BaseModel):
     )
 
     _content = None
+    _pending_projection = None
 
     # Tree structure
     alphabet = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
@@ -353,22 +355,84 @@ class Document(MP_Node, BaseModel):
     def __str__(self):
         return str(self.title) if self.title else str(_("Untitled Document"))
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the loaded values that access caches depend on, to detect changes on save."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_link_reach = instance.__dict__.get("link_reach")
+        instance._loaded_link_role = instance.__dict__.get("link_role")
+        attachments = instance.__dict__.get("attachments")
+        instance._loaded_attachments = list(attachments) if attachments is not None else None
+        return instance
+
     def save(self, *args, **kwargs):
         """Write content to object storage only if _content has changed."""
         super().save(*args, **kwargs)
 
         if self._content:
-            file_key = self.file_key
-            bytes_content = self._content.encode("utf-8")
+            # Written through the content cache, which skips the upload if unchanged
+            data = self._content.encode("utf-8")
+            version_id = content_cache.get_content_cache().put(self.file_key, data)
+            DocumentVersion.record(self, version_id, size=len(data), last_modified=self.updated_at)
+            self._sync_projection()
+
+    def _stored_projection(self):
+        """Return the stored projection of the document, if any."""
+        if self._state.adding:
+            return None
+        try:
+            return self.projection
+        except DocumentProjection.DoesNotExist:
+            return None
 
-            # Use Google Cloud Storage client to check if the object exists
-            client = get_storage_client()
-            bucket = client.bucket(settings.GCS_DOCS_BUCKET_NAME)
-            blob = bucket.blob(file_key)
+    def _sync_projection(self):
+        """
+        Bring the stored projection up to date with the content just saved: store the one
+        computed by ``projection_for`` if it matches, do nothing if the stored one already
+        does, and only otherwise queue a task to recompute it.
+        """
+        content_hash = utils.content_hash(self._content)
+        pending, self._pending_projection = self._pending_projection, None
+        if pending is not None and pending.content_hash == content_hash:
+            self.projection = DocumentProjection.store(self, pending)
+            return
+
+        stored = self._stored_projection()
+        if stored is not None and stored.content_hash == content_hash:
+            return
+
+        # pylint: disable=import-outside-toplevel
+        from apps.docs.tasks import update_document_projection
+
+        document_id = str(self.pk)
+        transaction.on_commit(lambda: update_document_projection.delay(document_id))
+
+    def projection_for(self, content):
+        """
+        Return the projection of ``content``: the stored projection if it is current, otherwise
+        a new one which is stored on the next save of this content instead of being recomputed.
+        """
+        stored = self._stored_projection()
+        if stored is not None and stored.content_hash == utils.content_hash(content):
+            return stored
+        self._pending_projection = DocumentProjection.compute(self, content)
+        return self._pending_projection
 
-            # Check if the blob exists and compare its hash
-            if not blob.exists() or blob.etag != hashlib.md5(bytes_content).hexdigest():
-                blob.upload_from_string(bytes_content)
+    def get_projection(self):
+        """
+        Return the text/attachments projection of the current content. The stored projection
+        is used when its hash matches the content, otherwise it is recomputed and stored.
+        """
+        content = self.content
+        try:
+            projection = self.projection
+        except DocumentProjection.DoesNotExist:
+            projection = None
+        if projection is not None and projection.content_hash == utils.content_hash(content):
+            return projection
+        projection = DocumentProjection.refresh(self, content)
+        self.projection = projection
+        return projection
 
     @property
     def key_base(self):
@@ -396,11 +460,9 @@ class Document(MP_Node, BaseModel):
         """Return the json content from object storage if available"""
         if self._content is None and self.id:
             try:
-                response = self.get_content_response()
+                self._content = content_cache.get_content_cache().get(self.file_key).decode("utf-8")
             except (FileNotFoundError, ClientError):
                 pass
-            else:
-                self._content = response["Body"].read().decode("utf-8")
         return self._content
 
     @content.setter
@@ -415,62 +477,60 @@ class Document(MP_Node, BaseModel):
         """Get the content in a specific version of the document"""
         try:
             if not version_id:
-                client = get_storage_client()
-                bucket = client.bucket(settings.GCS_DOCS_BUCKET_NAME)
-                blob = bucket.blob(self.file_key)
-                if not blob.exists():
-                    raise FileNotFoundError(f"Blob {self.file_key} not found in bucket {settings.GCS_DOCS_BUCKET_NAME}")
-                import io
-
-                return {"Body": io.BytesIO(blob.download_as_bytes())}
+                return {"Body": io.BytesIO(content_cache.get_content_cache().get(self.file_key))}
             else:
                 client = get_storage_client()
                 bucket = client.bucket(settings.GCS_DOCS_BUCKET_NAME)
                 blob = bucket.blob(self.file_key, generation=version_id)
-                if not blob.exists():
-                    raise FileNotFoundError(f"Blob {self.file_key} with version {version_id} not found")
-                import io
-
-                return {"Body": io.BytesIO(blob.download_as_bytes())}
+                try:
+                    body = io.BytesIO(blob.download_as_bytes())
+                except NotFound as e:
+                    raise FileNotFoundError(f"Blob {self.file_key} with version {version_id} not found") from e
+                last_modified = (
+                    self.versions.filter(version_id=version_id).values_list("last_modified", flat=True).first()
+                )
+                return {"Body": body, "LastModified": last_modified or self.created_at}
         except Exception as e:
             print(f"Error getting object: {e}")
             return {"error": str(e)}
 
     def get_versions_slice(self, from_version_id="", min_datetime=None, page_size=None):
-        """Get document versions from object storage with pagination and starting conditions"""
-        # /!\ Trick here /!\
-        # The "KeyMarker" and "VersionIdMarker" fields must either be both set or both not set.
-        # The error we get otherwise is not helpful at all.
-        markers = {}
-        if from_version_id:
-            markers.update({"KeyMarker": self.file_key, "VersionIdMarker": from_version_id})
-
+        """
+        Get previous versions of the document from the local version index, most recent
+        first, with cursor pagination after ``from_version_id`` and a minimum date.
+        """
         real_page_size = (
             min(page_size, settings.DOCUMENT_VERSIONS_PAGE_SIZE) if page_size else settings.DOCUMENT_VERSIONS_PAGE_SIZE
         )
 
-        response = default_storage.connection.meta.client.list_object_versions(
-            Bucket=default_storage.bucket_name,
-            Prefix=self.file_key,
-            # compensate the latest version that we exclude below and get one more to
-            # know if there are more pages
-            MaxKeys=real_page_size + 2,
-            **markers,
+        if not self.versions.exists():
+            # Content saved before the index existed: backfill it from the storage listing once
+            DocumentVersion.reconcile(self, content_cache.get_content_cache().backend)
+
+        # The most recent version is the current content, not part of the history
+        queryset = self.versions.filter(last_modified__gte=min_datetime or self.created_at).exclude(
+            pk=models.Subquery(self.versions.values("pk")[:1])
         )
 
-        min_last_modified = min_datetime or self.created_at
+        if from_version_id:
+            marker = self.versions.filter(version_id=from_version_id).values("last_modified", "version_id").first()
+            if marker is None:
+                queryset = queryset.none()
+            else:
+                queryset = queryset.filter(
+                    models.Q(last_modified__lt=marker["last_modified"])
+                    | models.Q(last_modified=marker["last_modified"], version_id__lt=marker["version_id"])
+                )
+
+        # Get one more to know if there are more pages
         versions = [
             {
-                key_snake: version[key_camel]
-                for key_snake, key_camel in [
-                    ("etag", "ETag"),
-                    ("is_latest", "IsLatest"),
-                    ("last_modified", "LastModified"),
-                    ("version_id", "VersionId"),
-                ]
+                "etag": version["etag"],
+                "is_latest": False,
+                "last_modified": version["last_modified"],
+                "version_id": version["version_id"],
             }
-            for version in response.get("Versions", [])
-            if version["LastModified"] >= min_last_modified and version["IsLatest"] is False
+            for version in queryset.values("etag", "last_modified", "version_id")[: real_page_size + 1]
         ]
         results = versions[:real_page_size]
 
@@ -491,12 +551,14 @@ class Document(MP_Node, BaseModel):
 
     def delete_version(self, version_id):
         """Delete a version from object storage given its version id"""
-        return default_storage.connection.meta.client.delete_object(
+        response = default_storage.connection.meta.client.delete_object(
             Bucket=default_storage.bucket_name, Key=self.file_key, VersionId=version_id
         )
+        self.versions.filter(version_id=version_id).delete()
+        return response
 
     def get_nb_accesses_cache_key(self):
-        """Generate a unique cache key for each document."""
+        """Generate a cache key for each document (entries are versioned, see access_cache)."""
         return f"document_{self.id!s}_nb_accesses"
 
     def get_nb_accesses(self):
@@ -506,7 +568,7 @@ class Document(MP_Node, BaseModel):
         - attached to any of the document's ancestors
         """
         cache_key = self.get_nb_accesses_cache_key()
-        nb_accesses = cache.get(cache_key)
+        nb_accesses, generation = access_cache.get_document_entry(cache_key, self.path, self.steplen)
 
         if nb_accesses is None:
             nb_accesses = (
@@ -516,7 +578,7 @@ class Document(MP_Node, BaseModel):
                     document__ancestors_deleted_at__isnull=True,
                 ).count(),
             )
-            cache.set(cache_key, nb_accesses)
+            access_cache.set_entry(cache_key, generation, nb_accesses)
 
         return nb_accesses
 
@@ -532,15 +594,17 @@ class Document(MP_Node, BaseModel):
 
     def invalidate_nb_accesses_cache(self):
         """
-        Invalidate the cache for number of accesses, including on affected descendants.
-        Args:
-            path: can optionally be passed as argument (useful when invalidating cache for a
-                document we just deleted)
+        Invalidate the cache for number of accesses, roles and abilities, including on
+        affected descendants. This bumps the generation of the document's path, which
+        every descendant's cache keys include, so it costs a single cache write whatever
+        the size of the subtree.
         """
+        access_cache.bump_path_generation(self.path)
 
-        for document in Document.objects.filter(path__startswith=self.path).only("id"):
-            cache_key = document.get_nb_accesses_cache_key()
-            cache.delete(cache_key)
+    def get_user_cache_key(self, name, user):
+        """Generate a cache key for data computed for a user on this document."""
+        user_key = user.pk if user.is_authenticated else "anonymous"
+        return f"document_{self.id!s}_{name:s}_{user_key!s}"
 
     def get_roles(self, user):
         """Return the roles a user has on a document."""
@@ -550,16 +614,21 @@ class Document(MP_Node, BaseModel):
         try:
             roles = self.user_roles or []
         except AttributeError:
-            try:
-                # team_ids = Membership.objects.filter(user=user).values_list("team_id", flat=True)
-                team_ids = list(Membership.objects.filter(user=user).values_list("team_id", flat=True))
+            cache_key = self.get_user_cache_key("roles", user)
+            roles, generation = access_cache.get_document_entry(cache_key, self.path, self.steplen, user=user)
+            if roles is None:
+                try:
+                    team_ids = list(Membership.objects.filter(user=user).values_list("team_id", flat=True))
 
-                roles = DocumentAccess.objects.filter(
-                    models.Q(user=user) | models.Q(team__in=team_ids),
-                    document__path=Left(models.Value(self.path), Length("document__path")),
-                ).values_list("role", flat=True)
-            except (models.ObjectDoesNotExist, IndexError):
-                roles = []
+                    roles = list(
+                        DocumentAccess.objects.filter(
+                            models.Q(user=user) | models.Q(team__in=team_ids),
+                            document__path=Left(models.Value(self.path), Length("document__path")),
+                        ).values_list("role", flat=True)
+                    )
+                except (models.ObjectDoesNotExist, IndexError):
+                    roles = []
+                access_cache.set_entry(cache_key, generation, roles)
         return roles
 
     def get_links_definitions(self, ancestors_links):
@@ -601,12 +670,24 @@ class Document(MP_Node, BaseModel):
     def get_abilities(self, user, ancestors_links=None):
         """
         Compute and return abilities for a given user on the document.
+
+        When the ancestors links are not provided by the caller, the result is cached
+        because computing them takes several queries per document.
         """
         if self.depth <= 1 or getattr(self, "is_highest_ancestor_for_user", False):
-            ancestors_links = []
-        elif ancestors_links is None:
-            ancestors_links = self.compute_ancestors_links(user=user)
-
+            return self._compute_abilities(user, [])
+        if ancestors_links is not None:
+            return self._compute_abilities(user, ancestors_links)
+
+        cache_key = self.get_user_cache_key("abilities", user)
+        abilities, generation = access_cache.get_document_entry(cache_key, self.path, self.steplen, user=user)
+        if abilities is None:
+            abilities = self._compute_abilities(user, self.compute_ancestors_links(user=user))
+            access_cache.set_entry(cache_key, generation, abilities)
+        return abilities
+
+    def _compute_abilities(self, user, ancestors_links):
+        """Compute abilities for a given user on the document from its ancestors links."""
         roles = set(self.get_roles(user))  # at this point only roles based on specific access
 
         # Characteristics that are based only on specific access
@@ -724,6 +805,12 @@ class Document(MP_Node, BaseModel):
 
         self.send_email(subject, [email], context, language)
 
+    def move(self, target, pos=None):
+        """Move the document, invalidating cached access data that depends on the old paths."""
+        super().move(target, pos=pos)
+        access_cache.bump_generation()
+        access_cache.bump_tree_generation()
+
     @transaction.atomic
     def soft_delete(self):
         """
@@ -787,6 +874,153 @@ class Document(MP_Node, BaseModel):
             self._meta.model.objects.filter(pk=self.get_parent().pk).update(numchild=models.F("numchild") + 1)
 
 
+class DocumentProjection(BaseModel):
+    """
+    Text and attachment keys derived from a document's content, so they are not decoded
+    from the Yjs payload on every read. ``content_hash`` is the hash of the content the
+    projection was computed from: a projection whose hash differs from the current
+    content's is stale.
+    """
+
+    document = models.OneToOneField(Document, on_delete=models.CASCADE, related_name="projection")
+    content_hash = models.CharField(max_length=64)
+    text = models.TextField(blank=True)
+    attachments = ArrayField(models.CharField(max_length=255), default=list, blank=True)
+
+    class Meta:
+        db_table = "impress_document_projection"
+        verbose_name = _("Document projection")
+        verbose_name_plural = _("Document projections")
+
+    def __str__(self):
+        return f"Projection of document {self.document_id!s}"
+
+    @classmethod
+    def compute(cls, document, content):
+        """Build an unsaved projection of ``content`` for ``document``."""
+        text, attachments = utils.base64_yjs_to_projection(content) if content else ("", [])
+        return cls(document=document, content_hash=utils.content_hash(content), text=text, attachments=attachments)
+
+    @classmethod
+    def refresh(cls, document, content):
+        """Store the projection of ``content`` for ``document`` unless it is already current."""
+        projection = cls.objects.filter(document=document).first()
+        if projection is not None and projection.content_hash == utils.content_hash(content):
+            return projection
+
+        return cls.store(document, cls.compute(document, content))
+
+    @classmethod
+    def store(cls, document, computed):
+        """Store a projection built by ``compute`` as the projection of ``document``."""
+        projection, _created = cls.objects.update_or_create(
+            document=document,
+            defaults={
+                "content_hash": computed.content_hash,
+                "text": computed.text,
+                "attachments": computed.attachments,
+            },
+        )
+        return projection
+
+
+class DocumentVersion(BaseModel):
+    """
+    Local index of the versions of a document's content in object storage, so listing and
+    paginating versions does not list the object versions on every request. A row is
+    appended on each save; ``reconcile`` repairs the index from the storage listing.
+    """
+
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name="versions")
+    version_id = models.CharField(max_length=255)
+    last_modified = models.DateTimeField()
+    size = models.BigIntegerField(default=0)
+    etag = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        db_table = "impress_document_version"
+        ordering = ("-last_modified", "-version_id")
+        verbose_name = _("Document version")
+        verbose_name_plural = _("Document versions")
+        constraints = [
+            models.UniqueConstraint(fields=["document", "version_id"], name="unique_document_version"),
+        ]
+        indexes = [
+            models.Index(fields=["document", "-last_modified", "-version_id"], name="document_version_recent_idx"),
+        ]
+
+    def __str__(self):
+        return f"Version {self.version_id:s} of document {self.document_id!s}"
+
+    @classmethod
+    def record(cls, document, version_id, size, last_modified):
+        """
+        Append a version written at ``last_modified`` to the index, ignoring a version that
+        is already indexed.
+        """
+        cls.objects.bulk_create(
+            [cls(document=document, version_id=version_id, last_modified=last_modified, size=size)],
+            ignore_conflicts=True,
+        )
+
+    @classmethod
+    def reconcile(cls, document, backend):
+        """
+        Sync the index of ``document`` with the versions listed by the storage ``backend``.
+        Return the number of versions added to and removed from the index.
+        """
+        listed = {version.version_id: version for version in backend.list_versions(document.file_key)}
+        indexed = set(cls.objects.filter(document=document).values_list("version_id", flat=True))
+
+        cls.objects.bulk_create(
+            [
+                cls(
+                    document=document,
+                    version_id=version.version_id,
+                    last_modified=version.last_modified,
+                    size=version.size,
+                    etag=version.etag,
+                )
+                for version_id, version in listed.items()
+                if version_id not in indexed
+            ],
+            ignore_conflicts=True,
+        )
+        removed = indexed - listed.keys()
+        if removed:
+            cls.objects.filter(document=document, version_id__in=removed).delete()
+
+        return len(listed.keys() - indexed), len(removed)
+
+
+class ReconciliationMarker(BaseModel):
+    """
+    Point in time up to which a periodic reconciliation has completed, so the next run only
+    looks at what changed since. Kept in the database so it survives cache evictions.
+    """
+
+    name = models.CharField(max_length=100, unique=True)
+    reconciled_until = models.DateTimeField()
+
+    class Meta:
+        db_table = "impress_reconciliation_marker"
+        verbose_name = _("Reconciliation marker")
+        verbose_name_plural = _("Reconciliation markers")
+
+    def __str__(self):
+        return f"{self.name:s} reconciled until {self.reconciled_until!s}"
+
+    @classmethod
+    def get(cls, name):
+        """Return the point in time reconciliation ``name`` completed up to, or None."""
+        return cls.objects.filter(name=name).values_list("reconciled_until", flat=True).first()
+
+    @classmethod
+    def advance(cls, name, reconciled_until):
+        """Record that reconciliation ``name`` has completed up to ``reconciled_until``."""
+        cls.objects.update_or_create(name=name, defaults={"reconciled_until": reconciled_until})
+
+
 class LinkTrace(BaseModel):
     """
     Relation model to trace accesses to a document via a link by a logged-in user.
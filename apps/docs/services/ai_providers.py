@@ -0,0 +1,92 @@
+"""AI completion providers used by the AI service."""
+
+import asyncio
+import hashlib
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+from openai import AsyncOpenAI, OpenAI
+
+
+class AIProvider:
+    """
+    Interface of a chat completion provider.
+
+    ``complete`` returns the whole answer; ``stream`` yields it in chunks. ``model`` is
+    part of the response cache key, so it must identify what produces the answers.
+    """
+
+    model = None
+
+    def complete(self, system_content, text):
+        """Return the answer to ``text`` given the ``system_content`` instructions."""
+        raise NotImplementedError
+
+    async def stream(self, system_content, text):
+        """Yield the answer to ``text`` in chunks as they are produced."""
+        raise NotImplementedError
+
+
+class OpenAIProvider(AIProvider):
+    """Provider for any OpenAI-compatible API, configured with the AI_* settings."""
+
+    def __init__(self):
+        if settings.AI_BASE_URL is None or settings.AI_API_KEY is None or settings.AI_MODEL is None:
+            raise ImproperlyConfigured("AI configuration not set")
+        self.model = settings.AI_MODEL
+
+    def _messages(self, system_content, text):
+        return [
+            {"role": "system", "content": system_content},
+            {"role": "user", "content": text},
+        ]
+
+    def complete(self, system_content, text):
+        client = OpenAI(base_url=settings.AI_BASE_URL, api_key=settings.AI_API_KEY)
+        response = client.chat.completions.create(model=self.model, messages=self._messages(system_content, text))
+        content = response.choices[0].message.content
+
+        if not content:
+            raise RuntimeError("AI response does not contain an answer")
+
+        return content
+
+    async def stream(self, system_content, text):
+        client = AsyncOpenAI(base_url=settings.AI_BASE_URL, api_key=settings.AI_API_KEY)
+        response = await client.chat.completions.create(
+            model=self.model, messages=self._messages(system_content, text), stream=True
+        )
+        async for chunk in response:
+            if chunk.choices and (delta := chunk.choices[0].delta.content):
+                yield delta
+
+
+class FakeAIProvider(AIProvider):
+    """
+    Deterministic offline provider for tests and benchmarks. The answer only depends on
+    the instructions and the text, and is streamed in fixed-size chunks with an optional
+    per-chunk delay to simulate generation time.
+    """
+
+    model = "fake"
+    chunk_size = 16
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def complete(self, system_content, text):
+        digest = hashlib.sha256(system_content.encode("utf-8")).hexdigest()[:8]
+        return f"[{digest}] {text}"
+
+    async def stream(self, system_content, text):
+        answer = self.complete(system_content, text)
+        for start in range(0, len(answer), self.chunk_size):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield answer[start : start + self.chunk_size]
+
+
+def get_ai_provider():
+    """Instantiate the provider class configured in ``AI_PROVIDER``."""
+    return import_string(settings.AI_PROVIDER)()
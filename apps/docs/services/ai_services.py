@@ -1,10 +1,13 @@
 """AI services."""
 
+import hashlib
+import threading
+
 from django.conf import settings
-from django.core.exceptions import ImproperlyConfigured
-from openai import OpenAI
+from django.core.cache import cache
 
 from apps.docs import enums
+from apps.docs.services.ai_providers import get_ai_provider
 
 AI_ACTIONS = {
     "prompt": (
@@ -38,39 +41,133 @@ AI_TRANSLATE = (
 )
 
 
+class AIConcurrencyLimitExceeded(Exception):
+    """Raised when a user already has the maximum number of AI streams running."""
+
+
+def get_response_cache_key(action, language, model, text):
+    """Content-addressed cache key of an AI answer."""
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"ai_response:{action:s}:{language or '':s}:{model!s}:{text_hash:s}"
+
+
+class AIStreamSlot:
+    """
+    Shared counter of the AI streams running for one user, kept in the cache so the limit
+    holds across workers. The counter expires ``AI_STREAM_TIMEOUT`` after the last stream
+    started, so a slot leaked by a killed worker is eventually released. A slot is given
+    back at most once, whichever of the stream's end and the response's close comes first.
+    """
+
+    def __init__(self, identity):
+        self.key = f"ai_streams_{identity:s}"
+        self.acquired = False
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a slot or raise AIConcurrencyLimitExceeded."""
+        cache.add(self.key, 0, settings.AI_STREAM_TIMEOUT)
+        try:
+            running = cache.incr(self.key)
+        except ValueError:
+            # Expired between add and incr
+            cache.set(self.key, 1, settings.AI_STREAM_TIMEOUT)
+            running = 1
+        if running > settings.AI_STREAM_MAX_CONCURRENCY_PER_USER:
+            self._decrement()
+            raise AIConcurrencyLimitExceeded("Too many AI requests running for this user.")
+        # The counter must outlive the stream just started
+        cache.touch(self.key, settings.AI_STREAM_TIMEOUT)
+        self.acquired = True
+
+    def _take(self):
+        """Mark the slot as released, returning whether it was still held."""
+        with self._lock:
+            acquired, self.acquired = self.acquired, False
+        return acquired
+
+    def _decrement(self):
+        try:
+            running = cache.decr(self.key)
+        except ValueError:
+            return
+        if running < 0:
+            # Released after the counter expired and was recreated
+            cache.set(self.key, 0, settings.AI_STREAM_TIMEOUT)
+
+    def release(self):
+        """Give the slot back."""
+        if self._take():
+            self._decrement()
+
+    async def arelease(self):
+        """Give the slot back."""
+        if not self._take():
+            return
+        try:
+            running = await cache.adecr(self.key)
+        except ValueError:
+            return
+        if running < 0:
+            await cache.aset(self.key, 0, settings.AI_STREAM_TIMEOUT)
+
+
 class AIService:
     """Service class for AI-related operations."""
 
-    def __init__(self):
+    def __init__(self, provider=None):
         """Ensure that the AI configuration is set properly."""
-        if settings.AI_BASE_URL is None or settings.AI_API_KEY is None or settings.AI_MODEL is None:
-            raise ImproperlyConfigured("AI configuration not set")
-        self.client = OpenAI(base_url=settings.AI_BASE_URL, api_key=settings.AI_API_KEY)
-
-    def call_ai_api(self, system_content, text):
-        """Helper method to call the OpenAI API and process the response."""
-        response = self.client.chat.completions.create(
-            model=settings.AI_MODEL,
-            messages=[
-                {"role": "system", "content": system_content},
-                {"role": "user", "content": text},
-            ],
-        )
-
-        content = response.choices[0].message.content
-
-        if not content:
-            raise RuntimeError("AI response does not contain an answer")
+        self.provider = provider or get_ai_provider()
+
+    def call_ai_api(self, system_content, text, action, language=None):
+        """Return the provider's answer, from the response cache when this text was already processed."""
+        cache_key = get_response_cache_key(action, language, self.provider.model, text)
+        content = cache.get(cache_key)
+
+        if content is None:
+            content = self.provider.complete(system_content, text)
+            cache.set(cache_key, content, settings.AI_RESPONSE_CACHE_TIMEOUT)
 
         return {"answer": content}
 
+    async def stream_ai_api(self, system_content, text, action, language=None):
+        """
+        Yield the provider's answer in chunks. A cached answer is yielded at once; a
+        streamed answer is cached when it completes.
+        """
+        cache_key = get_response_cache_key(action, language, self.provider.model, text)
+        content = await cache.aget(cache_key)
+
+        if content is not None:
+            yield content
+            return
+
+        chunks = []
+        async for chunk in self.provider.stream(system_content, text):
+            chunks.append(chunk)
+            yield chunk
+
+        if not chunks:
+            raise RuntimeError("AI response does not contain an answer")
+        await cache.aset(cache_key, "".join(chunks), settings.AI_RESPONSE_CACHE_TIMEOUT)
+
     def transform(self, text, action):
         """Transform text based on specified action."""
         system_content = AI_ACTIONS[action]
-        return self.call_ai_api(system_content, text)
+        return self.call_ai_api(system_content, text, action)
 
     def translate(self, text, language):
         """Translate text to a specified language."""
         language_display = enums.ALL_LANGUAGES.get(language, language)
         system_content = AI_TRANSLATE.format(language=language_display)
-        return self.call_ai_api(system_content, text)
+        return self.call_ai_api(system_content, text, "translate", language)
+
+    def stream_transform(self, text, action):
+        """Stream the transformation of text based on specified action."""
+        return self.stream_ai_api(AI_ACTIONS[action], text, action)
+
+    def stream_translate(self, text, language):
+        """Stream the translation of text to a specified language."""
+        language_display = enums.ALL_LANGUAGES.get(language, language)
+        system_content = AI_TRANSLATE.format(language=language_display)
+        return self.stream_ai_api(system_content, text, "translate", language)
@@ -0,0 +1,66 @@
+"""
+Signal handlers keeping the docs access caches in sync with writes.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.teams.models import Membership
+
+from . import access_cache
+from .models import Document, DocumentAccess, LinkReachChoices, LinkTrace
+
+
+@receiver(post_save, sender=Document)
+def invalidate_on_document_save(sender, instance, created, **kwargs):
+    """
+    A new non-restricted document or a link reach change alters what everyone can read,
+    and link changes alter abilities in the subtree; attachment changes alter the
+    attachment index.
+    """
+    if created:
+        if instance.link_reach != LinkReachChoices.RESTRICTED:
+            access_cache.bump_generation()
+        if instance.attachments:
+            access_cache.bump_attachments_generation()
+    else:
+        loaded_link_reach = getattr(instance, "_loaded_link_reach", None)
+        if loaded_link_reach is None or loaded_link_reach != instance.link_reach:
+            access_cache.bump_generation()
+            access_cache.bump_path_generation(instance.path)
+        elif getattr(instance, "_loaded_link_role", None) != instance.link_role:
+            access_cache.bump_path_generation(instance.path)
+        loaded_attachments = getattr(instance, "_loaded_attachments", None)
+        if loaded_attachments is None or loaded_attachments != instance.attachments:
+            access_cache.bump_attachments_generation()
+
+    # The saved state becomes the baseline for the next save of this instance
+    instance._loaded_link_reach = instance.link_reach
+    instance._loaded_link_role = instance.link_role
+    instance._loaded_attachments = list(instance.attachments) if instance.attachments is not None else None
+
+
+@receiver(post_delete, sender=Document)
+def invalidate_on_document_delete(sender, instance, **kwargs):
+    access_cache.bump_generation()
+    if instance.attachments:
+        access_cache.bump_attachments_generation()
+
+
+@receiver(post_save, sender=DocumentAccess)
+@receiver(post_delete, sender=DocumentAccess)
+def invalidate_on_document_access_change(sender, instance, **kwargs):
+    """User accesses only affect that user; team accesses may affect anyone."""
+    access_cache.bump_generation(user_id=instance.user_id)
+
+
+@receiver(post_save, sender=LinkTrace)
+@receiver(post_delete, sender=LinkTrace)
+def invalidate_on_link_trace_change(sender, instance, **kwargs):
+    access_cache.bump_generation(user_id=instance.user_id)
+
+
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+def invalidate_on_membership_change(sender, instance, **kwargs):
+    access_cache.bump_generation(user_id=instance.user_id)
@@ -0,0 +1,58 @@
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, autoretry_for=(Exception,), retry_kwargs={"max_retries": 3, "countdown": 30})
+def update_document_projection(self, document_id: str):
+    """
+    Recompute the text/attachments projection of a document after its content was saved.
+    A no-op when the stored projection already matches the current content.
+    """
+    from apps.docs.models import Document, DocumentProjection
+
+    document = Document.objects.filter(pk=document_id).first()
+    if document is None:
+        logger.info(f"Document {document_id} no longer exists, skipping projection")
+        return
+
+    DocumentProjection.refresh(document, document.content)
+
+
+VERSIONS_RECONCILIATION_MARKER = "document_versions"
+
+
+@shared_task
+def reconcile_document_versions(full=False):
+    """
+    Reconcile the local version index with the version listing in object storage, for the
+    documents updated since the marker stored by the previous run (all documents when there
+    is no marker or ``full`` is set). The marker only moves forward once a pass completes.
+    """
+    from django.utils import timezone
+
+    from apps.docs import content_cache
+    from apps.docs.models import Document, DocumentVersion, ReconciliationMarker
+
+    started_at = timezone.now()
+    marker = None if full else ReconciliationMarker.get(VERSIONS_RECONCILIATION_MARKER)
+
+    documents = Document.objects.select_related("creator").only("id", "created_at", "creator__uuid")
+    if marker is not None:
+        documents = documents.filter(updated_at__gte=marker)
+
+    backend = content_cache.get_content_cache().backend
+    nb_documents = nb_added = nb_removed = 0
+    for document in documents.order_by().iterator(chunk_size=500):
+        added, removed = DocumentVersion.reconcile(document, backend)
+        nb_documents += 1
+        nb_added += added
+        nb_removed += removed
+
+    ReconciliationMarker.advance(VERSIONS_RECONCILIATION_MARKER, started_at)
+    logger.info(
+        f"Reconciled versions of {nb_documents} documents since {marker}: {nb_added} added, {nb_removed} removed"
+    )
+    return {"documents": nb_documents, "added": nb_added, "removed": nb_removed}
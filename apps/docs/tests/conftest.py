@@ -8,6 +8,8 @@ from django.core.cache import cache
 from django.core.files.storage import default_storage
 from django.db import connection
 
+from apps.docs import access_cache, content_cache
+
 USER = "user"
 TEAM = "team"
 VIA = [USER, TEAM]
@@ -30,6 +32,16 @@ def clear_cache():
     cache.clear()
 
 
+@pytest.fixture(autouse=True)
+def immediate_access_cache_bumps():
+    """
+    Bump access cache generations right away: tests run inside a transaction that never
+    commits. test_access_cache covers the bumps deferred to the commit.
+    """
+    with mock.patch.object(access_cache, "on_commit", side_effect=lambda func, **kwargs: func()):
+        yield
+
+
 @pytest.fixture(autouse=True)
 def _db_cleanup(django_db_setup, django_db_blocker):
     """Ensure database is clean before each test."""
@@ -68,6 +80,16 @@ def mock_storage():
         yield mock_client
 
 
+@pytest.fixture(autouse=True)
+def content_backend(settings, tmp_path):
+    """Store document content on the filesystem instead of object storage."""
+    settings.DOCS_CONTENT_BACKEND = "apps.docs.content_cache.FileSystemContentBackend"
+    settings.DOCS_CONTENT_FILESYSTEM_ROOT = str(tmp_path / "docs")
+    content_cache.reset_content_cache()
+    yield content_cache.get_content_cache()
+    content_cache.reset_content_cache()
+
+
 @pytest.fixture
 def mock_user_teams():
     """Mock for team membership queries."""
@@ -2,6 +2,7 @@
 Test AI transform API endpoint for users in impress's core app.
 """
 
+import json
 import random
 from unittest.mock import MagicMock, patch
 
@@ -322,3 +323,38 @@ def test_api_documents_ai_transform_throttling_user(mock_create):
 
     assert response.status_code == 429
     assert response.json() == {"detail": "Request was throttled. Expected available in 60 seconds."}
+
+
+@override_settings(AI_PROVIDER="apps.docs.services.ai_providers.FakeAIProvider")
+def test_api_documents_ai_transform_stream_success():
+    """Editors should receive the AI answer as server-sent events."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    document = factories.DocumentFactory(link_reach="authenticated", link_role="editor")
+
+    url = f"/docs/api/v1/documents/{document.id!s}/ai-transform/stream/"
+    response = client.post(url, {"text": "Hello world, streamed", "action": "summarize"})
+
+    assert response.status_code == 200
+    assert response["Content-Type"] == "text/event-stream"
+    events = b"".join(response.streaming_content).decode().split("\n\n")
+    assert events[-2] == 'data: {"done": true}'
+    assert "".join(json.loads(event[len("data: ") :])["delta"] for event in events[:-2]).endswith(
+        "Hello world, streamed"
+    )
+
+
+def test_api_documents_ai_transform_stream_reader():
+    """Readers should not be able to stream AI transforms."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    document = factories.DocumentFactory(link_reach="authenticated", link_role="reader")
+
+    url = f"/docs/api/v1/documents/{document.id!s}/ai-transform/stream/"
+    response = client.post(url, {"text": "Hello", "action": "summarize"})
+
+    assert response.status_code == 403
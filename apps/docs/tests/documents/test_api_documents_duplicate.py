@@ -195,3 +195,37 @@ def test_api_documents_duplicate_with_accesses():
     assert duplicated_accesses.get(user=user).role == "owner"
     assert duplicated_accesses.get(user=user_access.user).role == user_access.role
     assert duplicated_accesses.get(team=team_access.team).role == team_access.role
+
+
+def test_api_documents_duplicate_attachment_on_copy_authorized():
+    """
+    Users given access to the copy should be authorized on attachments uploaded to it
+    right away, even when their readable documents were cached before the duplication.
+    """
+    user = factories.UserFactory()
+    reader = factories.UserFactory()
+    document = factories.DocumentFactory(users=[(user, "owner")], link_reach="restricted")
+    factories.UserDocumentAccessFactory(document=document, user=reader, role="reader")
+
+    reader_client = APIClient()
+    reader_client.force_login(reader)
+    _, unrelated_url = get_image_refs(document.id)
+    response = reader_client.get("/docs/api/v1/documents/media-auth/", HTTP_X_ORIGINAL_URL=unrelated_url)
+    assert response.status_code == 403
+
+    client = APIClient()
+    client.force_login(user)
+    response = client.post(
+        f"/docs/api/v1/documents/{document.id!s}/duplicate/",
+        {"with_accesses": True},
+        format="json",
+    )
+    assert response.status_code == 201
+
+    duplicated_document = models.Document.objects.get(id=response.json()["id"])
+    image_key, image_url = get_image_refs(duplicated_document.id)
+    duplicated_document.attachments = [image_key]
+    duplicated_document.save()
+
+    response = reader_client.get("/docs/api/v1/documents/media-auth/", HTTP_X_ORIGINAL_URL=image_url)
+    assert response.status_code == 200
@@ -0,0 +1,117 @@
+"""
+Unit tests for the generation-versioned document access cache.
+"""
+
+from unittest import mock
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.docs import access_cache, factories, models
+
+
+@pytest.fixture(name="locmem_cache", autouse=True)
+def fixture_locmem_cache(settings):
+    """Use a real cache backend so generations and cached values are observable."""
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def test_access_cache_readable_paths_covers_descendants():
+    """A root covers itself and its descendants but not siblings or ancestors."""
+    readable = access_cache.ReadablePaths(roots=frozenset({"0001", "00020003"}), steplen=4)
+
+    assert readable.covers("0001")
+    assert readable.covers("000100050007")
+    assert readable.covers("00020003")
+    assert readable.covers("000200030001")
+    assert not readable.covers("0002")
+    assert not readable.covers("00020004")
+    assert not readable.covers("0003")
+
+
+def test_access_cache_bump_generation_changes_user_generation():
+    """Bumping the global or user generation changes the user's combined generation."""
+    user = mock.Mock(pk=1, is_authenticated=True)
+    other_user = mock.Mock(pk=2, is_authenticated=True)
+
+    initial = access_cache.get_generation(user)
+    other_initial = access_cache.get_generation(other_user)
+
+    access_cache.bump_generation(user_id=1)
+    assert access_cache.get_generation(user) != initial
+    assert access_cache.get_generation(other_user) == other_initial
+
+    access_cache.bump_generation()
+    assert access_cache.get_generation(other_user) != other_initial
+
+
+@pytest.mark.django_db
+def test_access_cache_readable_paths_cached_and_invalidated_by_access():
+    """Readable paths are computed once, then recomputed after an access is granted."""
+    user = factories.UserFactory()
+    document = factories.DocumentFactory(link_reach="restricted")
+
+    assert not access_cache.get_readable_paths(user).covers(document.path)
+
+    with mock.patch.object(models.DocumentQuerySet, "readable_per_se") as readable_per_se:
+        access_cache.get_readable_paths(user)
+    readable_per_se.assert_not_called()
+
+    factories.UserDocumentAccessFactory(document=document, user=user)
+    assert access_cache.get_readable_paths(user).covers(document.path)
+
+
+@pytest.mark.django_db
+def test_access_cache_readable_paths_invalidated_by_link_reach():
+    """Opening a document's link reach invalidates cached paths for anonymous users."""
+    document = factories.DocumentFactory(link_reach="restricted")
+    anonymous = AnonymousUser()
+
+    assert not access_cache.get_readable_paths(anonymous).covers(document.path)
+
+    document = models.Document.objects.get(pk=document.pk)
+    document.link_reach = "public"
+    document.save()
+
+    assert access_cache.get_readable_paths(anonymous).covers(document.path)
+
+
+@pytest.mark.django_db
+def test_access_cache_attachment_paths_invalidated_on_append():
+    """Appending an attachment in place invalidates the attachment index."""
+    document = factories.DocumentFactory()
+    key = f"{document.pk!s}/attachments/file.png"
+
+    assert access_cache.get_attachment_paths(key) == []
+
+    document = models.Document.objects.get(pk=document.pk)
+    document.attachments.append(key)
+    document.save()
+
+    assert access_cache.get_attachment_paths(key) == [document.path]
+
+
+@pytest.mark.django_db
+def test_access_cache_generations_bumped_after_commit(django_capture_on_commit_callbacks):
+    """A revoked access is only visible in new generations once the revocation is committed."""
+    user = factories.UserFactory()
+    document = factories.DocumentFactory(link_reach="restricted")
+    access = factories.UserDocumentAccessFactory(document=document, user=user)
+
+    with mock.patch.object(access_cache, "on_commit", transaction.on_commit):
+        with django_capture_on_commit_callbacks() as callbacks:
+            generation = access_cache.get_generation(user)
+            access.delete()
+            # A reader between the write and the commit caches under the old generation
+            assert access_cache.get_generation(user) == generation
+
+        for callback in callbacks:
+            callback()
+
+    assert access_cache.get_generation(user) != generation
+    assert not access_cache.get_readable_paths(user).covers(document.path)
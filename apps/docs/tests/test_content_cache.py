@@ -0,0 +1,132 @@
+"""
+Unit tests for the tiered document content cache.
+"""
+
+from unittest import mock
+
+import pytest
+from django.core.cache import cache
+
+from apps.docs import content_cache, factories
+
+
+@pytest.fixture(name="locmem_cache", autouse=True)
+def fixture_locmem_cache(settings):
+    """Use a real cache backend so the shared tier is observable."""
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(name="backend")
+def fixture_backend(tmp_path):
+    return content_cache.FileSystemContentBackend(root=tmp_path)
+
+
+def _content_cache(backend, local_max_bytes=1024):
+    return content_cache.ContentCache(backend, local_max_bytes=local_max_bytes, shared_max_bytes=1024, timeout=60)
+
+
+def test_content_cache_local_lru_bounded_by_bytes():
+    """The least recently used entries are evicted once the byte budget is exceeded."""
+    lru = content_cache.LocalLRU(max_bytes=10)
+    lru.put("a", content_cache.StoredContent(b"aaaa", "1"))
+    lru.put("b", content_cache.StoredContent(b"bbbb", "1"))
+    lru.get("a")
+    lru.put("c", content_cache.StoredContent(b"cccc", "1"))
+
+    assert lru.get("b") is None
+    assert lru.get("a").data == b"aaaa"
+    assert lru.get("c").data == b"cccc"
+    assert lru.size == 8
+
+    lru.put("d", content_cache.StoredContent(b"d" * 11, "1"))
+    assert lru.get("d") is None
+
+
+def test_content_cache_tiers(backend):
+    """Reads are served locally, then from the shared tier, then revalidated."""
+    backend.store("doc/file", b"content")
+    first = _content_cache(backend)
+
+    assert first.get("doc/file") == b"content"
+    assert first.get("doc/file") == b"content"
+    assert first.requests == {"local": 1, "shared": 0, "revalidated": 0, "backend": 1}
+    assert first.bytes_served["backend"] == len(b"content")
+
+    # Another process starts with an empty local tier
+    second = _content_cache(backend)
+    with mock.patch.object(backend, "fetch") as fetch:
+        assert second.get("doc/file") == b"content"
+    fetch.assert_not_called()
+    assert second.requests["shared"] == 1
+
+    # Without the shared tier, the local copy is revalidated without downloading it
+    cache.clear()
+    assert first.get("doc/file") == b"content"
+    assert first.requests["revalidated"] == 1
+    assert first.hit_ratio == pytest.approx(2 / 3)
+
+
+def test_content_cache_write_through(backend):
+    """Writes reach the backend and are visible to other processes; unchanged writes are skipped."""
+    writer = _content_cache(backend)
+    reader = _content_cache(backend)
+
+    writer.put("doc/file", b"v1")
+    assert reader.get("doc/file") == b"v1"
+
+    writer.put("doc/file", b"v2")
+    assert reader.get("doc/file") == b"v2"
+
+    with mock.patch.object(backend, "store") as store:
+        writer.put("doc/file", b"v2")
+    store.assert_not_called()
+
+
+def test_content_cache_pointer_never_moves_back(backend):
+    """A slower concurrent writer cannot point the shared tier back at the version it wrote."""
+    slow = _content_cache(backend)
+    fast = _content_cache(content_cache.FileSystemContentBackend(root=backend.root))
+    store = backend.store
+
+    def store_then_overtaken(key, data):
+        version = store(key, data)
+        fast.put(key, b"newer")
+        return version
+
+    with mock.patch.object(backend, "store", side_effect=store_then_overtaken):
+        slow.put("doc/file", b"older")
+
+    assert _content_cache(backend).get("doc/file") == b"newer"
+    assert slow.get("doc/file") == b"newer"
+
+
+def test_content_cache_missing_content(backend):
+    """Missing content raises FileNotFoundError."""
+    with pytest.raises(FileNotFoundError):
+        _content_cache(backend).get("doc/missing")
+
+
+@pytest.mark.django_db
+def test_content_cache_document_content_round_trip(content_backend):
+    """Document content is written through on save and read back from the cache."""
+    document = factories.DocumentFactory(content="my content")
+
+    assert content_backend.backend.fetch(document.file_key).data == b"my content"
+    content_backend.reset_stats()
+
+    document.refresh_from_db()
+    document._content = None
+    assert document.content == "my content"
+    assert content_backend.requests["local"] == 1
+
+
+def test_content_cache_file_system_versions_distinct(backend):
+    """Successive writes of the same size get distinct versions, even within a clock tick."""
+    versions = [backend.store("doc/file", f"v{i:d}".encode()) for i in range(20)]
+
+    assert len(set(versions)) == 20
+    assert [version.version_id for version in backend.list_versions("doc/file")] == [versions[-1]]
+    assert backend.list_versions("doc/missing") == []
@@ -6,6 +6,7 @@ Unit tests for the Document model
 
 import random
 import smtplib
+from datetime import timedelta
 from logging import Logger
 from unittest import mock
 
@@ -18,11 +19,16 @@ from django.core.files.storage import default_storage
 from django.test.utils import override_settings
 from django.utils import timezone
 
-from apps.docs import factories, models
+from apps.docs import access_cache, content_cache, factories, models, tasks
 
 pytestmark = pytest.mark.django_db
 
 
+def _cached_nb_accesses(document):
+    """Return the cached number of accesses of a document, or None when missing or stale."""
+    return access_cache.get_document_entry(document.get_nb_accesses_cache_key(), document.path, document.steplen)[0]
+
+
 def test_models_documents_str():
     """The str representation should be the title of the document."""
     document = factories.DocumentFactory(title="admins")
@@ -654,6 +660,76 @@ def test_models_documents_version_duplicate():
     assert len(response["Versions"]) == 2
 
 
+def test_models_documents_versions_index_appended_on_save():
+    """Each save of changed content appends one version to the local index."""
+    document = factories.DocumentFactory()
+    assert document.versions.count() == 1
+
+    # Save again with the same content
+    document.save()
+    assert document.versions.count() == 1
+
+    document.content = "new content"
+    document.save()
+    assert document.versions.count() == 2
+    assert document.versions.first().size == len(b"new content")
+    assert document.versions.first().last_modified == document.updated_at
+
+
+def test_models_documents_versions_index_reconcile():
+    """Reconciliation adds versions missing from the index and removes deleted ones."""
+    document = factories.DocumentFactory()
+    now = timezone.now()
+    stale = models.DocumentVersion.objects.create(document=document, version_id="stale", last_modified=now)
+
+    backend = mock.Mock()
+    backend.list_versions.return_value = [
+        content_cache.VersionInfo(version_id=version.version_id, last_modified=now, size=1)
+        for version in document.versions.exclude(pk=stale.pk)
+    ] + [content_cache.VersionInfo(version_id="external", last_modified=now, size=3, etag="abc")]
+
+    assert models.DocumentVersion.reconcile(document, backend) == (1, 1)
+    backend.list_versions.assert_called_once_with(document.file_key)
+    assert not document.versions.filter(version_id="stale").exists()
+    assert document.versions.get(version_id="external").etag == "abc"
+
+    assert models.DocumentVersion.reconcile(document, backend) == (0, 0)
+
+
+def test_models_documents_get_versions_slice_backfills_unindexed(content_backend):
+    """Versions of a document missing from the index are listed from storage and indexed."""
+    document = factories.DocumentFactory()
+    document.versions.all().delete()
+    now = timezone.now()
+    listed = [
+        content_cache.VersionInfo(version_id="v1", last_modified=now - timedelta(hours=1), size=1),
+        content_cache.VersionInfo(version_id="v2", last_modified=now, size=1),
+    ]
+
+    with mock.patch.object(content_backend.backend, "list_versions", return_value=listed) as list_versions:
+        response = document.get_versions_slice(min_datetime=now - timedelta(days=1))
+        document.get_versions_slice(min_datetime=now - timedelta(days=1))
+
+    list_versions.assert_called_once_with(document.file_key)
+    assert [version["version_id"] for version in response["versions"]] == ["v1"]
+    assert document.versions.count() == 2
+
+
+def test_models_documents_versions_reconciliation_marker():
+    """Reconciliation runs only look at documents updated since the previous run."""
+    factories.DocumentFactory.create_batch(2)
+
+    assert tasks.reconcile_document_versions()["documents"] == 2
+    assert tasks.reconcile_document_versions()["documents"] == 0
+
+    document = factories.DocumentFactory()
+    document.content = "new content"
+    document.save()
+    assert tasks.reconcile_document_versions() == {"documents": 1, "added": 0, "removed": 1}
+    assert tasks.reconcile_document_versions(full=True)["documents"] == 3
+    assert models.ReconciliationMarker.get(tasks.VERSIONS_RECONCILIATION_MARKER) is not None
+
+
 def test_models_documents__email_invitation__success():
     """
     The email invitation is sent successfully.
@@ -790,7 +866,6 @@ def test_models_documents_nb_accesses_cache_is_set_and_retrieved_ancestors(
     """Test that nb_accesses is cached when calling nb_accesses_ancestors."""
     parent = factories.DocumentFactory()
     document = factories.DocumentFactory(parent=parent)
-    key = f"document_{document.id!s}_nb_accesses"
     nb_accesses_parent = random.randint(1, 4)
     factories.UserDocumentAccessFactory.create_batch(nb_accesses_parent, document=parent)
     nb_accesses_direct = random.randint(1, 4)
@@ -798,7 +873,7 @@ def test_models_documents_nb_accesses_cache_is_set_and_retrieved_ancestors(
     factories.UserDocumentAccessFactory()  # An unrelated access should not be counted
 
     # Initially, the nb_accesses should not be cached
-    assert cache.get(key) is None
+    assert _cached_nb_accesses(document) is None
 
     # Compute the nb_accesses for the first time (this should set the cache)
     nb_accesses_ancestors = nb_accesses_parent + nb_accesses_direct
@@ -808,14 +883,14 @@ def test_models_documents_nb_accesses_cache_is_set_and_retrieved_ancestors(
     # Ensure that the nb_accesses is now cached
     with django_assert_num_queries(0):
         assert document.nb_accesses_ancestors == nb_accesses_ancestors
-    assert cache.get(key) == (nb_accesses_direct, nb_accesses_ancestors)
+    assert _cached_nb_accesses(document) == (nb_accesses_direct, nb_accesses_ancestors)
 
     # The cache value should be invalidated when a document access is created
     models.DocumentAccess.objects.create(document=document, user=factories.UserFactory(), role="reader")
-    assert cache.get(key) is None  # Cache should be invalidated
+    assert _cached_nb_accesses(document) is None  # Cache should be invalidated
     with django_assert_num_queries(2):
         assert document.nb_accesses_ancestors == nb_accesses_ancestors + 1
-    assert cache.get(key) == (nb_accesses_direct + 1, nb_accesses_ancestors + 1)
+    assert _cached_nb_accesses(document) == (nb_accesses_direct + 1, nb_accesses_ancestors + 1)
 
 
 def test_models_documents_nb_accesses_cache_is_set_and_retrieved_direct(
@@ -824,7 +899,6 @@ def test_models_documents_nb_accesses_cache_is_set_and_retrieved_direct(
     """Test that nb_accesses is cached when calling nb_accesses_direct."""
     parent = factories.DocumentFactory()
     document = factories.DocumentFactory(parent=parent)
-    key = f"document_{document.id!s}_nb_accesses"
     nb_accesses_parent = random.randint(1, 4)
     factories.UserDocumentAccessFactory.create_batch(nb_accesses_parent, document=parent)
     nb_accesses_direct = random.randint(1, 4)
@@ -832,7 +906,7 @@ def test_models_documents_nb_accesses_cache_is_set_and_retrieved_direct(
     factories.UserDocumentAccessFactory()  # An unrelated access should not be counted
 
     # Initially, the nb_accesses should not be cached
-    assert cache.get(key) is None
+    assert _cached_nb_accesses(document) is None
 
     # Compute the nb_accesses for the first time (this should set the cache)
     nb_accesses_ancestors = nb_accesses_parent + nb_accesses_direct
@@ -842,14 +916,14 @@ def test_models_documents_nb_accesses_cache_is_set_and_retrieved_direct(
     # Ensure that the nb_accesses is now cached
     with django_assert_num_queries(0):
         assert document.nb_accesses_direct == nb_accesses_direct
-    assert cache.get(key) == (nb_accesses_direct, nb_accesses_ancestors)
+    assert _cached_nb_accesses(document) == (nb_accesses_direct, nb_accesses_ancestors)
 
     # The cache value should be invalidated when a document access is created
     models.DocumentAccess.objects.create(document=document, user=factories.UserFactory(), role="reader")
-    assert cache.get(key) is None  # Cache should be invalidated
+    assert _cached_nb_accesses(document) is None  # Cache should be invalidated
     with django_assert_num_queries(2):
         assert document.nb_accesses_direct == nb_accesses_direct + 1
-    assert cache.get(key) == (nb_accesses_direct + 1, nb_accesses_ancestors + 1)
+    assert _cached_nb_accesses(document) == (nb_accesses_direct + 1, nb_accesses_ancestors + 1)
 
 
 @pytest.mark.parametrize("field", ["nb_accesses_ancestors", "nb_accesses_direct"])
@@ -859,22 +933,21 @@ def test_models_documents_nb_accesses_cache_is_invalidated_on_access_removal(
 ):
     """Test that the cache is invalidated when a document access is deleted."""
     document = factories.DocumentFactory()
-    key = f"document_{document.id!s}_nb_accesses"
     access = factories.UserDocumentAccessFactory(document=document)
 
     # Initially, the nb_accesses should be cached
     assert getattr(document, field) == 1
-    assert cache.get(key) == (1, 1)
+    assert _cached_nb_accesses(document) == (1, 1)
 
     # Remove the access and check if cache is invalidated
     access.delete()
-    assert cache.get(key) is None  # Cache should be invalidated
+    assert _cached_nb_accesses(document) is None  # Cache should be invalidated
 
     # Recompute the nb_accesses (this should trigger a cache set)
     with django_assert_num_queries(2):
         new_nb_accesses = getattr(document, field)
     assert new_nb_accesses == 0
-    assert cache.get(key) == (0, 0)  # Cache should now contain the new value
+    assert _cached_nb_accesses(document) == (0, 0)  # Cache should now contain the new value
 
 
 @pytest.mark.parametrize("field", ["nb_accesses_ancestors", "nb_accesses_direct"])
@@ -884,22 +957,21 @@ def test_models_documents_nb_accesses_cache_is_invalidated_on_document_soft_dele
 ):
     """Test that the cache is invalidated when a document access is deleted."""
     document = factories.DocumentFactory()
-    key = f"document_{document.id!s}_nb_accesses"
     factories.UserDocumentAccessFactory(document=document)
 
     # Initially, the nb_accesses should be cached
     assert getattr(document, field) == 1
-    assert cache.get(key) == (1, 1)
+    assert _cached_nb_accesses(document) == (1, 1)
 
     # Soft delete the document and check if cache is invalidated
     document.soft_delete()
-    assert cache.get(key) is None  # Cache should be invalidated
+    assert _cached_nb_accesses(document) is None  # Cache should be invalidated
 
     # Recompute the nb_accesses (this should trigger a cache set)
     with django_assert_num_queries(2):
         new_nb_accesses = getattr(document, field)
     assert new_nb_accesses == (1 if field == "nb_accesses_direct" else 0)
-    assert cache.get(key) == (1, 0)  # Cache should now contain the new value
+    assert _cached_nb_accesses(document) == (1, 0)  # Cache should now contain the new value
 
     document.restore()
 
@@ -907,7 +979,104 @@ def test_models_documents_nb_accesses_cache_is_invalidated_on_document_soft_dele
     with django_assert_num_queries(2):
         new_nb_accesses = getattr(document, field)
     assert new_nb_accesses == 1
-    assert cache.get(key) == (1, 1)  # Cache should now contain the new value
+    assert _cached_nb_accesses(document) == (1, 1)  # Cache should now contain the new value
+
+
+def test_models_documents_nb_accesses_cache_is_invalidated_on_descendants():
+    """Adding an access on an ancestor invalidates the cache of the whole subtree at once."""
+    parent = factories.DocumentFactory()
+    document = factories.DocumentFactory(parent=factories.DocumentFactory(parent=parent))
+    factories.UserDocumentAccessFactory(document=document)
+
+    assert document.nb_accesses_ancestors == 1
+    assert _cached_nb_accesses(document) == (1, 1)
+
+    with mock.patch.object(cache, "delete") as cache_delete:
+        factories.UserDocumentAccessFactory(document=parent)
+    cache_delete.assert_not_called()
+
+    assert _cached_nb_accesses(document) is None
+    assert document.nb_accesses_ancestors == 2
+
+
+def test_models_documents_get_roles_cached_and_invalidated(django_assert_num_queries):
+    """Roles are cached per user and invalidated when an ancestor access changes."""
+    parent = factories.DocumentFactory()
+    document = factories.DocumentFactory(parent=parent)
+    user = factories.UserFactory()
+    factories.UserDocumentAccessFactory(document=parent, user=user, role="reader")
+
+    assert list(document.get_roles(user)) == ["reader"]
+    with django_assert_num_queries(0):
+        assert list(document.get_roles(user)) == ["reader"]
+
+    factories.UserDocumentAccessFactory(document=document, user=user, role="editor")
+
+    assert set(document.get_roles(user)) == {"reader", "editor"}
+
+
+# Document projection
+
+
+def test_models_documents_get_projection_uses_stored_projection(django_assert_num_queries):
+    """A stored projection whose hash matches the content is returned without decoding."""
+    document = factories.DocumentFactory()
+    projection = models.DocumentProjection.refresh(document, document.content)
+    document = models.Document.objects.select_related("projection").get(pk=document.pk)
+
+    with mock.patch.object(models.utils, "base64_yjs_to_projection") as decode:
+        with django_assert_num_queries(0):
+            assert document.get_projection() == projection
+    decode.assert_not_called()
+
+
+def test_models_documents_get_projection_recomputes_stale_projection():
+    """A projection computed from other content is recomputed and stored."""
+    document = factories.DocumentFactory()
+    models.DocumentProjection.objects.create(
+        document=document, content_hash="stale", text="old text", attachments=["old"]
+    )
+    document = models.Document.objects.get(pk=document.pk)
+
+    projection = document.get_projection()
+
+    assert projection.content_hash == models.utils.content_hash(document.content)
+    assert projection.attachments == []
+    assert projection.text != "old text"
+    assert models.DocumentProjection.objects.get(document=document).text == projection.text
+
+
+def test_models_documents_save_queues_projection_only_when_content_changed(django_capture_on_commit_callbacks):
+    """Saving content the stored projection was computed from queues no projection task."""
+    document = factories.DocumentFactory()
+    models.DocumentProjection.refresh(document, document.content)
+    document = models.Document.objects.get(pk=document.pk)
+
+    with mock.patch("apps.docs.tasks.update_document_projection.delay") as delay:
+        with django_capture_on_commit_callbacks(execute=True):
+            document.content = document.content
+            document.save()
+        delay.assert_not_called()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            document.content = "b3RoZXIgY29udGVudA=="
+            document.save()
+        delay.assert_called_once_with(str(document.pk))
+
+
+def test_models_documents_save_stores_projection_for_content():
+    """A projection computed with projection_for is stored on save instead of being queued."""
+    document = models.Document.objects.get(pk=factories.DocumentFactory().pk)
+    content = document.content
+
+    projection = document.projection_for(content)
+    with mock.patch("apps.docs.tasks.update_document_projection.delay") as delay:
+        document.content = content
+        document.save()
+
+    delay.assert_not_called()
+    stored = models.DocumentProjection.objects.get(document=document)
+    assert (stored.content_hash, stored.text) == (projection.content_hash, projection.text)
 
 
 def test_models_documents_numchild_deleted_from_instance():
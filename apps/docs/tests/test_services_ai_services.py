@@ -5,11 +5,20 @@ Test ai API endpoints in the impress core app.
 from unittest.mock import MagicMock, patch
 
 import pytest
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ImproperlyConfigured
 from django.test.utils import override_settings
 from openai import OpenAIError
 
-from apps.docs.services.ai_services import AIService
+from apps.docs.services.ai_providers import FakeAIProvider
+from apps.docs.services.ai_services import (
+    AI_ACTIONS,
+    AIConcurrencyLimitExceeded,
+    AIService,
+    AIStreamSlot,
+)
 
 pytestmark = pytest.mark.django_db
 
@@ -73,3 +82,87 @@ def test_api_ai__success(mock_create):
     response = AIService().transform("hello", "prompt")
 
     assert response == {"answer": "Salut"}
+
+
+@pytest.fixture(name="locmem_cache")
+def fixture_locmem_cache(settings):
+    """Use a real cache backend so cached answers and stream slots are observable."""
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    cache.clear()
+    yield
+    cache.clear()
+
+
+async def _collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+@pytest.mark.usefixtures("locmem_cache")
+def test_api_ai__answers_are_cached_by_content():
+    """The provider is only called once for the same action, model and text."""
+    provider = FakeAIProvider()
+    with patch.object(provider, "complete", wraps=provider.complete) as complete:
+        first = AIService(provider=provider).transform("hello", "summarize")
+        second = AIService(provider=provider).transform("hello", "summarize")
+        AIService(provider=provider).transform("hello", "correct")
+        AIService(provider=provider).translate("hello", "fr")
+
+    assert first == second
+    assert complete.call_count == 3
+
+
+@pytest.mark.usefixtures("locmem_cache")
+def test_api_ai__stream_then_cached():
+    """A streamed answer is chunked, then served from the cache in one piece."""
+    service = AIService(provider=FakeAIProvider())
+    expected = service.provider.complete(AI_ACTIONS["rephrase"], "hello world, this is a long text")
+
+    chunks = async_to_sync(_collect)(service.stream_transform("hello world, this is a long text", "rephrase"))
+    assert len(chunks) > 1
+    assert "".join(chunks) == expected
+
+    with patch.object(service.provider, "stream") as stream:
+        chunks = async_to_sync(_collect)(service.stream_transform("hello world, this is a long text", "rephrase"))
+    stream.assert_not_called()
+    assert chunks == [expected]
+
+
+@pytest.mark.usefixtures("locmem_cache")
+@override_settings(AI_STREAM_MAX_CONCURRENCY_PER_USER=2)
+def test_api_ai__stream_slots_limited_per_user():
+    """A user can't run more streams than allowed at once; released slots can be reused."""
+    first, second, third = AIStreamSlot("user_1"), AIStreamSlot("user_1"), AIStreamSlot("user_1")
+    first.acquire()
+    second.acquire()
+    with pytest.raises(AIConcurrencyLimitExceeded):
+        third.acquire()
+
+    AIStreamSlot("user_2").acquire()
+
+    async_to_sync(first.arelease)()
+    third.acquire()
+
+
+@pytest.mark.usefixtures("locmem_cache")
+@override_settings(AI_STREAM_MAX_CONCURRENCY_PER_USER=2)
+def test_api_ai__stream_slots_released_once_and_never_below_zero():
+    """A slot is released once whichever path releases it, and a late release can't go negative."""
+    slot = AIStreamSlot("user_1")
+    slot.acquire()
+    slot.release()
+    async_to_sync(slot.arelease)()
+    assert cache.get(slot.key) == 0
+
+    slot.acquire()
+    cache.set(slot.key, 0)  # the counter expired and was recreated meanwhile
+    slot.release()
+    assert cache.get(slot.key) == 0
+
+
+@pytest.mark.usefixtures("locmem_cache")
+def test_api_ai__stream_slot_acquire_refreshes_timeout():
+    """Starting a stream extends the counter's lifetime."""
+    slot = AIStreamSlot("user_1")
+    with patch.object(cache, "touch") as touch:
+        slot.acquire()
+    touch.assert_called_once_with(slot.key, settings.AI_STREAM_TIMEOUT)
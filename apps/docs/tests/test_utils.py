@@ -70,3 +70,28 @@ def test_utils_extract_attachments():
     base64_string = base64.b64encode(update).decode("utf-8")
     # image_key2 is missing the "/media/" part and shouldn't get extracted
     assert utils.extract_attachments(base64_string) == [image_key1, image_key3]
+
+
+def test_utils_base64_yjs_to_projection_matches_xml_parsing():
+    """The fast-path projection should match text and attachments extracted from the xml."""
+    image_key = f"{uuid.uuid4()!s}/attachments/{uuid.uuid4()!s}.png"
+    image_url = f"http://localhost/media/{image_key:s}"
+
+    ydoc = pycrdt.Doc()
+    frag = pycrdt.XmlFragment(
+        [
+            pycrdt.XmlElement(
+                "blockGroup",
+                {},
+                [
+                    pycrdt.XmlElement("image", {"url": image_url}),
+                    pycrdt.XmlElement("paragraph", {}, [pycrdt.XmlText("  some text ")]),
+                ],
+            )
+        ]
+    )
+    ydoc["document-store"] = frag
+    base64_string = base64.b64encode(ydoc.get_update()).decode("utf-8")
+
+    assert utils.base64_yjs_to_projection(base64_string) == ("some text", [image_key])
+    assert utils.base64_yjs_to_projection(TEST_BASE64_STRING) == ("Hello w or ld", [])
@@ -1,10 +1,9 @@
 """Utils for the core app."""
 
 import base64
-import re
+import hashlib
 
 import pycrdt
-from bs4 import BeautifulSoup
 
 from apps.docs import enums
 
@@ -59,12 +58,52 @@ def base64_yjs_to_xml(base64_string):
     return str(doc.get("document-store", type=pycrdt.XmlFragment))
 
 
+def _walk_xml_fragment(node, texts, attachments):
+    """
+    Collect text runs and attachment keys from a pycrdt XML node, in document order.
+
+    Text runs are split where the rendered XML would put a tag, so joining them matches
+    the text of the XML serialization without building a tree from it.
+    """
+    for child in node.children:
+        if isinstance(child, pycrdt.XmlText):
+            run, run_format = [], None
+            for insert, attributes in child.diff():
+                if not isinstance(insert, str):
+                    continue
+                for value in (attributes or {}).values():
+                    attachments.extend(enums.MEDIA_STORAGE_URL_EXTRACT.findall(str(value)))
+                attachments.extend(enums.MEDIA_STORAGE_URL_EXTRACT.findall(insert))
+                if run and (attributes or None) != run_format:
+                    texts.append("".join(run))
+                    run = []
+                run.append(insert)
+                run_format = attributes or None
+            if run:
+                texts.append("".join(run))
+        else:
+            for _name, value in child.attributes:
+                attachments.extend(enums.MEDIA_STORAGE_URL_EXTRACT.findall(str(value)))
+            _walk_xml_fragment(child, texts, attachments)
+
+
+def base64_yjs_to_projection(base64_string):
+    """
+    Decode a base64 yjs document once and return its plain text and attachment keys.
+    Walks the pycrdt XML fragment directly instead of parsing its XML serialization.
+    """
+    doc = pycrdt.Doc()
+    doc.apply_update(base64.b64decode(base64_string))
+
+    texts, attachments = [], []
+    _walk_xml_fragment(doc.get("document-store", type=pycrdt.XmlFragment), texts, attachments)
+    text = " ".join(stripped for stripped in (text.strip() for text in texts) if stripped)
+    return text, attachments
+
+
 def base64_yjs_to_text(base64_string):
     """Extract text from base64 yjs document."""
-
-    blocknote_structure = base64_yjs_to_xml(base64_string)
-    soup = BeautifulSoup(blocknote_structure, "lxml-xml")
-    return soup.get_text(separator=" ", strip=True)
+    return base64_yjs_to_projection(base64_string)[0]
 
 
 def extract_attachments(content):
@@ -72,5 +111,9 @@ def extract_attachments(content):
     if not content:
         return []
 
-    xml_content = base64_yjs_to_xml(content)
-    return re.findall(enums.MEDIA_STORAGE_URL_EXTRACT, xml_content)
+    return base64_yjs_to_projection(content)[1]
+
+
+def content_hash(content):
+    """Hash of a document's base64 content, used to check that a projection is current."""
+    return hashlib.sha256((content or "").encode("utf-8")).hexdigest()
@@ -1,11 +1,23 @@
 import json
 import uuid
 
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
 from django.template.loader import render_to_string
 
 from apps.users.serializers import CustomUserSerializer
 
+from .models import ChatMessage
+from .persistence import get_message_buffer
+
+MESSAGE_TEMPLATE = "group_chat/components/chat_response_htmx.html"
+HISTORY_TEMPLATE = "group_chat/components/chat_history_htmx.html"
+
+
+def render_message(message, user, is_own):
+    return render_to_string(MESSAGE_TEMPLATE, {"user": user, "message": message, "is_own": is_own})
+
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -19,21 +31,41 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
         await self.accept()
 
+        # Backfill the latest messages, including the ones still waiting in the write buffer
+        await get_message_buffer().flush()
+        await self.send_history()
+
     async def disconnect(self, close_code):
         # Leave room group
         await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        await get_message_buffer().flush()
 
     # Receive message from WebSocket
     async def receive(self, text_data):
         text_data_json = json.loads(text_data)
+        if "before" in text_data_json:
+            try:
+                before = int(text_data_json["before"])
+            except (TypeError, ValueError):
+                return
+            await self.send_history(before=before)
+            return
+
         message = text_data_json["message"]
         user_data = None
         if not self.user.is_anonymous:
             user_data = CustomUserSerializer(self.user).data
+
+        await get_message_buffer().add(
+            ChatMessage(room=self.room_name, user_id=self.user.id, session_id=self.session_id, message=message)
+        )
+
+        # Render the two variants of the fragment once here, rather than once per socket in the room
         event = {
             "type": "chat_message",
-            "message": message,
-            "user": user_data,
+            "html": render_message(message, user_data, is_own=False),
+            "own_html": render_message(message, user_data, is_own=True),
+            "user_id": user_data["id"] if user_data else None,
             "session": self.session_id,
         }
         # Send message to room group
@@ -41,15 +73,34 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     # Receive message from room group
     async def chat_message(self, event):
-        message = event["message"]
-        user = event["user"]
-        is_own = self.session_id == event["session"] or (user and user["id"] == self.user.id)
+        user_id = event["user_id"]
+        is_own = self.session_id == event["session"] or (user_id is not None and user_id == self.user.id)
+        await self.send(text_data=event["own_html"] if is_own else event["html"])
+
+    async def send_history(self, before=None):
+        # Only this worker's write buffer is flushed before reading: messages still pending
+        # on other workers show up in history once their buffer is flushed, at most
+        # GROUP_CHAT_PERSIST_INTERVAL_MS later (they are delivered live meanwhile).
+        page_size = settings.GROUP_CHAT_HISTORY_PAGE_SIZE
+        messages = await database_sync_to_async(ChatMessage.objects.history)(
+            self.room_name, before=before, limit=page_size
+        )
+        if not messages and before is not None:
+            return
         response = render_to_string(
-            "group_chat/components/chat_response_htmx.html",
+            HISTORY_TEMPLATE,
             {
-                "user": user,
-                "message": message,
-                "is_own": is_own,
+                "before": messages[0].id if len(messages) == page_size else None,
+                "messages": [
+                    {
+                        "id": message.id,
+                        "user": message.user,
+                        "message": message.message,
+                        "is_own": message.session_id == self.session_id
+                        or (message.user_id is not None and message.user_id == self.user.id),
+                    }
+                    for message in messages
+                ],
             },
         )
         await self.send(text_data=response)
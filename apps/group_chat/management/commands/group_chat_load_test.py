@@ -0,0 +1,107 @@
+"""
+Django management command load testing the group chat fan-out.
+
+Connects many sockets to one room, posts messages from one of them and measures how long
+it takes until every socket received each message. Also reports the template rendering
+cost of a room this size when each socket renders the fragment itself, compared to the
+two renders per message done by the sender.
+"""
+
+import asyncio
+import time
+import uuid
+
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from apps.group_chat.consumers import render_message
+from apps.group_chat.models import ChatMessage
+from apps.group_chat.persistence import get_message_buffer
+from apps.group_chat.routing import websocket_urlpatterns
+
+IN_MEMORY_CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+def _anonymous_application():
+    router = URLRouter(websocket_urlpatterns)
+
+    async def application(scope, receive, send):
+        return await router(dict(scope, user=AnonymousUser()), receive, send)
+
+    return application
+
+
+class Command(BaseCommand):
+    help = "Load test the group chat fan-out with many sockets in one room"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sockets", type=int, default=200, help="Number of sockets in the room (default: 200)")
+        parser.add_argument("--messages", type=int, default=50, help="Number of messages posted (default: 50)")
+        parser.add_argument(
+            "--in-memory",
+            action="store_true",
+            help="Use the in-memory channel layer instead of the configured one",
+        )
+
+    def _report(self, label, count, unit, elapsed):
+        self.stdout.write(f"{label:<30} {count:>8d} {unit:<10} in {elapsed:8.3f}s  {count / elapsed:12.1f} {unit}/s")
+
+    def _measure_rendering(self, sockets, messages):
+        started = time.perf_counter()
+        for i in range(messages * sockets):
+            render_message(f"message {i}", None, is_own=False)
+        self._report("render per socket (before)", messages * sockets, "renders", time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for i in range(messages):
+            render_message(f"message {i}", None, is_own=False)
+            render_message(f"message {i}", None, is_own=True)
+        self._report("render once (after)", messages * 2, "renders", time.perf_counter() - started)
+
+    async def _run(self, room, sockets, messages):
+        application = _anonymous_application()
+        communicators = [WebsocketCommunicator(application, f"/ws/chat/{room}/") for _ in range(sockets)]
+
+        started = time.perf_counter()
+        for communicator in communicators:
+            connected, _ = await communicator.connect()
+            if not connected:
+                raise RuntimeError("Socket refused by the consumer")
+            await communicator.receive_from(timeout=10)  # history backfill
+        self._report("connect + backfill", sockets, "sockets", time.perf_counter() - started)
+
+        try:
+            started = time.perf_counter()
+            for i in range(messages):
+                await communicators[0].send_json_to({"message": f"load test message {i}"})
+                await asyncio.gather(*(communicator.receive_from(timeout=10) for communicator in communicators))
+            elapsed = time.perf_counter() - started
+            self._report("fan-out", messages, "messages", elapsed)
+            self._report("fan-out", messages * sockets, "deliveries", elapsed)
+        finally:
+            for communicator in communicators:
+                await communicator.disconnect()
+            await get_message_buffer().flush()
+
+    def handle(self, *args, **options):
+        sockets, messages = options["sockets"], options["messages"]
+        room = f"load-test-{uuid.uuid4().hex[:8]}"
+        self.stdout.write(f"{sockets} sockets x {messages} messages in room {room}")
+
+        self._measure_rendering(sockets, messages)
+
+        try:
+            if options["in_memory"]:
+                with override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS):
+                    asyncio.run(self._run(room, sockets, messages))
+            else:
+                asyncio.run(self._run(room, sockets, messages))
+
+            persisted = ChatMessage.objects.filter(room=room).count()
+            style = self.style.SUCCESS if persisted == messages else self.style.ERROR
+            self.stdout.write(style(f"{persisted}/{messages} messages persisted"))
+        finally:
+            ChatMessage.objects.filter(room=room).delete()
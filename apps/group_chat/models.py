@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.db import models
+
+from apps.utils.models import BaseModel
+
+
+class ChatMessageQuerySet(models.QuerySet):
+    def history(self, room, before=None, limit=None):
+        """
+        The ``limit`` latest messages of a room posted before the message id ``before``, oldest
+        first. Keyset pagination on the id: each page costs the same however deep it is.
+        """
+        limit = limit or settings.GROUP_CHAT_HISTORY_PAGE_SIZE
+        messages = self.filter(room=room)
+        if before is not None:
+            messages = messages.filter(id__lt=before)
+        page = list(messages.select_related("user").order_by("-id")[:limit])
+        page.reverse()
+        return page
+
+
+class ChatMessage(BaseModel):
+    """A message posted in a group chat room."""
+
+    room = models.SlugField(max_length=255)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    session_id = models.CharField(max_length=32)
+    message = models.TextField()
+
+    objects = ChatMessageQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["room", "-id"], name="group_chat_room_history_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.room}: {self.message[:50]}"
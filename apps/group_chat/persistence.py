@@ -0,0 +1,72 @@
+"""
+Buffered persistence of group chat messages.
+
+Writing each message in its own INSERT puts a database round trip on every message of a
+busy room. Consumers hand the messages to the buffer of their event loop instead, which
+writes them with a single ``bulk_create`` once ``GROUP_CHAT_PERSIST_BATCH_SIZE`` messages
+are pending or ``GROUP_CHAT_PERSIST_INTERVAL_MS`` after the first pending message.
+
+Buffers are per process: a reader can only flush the buffer of its own worker, so history
+may miss the messages pending on other workers for up to ``GROUP_CHAT_PERSIST_INTERVAL_MS``.
+"""
+
+import asyncio
+import logging
+import weakref
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+from .models import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+
+class MessageBuffer:
+    def __init__(self, batch_size=None, interval_ms=None):
+        self.batch_size = batch_size or settings.GROUP_CHAT_PERSIST_BATCH_SIZE
+        self.interval = (interval_ms or settings.GROUP_CHAT_PERSIST_INTERVAL_MS) / 1000
+        self._pending = []
+        self._timer = None
+        self._flush_task = None
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self._pending)
+
+    async def add(self, message: ChatMessage):
+        self._pending.append(message)
+        if len(self._pending) >= self.batch_size:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.interval, self._flush_later)
+
+    def _flush_later(self):
+        # Keep a reference so the task isn't garbage collected before it completes
+        self._flush_task = asyncio.ensure_future(self.flush())
+
+    async def flush(self):
+        """Write the pending messages. Messages failing to be written are logged and dropped."""
+        async with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                await database_sync_to_async(ChatMessage.objects.bulk_create)(batch)
+            except Exception:
+                logger.exception(f"Failed to persist {len(batch)} group chat messages")
+
+
+_buffers = weakref.WeakKeyDictionary()
+
+
+def get_message_buffer() -> MessageBuffer:
+    """The message buffer of the running event loop."""
+    loop = asyncio.get_running_loop()
+    buffer = _buffers.get(loop)
+    if buffer is None:
+        buffer = _buffers[loop] = MessageBuffer()
+    return buffer
@@ -0,0 +1,81 @@
+from unittest import mock
+
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from apps.group_chat import consumers
+from apps.group_chat.models import ChatMessage
+from apps.group_chat.routing import websocket_urlpatterns
+
+IN_MEMORY_CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+async def application(scope, receive, send):
+    return await URLRouter(websocket_urlpatterns)(dict(scope, user=AnonymousUser()), receive, send)
+
+
+class TestChatMessageHistory(TestCase):
+    def test_history_pages(self):
+        messages = [ChatMessage.objects.create(room="lobby", session_id="s", message=str(i)) for i in range(5)]
+        ChatMessage.objects.create(room="other", session_id="s", message="elsewhere")
+
+        page = ChatMessage.objects.history("lobby", limit=2)
+        self.assertEqual([message.message for message in page], ["3", "4"])
+
+        page = ChatMessage.objects.history("lobby", before=page[0].id, limit=2)
+        self.assertEqual([message.message for message in page], ["1", "2"])
+
+        page = ChatMessage.objects.history("lobby", before=messages[0].id, limit=2)
+        self.assertEqual(page, [])
+
+
+@override_settings(
+    CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, GROUP_CHAT_PERSIST_BATCH_SIZE=100, GROUP_CHAT_PERSIST_INTERVAL_MS=60000
+)
+class TestChatConsumer(TransactionTestCase):
+    async def _connect(self):
+        communicator = WebsocketCommunicator(application, "/ws/chat/lobby/")
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator, await communicator.receive_from()
+
+    async def test_message_rendered_once_for_the_room(self):
+        sockets = [await self._connect() for _ in range(3)]
+        sender = sockets[0][0]
+
+        with mock.patch.object(consumers, "render_message", wraps=consumers.render_message) as render:
+            await sender.send_json_to({"message": "hello"})
+            responses = [await communicator.receive_from() for communicator, _ in sockets]
+
+        self.assertEqual(render.call_count, 2)
+        self.assertIn("pg-chat-message-user", responses[0])
+        for response in responses[1:]:
+            self.assertIn("pg-chat-message-system", response)
+            self.assertIn("hello", response)
+
+        for communicator, _ in sockets:
+            await communicator.disconnect()
+
+    async def test_reconnect_backfills_history(self):
+        communicator, history = await self._connect()
+        self.assertNotIn("pg-chat-message", history)
+        await communicator.send_json_to({"message": "first"})
+        await communicator.receive_from()
+        await communicator.send_json_to({"message": "second"})
+        await communicator.receive_from()
+        await communicator.disconnect()
+
+        self.assertEqual(await ChatMessage.objects.filter(room="lobby").acount(), 2)
+
+        communicator, history = await self._connect()
+        self.assertLess(history.index("first"), history.index("second"))
+        await communicator.disconnect()
+
+    async def test_invalid_history_cursor_ignored(self):
+        communicator, _ = await self._connect()
+        for before in ("abc", None, [1]):
+            await communicator.send_json_to({"before": before})
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
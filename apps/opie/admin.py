@@ -35,6 +35,7 @@ from .models import (
     VaultFile,
     VaultFileInsight,
     VaultIngestionTask,
+    VectorIndexBuild,
     Website,
 )
 
@@ -237,6 +238,14 @@ class KnowledgeBaseAdmin(admin.ModelAdmin):
     inlines = [AgentInline]
 
 
+@admin.register(VectorIndexBuild)
+class VectorIndexBuildAdmin(admin.ModelAdmin):
+    list_display = ("table_name", "method", "status", "row_count", "build_seconds", "search_parameter", "created_at")
+    search_fields = ("table_name",)
+    list_filter = ("method", "status")
+    readonly_fields = [field.name for field in VectorIndexBuild._meta.fields]
+
+
 # =========================
 # Tag & Project Section
 # =========================
@@ -7,12 +7,15 @@ including usage statistics, performance monitoring, and error tracking.
 
 import logging
 import time
+import zoneinfo
 from datetime import date, datetime, timedelta
 from typing import Dict, List, Optional, Any
-from django.db import models, transaction
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import Avg, Count, F, Func, Max, Q, Sum
+from django.db.models.functions import TruncDate
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from django.core.cache import cache
 
 from ..models import (
     AgentOSSession,
@@ -20,12 +23,58 @@ from ..models import (
     AgentOSUsage,
     AgentOSPerformance,
     AgentOSError,
+    RollupWatermark,
     TokenUsage
 )
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
+ROLLUP_WATERMARK = "agentos_metrics"
+DAILY_USAGE_VIEW = "agentos_daily_usage_mv"
+
+
+class PercentileCont(models.Aggregate):
+    """Postgres ``percentile_cont(fraction) WITHIN GROUP (ORDER BY expression)``."""
+
+    function = "percentile_cont"
+    template = "%(function)s(%(percentile)s) WITHIN GROUP (ORDER BY %(expressions)s)"
+    output_field = models.FloatField()
+
+    def __init__(self, expression, percentile, **extra):
+        super().__init__(expression, percentile=float(percentile), **extra)
+
+
+def _unique_tools_count(messages) -> int:
+    """Number of distinct tool names in the ``tools_used`` jsonb arrays of ``messages``."""
+    return (
+        messages.filter(tools_used__0__isnull=False)
+        .annotate(tool=Func(F("tools_used"), function="jsonb_array_elements_text", output_field=models.CharField()))
+        .values("tool")
+        .distinct()
+        .count()
+    )
+
+
+def _message_stats(messages) -> Dict[str, Any]:
+    """Count, token and cost totals and latency statistics of ``messages``, computed in SQL."""
+    stats = messages.order_by().aggregate(
+        message_count=Count("id"),
+        total_tokens=Sum("tokens_used"),
+        total_cost=Sum("cost"),
+        avg_response_time_ms=Avg("response_time_ms"),
+        p50_response_time_ms=PercentileCont("response_time_ms", 0.5),
+        p95_response_time_ms=PercentileCont("response_time_ms", 0.95),
+    )
+    return {
+        "message_count": stats["message_count"],
+        "total_tokens": stats["total_tokens"] or 0,
+        "total_cost": float(stats["total_cost"] or 0),
+        "avg_response_time_ms": int(stats["avg_response_time_ms"] or 0),
+        "p50_response_time_ms": int(stats["p50_response_time_ms"] or 0),
+        "p95_response_time_ms": int(stats["p95_response_time_ms"] or 0),
+    }
+
 
 class AgentOSMetricsService:
     """
@@ -134,7 +183,6 @@ class AgentOSMetricsService:
                 }
             )
             
-            # Calculate updated statistics
             sessions = AgentOSSession.objects.filter(
                 user=self.user,
                 agent_id=agent_id,
@@ -146,19 +194,18 @@ class AgentOSMetricsService:
                 session__agent_id=agent_id,
                 created_at__date=date_obj
             )
-            
+
+            # Aggregate in the database instead of loading the messages
+            stats = _message_stats(messages)
             usage.session_count = sessions.count()
-            usage.message_count = messages.count()
-            usage.total_tokens = sum(msg.tokens_used for msg in messages)
-            usage.total_cost = sum(float(msg.cost) for msg in messages)
-            
-            if messages.exists():
-                usage.avg_response_time_ms = sum(msg.response_time_ms for msg in messages) // messages.count()
-                all_tools = set()
-                for msg in messages:
-                    all_tools.update(msg.tools_used or [])
-                usage.unique_tools_used = len(all_tools)
-            
+            usage.message_count = stats["message_count"]
+            usage.total_tokens = stats["total_tokens"]
+            usage.total_cost = stats["total_cost"]
+
+            if stats["message_count"]:
+                usage.avg_response_time_ms = stats["avg_response_time_ms"]
+                usage.unique_tools_used = _unique_tools_count(messages)
+
             usage.save()
             return usage
         except Exception as e:
@@ -187,35 +234,34 @@ class AgentOSMetricsService:
                     'error_rate': 0.0
                 }
             )
-            
-            # Calculate performance metrics
-            sessions = AgentOSSession.objects.filter(
-                agent_id=agent_id,
-                created_at__date=date_obj
+
+            # Calculate performance metrics in the database
+            session_stats = AgentOSSession.objects.filter(agent_id=agent_id, created_at__date=date_obj).aggregate(
+                total=Count("id"),
+                successful=Count("id", filter=Q(is_active=True)),
+                failed=Count("id", filter=Q(is_active=False)),
             )
             
             messages = AgentOSMessage.objects.filter(
                 session__agent_id=agent_id,
                 created_at__date=date_obj
             )
-            
-            errors = AgentOSError.objects.filter(
-                agent_id=agent_id,
-                created_at__date=date_obj
-            )
-            
-            performance.total_sessions = sessions.count()
-            performance.successful_sessions = sessions.filter(is_active=True).count()
-            performance.failed_sessions = sessions.filter(is_active=False).count()
-            
-            if messages.exists():
-                performance.avg_response_time_ms = sum(msg.response_time_ms for msg in messages) // messages.count()
-                performance.avg_tokens_per_session = sum(msg.tokens_used for msg in messages) // max(sessions.count(), 1)
-                performance.avg_cost_per_session = sum(float(msg.cost) for msg in messages) / max(sessions.count(), 1)
-            
+
+            error_count = AgentOSError.objects.filter(agent_id=agent_id, created_at__date=date_obj).count()
+
+            performance.total_sessions = session_stats["total"]
+            performance.successful_sessions = session_stats["successful"]
+            performance.failed_sessions = session_stats["failed"]
+
+            stats = _message_stats(messages)
+            if stats["message_count"]:
+                performance.avg_response_time_ms = stats["avg_response_time_ms"]
+                performance.avg_tokens_per_session = stats["total_tokens"] // max(session_stats["total"], 1)
+                performance.avg_cost_per_session = stats["total_cost"] / max(session_stats["total"], 1)
+
             if performance.total_sessions > 0:
-                performance.error_rate = (errors.count() / performance.total_sessions) * 100
-            
+                performance.error_rate = (error_count / performance.total_sessions) * 100
+
             performance.save()
             return performance
         except Exception as e:
@@ -250,45 +296,64 @@ class AgentOSMetricsService:
                 user=user,
                 created_at__date__range=[start_date, end_date]
             ).order_by('-created_at')
-            
-            # Calculate totals
-            total_sessions = sessions.count()
-            total_messages = sum(session.message_count for session in sessions)
-            total_tokens = sum(usage.total_tokens for usage in usage_data)
-            total_cost = sum(float(usage.total_cost) for usage in usage_data)
+
+            # Calculate totals in the database
+            session_totals = sessions.order_by().aggregate(
+                total_sessions=Count("id"),
+                total_messages=Sum("message_count"),
+            )
+            usage_totals = usage_data.order_by().aggregate(
+                total_tokens=Sum("total_tokens"),
+                total_cost=Sum("total_cost"),
+            )
+            total_sessions = session_totals["total_sessions"]
+            total_messages = session_totals["total_messages"] or 0
+            total_tokens = usage_totals["total_tokens"] or 0
+            total_cost = float(usage_totals["total_cost"] or 0)
             total_errors = errors.count()
             
             # Get agent breakdown
-            agent_breakdown = {}
-            for session in sessions:
-                agent_id = session.agent_id
-                if agent_id not in agent_breakdown:
-                    agent_breakdown[agent_id] = {
-                        'name': session.agent_name,
-                        'sessions': 0,
-                        'messages': 0,
-                        'tokens': 0,
-                        'cost': 0.0
-                    }
-                agent_breakdown[agent_id]['sessions'] += 1
-                agent_breakdown[agent_id]['messages'] += session.message_count
-                agent_breakdown[agent_id]['tokens'] += session.total_tokens
-                agent_breakdown[agent_id]['cost'] += float(session.total_cost)
-            
+            agent_breakdown = {
+                row["agent_id"]: {
+                    "name": row["name"],
+                    "sessions": row["sessions"],
+                    "messages": row["messages"] or 0,
+                    "tokens": row["tokens"] or 0,
+                    "cost": float(row["cost"] or 0),
+                }
+                for row in sessions.order_by()
+                .values("agent_id")
+                .annotate(
+                    name=Max("agent_name"),
+                    sessions=Count("id"),
+                    messages=Sum("message_count"),
+                    tokens=Sum("total_tokens"),
+                    cost=Sum("total_cost"),
+                )
+            }
+
+            # Response time percentiles over the user's messages of the period
+            latency = _message_stats(
+                AgentOSMessage.objects.filter(session__user=user, created_at__date__range=[start_date, end_date])
+            )
+
             return {
-                'user': user,
-                'period_days': days,
-                'start_date': start_date,
-                'end_date': end_date,
-                'total_sessions': total_sessions,
-                'total_messages': total_messages,
-                'total_tokens': total_tokens,
-                'total_cost': total_cost,
-                'total_errors': total_errors,
-                'agent_breakdown': agent_breakdown,
-                'usage_data': list(usage_data.values()),
-                'recent_sessions': list(sessions[:10].values()),
-                'recent_errors': list(errors[:10].values())
+                "user": user,
+                "period_days": days,
+                "start_date": start_date,
+                "end_date": end_date,
+                "total_sessions": total_sessions,
+                "total_messages": total_messages,
+                "total_tokens": total_tokens,
+                "total_cost": total_cost,
+                "total_errors": total_errors,
+                "avg_response_time_ms": latency["avg_response_time_ms"],
+                "p50_response_time_ms": latency["p50_response_time_ms"],
+                "p95_response_time_ms": latency["p95_response_time_ms"],
+                "agent_breakdown": agent_breakdown,
+                "usage_data": list(usage_data.values()),
+                "recent_sessions": list(sessions[:10].values()),
+                "recent_errors": list(errors[:10].values()),
             }
         except Exception as e:
             logger.error(f"Failed to get user metrics: {e}")
@@ -432,7 +497,103 @@ class AgentOSMetricsService:
         except Exception as e:
             logger.error(f"Failed to get system metrics: {e}")
             return {}
-    
+
+    def rollup_since_watermark(self, since: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Recompute the daily usage and performance rows touched by the messages created since
+        the stored watermark, instead of every day of the period. Messages of the last
+        ``AGENTOS_METRICS_ROLLUP_LAG_SECONDS`` are left for the next run, so rows committed
+        late by slow transactions are not skipped. Without a watermark, the lookback of
+        ``AGENTOS_METRICS_ROLLUP_INITIAL_DAYS`` is processed. ``since`` overrides the watermark.
+        """
+        upper = timezone.now() - timedelta(seconds=settings.AGENTOS_METRICS_ROLLUP_LAG_SECONDS)
+        lower = (
+            since
+            or RollupWatermark.get(ROLLUP_WATERMARK)
+            or upper - timedelta(days=settings.AGENTOS_METRICS_ROLLUP_INITIAL_DAYS)
+        )
+        if lower >= upper:
+            return {"usage_rows": 0, "performance_rows": 0}
+
+        result = self.rollup_range(lower, upper)
+        RollupWatermark.advance(ROLLUP_WATERMARK, upper)
+        return result
+
+    def rollup_range(self, lower: datetime, upper: datetime, user=None) -> Dict[str, int]:
+        """
+        Recompute the daily rows touched by the messages created in ``(lower, upper]``, only
+        those of ``user``'s sessions when given. Leaves the stored watermark untouched.
+        """
+        messages = AgentOSMessage.objects.filter(created_at__gt=lower, created_at__lte=upper)
+        if user is not None:
+            messages = messages.filter(session__user=user)
+        touched = (
+            messages.annotate(day=TruncDate("created_at"))
+            .values_list("session__user_id", "session__agent_id", "day")
+            .order_by()
+            .distinct()
+        )
+
+        usage_keys = set()
+        performance_keys = set()
+        for user_id, agent_id, day in touched.iterator():
+            usage_keys.add((user_id, agent_id, day))
+            performance_keys.add((agent_id, day))
+
+        users = User.objects.in_bulk({user_id for user_id, _agent_id, _day in usage_keys})
+        for user_id, agent_id, day in usage_keys:
+            get_metrics_service(users[user_id]).update_daily_usage(agent_id, day)
+        for agent_id, day in performance_keys:
+            self.update_daily_performance(agent_id, day)
+
+        logger.info(
+            f"Rolled up AgentOS metrics from {lower} to {upper}: "
+            f"{len(usage_keys)} usage rows, {len(performance_keys)} performance rows"
+        )
+        return {"usage_rows": len(usage_keys), "performance_rows": len(performance_keys)}
+
+    @staticmethod
+    def create_daily_usage_view():
+        """
+        Create the optional materialized view of daily usage per user and agent, with the
+        unique index that ``REFRESH MATERIALIZED VIEW CONCURRENTLY`` requires.
+        """
+        # Days are taken in the same time zone as the ORM's ``__date`` lookups. The time zone
+        # is passed as a parameter, which Django binds client-side (DDL takes no server-side
+        # parameters)
+        time_zone = str(zoneinfo.ZoneInfo(settings.TIME_ZONE))
+        message_table = AgentOSMessage._meta.db_table
+        session_table = AgentOSSession._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                CREATE MATERIALIZED VIEW IF NOT EXISTS {DAILY_USAGE_VIEW} AS
+                SELECT
+                    s.user_id,
+                    s.agent_id,
+                    (m.created_at AT TIME ZONE %s)::date AS date,
+                    COUNT(*) AS message_count,
+                    COALESCE(SUM(m.tokens_used), 0) AS total_tokens,
+                    COALESCE(SUM(m.cost), 0) AS total_cost,
+                    AVG(m.response_time_ms) AS avg_response_time_ms,
+                    percentile_cont(0.95) WITHIN GROUP (ORDER BY m.response_time_ms) AS p95_response_time_ms
+                FROM {message_table} m
+                JOIN {session_table} s ON s.id = m.session_id
+                GROUP BY s.user_id, s.agent_id, (m.created_at AT TIME ZONE %s)::date
+                """,
+                [time_zone, time_zone],
+            )
+            cursor.execute(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {DAILY_USAGE_VIEW}_key "
+                f"ON {DAILY_USAGE_VIEW} (user_id, agent_id, date)"
+            )
+
+    @staticmethod
+    def refresh_daily_usage_view():
+        """Refresh the materialized view without blocking readers."""
+        with connection.cursor() as cursor:
+            cursor.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {DAILY_USAGE_VIEW}")
+
     def cleanup_old_metrics(self, days: int = 90):
         """
         Clean up old metrics data to prevent database bloat.
@@ -2,6 +2,7 @@
 
 from typing import Any
 import logging
+import threading
 
 from django.db import connection
 
@@ -20,12 +21,21 @@ from llama_index.core import StorageContext, VectorStoreIndex
 from llama_index.core.retrievers import VectorIndexRetriever
 from llama_index.core.schema import Document
 from llama_index.core.vector_stores import FilterOperator, MetadataFilter, MetadataFilters
-from llama_index.vector_stores.postgres import PGVectorStore
 from pydantic import ConfigDict
 
-from apps.opie.agents.helpers.retrievers import ManualHybridRetriever
+from apps.opie.agents.helpers.retrievers import (
+    FederatedRetriever,
+    FullTextPGVectorStore,
+    ManualHybridRetriever,
+    PGFullTextRetriever,
+    rbac_query_customizer,
+)
 from apps.opie.models import Agent as DjangoAgent
 from apps.opie.models import AgentInstruction, ModelProvider
+from apps.opie.services.embedding_cache import CachedEmbedder, cached_embed_model
+from apps.opie.services.rbac_filter_compiler import RBACFilterCompiler
+from apps.opie.services.vector_index_manager import search_settings_for_knowledge_base
+from apps.opie.services.vector_storage import get_layout, query_embed_model
 
 logger = logging.getLogger(__name__)
 
@@ -105,8 +115,14 @@ class MultiMetadataFilteredPgVector(PgVector):
         params = [embedding]
         for key, value in filter_dict.items():
             # Use metadata_ column for data_vault_vector_table (LlamaIndex format)
-            filter_conditions.append("metadata_->>%s = %s")
-            params.extend([key, value])
+            if key == "$or" or isinstance(value, dict):
+                # RBAC conditions compile to one "= ANY(array)" predicate per key
+                clause, clause_params = RBACFilterCompiler.compile_sql({key: value})
+                filter_conditions.append(clause)
+                params.extend(clause_params)
+            else:
+                filter_conditions.append("metadata_->>%s = %s")
+                params.extend([key, value])
         where_clause = " AND ".join(filter_conditions) if filter_conditions else "1=1"
         params.append(embedding)  # for ORDER BY embedding <=> %s
         params.append(limit)
@@ -248,6 +264,73 @@ def build_agent_database(db_url: str = None) -> PostgresDb:
         db_url=db_url or get_db_url(),
     )
 
+
+# Vector stores shared by the agent builds, each with its SQLAlchemy engines: the RBAC filters come
+# with every query (see rbac_query_customizer), so a store serves every user of its table
+_vector_stores: dict[tuple, FullTextPGVectorStore] = {}
+_vector_stores_lock = threading.Lock()
+
+
+def _vector_store(kb, db_url, schema) -> FullTextPGVectorStore:
+    """The shared store of the vector table of a LlamaIndex knowledge base, for its layout"""
+    # The recall target is in the key: a store applies one set of search settings to its queries
+    key = (kb.vector_table_name, db_url, schema, kb.vector_storage, kb.embed_dim, kb.recall_target)
+    with _vector_stores_lock:
+        vector_store = _vector_stores.get(key)
+        if vector_store is None:
+            # Keyword search ranks to_tsvector(text) directly, so the table doesn't need the hybrid tsv column
+            layout = get_layout(kb.vector_storage)
+            vector_store = _vector_stores[key] = FullTextPGVectorStore(
+                connection_string=db_url,
+                async_connection_string=db_url.replace("postgresql://", "postgresql+asyncpg://"),
+                table_name=kb.vector_table_name,
+                embed_dim=kb.embed_dim,
+                use_halfvec=layout.column_type == "halfvec",
+                schema_name=schema,
+                customize_query_fn=rbac_query_customizer,
+            )
+            if layout.binary:
+                vector_store.set_binary_rerank(settings.OPIE_VECTOR_BINARY_RERANK_FACTOR)
+    # ANN search breadth (ef_search / probes) for the recall target, from the cached calibration
+    vector_store.set_search_settings(search_settings_for_knowledge_base(kb))
+    return vector_store
+
+
+def _query_embed_model(kb, embed_models: dict):
+    """The query embed model of a knowledge base, shared with those storing embeddings of the same size"""
+    key = (kb.model_provider.embedder_id, kb.embedding_dimensions) if kb.embedding_dimensions else None
+    if key not in embed_models:
+        # Truncated embeddings are compared with query embeddings of the same size
+        embed_models[key] = cached_embed_model(query_embed_model(kb))
+    return embed_models[key]
+
+
+def _hybrid_retriever(kb, db_url, schema, top_k, metadata_filters, rbac_filters, embed_model) -> ManualHybridRetriever:
+    """Hybrid (vector + full-text) retriever over the vector table of a LlamaIndex knowledge base"""
+    vector_store = _vector_store(kb, db_url, schema)
+    storage_context = StorageContext.from_defaults(vector_store=vector_store)
+    index = VectorStoreIndex.from_vector_store(vector_store, storage_context=storage_context, embed_model=embed_model)
+
+    combined_filter = MetadataFilters(filters=metadata_filters) if metadata_filters else None
+    # The full RBAC predicate is pushed into both queries (see rbac_query_customizer)
+    vector_store_kwargs = {"rbac_filters": rbac_filters} if rbac_filters else {}
+
+    # Vector ANN and Postgres full-text run concurrently and are fused with RRF
+    semantic_retriever = VectorIndexRetriever(
+        index=index, similarity_top_k=top_k, filters=combined_filter, vector_store_kwargs=vector_store_kwargs
+    )
+    keyword_retriever = PGFullTextRetriever(
+        vector_store, top_k=top_k, filters=combined_filter, vector_store_kwargs=vector_store_kwargs
+    )
+
+    return ManualHybridRetriever(
+        semantic_retriever=semantic_retriever,
+        keyword_retriever=keyword_retriever,
+        alpha=0.5,
+        top_k=top_k,
+    )
+
+
 def build_knowledge_base(
     django_agent: DjangoAgent,
     db_url: str = None,
@@ -288,26 +371,16 @@ def build_knowledge_base(
         if knowledgebase_id:
             if not RBACService.can_user_access_knowledge_base(user, knowledgebase_id):
                 raise ValueError(f"User does not have access to knowledge base {knowledgebase_id}")
-        
-        # Convert RBAC filters to LlamaIndex format
-        # This is a simplified conversion - you may need to enhance based on your needs
-        if "$or" in rbac_filters:
-            # For OR conditions, we'll use the first matching condition for now
-            # (LlamaIndex doesn't directly support OR in the same way)
-            for condition in rbac_filters["$or"]:
-                if "knowledgebase_id" in condition and knowledgebase_id:
-                    if condition["knowledgebase_id"] == knowledgebase_id or \
-                       (isinstance(condition["knowledgebase_id"], dict) and 
-                        "$in" in condition["knowledgebase_id"] and 
-                        knowledgebase_id in condition["knowledgebase_id"]["$in"]):
-                        filter_dict.update(condition)
-                        break
-            else:
-                # Use the first available filter
-                if rbac_filters["$or"]:
-                    filter_dict.update(rbac_filters["$or"][0])
-        else:
-            filter_dict.update(rbac_filters)
+
+        # The full RBAC predicate is pushed into the vector query (see RBACFilterCompiler);
+        # a requested knowledge base narrows it further
+        filter_dict.update(rbac_filters)
+        if knowledgebase_id:
+            knowledgebase_id_str = str(knowledgebase_id)
+            metadata_filters.append(
+                MetadataFilter(key="knowledgebase_id", value=knowledgebase_id_str, operator=FilterOperator.EQ)
+            )
+            filter_dict["knowledgebase_id"] = knowledgebase_id_str
     else:
         # Fallback to basic filtering if no user provided
         # Always required filters - Convert UUIDs to strings
@@ -334,22 +407,6 @@ def build_knowledge_base(
             metadata_filters.append(MetadataFilter(key="project_id", value=project_id_str, operator=FilterOperator.EQ))
             filter_dict["project_id"] = project_id_str
     
-    # Convert filter_dict to metadata_filters for LlamaIndex
-    if not metadata_filters and filter_dict:
-        for key, value in filter_dict.items():
-            if key == "$or" or key == "$and":
-                continue  # Skip operators
-            if isinstance(value, dict) and "$in" in value:
-                # Handle $in operator - use the first value for now
-                if value["$in"]:
-                    metadata_filters.append(
-                        MetadataFilter(key=key, value=str(value["$in"][0]), operator=FilterOperator.EQ)
-                    )
-            else:
-                metadata_filters.append(
-                    MetadataFilter(key=key, value=str(value), operator=FilterOperator.EQ)
-                )
-
     if kb.knowledge_type == "agno_pgvector":
         contents_db = PostgresDb(
             db_url=db_url,
@@ -359,9 +416,11 @@ def build_knowledge_base(
             db_url=db_url,
             table_name=table_name,
             schema=schema,
-            embedder=OpenAIEmbedder(
-                id="text-embedding-ada-002",
-                dimensions=1536,
+            embedder=CachedEmbedder(
+                embedder=OpenAIEmbedder(
+                    id="text-embedding-ada-002",
+                    dimensions=1536,
+                )
             ),
         )
         # Create Knowledge with multi-metadata filtering capability
@@ -380,36 +439,37 @@ def build_knowledge_base(
             )
 
     elif kb.knowledge_type == "llamaindex":
-        vector_store = PGVectorStore(
-            connection_string=db_url,
-            async_connection_string=db_url.replace("postgresql://", "postgresql+asyncpg://"),
-            table_name=table_name,
-            embed_dim=1536,
-            schema_name=schema,
-            hybrid_search=True,
-        )
-        storage_context = StorageContext.from_defaults(vector_store=vector_store)
-        index = VectorStoreIndex.from_vector_store(vector_store, storage_context=storage_context)
-
-        # Create retrievers with metadata filtering if filters exist
-        if metadata_filters:
-            # Create combined metadata filter
-            combined_filter = MetadataFilters(filters=metadata_filters)
-
-            semantic_retriever = VectorIndexRetriever(index=index, similarity_top_k=top_k, filters=combined_filter)
-
-            # For keyword retriever, you'll need a proper BM25 implementation
-            # For now, using semantic retriever with same filter
-            keyword_retriever = VectorIndexRetriever(index=index, similarity_top_k=top_k, filters=combined_filter)
+        if not user:
+            rbac_filters = None
+        embed_models, source_embed_models = {}, {}
+        source_embed_models[table_name] = _query_embed_model(kb, embed_models)
+        sources = {
+            table_name: _hybrid_retriever(
+                kb, db_url, schema, top_k, metadata_filters, rbac_filters, source_embed_models[table_name]
+            )
+        }
+        if user and not knowledgebase_id:
+            # The accessible knowledge bases may be stored in other tables (see vector_storage):
+            # each table is searched with the layout and embedder of its rows
+            from apps.opie.services.rbac_service import RBACService
+
+            for other in RBACService.get_user_knowledge_bases(user):
+                if other.knowledge_type == "llamaindex" and other.vector_table_name not in sources:
+                    source_embed_models[other.vector_table_name] = _query_embed_model(other, embed_models)
+                    sources[other.vector_table_name] = _hybrid_retriever(
+                        other,
+                        db_url,
+                        schema,
+                        top_k,
+                        metadata_filters,
+                        rbac_filters,
+                        source_embed_models[other.vector_table_name],
+                    )
+        if len(sources) == 1:
+            hybrid_retriever = sources[table_name]
         else:
-            semantic_retriever = VectorIndexRetriever(index=index, similarity_top_k=top_k)
-            keyword_retriever = VectorIndexRetriever(index=index, similarity_top_k=top_k)
-
-        hybrid_retriever = ManualHybridRetriever(
-            semantic_retriever=semantic_retriever,
-            keyword_retriever=keyword_retriever,
-            alpha=0.5,
-        )
+            # The query is embedded once per embed model, before the sources are searched
+            hybrid_retriever = FederatedRetriever(sources, top_k=top_k, embed_models=source_embed_models)
 
         return CustomLlamaIndexKnowledge(
             retriever=hybrid_retriever, 
@@ -1,35 +1,556 @@
 # apps/opie/helpers/retrievers.py
 
-from llama_index.core.retrievers import BaseRetriever
-from typing import Optional, Dict, Any, List
+import copy
+import hashlib
+import importlib.metadata
+import inspect
 import logging
+import re
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.db import connection
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from llama_index.core.vector_stores.types import (
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryMode,
+    VectorStoreQueryResult,
+)
+from llama_index.vector_stores.postgres import PGVectorStore
+from llama_index.vector_stores.postgres.base import DBEmbeddingRow
+
+from apps.opie.services.rbac_filter_compiler import RBACFilterCompiler
 
 logger = logging.getLogger(__name__)
 
+_TEXT_SEARCH_CONFIG_RE = re.compile(r"^[a-z_]+$")
+
+# FullTextPGVectorStore overrides private PGVectorStore methods (query building and the sparse
+# query path), checked against these releases only; see requirements.in
+SUPPORTED_PGVECTOR_STORE_VERSIONS = ((0, 7),)
+
+
+def _pgvector_store_version() -> str:
+    return importlib.metadata.version("llama-index-vector-stores-postgres")
+
+
+def check_pgvector_store_version() -> None:
+    """Raise if the installed PGVectorStore isn't a release the overrides were checked against"""
+    installed = _pgvector_store_version()
+    if tuple(int(part) for part in installed.split(".")[:2]) not in SUPPORTED_PGVECTOR_STORE_VERSIONS:
+        raise RuntimeError(
+            f"llama-index-vector-stores-postgres {installed} isn't supported by FullTextPGVectorStore: "
+            "check its overrides (RBAC filters, full-text and binary rerank queries) and update "
+            "SUPPORTED_PGVECTOR_STORE_VERSIONS"
+        )
+
+
+# Private PGVectorStore methods the binary rerank ``_build_query`` overrides or calls, with their
+# parameters: checked on top of the release line, whose patch releases may still reshape them
+_BINARY_RERANK_SIGNATURES = {
+    "_build_query": ["self", "embedding", "limit", "metadata_filters", "kwargs"],
+    "_apply_filters_and_limit": ["self", "stmt", "limit", "metadata_filters"],
+}
+
+
+def check_binary_rerank_support() -> None:
+    """Raise if the PGVectorStore methods the binary rerank query is built on changed shape"""
+    for name, expected in _BINARY_RERANK_SIGNATURES.items():
+        method = getattr(PGVectorStore, name, None)
+        parameters = list(inspect.signature(method).parameters) if method else None
+        if parameters != expected:
+            raise RuntimeError(
+                f"PGVectorStore.{name} of llama-index-vector-stores-postgres {_pgvector_store_version()} "
+                f"takes {parameters}, the binary rerank query of FullTextPGVectorStore expects {expected}"
+            )
+
+
+def _text_search_config(config: str) -> str:
+    # Inlined (not bound) so the query expression matches the GIN expression index
+    if not _TEXT_SEARCH_CONFIG_RE.match(config):
+        raise ValueError(f"Invalid text search config: {config}")
+    return config
+
+
+def rbac_query_customizer(stmt, table_class, rbac_filters: Optional[Dict[str, Any]] = None, **kwargs):
+    """
+    ``customize_query_fn`` for PGVectorStore that ANDs the compiled RBAC predicate of the query's
+    ``rbac_filters`` into every dense/sparse query. The filters come with each query (the
+    retrievers' ``vector_store_kwargs``), so one store can serve every user.
+    """
+    if rbac_filters:
+        stmt = stmt.where(RBACFilterCompiler.compile_sqlalchemy(rbac_filters))
+    return stmt
+
+
+class FullTextPGVectorStore(PGVectorStore):
+    """
+    PGVectorStore whose sparse (keyword) queries rank ``to_tsvector(config, text)`` directly.
+
+    The stock hybrid mode needs a generated ``text_search_tsv`` column that tables created by the
+    ingestion service don't have. The expression form works on every vector table and is served
+    by the GIN index created by ``ensure_text_search_index``.
+
+    ``set_search_settings`` applies Postgres settings such as ``hnsw.ef_search`` to every
+    transaction of the store (``SET LOCAL``), so each ANN query explores as much of the index
+    as the recall target of its knowledge base needs (see vector_index_manager).
+
+    ``set_binary_rerank`` makes dense queries take ``factor × k`` candidates by Hamming distance
+    between binary-quantized vectors, served by the ``bit_hamming_ops`` index of binary-rerank
+    knowledge bases, and rerank them by cosine distance on the full vectors (see vector_storage).
+    """
+
+    _search_settings: Dict[str, Any] = PrivateAttr(default_factory=dict)
+    _binary_rerank_factor: int = PrivateAttr(default=0)
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        # Silently running the stock private methods could drop the RBAC filters of sparse queries
+        check_pgvector_store_version()
+        super().__init__(*args, **kwargs)
+
+    def set_search_settings(self, search_settings: Dict[str, Any]) -> None:
+        self._search_settings = dict(search_settings)
+
+    def set_binary_rerank(self, factor: int) -> None:
+        if factor:
+            # Else a changed _build_query would silently search without the rerank or its filters
+            check_binary_rerank_support()
+        self._binary_rerank_factor = factor
+
+    def _connect(self) -> Any:
+        from sqlalchemy import event
+
+        super()._connect()
+        event.listen(self._engine, "begin", self._apply_search_settings)
+        event.listen(self._async_engine.sync_engine, "begin", self._apply_search_settings)
+
+    def _apply_search_settings(self, conn) -> None:
+        from sqlalchemy import text
+
+        for name, value in self._search_settings.items():
+            conn.execute(text("SELECT set_config(:name, :value, true)"), {"name": name, "value": str(value)})
+
+    def _build_query(
+        self,
+        embedding: Optional[List[float]],
+        limit: int = 10,
+        metadata_filters: Optional[MetadataFilters] = None,
+        **kwargs: Any,
+    ) -> Any:
+        if not self._binary_rerank_factor or embedding is None:
+            return super()._build_query(embedding, limit, metadata_filters, **kwargs)
+
+        from pgvector.sqlalchemy import BIT, VECTOR
+        from sqlalchemy import Float, cast, text
+        from sqlalchemy.sql import func, select
+
+        # Same expression as the index: binary_quantize(embedding)::bit(dim)
+        bits = BIT(self.embed_dim)
+        query_bits = cast(func.binary_quantize(cast(embedding, VECTOR(self.embed_dim))), bits)
+        hamming = cast(func.binary_quantize(self._table_class.embedding), bits).op("<~>", return_type=Float)(query_bits)
+
+        candidates = select(self._table_class.id).order_by(hamming)
+        if self._customize_query_fn is not None:
+            candidates = self._customize_query_fn(candidates, self._table_class, **kwargs)
+        candidates = self._apply_filters_and_limit(
+            candidates, limit * self._binary_rerank_factor, metadata_filters
+        ).subquery("candidates")
+
+        return (
+            select(
+                self._table_class.id,
+                self._table_class.node_id,
+                self._table_class.text,
+                self._table_class.metadata_,
+                self._table_class.embedding.cosine_distance(embedding).label("distance"),
+            )
+            .join(candidates, candidates.c.id == self._table_class.id)
+            .order_by(text("distance asc"))
+            .limit(limit)
+        )
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.mode != VectorStoreQueryMode.SPARSE:
+            return super().query(query, **kwargs)
+        # The stock sparse path drops the query kwargs, and with them the RBAC filters
+        self._initialize()
+        rows = self._sparse_query_with_rank(
+            query.query_str, query.sparse_top_k or query.similarity_top_k, query.filters, **kwargs
+        )
+        return self._db_rows_to_query_result(rows)
+
+    def _sparse_query_with_rank(
+        self,
+        query_str: Optional[str] = None,
+        limit: int = 10,
+        metadata_filters: Optional[MetadataFilters] = None,
+        **kwargs: Any,
+    ) -> List[DBEmbeddingRow]:
+        stmt = self._build_sparse_query(query_str, limit, metadata_filters, **kwargs)
+        with self._session() as session, session.begin():
+            return [
+                DBEmbeddingRow(
+                    node_id=row.node_id, text=row.text, metadata=row.metadata_, custom_fields={}, similarity=row.rank
+                )
+                for row in session.execute(stmt).all()
+            ]
+
+    def _build_sparse_query(
+        self,
+        query_str: Optional[str],
+        limit: int,
+        metadata_filters: Optional[MetadataFilters] = None,
+        **kwargs: Any,
+    ) -> Any:
+        from sqlalchemy import literal_column, text
+        from sqlalchemy.sql import func, select
+
+        if query_str is None:
+            raise ValueError("query_str must be specified for a sparse vector query.")
+
+        # Same tokenisation as PGVectorStore: strip tsquery syntax and OR the terms for recall
+        query_str = re.sub(r"(?!\b\.\b)\W+", " ", query_str).strip().replace(" ", "|")
+
+        config = literal_column(f"'{_text_search_config(self.text_search_config)}'::regconfig")
+        ts_query = func.to_tsquery(config, query_str)
+        ts_vector = func.to_tsvector(config, self._table_class.text)
+
+        stmt = (
+            select(
+                self._table_class.id,
+                self._table_class.node_id,
+                self._table_class.text,
+                self._table_class.metadata_,
+                func.ts_rank(ts_vector, ts_query).label("rank"),
+            )
+            .where(ts_vector.op("@@")(ts_query))
+            .order_by(text("rank desc"))
+        )
+
+        if self._customize_query_fn is not None:
+            stmt = self._customize_query_fn(stmt, self._table_class, **kwargs)
+
+        return self._apply_filters_and_limit(stmt, limit, metadata_filters)
+
+
+def ensure_text_search_index(table_name: str, schema: str = "public", config: str = "english") -> str:
+    """Create the GIN expression index used by FullTextPGVectorStore keyword queries"""
+    config = _text_search_config(config)
+    index_name = f"{table_name}_text_tsv_idx"[:63]
+    sql = (
+        f'CREATE INDEX IF NOT EXISTS "{index_name}" '
+        f'ON "{schema}"."{table_name}" USING gin (to_tsvector(\'{config}\'::regconfig, text))'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+    logger.info(f"Ensured full-text index on {schema}.{table_name}")
+    return sql
+
+
+class PGFullTextRetriever(BaseRetriever):
+    """
+    Keyword retriever over a PGVectorStore table using Postgres full-text search.
+    Never embeds the query. ``vector_store_kwargs`` are passed to every store query, like
+    VectorIndexRetriever's.
+    """
+
+    def __init__(
+        self,
+        vector_store: PGVectorStore,
+        top_k: int = 5,
+        filters: Optional[MetadataFilters] = None,
+        vector_store_kwargs: Optional[Dict[str, Any]] = None,
+    ):
+        super().__init__()
+        self.vector_store = vector_store
+        self.top_k = top_k
+        self.filters = filters
+        self.vector_store_kwargs = vector_store_kwargs or {}
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        result = self.vector_store.query(
+            VectorStoreQuery(
+                query_str=query_bundle.query_str,
+                mode=VectorStoreQueryMode.SPARSE,
+                similarity_top_k=self.top_k,
+                sparse_top_k=self.top_k,
+                filters=self.filters,
+            ),
+            **self.vector_store_kwargs,
+        )
+        similarities = result.similarities or [None] * len(result.nodes)
+        return [NodeWithScore(node=node, score=score) for node, score in zip(result.nodes, similarities, strict=True)]
+
 
 class ManualHybridRetriever(BaseRetriever):
     """
-    A manual hybrid retriever: combines semantic + keyword retrieval results.
+    Hybrid retriever: runs semantic (vector) and keyword (full-text) retrieval concurrently
+    and fuses the two rankings with weighted reciprocal rank fusion, deduplicated by node id.
+
+    ``alpha`` weights the semantic ranking (``1 - alpha`` for keyword); ``rrf_k`` is the usual
+    RRF damping constant.
     """
 
-    def __init__(self, semantic_retriever, keyword_retriever, alpha=0.5):
+    def __init__(self, semantic_retriever, keyword_retriever, alpha=0.5, top_k: Optional[int] = None, rrf_k: int = 60):
+        super().__init__()
         self.semantic_retriever = semantic_retriever
         self.keyword_retriever = keyword_retriever
         self.alpha = alpha  # 0.5 = 50/50 balance between semantic and keyword
+        self.top_k = top_k
+        self.rrf_k = rrf_k
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="hybrid-retrieve") as executor:
+            semantic_future = executor.submit(self._safe_retrieve, self.semantic_retriever, query_bundle)
+            keyword_future = executor.submit(self._safe_retrieve, self.keyword_retriever, query_bundle)
+            semantic_nodes = semantic_future.result()
+            keyword_nodes = keyword_future.result()
+
+        fused = reciprocal_rank_fusion(
+            [semantic_nodes, keyword_nodes], weights=[self.alpha, 1 - self.alpha], k=self.rrf_k
+        )
+        top_k = self.top_k or max(len(semantic_nodes), len(keyword_nodes))
+        return fused[:top_k]
+
+    @staticmethod
+    def _safe_retrieve(retriever, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        try:
+            return retriever.retrieve(query_bundle)
+        except Exception as e:
+            # One failing side (e.g. no full-text match support) shouldn't lose the other ranking
+            logger.error(f"Hybrid retrieval side failed ({type(retriever).__name__}): {e}")
+            return []
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[NodeWithScore]], weights: Optional[List[float]] = None, k: int = 60
+) -> List[NodeWithScore]:
+    """
+    Fuse ranked node lists: score(d) = sum(weight_i / (k + rank_i(d))), ranks starting at 1.
+    Nodes are deduplicated by node id, keeping the first instance seen.
+    """
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict[str, float] = {}
+    nodes: Dict[str, NodeWithScore] = {}
+
+    for ranking, weight in zip(rankings, weights, strict=True):
+        seen = set()
+        for rank, node_with_score in enumerate(ranking, start=1):
+            node_id = node_with_score.node.node_id
+            if node_id in seen:
+                continue
+            seen.add(node_id)
+            scores[node_id] = scores.get(node_id, 0.0) + weight / (k + rank)
+            nodes.setdefault(node_id, node_with_score)
+
+    ordered = sorted(scores, key=scores.get, reverse=True)
+    return [NodeWithScore(node=nodes[node_id].node, score=scores[node_id]) for node_id in ordered]
+
+
+OK = "ok"
+TIMEOUT = "timeout"
+ERROR = "error"
 
-    def _retrieve(self, query: str):
-        semantic_nodes = self.semantic_retriever.retrieve(query)
-        keyword_nodes = self.keyword_retriever.retrieve(query)
+# Per-source latency samples kept for the percentiles
+_LATENCY_SAMPLES = 1000
 
-        combined = []
+_federated_executor: Optional[ThreadPoolExecutor] = None
+_federated_lock = threading.Lock()
+_latencies: Dict[str, deque] = {}
+_outcomes: Dict[str, Dict[str, int]] = {}
 
-        if semantic_nodes:
-            combined.extend(semantic_nodes[: int(len(semantic_nodes) * self.alpha)])
 
-        if keyword_nodes:
-            combined.extend(keyword_nodes)
+def _get_federated_executor() -> ThreadPoolExecutor:
+    global _federated_executor
+    with _federated_lock:
+        if _federated_executor is None:
+            _federated_executor = ThreadPoolExecutor(
+                max_workers=settings.OPIE_FEDERATED_RETRIEVAL_WORKERS, thread_name_prefix="federated-retrieve"
+            )
+        return _federated_executor
+
+
+def _record_latency(source: str, latency_ms: float, status: str):
+    with _federated_lock:
+        _latencies.setdefault(source, deque(maxlen=_LATENCY_SAMPLES)).append(latency_ms)
+        outcomes = _outcomes.setdefault(source, {OK: 0, TIMEOUT: 0, ERROR: 0})
+        outcomes[status] += 1
+
+
+def source_latency_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Per-source latency percentiles (ms) over the last searches of this process, and how many
+    searches each source answered, missed the deadline of, or failed.
+    """
+    with _federated_lock:
+        samples = {source: sorted(latencies) for source, latencies in _latencies.items()}
+        outcomes = {source: dict(counts) for source, counts in _outcomes.items()}
+
+    stats = {}
+    for source, latencies in samples.items():
+        percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        stats[source] = {
+            "samples": len(latencies),
+            "p50": percentiles[49],
+            "p95": percentiles[94],
+            "p99": percentiles[98],
+            "max": latencies[-1],
+            **outcomes[source],
+        }
+    return stats
+
+
+def reset_source_latency_stats():
+    with _federated_lock:
+        _latencies.clear()
+        _outcomes.clear()
+
+
+def normalize_scores(nodes: List[NodeWithScore]) -> List[NodeWithScore]:
+    """
+    Min-max normalize the scores of one source's ranking to [0, 1], so rankings scored on
+    different scales (RRF, cosine similarity, ts_rank) can be merged. A ranking without
+    scores, or with a single distinct score, is scored by rank instead.
+    """
+    scores = [node.score for node in nodes]
+    if any(score is None for score in scores) or len(set(scores)) < 2:
+        count = len(nodes)
+        return [NodeWithScore(node=node.node, score=1.0 - rank / count) for rank, node in enumerate(nodes)]
+    low, high = min(scores), max(scores)
+    return [NodeWithScore(node=node.node, score=(node.score - low) / (high - low)) for node in nodes]
+
 
-        return combined
+@dataclass
+class SourceReport:
+    source: str
+    status: str
+    latency_ms: float
+    results: int = 0
+
+
+class FederatedRetriever(BaseRetriever):
+    """
+    Retriever over several sources - e.g. the vector tables of the knowledge bases a query spans -
+    searched concurrently on a shared executor within one deadline for the whole query.
+
+    The query is embedded once per embed model of ``embed_models`` (source -> query embed model;
+    sources may share one) before the deadline starts, so the embedding API round trip isn't
+    paid by every source nor counted against them. Sources missing the deadline or failing are
+    left out of the results rather than delaying or failing the query; when none answered in
+    time, the first answer within another deadline is used, and a query no source answered
+    raises. Each source's scores are normalized (see ``normalize_scores``) before the rankings
+    are merged, and chunks found in several sources (same node id, or same text) are kept once
+    with their best score. ``last_reports`` holds the status and latency of each source for the
+    last query; ``source_latency_stats`` aggregates them per process.
+    """
+
+    def __init__(
+        self,
+        retrievers: Dict[str, BaseRetriever],
+        top_k: Optional[int] = None,
+        deadline_ms: Optional[int] = None,
+        embed_models: Optional[Dict[str, BaseEmbedding]] = None,
+    ):
+        super().__init__()
+        self.retrievers = retrievers
+        self.top_k = top_k
+        self.deadline_ms = settings.OPIE_FEDERATED_RETRIEVAL_DEADLINE_MS if deadline_ms is None else deadline_ms
+        self.embed_models = embed_models or {}
+        self.last_reports: List[SourceReport] = []
+
+    def _source_bundles(self, query_bundle: QueryBundle) -> Dict[str, QueryBundle]:
+        """A query bundle per source, embedded with its embed model; retrievers embed into their bundle."""
+        embeddings: Dict[int, List[float]] = {}
+        bundles = {}
+        for source in self.retrievers:
+            embed_model = self.embed_models.get(source)
+            embedding = query_bundle.embedding
+            if embed_model is not None and embedding is None and query_bundle.embedding_strs:
+                if id(embed_model) not in embeddings:
+                    embeddings[id(embed_model)] = embed_model.get_agg_embedding_from_queries(
+                        query_bundle.embedding_strs
+                    )
+                embedding = embeddings[id(embed_model)]
+            bundles[source] = replace(query_bundle, embedding=embedding)
+        return bundles
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        bundles = self._source_bundles(query_bundle)
+        started = time.perf_counter()
+        deadline = started + self.deadline_ms / 1000
+        executor = _get_federated_executor()
+        futures = {
+            executor.submit(self._timed_retrieve, source, retriever, bundles[source], deadline): source
+            for source, retriever in self.retrievers.items()
+        }
+        done, pending = wait(futures, timeout=self.deadline_ms / 1000)
+        if pending and not any(future.result()[2] == OK for future in done):
+            # Better late than empty: wait another deadline for the first source answering
+            grace = time.perf_counter() + self.deadline_ms / 1000
+            while pending and not any(future.result()[2] == OK for future in done):
+                late, pending = wait(pending, timeout=max(grace - time.perf_counter(), 0), return_when=FIRST_COMPLETED)
+                if not late:
+                    break
+                done |= late
+
+        rankings, reports = [], []
+        for future, source in futures.items():
+            if future not in done:
+                # Still running: its latency is recorded when it finishes
+                if future.cancel():
+                    _record_latency(source, self.deadline_ms, TIMEOUT)
+                reports.append(SourceReport(source, TIMEOUT, (time.perf_counter() - started) * 1000))
+                continue
+            nodes, latency_ms, status = future.result()
+            reports.append(SourceReport(source, status, latency_ms, len(nodes)))
+            rankings.append(normalize_scores(nodes))
+
+        self.last_reports = reports
+        summary = ", ".join(f"{report.source}={report.status}/{report.latency_ms:.0f}ms" for report in reports)
+        if reports and not any(report.status == OK for report in reports):
+            raise RuntimeError(f"Federated retrieval: no source answered ({summary})")
+        logger.info(f"Federated retrieval: {summary}")
+        merged = self._merge(rankings)
+        top_k = self.top_k or max((len(ranking) for ranking in rankings), default=0)
+        return merged[:top_k]
+
+    @staticmethod
+    def _timed_retrieve(source: str, retriever: BaseRetriever, query_bundle: QueryBundle, deadline: float):
+        started = time.perf_counter()
+        try:
+            nodes, status = retriever.retrieve(query_bundle), OK
+        except Exception as e:
+            logger.error(f"Federated retrieval source {source} failed: {e}")
+            nodes, status = [], ERROR
+        finished = time.perf_counter()
+        latency_ms = (finished - started) * 1000
+        _record_latency(source, latency_ms, TIMEOUT if status == OK and finished > deadline else status)
+        return nodes, latency_ms, status
+
+    @staticmethod
+    def _merge(rankings: List[List[NodeWithScore]]) -> List[NodeWithScore]:
+        best: Dict[str, NodeWithScore] = {}
+        keys: Dict[str, str] = {}
+        for ranking in rankings:
+            for node_with_score in ranking:
+                node = node_with_score.node
+                digest = hashlib.sha256(node.get_content().strip().encode()).hexdigest()
+                # The same chunk under another node id (e.g. re-ingested in another knowledge base)
+                key = keys.setdefault(node.node_id, keys.get(digest, node.node_id))
+                keys.setdefault(digest, key)
+                if key not in best or node_with_score.score > best[key].score:
+                    best[key] = node_with_score
+        return sorted(best.values(), key=lambda node_with_score: node_with_score.score, reverse=True)
 
 
 class RBACFilteredRetriever(BaseRetriever):
@@ -59,7 +580,29 @@ class RBACFilteredRetriever(BaseRetriever):
             self.filters = RBACService.get_user_accessible_filters(user)
         else:
             self.filters = filters or {}
-    
+
+        self.pushed_down_retriever = self._push_down_filters() if self.filters else None
+        self.filters_pushed_down = self.pushed_down_retriever is not None
+
+    def _push_down_filters(self) -> Optional[BaseRetriever]:
+        """
+        A copy of the base retriever whose queries carry the RBAC filters into the SQL of its
+        PGVectorStore (see ``rbac_query_customizer``), so top-k is taken over permitted rows only.
+        The shared store isn't modified. Returns None when the base retriever can't take SQL filters.
+        """
+        from llama_index.core.retrievers import VectorIndexRetriever
+
+        if not isinstance(self.base_retriever, VectorIndexRetriever):
+            return None
+        vector_store = getattr(self.base_retriever, "_vector_store", None)
+        if not isinstance(vector_store, PGVectorStore) or vector_store._customize_query_fn is not rbac_query_customizer:
+            return None
+
+        retriever = copy.copy(self.base_retriever)
+        # The vector_store_kwargs of VectorIndexRetriever
+        retriever._kwargs = {**self.base_retriever._kwargs, "rbac_filters": self.filters}
+        return retriever
+
     def _retrieve(self, query: str, **kwargs) -> List:
         """
         Retrieve documents with RBAC filtering applied.
@@ -77,7 +620,10 @@ class RBACFilteredRetriever(BaseRetriever):
             return []
         
         # Apply metadata filters to the retrieval
-        if hasattr(self.base_retriever, 'retrieve_with_metadata_filters'):
+        if self.filters_pushed_down:
+            # Enforced inside the SQL query
+            nodes = self.pushed_down_retriever.retrieve(query, **kwargs)
+        elif hasattr(self.base_retriever, "retrieve_with_metadata_filters"):
             # If the base retriever supports metadata filtering directly
             nodes = self.base_retriever.retrieve_with_metadata_filters(
                 query, 
@@ -85,7 +631,7 @@ class RBACFilteredRetriever(BaseRetriever):
                 **kwargs
             )
         else:
-            # Otherwise, retrieve and filter manually
+            # Otherwise, retrieve and filter manually (may return fewer than top-k)
             nodes = self.base_retriever.retrieve(query, **kwargs)
             nodes = self._filter_nodes_by_rbac(nodes)
         
@@ -127,17 +673,9 @@ class RBACFilteredRetriever(BaseRetriever):
         metadata = getattr(node, 'metadata', {})
         if not metadata:
             return False
-        
-        # Handle OR logic in filters
-        if "$or" in self.filters:
-            for condition in self.filters["$or"]:
-                if self._metadata_matches_condition(metadata, condition):
-                    return True
-            return False
-        else:
-            # Single condition
-            return self._metadata_matches_condition(metadata, self.filters)
-    
+
+        return RBACFilterCompiler.matches(self.filters, metadata)
+
     def _metadata_matches_condition(self, metadata: Dict, condition: Dict) -> bool:
         """
         Check if metadata matches a filter condition.
@@ -149,16 +687,4 @@ class RBACFilteredRetriever(BaseRetriever):
         Returns:
             Boolean indicating match
         """
-        for key, value in condition.items():
-            if key not in metadata:
-                return False
-            
-            # Handle $in operator for list membership
-            if isinstance(value, dict) and "$in" in value:
-                if metadata[key] not in value["$in"]:
-                    return False
-            # Direct equality check
-            elif metadata[key] != value:
-                return False
-        
-        return True
+        return RBACFilterCompiler.matches(condition, metadata)
@@ -1,3 +1,4 @@
+import importlib.util
 import io
 import json
 import mimetypes
@@ -7,12 +8,7 @@ import tempfile
 from agno.tools import Toolkit
 
 # PDF
-try:
-    import pypdf
-
-    PYPDF_AVAILABLE = True
-except ImportError:
-    PYPDF_AVAILABLE = False
+PYPDF_AVAILABLE = importlib.util.find_spec("pypdf") is not None
 
 # CSV/Excel
 try:
@@ -84,6 +80,19 @@ class FileReaderTools(Toolkit):
         super().__init__(name="file_reader_tools")
         self.register(self.read_file)
 
+    def read_pdf(self, content: bytes, max_chars: int | None = None) -> str:
+        """Extract the text of a PDF from memory, stopping once ``max_chars`` characters are extracted."""
+        from apps.opie.utils.pdf_pages import iter_pdf_pages
+
+        text_content = []
+        for page in iter_pdf_pages(content, max_chars=max_chars):
+            if page.error:
+                print(f"[FileReaderTools] Error extracting text from page {page.number}: {page.error}")
+                text_content.append(f"--- Page {page.number} (Error: {page.error}) ---\n")
+            elif page.text.strip():
+                text_content.append(f"--- Page {page.number} ---\n{page.text}")
+        return "\n\n".join(text_content) if text_content else "No text content found in PDF"
+
     def read_file(
         self, content: bytes, file_type: str | None = None, file_name: str | None = None, max_chars: int = 20000
     ) -> str:
@@ -94,23 +103,7 @@ class FileReaderTools(Toolkit):
         print(f"[FileReaderTools] Detected file type: {ext} for file_name: {str(file_name)[:100]}")
         try:
             if ext in ("pdf", "application/pdf") and PYPDF_AVAILABLE:
-                with tempfile.NamedTemporaryFile(suffix=".pdf", delete=True) as tmp:
-                    tmp.write(content)
-                    tmp.flush()
-                    print(f"[FileReaderTools] PDF temp file path: {tmp.name}")
-                    text_content = []
-                    with open(tmp.name, "rb") as file:
-                        pdf_reader = pypdf.PdfReader(file)
-                        for page_num, page in enumerate(pdf_reader.pages, 1):
-                            try:
-                                page_text = page.extract_text()
-                                print(f"[FileReaderTools] Page {page_num} text: {repr(page_text)[:100]}")
-                                if page_text and page_text.strip():
-                                    text_content.append(f"--- Page {page_num} ---\n{page_text}")
-                            except Exception as e:
-                                print(f"[FileReaderTools] Error extracting text from page {page_num}: {e}")
-                                text_content.append(f"--- Page {page_num} (Error: {e}) ---\n")
-                    text = "\n\n".join(text_content) if text_content else "No text content found in PDF"
+                text = self.read_pdf(content, max_chars=max_chars)
             elif ext == "csv" and PANDAS_AVAILABLE:
                 df = pd.read_csv(io.BytesIO(content))
                 text = df.to_string(index=False, max_rows=100)
@@ -159,23 +152,7 @@ class FileReaderTools(Toolkit):
         print(f"[FileReaderTools] Detected file type: {ext} for file_name: {str(file_name)[:100]}")
         try:
             if ext in ("pdf", "application/pdf") and PYPDF_AVAILABLE:
-                with tempfile.NamedTemporaryFile(suffix=".pdf", delete=True) as tmp:
-                    tmp.write(file_bytes)
-                    tmp.flush()
-                    print(f"[FileReaderTools] PDF temp file path: {tmp.name}")
-                    text_content = []
-                    with open(tmp.name, "rb") as file:
-                        pdf_reader = pypdf.PdfReader(file)
-                        for page_num, page in enumerate(pdf_reader.pages, 1):
-                            try:
-                                page_text = page.extract_text()
-                                print(f"[FileReaderTools] Page {page_num} text: {repr(page_text)[:100]}")
-                                if page_text and page_text.strip():
-                                    text_content.append(f"--- Page {page_num} ---\n{page_text}")
-                            except Exception as e:
-                                print(f"[FileReaderTools] Error extracting text from page {page_num}: {e}")
-                                text_content.append(f"--- Page {page_num} (Error: {e}) ---\n")
-                    text = "\n\n".join(text_content) if text_content else "No text content found in PDF"
+                text = self.read_pdf(file_bytes, max_chars=max_chars)
             elif ext == "csv" and PANDAS_AVAILABLE:
                 df = pd.read_csv(io.BytesIO(file_bytes))
                 text = df.to_string(index=False, max_rows=100)
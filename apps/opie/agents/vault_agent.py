@@ -16,6 +16,7 @@ from django.core.cache import cache
 from django.db import connection
 
 from apps.opie.models import Project, ProjectInstruction, ModelProvider
+from apps.opie.services.embedding_cache import cached_embed_model
 
 from .helpers.agent_helpers import (
     get_db_url,
@@ -168,8 +169,8 @@ class VaultAgent:
             schema_name=get_schema(),
         )
 
-        # Create index from existing vector store
-        index = VectorStoreIndex.from_vector_store(vector_store)
+        # Create index from existing vector store; query embeddings are cached
+        index = VectorStoreIndex.from_vector_store(vector_store, embed_model=cached_embed_model())
 
         # Create metadata filters for LlamaIndex
         filters_list = [
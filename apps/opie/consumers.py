@@ -17,8 +17,8 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 
 from apps.opie.agents.agent_builder import AgentBuilder
-from apps.opie.agents.tools.filereader import FileReaderTools
 from apps.opie.models import ChatSession, EphemeralFile
+from apps.opie.services.attachment_extraction import extract_texts
 from apps.teams.models import Team
 from apps.opie.utils.session_title import TITLE_MANAGER
 from apps.opie.utils.token_usage import record_agent_token_usage
@@ -141,7 +141,9 @@ class StreamAgentConsumer(AsyncHttpConsumer):
 
                 @database_sync_to_async
                 def get_ephemeral_files():
-                    return list(EphemeralFile.objects.filter(session_id=session_id).only("file", "mime_type", "name"))
+                    return list(
+                        EphemeralFile.objects.filter(session_id=session_id).only("uuid", "file", "mime_type", "name")
+                    )
 
                 t_files_start = time.time()
                 ephemeral_files = await get_ephemeral_files()
@@ -149,18 +151,17 @@ class StreamAgentConsumer(AsyncHttpConsumer):
                     f"[TIMING] handle: get_ephemeral_files in {time.time() - t_files_start:.3f}s (total {time.time() - request_start:.3f}s)"
                 )
 
-                # Process files asynchronously if we have any
+                # Extract the files concurrently, reusing the text extracted at upload time
                 if ephemeral_files:
-                    reader_tool = FileReaderTools()
+                    t_extract_start = time.time()
+                    texts = await extract_texts(ephemeral_files)
+                    logger.info(
+                        f"[TIMING] handle: extracted {len(ephemeral_files)} files in {time.time() - t_extract_start:.3f}s"
+                    )
                     extracted_texts = []
                     attachments = []
-                    for ephemeral_file in ephemeral_files:
+                    for ephemeral_file, text in zip(ephemeral_files, texts, strict=True):
                         file_type = getattr(ephemeral_file, "mime_type", None) or None
-                        file_name = getattr(ephemeral_file, "name", None) or None
-                        with ephemeral_file.file.open("rb") as f:
-                            file_bytes = f.read()
-                        # Extract text using the tool, always pass file_type and file_name
-                        text = reader_tool.read_file(content=file_bytes, file_type=file_type, file_name=file_name)
                         extracted_texts.append(f"\n--- File: {ephemeral_file.name} ({file_type}) ---\n{text}")
                         # Build attachment metadata
                         attachments.append(
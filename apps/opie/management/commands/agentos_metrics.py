@@ -3,13 +3,17 @@ Django management command for AgentOS metrics operations.
 """
 
 import logging
+import time
+import uuid
 from datetime import date, timedelta
+from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
 from django.db import transaction
+from django.utils import timezone
 
 from apps.opie.agentos.metrics_service import get_metrics_service
-from apps.opie.models import AgentOSSession, AgentOSUsage, AgentOSPerformance
+from apps.opie.models import AgentOSSession, AgentOSMessage, AgentOSUsage, AgentOSPerformance
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -20,9 +24,7 @@ class Command(BaseCommand):
     
     def add_arguments(self, parser):
         parser.add_argument(
-            'action',
-            choices=['update', 'cleanup', 'export', 'stats'],
-            help='Action to perform'
+            "action", choices=["update", "cleanup", "export", "stats", "rollup", "benchmark"], help="Action to perform"
         )
         parser.add_argument(
             '--days',
@@ -57,7 +59,16 @@ class Command(BaseCommand):
             default=90,
             help='Days of old data to clean up (default: 90)'
         )
-    
+        parser.add_argument(
+            "--messages",
+            type=int,
+            default=1_000_000,
+            help="Number of synthetic messages seeded by the benchmark (default: 1000000)",
+        )
+        parser.add_argument(
+            "--skip-python", action="store_true", help="Skip the Python-side aggregation baseline in the benchmark"
+        )
+
     def handle(self, *args, **options):
         action = options['action']
         days = options['days']
@@ -73,8 +84,12 @@ class Command(BaseCommand):
                 self.export_metrics(days, user_id, agent_id, options['format'], options.get('output'))
             elif action == 'stats':
                 self.show_stats(days, user_id, agent_id)
+            elif action == "rollup":
+                self.rollup_metrics()
+            elif action == "benchmark":
+                self.benchmark(options["messages"], days, options["skip_python"])
         except Exception as e:
-            raise CommandError(f'Failed to execute {action}: {e}')
+            raise CommandError(f"Failed to execute {action}: {e}")
     
     def update_metrics(self, days, user_id=None, agent_id=None):
         """Update metrics for specified period."""
@@ -136,7 +151,120 @@ class Command(BaseCommand):
         self.stdout.write(
             self.style.SUCCESS(f'Successfully updated metrics for {updated_count} agent-user combinations')
         )
-    
+
+    def rollup_metrics(self):
+        """Roll up metrics for the messages created since the stored watermark."""
+        result = get_metrics_service().rollup_since_watermark()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rolled up {result['usage_rows']} usage rows and {result['performance_rows']} performance rows"
+            )
+        )
+
+    def benchmark(self, message_count, days, skip_python):
+        """
+        Seed synthetic messages for a benchmark user and time the daily rollups: loading the
+        messages into Python (the previous implementation), aggregating in SQL, the
+        incremental rollup and the materialized view refresh. The seeded data is deleted.
+        """
+        agents = [f"benchmark-agent-{i}" for i in range(5)]
+        sessions_per_agent = 20
+        batch_size = 10_000
+        suffix = uuid.uuid4().hex[:8]
+        user = User.objects.create(
+            username=f"agentos-benchmark-{suffix}", email=f"agentos-benchmark-{suffix}@example.com"
+        )
+
+        try:
+            started = time.perf_counter()
+            sessions = AgentOSSession.objects.bulk_create(
+                [
+                    AgentOSSession(
+                        user=user,
+                        agent_id=agent_id,
+                        agent_name=agent_id,
+                        session_id=f"{agent_id}-{suffix}-{i}",
+                        title="Benchmark",
+                    )
+                    for agent_id in agents
+                    for i in range(sessions_per_agent)
+                ]
+            )
+            tools = ["search", "calculator", "browser", "python", "files"]
+            seeded = 0
+            for batch_index, batch_start in enumerate(range(0, message_count, batch_size)):
+                batch = AgentOSMessage.objects.bulk_create(
+                    [
+                        AgentOSMessage(
+                            session=sessions[n % len(sessions)],
+                            message_id=f"{suffix}-{n}",
+                            role="assistant",
+                            content="",
+                            tokens_used=n % 2000,
+                            cost=(n % 2000) / 1_000_000,
+                            response_time_ms=100 + n % 5000,
+                            model_used="benchmark",
+                            tools_used=tools[: n % 4],
+                            metadata={},
+                        )
+                        for n in range(batch_start, min(batch_start + batch_size, message_count))
+                    ]
+                )
+                # Spread the messages over the period
+                day = timezone.now() - timedelta(days=batch_index % max(days, 1))
+                AgentOSMessage.objects.filter(pk__in=[m.pk for m in batch]).update(created_at=day)
+                seeded += len(batch)
+            self.stdout.write(f"Seeded {seeded:,} messages in {time.perf_counter() - started:.1f}s")
+
+            end_date = date.today()
+            pairs = [(agent_id, end_date - timedelta(days=i)) for agent_id in agents for i in range(days)]
+            user_service = get_metrics_service(user)
+
+            if not skip_python:
+                started = time.perf_counter()
+                python_tokens = 0
+                for agent_id, day in pairs:
+                    messages = AgentOSMessage.objects.filter(
+                        session__user=user, session__agent_id=agent_id, created_at__date=day
+                    )
+                    python_tokens += sum(msg.tokens_used for msg in messages)
+                    all_tools = set()
+                    for msg in messages:
+                        all_tools.update(msg.tools_used or [])
+                self.stdout.write(
+                    f"Python-side daily usage ({len(pairs)} days, {python_tokens:,} tokens): "
+                    f"{time.perf_counter() - started:.2f}s"
+                )
+
+            started = time.perf_counter()
+            for agent_id, day in pairs:
+                user_service.update_daily_usage(agent_id, day)
+                user_service.update_daily_performance(agent_id, day)
+            self.stdout.write(
+                f"SQL daily usage and performance ({len(pairs)} days): {time.perf_counter() - started:.2f}s"
+            )
+
+            # Scoped to the benchmark user and leaves the production watermark alone
+            started = time.perf_counter()
+            result = user_service.rollup_range(timezone.now() - timedelta(days=days + 1), timezone.now(), user=user)
+            self.stdout.write(
+                f"Incremental rollup ({result['usage_rows']} usage rows): {time.perf_counter() - started:.2f}s"
+            )
+
+            if settings.AGENTOS_METRICS_MATERIALIZED_VIEW:
+                started = time.perf_counter()
+                user_service.create_daily_usage_view()
+                user_service.refresh_daily_usage_view()
+                self.stdout.write(f"Materialized view create and refresh: {time.perf_counter() - started:.2f}s")
+            else:
+                self.stdout.write("Materialized view skipped (AGENTOS_METRICS_MATERIALIZED_VIEW is off)")
+        finally:
+            AgentOSUsage.objects.filter(user=user).delete()
+            AgentOSPerformance.objects.filter(agent_id__in=agents).delete()
+            AgentOSMessage.objects.filter(session__user=user).delete()
+            AgentOSSession.objects.filter(user=user).delete()
+            user.delete()
+
     def cleanup_metrics(self, cleanup_days):
         """Clean up old metrics data."""
         self.stdout.write(f'Cleaning up metrics older than {cleanup_days} days...')
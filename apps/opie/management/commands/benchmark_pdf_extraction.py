@@ -0,0 +1,111 @@
+"""
+Django management command benchmarking PDF text extraction.
+
+Extracts synthetic PDFs of increasing page counts with the previous temp-file reader and
+with the in-memory page iterator, sequentially and across the process pool. Each run
+happens in a fresh process, so the reported peak RSS is the one of that run only (the
+pool workers are separate processes and not included).
+"""
+
+import multiprocessing
+import resource
+import tempfile
+import time
+
+import pypdf
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.opie.utils.pdf_pages import iter_pdf_pages, synthetic_pdf
+
+
+def _extract_with_temp_file(content):
+    """The previous reader: write the PDF to a named temp file, then extract every page."""
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=True) as tmp:
+        tmp.write(content)
+        tmp.flush()
+        with open(tmp.name, "rb") as file:
+            for page in pypdf.PdfReader(file).pages:
+                yield page.extract_text()
+
+
+def _peak_rss_mb():
+    # ru_maxrss survives the exec of a spawned process and would report the parent's peak
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run(mode, content, workers, max_chars, results):
+    started = time.perf_counter()
+    first_page = None
+    pages = chars = 0
+    if mode == "temp file (before)":
+        texts = _extract_with_temp_file(content)
+    else:
+        parallel = mode == "streamed, process pool"
+        texts = (
+            page.text
+            for page in iter_pdf_pages(
+                content,
+                max_chars=max_chars,
+                workers=workers if parallel else 1,
+                min_parallel_pages=1 if parallel else 0,
+            )
+        )
+    for text in texts:
+        if first_page is None:
+            first_page = time.perf_counter() - started
+        pages += 1
+        chars += len(text)
+    total = time.perf_counter() - started
+    results.put((first_page or 0.0, total, pages, chars, _peak_rss_mb()))
+
+
+class Command(BaseCommand):
+    help = "Benchmark PDF text extraction: time to the first page, total time and peak RSS"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--pages",
+            type=int,
+            nargs="+",
+            default=[10, 100, 1000],
+            help="Page counts of the synthetic PDFs (default: 10 100 1000)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=max(settings.OPIE_PDF_EXTRACTION_WORKERS, 2),
+            help="Process pool size (default: OPIE_PDF_EXTRACTION_WORKERS, at least 2)",
+        )
+        parser.add_argument(
+            "--max-chars", type=int, default=None, help="Character budget of the streamed runs (default: none)"
+        )
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context("spawn")
+        modes = ("temp file (before)", "streamed, in process", "streamed, process pool")
+
+        self.stdout.write(
+            f"{'pages':>6} {'mode':<24} {'first page':>11} {'total':>9} {'pages':>6} {'chars':>9} {'peak RSS':>10}"
+        )
+        for page_count in options["pages"]:
+            content = synthetic_pdf(page_count)
+            for mode in modes:
+                results = context.Queue()
+                process = context.Process(
+                    target=_run, args=(mode, content, options["workers"], options["max_chars"], results)
+                )
+                process.start()
+                first_page, total, pages, chars, peak_rss_mb = results.get()
+                process.join()
+                self.stdout.write(
+                    f"{page_count:>6} {mode:<24} {first_page:>10.3f}s {total:>8.3f}s {pages:>6} {chars:>9} "
+                    f"{peak_rss_mb:>8.1f}MB"
+                )
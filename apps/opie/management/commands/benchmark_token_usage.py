@@ -0,0 +1,144 @@
+"""
+Django management command benchmarking concurrent token usage writes.
+
+Compares the previous write path, which locked the user and team summary rows inside the
+transaction of every record, with the append-only path whose records are folded into the
+summaries by the periodic rollup. All writers record usage for the same user and team,
+which is the hot-row case of a busy team.
+"""
+
+import threading
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import F
+
+from apps.opie.models import TeamTokenSummary, TokenUsage, TokenUsageBucket, UserTokenSummary
+from apps.opie.utils.token_usage import _current_period, create_token_usage_record, rollup_token_usage
+from apps.teams.models import Team
+
+User = get_user_model()
+
+TOKENS_PER_RECORD = 100
+
+
+def _record_kwargs(user, request_id):
+    return dict(
+        user=user,
+        session_id="benchmark",
+        agent_id="benchmark",
+        agent_name="benchmark",
+        chat_name="benchmark",
+        model_provider="benchmark",
+        model_name="benchmark",
+        input_tokens=TOKENS_PER_RECORD // 2,
+        output_tokens=TOKENS_PER_RECORD // 2,
+        total_tokens=TOKENS_PER_RECORD,
+        user_msg="",
+        assistant_msg="",
+        cost=0.001,
+        request_id=request_id,
+    )
+
+
+@transaction.atomic
+def _record_with_row_lock(user, request_id):
+    """The previous write path: insert, then update both summaries under row locks."""
+    kwargs = _record_kwargs(user, request_id)
+    TokenUsage.objects.create(team=user.team, rolled_up=True, **kwargs)
+
+    period_start, period_end = _current_period()
+    summary, _ = UserTokenSummary.objects.select_for_update().get_or_create(
+        user=user, defaults=dict(period_start=period_start, period_end=period_end)
+    )
+    UserTokenSummary.objects.filter(pk=summary.pk).update(total_tokens=F("total_tokens") + TOKENS_PER_RECORD)
+
+    summary, _ = TeamTokenSummary.objects.select_for_update().get_or_create(team=user.team)
+    TeamTokenSummary.objects.filter(pk=summary.pk).update(total_tokens=F("total_tokens") + TOKENS_PER_RECORD)
+
+
+def _record_append_only(user, request_id):
+    create_token_usage_record(**_record_kwargs(user, request_id))
+
+
+class Command(BaseCommand):
+    help = "Benchmark token usage write throughput with parallel writers on the same user and team"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=50, help="Number of parallel writers (default: 50)")
+        parser.add_argument(
+            "--records", type=int, default=20, help="Number of records written by each writer (default: 20)"
+        )
+
+    def _run_writers(self, write, user, writers, records):
+        barrier = threading.Barrier(writers + 1)
+        errors = []
+
+        def writer(index):
+            try:
+                barrier.wait()
+                for i in range(records):
+                    write(user, f"benchmark-{uuid.uuid4().hex}-{index}-{i}")
+            except Exception as e:  # noqa: BLE001
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=writer, args=(index,)) for index in range(writers)]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        if errors:
+            self.stderr.write(self.style.ERROR(f"{len(errors)} writers failed, first error: {errors[0]!r}"))
+        return elapsed
+
+    def _report(self, label, count, elapsed):
+        self.stdout.write(f"{label:<28} {count:>7d} records in {elapsed:8.3f}s  {count / elapsed:10.1f} records/s")
+
+    def handle(self, *args, **options):
+        writers, records = options["writers"], options["records"]
+        count = writers * records
+        suffix = uuid.uuid4().hex[:8]
+        team = Team.objects.create(name=f"Token usage benchmark {suffix}", slug=f"token-usage-benchmark-{suffix}")
+        user = User.objects.create(username=f"token-usage-benchmark-{suffix}", email=f"benchmark-{suffix}@example.com")
+        user.team = team
+
+        try:
+            self.stdout.write(f"{writers} writers x {records} records on one user and team")
+
+            elapsed = self._run_writers(_record_with_row_lock, user, writers, records)
+            self._report("summary row locks (before)", count, elapsed)
+
+            TokenUsage.objects.filter(user=user).delete()
+            UserTokenSummary.objects.filter(user=user).update(total_tokens=0)
+            TeamTokenSummary.objects.filter(team=team).update(total_tokens=0)
+
+            elapsed = self._run_writers(_record_append_only, user, writers, records)
+            self._report("append-only (after)", count, elapsed)
+
+            started = time.perf_counter()
+            rolled_up = rollup_token_usage(user=user)
+            self._report("rollup", rolled_up, time.perf_counter() - started)
+
+            expected = TokenUsage.objects.filter(user=user).count() * TOKENS_PER_RECORD
+            totals = (
+                UserTokenSummary.objects.get(user=user).total_tokens,
+                TeamTokenSummary.objects.get(team=team).total_tokens,
+            )
+            if totals != (expected, expected):
+                self.stderr.write(self.style.ERROR(f"Summaries {totals} do not match the records ({expected})"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"Summaries match the records: {expected} tokens"))
+        finally:
+            TokenUsage.objects.filter(user=user).delete()
+            TokenUsageBucket.objects.filter(user=user).delete()
+            user.delete()
+            team.delete()
@@ -0,0 +1,161 @@
+"""
+Django management command benchmarking the vector storage layouts.
+
+Copies the embeddings of a knowledge base (or generates clustered synthetic ones) into a
+temporary table per layout - the current full-precision ``vector``, ``halfvec``, the
+binary-quantized index with full-precision rerank, and truncated dimensions - builds the HNSW
+index each would get, and runs the same queries against all of them. recall@k is measured
+against exact search on the full-precision embeddings, so it includes the precision each
+layout gives up. Temporary tables disappear with the session: nothing in the database changes.
+"""
+
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.opie.services.vector_index_manager import VectorTable, find_vector_tables, nearest_sql
+from apps.opie.services.vector_storage import conversion_sql, get_layout
+
+
+def _truncate(embedding, dimensions):
+    values = embedding.strip("[]").split(",")
+    return "[" + ",".join(values[:dimensions]) + "]"
+
+
+class Command(BaseCommand):
+    help = "Benchmark the vector storage layouts: size, index build time, recall@k and p95 query latency"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--knowledge-base",
+            help="knowledgebase_id whose embeddings are copied (default: synthetic embeddings)",
+        )
+        parser.add_argument("--rows", type=int, default=20_000, help="Embeddings benchmarked (default: 20000)")
+        parser.add_argument(
+            "--dimensions", type=int, default=1536, help="Dimensions of the synthetic embeddings (default: 1536)"
+        )
+        parser.add_argument(
+            "--truncate",
+            type=int,
+            action="append",
+            default=[],
+            help="Also benchmark embeddings truncated to N dimensions (repeatable; Matryoshka embedders only)",
+        )
+        parser.add_argument("--queries", type=int, default=100, help="Queries sampled from the rows (default: 100)")
+        parser.add_argument("--k", type=int, default=10, help="Results per query (default: 10)")
+        parser.add_argument("--ef-search", type=int, default=40, help="hnsw.ef_search of the queries (default: 40)")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("The benchmark needs the Postgres database (pgvector)")
+        k = options["k"]
+
+        with connection.cursor() as cursor:
+            dimensions = self._load_source(cursor, options)
+            cursor.execute("SELECT embedding::text FROM vs_source ORDER BY random() LIMIT %s", [options["queries"]])
+            queries = [row[0] for row in cursor.fetchall()]
+            if not queries:
+                raise CommandError("No embeddings to benchmark")
+            source = VectorTable("pg_temp", "vs_source", dimensions, 0)
+            expected = []
+            for query in queries:
+                cursor.execute(nearest_sql(source, exact=True), {"embedding": query, "k": k})
+                expected.append({row[0] for row in cursor.fetchall()})
+
+            layouts = [("vector", None), ("halfvec", None), ("binary_rerank", None)]
+            for truncated in options["truncate"]:
+                layouts += [("vector", truncated), ("halfvec", truncated)]
+            self.stdout.write(
+                f"{'layout':<20} {'dims':>5} {'table':>9} {'index':>9} {'build':>8} "
+                f"{'recall@' + str(k):>9} {'p50':>8} {'p95':>8}"
+            )
+            for storage, truncated in layouts:
+                self._benchmark(cursor, storage, truncated or dimensions, dimensions, queries, expected, options)
+
+    def _load_source(self, cursor, options):
+        """Fill the vs_source temporary table; returns the dimensions of its embeddings."""
+        if options["knowledge_base"]:
+            from apps.opie.models import KnowledgeBase
+
+            knowledge_base = KnowledgeBase.objects.filter(knowledgebase_id=options["knowledge_base"]).first()
+            if knowledge_base is None:
+                raise CommandError(f"No knowledge base {options['knowledge_base']}")
+            name = f"data_{knowledge_base.vector_table_name}".lower()
+            tables = [table for table in find_vector_tables([knowledge_base.vector_table_name]) if table.name == name]
+            if not tables or not tables[0].dimensions:
+                raise CommandError(f"No vector table for {knowledge_base.knowledgebase_id}")
+            dimensions = tables[0].dimensions
+            cursor.execute(f"CREATE TEMPORARY TABLE vs_source (id bigint PRIMARY KEY, embedding vector({dimensions}))")
+            cursor.execute(
+                f"INSERT INTO vs_source SELECT id, embedding::vector FROM {tables[0].qualified_name} "
+                "WHERE metadata_->>'knowledgebase_id' = %s ORDER BY id LIMIT %s",
+                [knowledge_base.knowledgebase_id, options["rows"]],
+            )
+            return dimensions
+
+        # Points scattered around random centers, so neighbourhoods are meaningful (unlike uniform noise)
+        dimensions = options["dimensions"]
+        if options["truncate"]:
+            self.stdout.write(self.style.WARNING("Synthetic embeddings aren't Matryoshka: truncated recall is a floor"))
+        cursor.execute(
+            "CREATE TEMPORARY TABLE vs_centers AS SELECT c, array_agg(random() - 0.5 ORDER BY d) AS v "
+            "FROM generate_series(1, %s) c, generate_series(1, %s) d GROUP BY c",
+            [max(options["rows"] // 100, 1), dimensions],
+        )
+        cursor.execute(f"CREATE TEMPORARY TABLE vs_source (id bigint PRIMARY KEY, embedding vector({dimensions}))")
+        cursor.execute(
+            "INSERT INTO vs_source SELECT i, (SELECT array_agg(v[j] + (random() - 0.5) * 0.3 ORDER BY j) "
+            "FROM generate_subscripts(v, 1) j)::vector FROM generate_series(1, %s) i "
+            "JOIN vs_centers ON c = 1 + i %% (SELECT count(*) FROM vs_centers)",
+            [options["rows"]],
+        )
+        return dimensions
+
+    def _benchmark(self, cursor, storage, dimensions, source_dimensions, queries, expected, options):
+        layout = get_layout(storage)
+        name = f"vs_{storage}_{dimensions}"
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE {name} AS SELECT id, "
+            f"{conversion_sql(storage, dimensions, source_dimensions)} AS embedding FROM vs_source"
+        )
+        table = VectorTable("pg_temp", name, dimensions, 0, storage=storage)
+
+        build = 0.0
+        if dimensions <= layout.max_index_dimensions:
+            started = time.perf_counter()
+            cursor.execute(
+                f"CREATE INDEX ON {name} USING hnsw ({layout.index_expression(dimensions)} {layout.opclass})"
+            )
+            build = time.perf_counter() - started
+        cursor.execute(f"ANALYZE {name}")
+        cursor.execute(f"SELECT pg_table_size('{name}'), pg_indexes_size('{name}')")
+        table_bytes, index_bytes = cursor.fetchone()
+
+        k = options["k"]
+        candidates = k * (settings.OPIE_VECTOR_BINARY_RERANK_FACTOR if layout.binary else 1)
+        cursor.execute(f"SET hnsw.ef_search = {max(options['ef_search'], candidates)}")
+        # The benchmark tables are small enough for the planner to prefer a scan
+        cursor.execute("SET enable_seqscan = off")
+        latencies, found = [], 0
+        try:
+            for query, nearest in zip(queries, expected, strict=True):
+                if dimensions < source_dimensions:
+                    query = _truncate(query, dimensions)
+                started = time.perf_counter()
+                cursor.execute(nearest_sql(table), {"embedding": query, "k": k, "candidates": candidates})
+                ids = {row[0] for row in cursor.fetchall()}
+                latencies.append((time.perf_counter() - started) * 1000)
+                found += len(ids & nearest)
+        finally:
+            cursor.execute("RESET enable_seqscan")
+            cursor.execute(f"DROP TABLE {name}")
+
+        recall = found / max(sum(len(nearest) for nearest in expected), 1)
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+        self.stdout.write(
+            f"{storage:<20} {dimensions:>5} {table_bytes / 2**20:>7.1f}MB {index_bytes / 2**20:>7.1f}MB "
+            f"{build:>7.2f}s {recall:>9.3f} {statistics.median(latencies):>6.2f}ms {p95:>6.2f}ms"
+        )
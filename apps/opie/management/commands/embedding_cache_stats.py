@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from apps.opie.services.embedding_cache import TIERS, reset_shared_stats, shared_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Shows the query embedding cache requests of every process by tier (local LRU, Redis, "
+        "coalesced with a concurrent request, or embedded) and the hit ratio, as last flushed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Reset the counters after showing them.")
+
+    def handle(self, *args, **options):
+        stats = shared_stats()
+        total = sum(stats["requests"].values())
+        for tier in TIERS:
+            count = stats["requests"][tier]
+            self.stdout.write(f"{tier:<10} {count:>10} {count / total if total else 0.0:>8.1%}")
+        self.stdout.write(self.style.SUCCESS(f"{total} query embeddings, hit ratio {stats['hit_ratio']:.1%}"))
+
+        if options["reset"]:
+            reset_shared_stats()
+            self.stdout.write("Counters reset")
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from apps.opie.agents.helpers.retrievers import ensure_text_search_index
+from apps.opie.models import KnowledgeBase
+from apps.opie.services.rbac_filter_compiler import RBAC_METADATA_KEYS, ensure_rbac_metadata_indexes
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates the secondary indexes used by retrieval on every knowledge base vector table: "
+        f"expression indexes on the RBAC metadata keys ({', '.join(RBAC_METADATA_KEYS)}) and a GIN "
+        "full-text index on the text column for hybrid keyword search. Safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--text-search-config",
+            default="english",
+            help="Postgres text search configuration for the full-text index (default: english).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only list the vector tables that would be indexed.",
+        )
+
+    def handle(self, *args, **options):
+        kb_table_names = {name for name in KnowledgeBase.objects.values_list("vector_table_name", flat=True) if name}
+        # LlamaIndex prefixes its tables with "data_"; agno and the ingestion service use the name as-is
+        candidates = kb_table_names | {f"data_{name}" for name in kb_table_names}
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT table_schema, table_name
+                FROM information_schema.columns
+                WHERE column_name = 'metadata_' AND table_name = ANY(%s)
+                """,
+                [[name.lower() for name in candidates] + list(candidates)],
+            )
+            tables = sorted(set(cursor.fetchall()))
+
+        if not tables:
+            self.stdout.write(self.style.SUCCESS("No knowledge base vector tables with a metadata_ column found."))
+            return
+
+        for schema, table_name in tables:
+            if options["dry_run"]:
+                self.stdout.write(f"{schema}.{table_name}")
+                continue
+            try:
+                ensure_rbac_metadata_indexes(table_name, schema=schema)
+                ensure_text_search_index(table_name, schema=schema, config=options["text_search_config"])
+                self.stdout.write(self.style.SUCCESS(f"Indexed {schema}.{table_name}"))
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"Failed to index {schema}.{table_name}: {e}"))
@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand
+
+from apps.opie.services.vector_index_manager import EXACT, manage_vector_indexes
+
+
+class Command(BaseCommand):
+    help = (
+        "Sizes the ANN index of every knowledge base vector table on its row count (none for small "
+        "tables, HNSW, or ivfflat with lists ≈ sqrt(rows) for the largest), rebuilds it CONCURRENTLY "
+        "when it no longer fits, and records the build time and the recall@k measured against exact "
+        "search. Also runs periodically as apps.opie.tasks.manage_vector_indexes_task."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--table",
+            action="append",
+            dest="tables",
+            help="Only manage this vector table (repeatable; default: every knowledge base table).",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Rebuild the indexes even when they match the plan.",
+        )
+        parser.add_argument(
+            "--no-recall",
+            action="store_true",
+            help="Skip the recall@k calibration after a build.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only show the planned index and action for each table.",
+        )
+
+    def handle(self, *args, **options):
+        results = manage_vector_indexes(
+            table_names=options["tables"],
+            dry_run=options["dry_run"],
+            force=options["force"],
+            measure=not options["no_recall"],
+        )
+        if not results:
+            self.stdout.write(self.style.SUCCESS("No vector tables to manage, or another run is in progress."))
+            return
+
+        for result in results:
+            plan = result["plan"]
+            index = plan.method
+            if plan.lists:
+                index += f" (lists = {plan.lists})"
+            elif plan.method != EXACT:
+                index += f" (m = {plan.m}, ef_construction = {plan.ef_construction})"
+            line = f"{result['table']}: {index}, {plan.reason} - {result['action']}"
+
+            build = result.get("build")
+            if build is None:
+                self.stdout.write(line)
+            elif build.status == build.Status.FAILED:
+                self.stdout.write(self.style.ERROR(f"{line}: failed: {build.error}"))
+            else:
+                if build.build_seconds is not None:
+                    line += f" in {build.build_seconds:.1f}s"
+                if build.calibration:
+                    recalls = ", ".join(f"{value}: {recall:.3f}" for value, recall in build.calibration.items())
+                    line += f"; recall@{build.recall_k} by {build.search_parameter}: {recalls}"
+                self.stdout.write(self.style.SUCCESS(line))
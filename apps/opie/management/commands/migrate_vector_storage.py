@@ -0,0 +1,64 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.opie.models import KnowledgeBase, VectorStorage
+from apps.opie.services.vector_storage import migrate_storage
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves the embeddings of a knowledge base to another storage layout: halfvec, binary-quantized "
+        "index with full-precision rerank, and/or truncated (Matryoshka) dimensions. Rows are copied and "
+        "converted in batches into the table of the new layout, then the knowledge base is switched "
+        "over and the table indexed. Converting loses precision: use benchmark_vector_storage first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("knowledgebase_id", help="knowledgebase_id of the knowledge base to migrate.")
+        parser.add_argument(
+            "--storage",
+            choices=VectorStorage.values,
+            default=VectorStorage.VECTOR,
+            help="Storage layout to move to (default: vector).",
+        )
+        parser.add_argument(
+            "--dimensions",
+            type=int,
+            help="Keep only the first N dimensions of the embeddings (text-embedding-3-* only).",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows copied per transaction.")
+        parser.add_argument(
+            "--delete-source",
+            action="store_true",
+            help="Delete the knowledge base rows from the old table (drop it when it isn't shared).",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Only show the tables and conversion.")
+
+    def handle(self, *args, **options):
+        try:
+            knowledge_base = KnowledgeBase.objects.select_related("model_provider").get(
+                knowledgebase_id=options["knowledgebase_id"]
+            )
+        except KnowledgeBase.DoesNotExist as e:
+            raise CommandError(f"No knowledge base {options['knowledgebase_id']}") from e
+
+        try:
+            summary = migrate_storage(
+                knowledge_base,
+                options["storage"],
+                dimensions=options["dimensions"],
+                batch_size=options["batch_size"],
+                delete_source=options["delete_source"],
+                dry_run=options["dry_run"],
+                progress=self.stdout.write,
+            )
+        except (ValidationError, ValueError) as e:
+            raise CommandError(str(e.messages[0] if isinstance(e, ValidationError) else e)) from e
+
+        self.stdout.write(f"{summary['source']} -> {summary['target']}, embedding = {summary['conversion']}")
+        if options["dry_run"]:
+            self.stdout.write(f"{summary['rows']} rows to copy")
+            return
+        for result in summary["indexes"]:
+            self.stdout.write(f"{result['table']}: {result['plan'].method} index, {result['action']}")
+        self.stdout.write(self.style.SUCCESS(f"Migrated {summary['copied']} rows"))
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 21:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opie', '0003_add_chunking_strategy'),
+        ('teams', '0002_team_billing_details_last_changed_team_customer_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Existing records were already counted in the summaries when they were created
+        migrations.AddField(
+            model_name='tokenusage',
+            name='rolled_up',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AlterField(
+            model_name='tokenusage',
+            name='rolled_up',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='tokenusage',
+            index=models.Index(condition=models.Q(('rolled_up', False)), fields=['created_at'], name='token_usage_pending_rollup_idx'),
+        ),
+    ]
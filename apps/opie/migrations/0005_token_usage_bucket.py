@@ -0,0 +1,95 @@
+# Generated by Django 5.2.7 on 2026-10-18 21:58
+
+import datetime
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum, Value
+from django.db.models.functions import Coalesce, TruncHour
+
+
+def backfill_buckets(apps, schema_editor):
+    """
+    Bucket the records that were already rolled up; the others are bucketed by the rollup.
+    Rows are grouped on the bucket key, so the unique constraint holds from the start.
+    """
+    TokenUsage = apps.get_model("opie", "TokenUsage")
+    TokenUsageBucket = apps.get_model("opie", "TokenUsageBucket")
+
+    rows = (
+        TokenUsage.objects.filter(rolled_up=True)
+        .order_by()
+        .values(
+            "team_id",
+            "user_id",
+            "model_provider",
+            "model_name",
+            agent=Coalesce("agent_id", Value("")),
+            bucket=TruncHour("created_at", tzinfo=datetime.timezone.utc),
+        )
+        .annotate(
+            input=Sum("input_tokens"),
+            output=Sum("output_tokens"),
+            total=Sum("total_tokens"),
+            total_cost=Sum("cost"),
+            requests=Count("id"),
+        )
+    )
+    TokenUsageBucket.objects.bulk_create(
+        (
+            TokenUsageBucket(
+                team_id=row["team_id"],
+                user_id=row["user_id"],
+                agent_id=row["agent"],
+                model_provider=row["model_provider"],
+                model_name=row["model_name"],
+                bucket_start=row["bucket"],
+                input_tokens=row["input"] or 0,
+                output_tokens=row["output"] or 0,
+                total_tokens=row["total"] or 0,
+                cost=row["total_cost"] or 0.0,
+                request_count=row["requests"],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opie', '0004_token_usage_rolled_up'),
+        ('teams', '0002_team_billing_details_last_changed_team_customer_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenUsageBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('agent_id', models.CharField(blank=True, default='', max_length=128)),
+                ('model_provider', models.CharField(blank=True, default='', max_length=50)),
+                ('model_name', models.CharField(blank=True, default='', max_length=100)),
+                ('bucket_start', models.DateTimeField(help_text='Start of the hour covered by the bucket (UTC).')),
+                ('input_tokens', models.BigIntegerField(default=0)),
+                ('output_tokens', models.BigIntegerField(default=0)),
+                ('total_tokens', models.BigIntegerField(default=0)),
+                ('cost', models.FloatField(default=0.0)),
+                ('request_count', models.PositiveIntegerField(default=0)),
+                ('team', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='teams.team')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Token Usage Bucket',
+                'verbose_name_plural': 'Token Usage Buckets',
+                'indexes': [models.Index(fields=['bucket_start'], name='token_usage_bucket_start_idx'), models.Index(fields=['team', 'bucket_start'], name='token_usage_bucket_team_idx'), models.Index(fields=['user', 'bucket_start'], name='token_usage_bucket_user_idx')],
+                'constraints': [models.UniqueConstraint(fields=('team', 'user', 'agent_id', 'model_provider', 'model_name', 'bucket_start'), name='unique_token_usage_bucket', nulls_distinct=False)],
+            },
+        ),
+        migrations.RunPython(backfill_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:22
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opie', '0005_token_usage_bucket'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='knowledgebase',
+            name='recall_target',
+            field=models.FloatField(default=0.95, help_text='Recall@k vector searches should reach; sets how much of the ANN index each query explores.', validators=[django.core.validators.MinValueValidator(0.0), django.core.validators.MaxValueValidator(1.0)]),
+        ),
+        migrations.CreateModel(
+            name='VectorIndexBuild',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('schema_name', models.CharField(max_length=63)),
+                ('table_name', models.CharField(max_length=255)),
+                ('method', models.CharField(help_text='hnsw, ivfflat, or exact when no ANN index is kept.', max_length=16)),
+                ('index_name', models.CharField(blank=True, default='', max_length=63)),
+                ('status', models.CharField(choices=[('built', 'Built'), ('calibrated', 'Calibrated'), ('dropped', 'Dropped (exact search)'), ('failed', 'Failed')], max_length=16)),
+                ('row_count', models.BigIntegerField(help_text='Rows in the table when the index was planned.')),
+                ('lists', models.PositiveIntegerField(blank=True, null=True)),
+                ('m', models.PositiveIntegerField(blank=True, null=True)),
+                ('ef_construction', models.PositiveIntegerField(blank=True, null=True)),
+                ('build_seconds', models.FloatField(blank=True, null=True)),
+                ('search_parameter', models.CharField(blank=True, default='', help_text='ivfflat.probes or hnsw.ef_search.', max_length=32)),
+                ('recall_k', models.PositiveIntegerField(default=10)),
+                ('sample_size', models.PositiveIntegerField(default=0)),
+                ('calibration', models.JSONField(blank=True, default=dict, help_text='recall@k by search parameter value.')),
+                ('error', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'verbose_name': 'Vector Index Build',
+                'verbose_name_plural': 'Vector Index Builds',
+                'indexes': [models.Index(fields=['table_name', '-created_at'], name='vector_index_build_table_idx')],
+            },
+        ),
+    ]
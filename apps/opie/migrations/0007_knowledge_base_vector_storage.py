@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opie', '0006_vector_index_build'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='knowledgebase',
+            name='embedding_dimensions',
+            field=models.PositiveIntegerField(blank=True, help_text='Keep only the first N dimensions of each embedding (Matryoshka embedders such as text-embedding-3-*). Empty keeps the full embedding.', null=True),
+        ),
+        migrations.AddField(
+            model_name='knowledgebase',
+            name='vector_storage',
+            field=models.CharField(choices=[('vector', 'Full precision (vector)'), ('halfvec', 'Half precision (halfvec)'), ('binary_rerank', 'Binary-quantized index, full-precision rerank')], default='vector', help_text='How the embeddings are stored and indexed (LlamaIndex knowledge bases only).', max_length=20),
+        ),
+    ]
@@ -12,6 +12,7 @@ from agno.vectordb.pgvector import PgVector
 # Third-party imports
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.core.files.storage import default_storage
 from django.core.signing import Signer
 from django.db import models
@@ -75,6 +76,8 @@ class TokenUsage(BaseModel):
     cost = models.FloatField(default=0.0)
     user_msg = models.TextField(blank=True, null=True)
     assistant_msg = models.TextField(blank=True, null=True)
+    # Whether the record was folded into the user/team summaries by the periodic rollup
+    rolled_up = models.BooleanField(default=False)
 
     def __str__(self):
         return f"{self.user} - {self.agent_name} - {self.total_tokens} tokens"
@@ -83,6 +86,14 @@ class TokenUsage(BaseModel):
         ordering = ["-created_at"]
         verbose_name = "Token Usage"
         verbose_name_plural = "Token Usages"
+        indexes = [
+            models.Index(
+                fields=["created_at"],
+                condition=models.Q(rolled_up=False),
+                name="token_usage_pending_rollup_idx",
+            ),
+        ]
+
 
 class UserTokenSummary(BaseModel):
     user = models.OneToOneField(
@@ -123,6 +134,76 @@ class TeamTokenSummary(BaseModel):
         verbose_name = "Team Token Summary"
         verbose_name_plural = "Team Token Summaries"
 
+class TokenUsageBucket(BaseModel):
+    """
+    Token usage pre-aggregated per hour and per team, user, agent and model, so usage
+    summaries read a bounded number of buckets instead of every TokenUsage record. Buckets
+    are filled by the token usage rollup; records not rolled up yet are read from the raw
+    table.
+    """
+
+    team = models.ForeignKey("teams.Team", on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    agent_id = models.CharField(max_length=128, blank=True, default="")
+    model_provider = models.CharField(max_length=50, blank=True, default="")
+    model_name = models.CharField(max_length=100, blank=True, default="")
+    bucket_start = models.DateTimeField(help_text="Start of the hour covered by the bucket (UTC).")
+    input_tokens = models.BigIntegerField(default=0)
+    output_tokens = models.BigIntegerField(default=0)
+    total_tokens = models.BigIntegerField(default=0)
+    cost = models.FloatField(default=0.0)
+    request_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.bucket_start:%Y-%m-%d %H:00} - {self.model_name} - {self.total_tokens} tokens"
+
+    class Meta:
+        verbose_name = "Token Usage Bucket"
+        verbose_name_plural = "Token Usage Buckets"
+        constraints = [
+            # One bucket per key, with no team or user being a key value like any other
+            models.UniqueConstraint(
+                fields=["team", "user", "agent_id", "model_provider", "model_name", "bucket_start"],
+                name="unique_token_usage_bucket",
+                nulls_distinct=False,
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["bucket_start"], name="token_usage_bucket_start_idx"),
+            models.Index(fields=["team", "bucket_start"], name="token_usage_bucket_team_idx"),
+            models.Index(fields=["user", "bucket_start"], name="token_usage_bucket_user_idx"),
+        ]
+
+
+class RollupWatermark(BaseModel):
+    """
+    Point in time up to which a periodic incremental rollup has processed its source rows,
+    so the next run starts from there. Kept in the database so it survives cache evictions.
+    """
+
+    name = models.CharField(max_length=100, unique=True)
+    rolled_up_until = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} rolled up until {self.rolled_up_until}"
+
+    class Meta:
+        verbose_name = "Rollup Watermark"
+        verbose_name_plural = "Rollup Watermarks"
+
+    @classmethod
+    def get(cls, name):
+        """Return the point in time rollup ``name`` has processed up to, or None."""
+        return cls.objects.filter(name=name).values_list("rolled_up_until", flat=True).first()
+
+    @classmethod
+    def advance(cls, name, rolled_up_until):
+        """Record that rollup ``name`` has processed everything up to ``rolled_up_until``."""
+        cls.objects.update_or_create(name=name, defaults={"rolled_up_until": rolled_up_until})
+
+
 # Making changes so the session table can use a unique agent name
 def generate_agent_id(provider: str, name: str) -> str:
     prefix = provider[0].lower() if provider else "x"
@@ -631,6 +712,12 @@ class KnowledgeBaseType(models.TextChoices):
     OTHER = "other", "Other Knowledge Type"
 
 
+class VectorStorage(models.TextChoices):
+    VECTOR = "vector", "Full precision (vector)"
+    HALFVEC = "halfvec", "Half precision (halfvec)"
+    BINARY_RERANK = "binary_rerank", "Binary-quantized index, full-precision rerank"
+
+
 # class ParserType(models.TextChoices):
 #     PRESENTATION = "presentation", "Presentation/Slides"
 #     LAWS = "laws", "Legal Documents"
@@ -771,6 +858,26 @@ class KnowledgeBase(BaseModel):
         help_text="The chunking strategy to use for documents in this knowledge base."
     )
 
+    recall_target = models.FloatField(
+        default=0.95,
+        validators=[MinValueValidator(0.0), MaxValueValidator(1.0)],
+        help_text="Recall@k vector searches should reach; sets how much of the ANN index each query explores.",
+    )
+
+    vector_storage = models.CharField(
+        max_length=20,
+        choices=VectorStorage.choices,
+        default=VectorStorage.VECTOR,
+        help_text="How the embeddings are stored and indexed (LlamaIndex knowledge bases only).",
+    )
+
+    embedding_dimensions = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Keep only the first N dimensions of each embedding (Matryoshka embedders such as "
+        "text-embedding-3-*). Empty keeps the full embedding.",
+    )
+
     ## Add Subscriptions
     # subscriptions = models.ManyToManyField("djstripe.Subscription", related_name="knowledge_bases", blank=True)
     # team = models.ForeignKey("teams.Team", on_delete=models.CASCADE, null=True, blank=True, related_name="knowledge_bases")
@@ -789,6 +896,17 @@ class KnowledgeBase(BaseModel):
                     "This is to prevent conflicts with already generated embeddings. "
                     "Please create a new Knowledge Base for a different embedding model."
                 )
+            if (original.vector_storage, original.embedding_dimensions) != (
+                self.vector_storage,
+                self.embedding_dimensions,
+            ):
+                raise ValidationError(
+                    "The vector storage of an existing Knowledge Base is changed by copying its embeddings: "
+                    "run `manage.py migrate_vector_storage` instead."
+                )
+        from apps.opie.services.vector_storage import validate_vector_storage
+
+        validate_vector_storage(self)
 
     def save(self, *args, **kwargs):
         creating = not self.pk
@@ -799,12 +917,22 @@ class KnowledgeBase(BaseModel):
             provider_name = self.model_provider.provider if self.model_provider else "x"
             self.knowledgebase_id = generate_knowledgebase_id(provider_name, self.name)
             self.vector_table_name = "kb_" + settings.PGVECTOR_TABLE_PREFIX
+            if self.vector_storage != VectorStorage.VECTOR or self.embedding_dimensions:
+                # Layouts other than the shared table's get a table of their own
+                from apps.opie.services.vector_storage import storage_table_name
+
+                self.vector_table_name = storage_table_name(
+                    self.knowledgebase_id, self.vector_storage, self.embedding_dimensions
+                )
 
         else:
             original = KnowledgeBase.objects.get(pk=self.pk)
             self.unique_code = original.unique_code
             self.knowledgebase_id = original.knowledgebase_id
             self.vector_table_name = original.vector_table_name
+            # Both describe the rows of vector_table_name: see migrate_vector_storage
+            self.vector_storage = original.vector_storage
+            self.embedding_dimensions = original.embedding_dimensions
 
         super().save(*args, **kwargs)
         if creating:
@@ -813,6 +941,13 @@ class KnowledgeBase(BaseModel):
             except Exception as e:
                 print(f"❌ Failed to create vector table: {e}")
 
+    @property
+    def embed_dim(self) -> int:
+        """Dimensions of the stored embeddings."""
+        if self.embedding_dimensions:
+            return self.embedding_dimensions
+        return (self.model_provider.embedder_dimensions if self.model_provider else None) or 1536
+
     def get_embedder(self):
         if not self.model_provider or not self.model_provider.embedder_id:
             raise ValueError("Embedder configuration is missing for this knowledge base.")
@@ -868,6 +1003,48 @@ class KnowledgeBase(BaseModel):
             return False
 
 
+class VectorIndexBuild(BaseModel):
+    """
+    An ANN index build or calibration of a vector table by the vector index manager
+    (apps.opie.services.vector_index_manager): the index chosen for the table size, its
+    build time, and the recall@k measured against exact search for each search value.
+    """
+
+    class Status(models.TextChoices):
+        BUILT = "built", "Built"
+        CALIBRATED = "calibrated", "Calibrated"
+        DROPPED = "dropped", "Dropped (exact search)"
+        FAILED = "failed", "Failed"
+
+    schema_name = models.CharField(max_length=63)
+    table_name = models.CharField(max_length=255)
+    method = models.CharField(max_length=16, help_text="hnsw, ivfflat, or exact when no ANN index is kept.")
+    index_name = models.CharField(max_length=63, blank=True, default="")
+    status = models.CharField(max_length=16, choices=Status.choices)
+    row_count = models.BigIntegerField(help_text="Rows in the table when the index was planned.")
+    lists = models.PositiveIntegerField(null=True, blank=True)
+    m = models.PositiveIntegerField(null=True, blank=True)
+    ef_construction = models.PositiveIntegerField(null=True, blank=True)
+    build_seconds = models.FloatField(null=True, blank=True)
+    search_parameter = models.CharField(
+        max_length=32, blank=True, default="", help_text="ivfflat.probes or hnsw.ef_search."
+    )
+    recall_k = models.PositiveIntegerField(default=10)
+    sample_size = models.PositiveIntegerField(default=0)
+    calibration = models.JSONField(default=dict, blank=True, help_text="recall@k by search parameter value.")
+    error = models.TextField(blank=True, default="")
+
+    def __str__(self):
+        return f"{self.schema_name}.{self.table_name} - {self.method} - {self.get_status_display()}"
+
+    class Meta:
+        verbose_name = "Vector Index Build"
+        verbose_name_plural = "Vector Index Builds"
+        indexes = [
+            models.Index(fields=["table_name", "-created_at"], name="vector_index_build_table_idx"),
+        ]
+
+
 ## Projects
 # Tag model for flexible categorization
 class Tag(BaseModel):
@@ -1458,6 +1635,48 @@ class FileType(models.TextChoices):
     OTHER = "other", "Other"
 
 
+FILE_EXTENSION_TYPES = {
+    ".pdf": FileType.PDF,
+    ".docx": FileType.DOCX,
+    ".txt": FileType.TXT,
+    ".csv": FileType.CSV,
+    ".json": FileType.JSON,
+}
+
+
+def detect_file_type(filename):
+    """Map a filename's extension onto a FileType."""
+    return FILE_EXTENSION_TYPES.get(os.path.splitext(filename)[1].lower(), FileType.OTHER)
+
+
+def build_unique_filename(filename):
+    """
+    Returns (unique_filename, original_filename) for an upload.
+    Spaces become underscores and an 8-char UUID suffix keeps the storage name unique.
+    """
+    original_filename = os.path.basename(filename).replace(" ", "_").replace("__", "_")
+    name, ext = os.path.splitext(original_filename)
+    return f"{name}_{uuid.uuid4().hex[:8]}{ext}", original_filename
+
+
+def build_file_storage_path(storage_bucket, unique_filename, is_global=False, uploaded_by=None):
+    """
+    Full storage path for a File, e.g.
+    gs://bucket/user_files/user_uuid=.../year=YYYY/month=MM/day=DD/name_1a2b3c4d.pdf
+    """
+    storage_url = storage_bucket.get_storage_url()
+    if not storage_url:
+        raise ValidationError(f"Storage bucket '{storage_bucket}' returned invalid URL")
+
+    today = datetime.today()
+    date_path = f"year={today.year}/month={today.month:02d}/day={today.day:02d}"
+
+    if is_global:
+        return f"{storage_url}/global/library/{date_path}/{unique_filename}"
+    user_uuid = getattr(uploaded_by, "uuid", None)
+    return f"{storage_url}/user_files/user_uuid={user_uuid}/{date_path}/{unique_filename}"
+
+
 class Collection(BaseModel):
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     name = models.CharField(max_length=255)
@@ -1663,15 +1882,7 @@ class File(models.Model):
 
         # Handle file type detection
         if self.file:
-            file_extension = os.path.splitext(self.file.name)[1].lower()
-            file_type_map = {
-                ".pdf": FileType.PDF,
-                ".docx": FileType.DOCX,
-                ".txt": FileType.TXT,
-                ".csv": FileType.CSV,
-                ".json": FileType.JSON,
-            }
-            self.file_type = file_type_map.get(file_extension, FileType.OTHER)
+            self.file_type = detect_file_type(self.file.name)
 
         # If no storage bucket is set, use the system default
         if not self.storage_bucket:
@@ -1685,15 +1896,7 @@ class File(models.Model):
             if not self.file:
                 raise ValidationError("No file provided for upload.")
 
-            original_filename = os.path.basename(self.file.name)
-            # Convert spaces to underscores in original filename
-            original_filename = original_filename.replace(" ", "_").replace("__", "_")
-
-            # Keep original filename but ensure uniqueness with UUID
-            name, ext = os.path.splitext(original_filename)
-            # Clean up the name part
-            name = name.replace(" ", "_").replace("__", "_")
-            unique_filename = f"{name}_{uuid.uuid4().hex[:8]}{ext}"
+            unique_filename, original_filename = build_unique_filename(self.file.name)
 
             # Construct the full storage path
             new_path = f"{unique_filename}"
@@ -1709,20 +1912,9 @@ class File(models.Model):
 
                 # Update file paths
                 self.file.name = new_path
-                storage_url = self.storage_bucket.get_storage_url()
-                if not storage_url:
-                    raise ValidationError(f"Storage bucket '{self.storage_bucket}' returned invalid URL")
-
-                # Handle path construction based on file type (global vs user)
-                today = datetime.today()
-                date_path = f"year={today.year}/month={today.month:02d}/day={today.day:02d}"
-
-                if self.is_global:
-                    self.storage_path = f"{storage_url}/global/library/{date_path}/{unique_filename}"
-                else:
-                    user_uuid = getattr(self.uploaded_by, "uuid", None)
-                    self.storage_path = f"{storage_url}/user_files/user_uuid={user_uuid}/{date_path}/{unique_filename}"
-
+                self.storage_path = build_file_storage_path(
+                    self.storage_bucket, unique_filename, is_global=self.is_global, uploaded_by=self.uploaded_by
+                )
                 self.original_path = original_filename
 
                 # Update title to match filename if it was auto-generated
@@ -1740,7 +1932,6 @@ class File(models.Model):
             self.filesize = self.file.size
         else:
             self.filesize = self.file_size  # fallback to file_size field if needed
-        print(self)
         super().save(*args, **kwargs)
 
         # Only run ingestion if auto_ingest is True and we have linked knowledge bases
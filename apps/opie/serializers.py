@@ -765,7 +765,12 @@ class UploadFileSerializer(serializers.Serializer):
         return attrs
 
     def create(self, validated_data):
+        from functools import partial
+
+        from django.db import transaction
+
         from .models import Collection, EphemeralFile, File
+        from .services.attachment_extraction import start_extraction
 
         user = self.context["request"].user
         team = validated_data.get("team", None)
@@ -812,6 +817,8 @@ class UploadFileSerializer(serializers.Serializer):
                     name=file.name,
                     mime_type=file.content_type or "application/octet-stream",
                 )
+                # Parse the file now so the next chat turn does not wait for it
+                transaction.on_commit(partial(start_extraction, ephemeral_file))
                 documents.append(ephemeral_file)
             else:
                 # Use original filename as title
@@ -1,3 +1,5 @@
+from .file_import_service import FileImportItem, FileImportResult, FileImportService
+from .rbac_filter_compiler import RBACFilterCompiler
 from .rbac_service import RBACService
 
-__all__ = ['RBACService']
\ No newline at end of file
+__all__ = ["FileImportItem", "FileImportResult", "FileImportService", "RBACFilterCompiler", "RBACService"]
@@ -0,0 +1,161 @@
+"""
+Text extraction of ephemeral chat attachments.
+
+The text of every attachment of a chat session is prepended to each message sent to the
+agent. Parsing them one after another in the consumer delayed the first streamed token by
+the sum of their extraction times, on every turn. Instead:
+
+- extraction runs in a bounded thread pool (``OPIE_ATTACHMENT_EXTRACTION_WORKERS``), so
+  the attachments of a turn are parsed concurrently,
+- the text is cached by the SHA-256 of the file content, type and name, and that cache
+  key by the EphemeralFile uuid, so the files of later turns and re-sent files are neither
+  read nor parsed again. Failed extractions are not cached,
+- extraction starts as soon as the file is uploaded (``start_extraction``); a chat turn
+  waits on the extraction still pending in this process, if any. Across processes, the
+  extraction of a file is claimed in the cache, and the other processes wait for the
+  claiming one's result.
+"""
+
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.opie.agents.tools.filereader import FileReaderTools
+
+logger = logging.getLogger(__name__)
+
+MAX_CHARS = 20000
+# FileReaderTools returns its failures as text starting with this
+READ_ERROR_PREFIX = "Error reading file"
+CLAIM_POLL_INTERVAL = 0.1
+
+_executor: ThreadPoolExecutor | None = None
+_pending: dict[str, Future] = {}
+_lock = threading.Lock()
+_reader: FileReaderTools | None = None
+
+
+def _text_cache_key(content: bytes, file_type: str | None, file_name: str | None) -> str:
+    # The type and name select the parser, so the same bytes may not give the same text
+    digest = hashlib.sha256(content)
+    digest.update(f"\0{file_type or ''}\0{file_name or ''}".encode())
+    return f"opie:attachment_text:{digest.hexdigest()}"
+
+
+def _file_cache_key(file_uuid: str) -> str:
+    return f"opie:attachment_text_key:{file_uuid}"
+
+
+def _claim_cache_key(file_uuid: str) -> str:
+    return f"opie:attachment_extraction:{file_uuid}"
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.OPIE_ATTACHMENT_EXTRACTION_WORKERS, thread_name_prefix="attachment-extraction"
+            )
+        return _executor
+
+
+def _get_reader() -> FileReaderTools:
+    global _reader
+    with _lock:
+        if _reader is None:
+            _reader = FileReaderTools()
+        return _reader
+
+
+def extract_text(content: bytes, file_type: str | None = None, file_name: str | None = None) -> str:
+    """Return the text of a file, parsed once per distinct content, type and name."""
+    text_key = _text_cache_key(content, file_type, file_name)
+    text = cache.get(text_key)
+    if text is None:
+        text = _get_reader().read_file(content=content, file_type=file_type, file_name=file_name, max_chars=MAX_CHARS)
+        if not text.startswith(READ_ERROR_PREFIX):
+            cache.set(text_key, text, settings.OPIE_ATTACHMENT_TEXT_CACHE_TTL)
+    return text
+
+
+def _cached_text(file_uuid: str) -> str | None:
+    text_key = cache.get(_file_cache_key(file_uuid))
+    return cache.get(text_key) if text_key is not None else None
+
+
+def _wait_for_claimed_text(file_uuid: str) -> str | None:
+    """Wait for the process that claimed the extraction of a file to finish or give up."""
+    deadline = time.monotonic() + settings.OPIE_ATTACHMENT_EXTRACTION_CLAIM_TTL
+    while cache.get(_claim_cache_key(file_uuid)) is not None and time.monotonic() < deadline:
+        time.sleep(CLAIM_POLL_INTERVAL)
+    return _cached_text(file_uuid)
+
+
+def _extract_ephemeral_file(ephemeral_file) -> str:
+    file_uuid = str(ephemeral_file.uuid)
+    text = _cached_text(file_uuid)
+    if text is not None:
+        return text
+
+    claim_key = _claim_cache_key(file_uuid)
+    claimed = cache.add(claim_key, True, settings.OPIE_ATTACHMENT_EXTRACTION_CLAIM_TTL)
+    if not claimed:
+        # Another process is extracting this file; extract it here only if that fails
+        text = _wait_for_claimed_text(file_uuid)
+        if text is not None:
+            return text
+
+    try:
+        try:
+            with ephemeral_file.file.open("rb") as f:
+                content = f.read()
+        except Exception as e:
+            logger.exception(f"Failed to read ephemeral file {file_uuid}")
+            return f"{READ_ERROR_PREFIX}: {e}"
+
+        file_type, file_name = ephemeral_file.mime_type or None, ephemeral_file.name or None
+        text = extract_text(content, file_type=file_type, file_name=file_name)
+        if not text.startswith(READ_ERROR_PREFIX):
+            cache.set(
+                _file_cache_key(file_uuid),
+                _text_cache_key(content, file_type, file_name),
+                settings.OPIE_ATTACHMENT_TEXT_CACHE_TTL,
+            )
+        return text
+    finally:
+        if claimed:
+            cache.delete(claim_key)
+
+
+def start_extraction(ephemeral_file) -> Future:
+    """
+    Submit the extraction of an ephemeral file to the worker pool, or return the extraction
+    of this file already pending in this process.
+    """
+    file_uuid = str(ephemeral_file.uuid)
+    executor = _get_executor()
+    with _lock:
+        future = _pending.get(file_uuid)
+        if future is not None:
+            return future
+        future = _pending[file_uuid] = executor.submit(_extract_ephemeral_file, ephemeral_file)
+    future.add_done_callback(lambda done: _forget(file_uuid, done))
+    return future
+
+
+def _forget(file_uuid: str, future: Future):
+    with _lock:
+        if _pending.get(file_uuid) is future:
+            del _pending[file_uuid]
+
+
+async def extract_texts(ephemeral_files) -> list[str]:
+    """The texts of the ephemeral files, in order, extracted concurrently."""
+    return list(await asyncio.gather(*(asyncio.wrap_future(start_extraction(f)) for f in ephemeral_files)))
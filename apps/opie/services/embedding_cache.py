@@ -0,0 +1,372 @@
+"""
+Cache of query embeddings.
+
+Every agent turn embedded the user query again before searching the knowledge base, with an
+embedding API round trip even for a repeated question or when several sub-agents search
+with the same query. Query embeddings are now cached by (embedder model, hash of the
+normalized query text) in two tiers:
+
+1. a process-local LRU of ``OPIE_QUERY_EMBEDDING_CACHE_SIZE`` embeddings;
+2. the shared Django cache (Redis), for ``OPIE_QUERY_EMBEDDING_CACHE_TTL`` seconds, holding
+   the embeddings packed as float32.
+
+Concurrent requests for the same embedding in a process wait for the first one instead of
+calling the API again. Normalization only collapses whitespace: case and Unicode forms can
+change the embedding, so queries differing by them are embedded separately.
+
+Only query embeddings go through the cache: ``CachedEmbedder`` (agno) and
+``CachedEmbedding`` (LlamaIndex) pass document embeddings straight to the wrapped embedder.
+Hits and misses are counted per process (``get_stats``) and added to shared counters every
+``STATS_FLUSH_SECONDS`` (``shared_stats``, shown by the ``embedding_cache_stats`` command).
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any
+
+from agno.knowledge.embedder.base import Embedder
+from django.conf import settings
+from django.core.cache import cache
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import Field
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_KEY = "opie:query_embedding:{digest}"
+STATS_KEY = "opie:query_embedding:stats:{tier}"
+
+# Tiers a query embedding can be served from
+LOCAL = "local"
+SHARED = "shared"
+COALESCED = "coalesced"
+MISS = "miss"
+TIERS = (LOCAL, SHARED, COALESCED, MISS)
+
+STATS_FLUSH_SECONDS = 30
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def cache_key(model: str, text: str) -> str:
+    digest = hashlib.sha256(f"{model}\0{normalize_query(text)}".encode()).hexdigest()
+    return EMBEDDING_KEY.format(digest=digest)
+
+
+class _LRU:
+    """Thread-safe LRU of embeddings, bounded by their count."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, array] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str) -> array | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: array) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class QueryEmbeddingCache:
+    """Two-tier read-through cache of query embeddings, with in-flight deduplication."""
+
+    def __init__(self, local_max_entries: int, timeout: int):
+        self.local = _LRU(local_max_entries)
+        self.timeout = timeout
+        self._pending: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._unflushed = dict.fromkeys(TIERS, 0)
+        self._flushed_at = time.monotonic()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        with self._stats_lock:
+            self.requests = dict.fromkeys(TIERS, 0)
+
+    @property
+    def hit_ratio(self) -> float:
+        """Share of query embeddings served without calling the embedder"""
+        total = sum(self.requests.values())
+        return (total - self.requests[MISS]) / total if total else 0.0
+
+    def get_stats(self) -> dict[str, Any]:
+        return {"requests": dict(self.requests), "hit_ratio": self.hit_ratio, "local_entries": len(self.local)}
+
+    def _served(self, tier: str, entry: array) -> list[float]:
+        with self._stats_lock:
+            self.requests[tier] += 1
+            self._unflushed[tier] += 1
+            flush = time.monotonic() - self._flushed_at >= STATS_FLUSH_SECONDS
+            if flush:
+                unflushed, self._unflushed = self._unflushed, dict.fromkeys(TIERS, 0)
+                self._flushed_at = time.monotonic()
+        if flush:
+            flush_stats(unflushed)
+        return entry.tolist()
+
+    def _cached(self, key: str) -> tuple[array | None, str | None]:
+        entry = self.local.get(key)
+        if entry is not None:
+            return entry, LOCAL
+        if self.timeout:
+            try:
+                data = cache.get(key)
+            except Exception as e:
+                # The shared tier is an optimization: embed the query when Redis is unavailable
+                logger.warning(f"Query embedding cache read failed: {e}")
+                data = None
+            if data is not None:
+                entry = array("f", data)
+                self.local.put(key, entry)
+                return entry, SHARED
+        return None, None
+
+    def _remember(self, key: str, embedding: list[float]) -> array:
+        entry = array("f", embedding)
+        self.local.put(key, entry)
+        if self.timeout:
+            try:
+                cache.set(key, entry.tobytes(), self.timeout)
+            except Exception as e:
+                logger.warning(f"Query embedding cache write failed: {e}")
+        return entry
+
+    def _claim(self, key: str) -> tuple[Future, bool]:
+        """The future of the embedding of ``key``, and whether this caller computes it."""
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                return future, False
+            future = self._pending[key] = Future()
+            return future, True
+
+    def _settle(self, key: str, future: Future, embedding=None, error: BaseException | None = None) -> None:
+        with self._lock:
+            self._pending.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(embedding)
+
+    def get_or_compute(self, model: str, text: str, compute: Callable[[], list[float]]) -> list[float]:
+        key = cache_key(model, text)
+        entry, tier = self._cached(key)
+        if tier is not None:
+            return self._served(tier, entry)
+
+        future, owner = self._claim(key)
+        if not owner:
+            if not _in_event_loop():
+                return self._served(COALESCED, future.result())
+            # Blocking here could block the coroutine computing it
+            return self._served(MISS, self._remember(key, compute()))
+        try:
+            entry = self._remember(key, compute())
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, entry)
+        return self._served(MISS, entry)
+
+    async def aget_or_compute(
+        self, model: str, text: str, compute: Callable[[], Awaitable[list[float]]]
+    ) -> list[float]:
+        key = cache_key(model, text)
+        entry = self.local.get(key)
+        if entry is not None:
+            return self._served(LOCAL, entry)
+        if self.timeout:
+            try:
+                data = await cache.aget(key)
+            except Exception as e:
+                logger.warning(f"Query embedding cache read failed: {e}")
+                data = None
+            if data is not None:
+                entry = array("f", data)
+                self.local.put(key, entry)
+                return self._served(SHARED, entry)
+
+        future, owner = self._claim(key)
+        if not owner:
+            return self._served(COALESCED, await asyncio.wrap_future(future))
+        try:
+            entry = array("f", await compute())
+            self.local.put(key, entry)
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, entry)
+        if self.timeout:
+            try:
+                await cache.aset(key, entry.tobytes(), self.timeout)
+            except Exception as e:
+                logger.warning(f"Query embedding cache write failed: {e}")
+        return self._served(MISS, entry)
+
+
+def _in_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def flush_stats(counts: dict[str, int]) -> None:
+    """Add per-process request counts to the shared counters."""
+    try:
+        for tier, count in counts.items():
+            if count:
+                key = STATS_KEY.format(tier=tier)
+                # incr fails on a missing key; add doesn't overwrite a concurrent one
+                if not cache.add(key, count, None):
+                    cache.incr(key, count)
+    except Exception as e:
+        logger.warning(f"Failed to record query embedding cache stats: {e}")
+
+
+def shared_stats() -> dict[str, Any]:
+    """Request counts of every process since the last reset, as flushed, and their hit ratio."""
+    values = cache.get_many([STATS_KEY.format(tier=tier) for tier in TIERS])
+    requests = {tier: values.get(STATS_KEY.format(tier=tier), 0) for tier in TIERS}
+    total = sum(requests.values())
+    return {"requests": requests, "hit_ratio": (total - requests[MISS]) / total if total else 0.0}
+
+
+def reset_shared_stats() -> None:
+    cache.delete_many([STATS_KEY.format(tier=tier) for tier in TIERS])
+
+
+_embedding_cache: QueryEmbeddingCache | None = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> QueryEmbeddingCache:
+    """Return the process-wide QueryEmbeddingCache built from settings."""
+    global _embedding_cache  # pylint: disable=global-statement
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                _embedding_cache = QueryEmbeddingCache(
+                    local_max_entries=settings.OPIE_QUERY_EMBEDDING_CACHE_SIZE,
+                    timeout=settings.OPIE_QUERY_EMBEDDING_CACHE_TTL,
+                )
+    return _embedding_cache
+
+
+def reset_embedding_cache() -> None:
+    """Drop the process-wide QueryEmbeddingCache, e.g. after changing settings in tests."""
+    global _embedding_cache  # pylint: disable=global-statement
+    with _embedding_cache_lock:
+        _embedding_cache = None
+
+
+@dataclass
+class CachedEmbedder(Embedder):
+    """agno embedder serving query embeddings (``get_embedding``) of ``embedder`` from the cache."""
+
+    embedder: Embedder | None = None
+
+    def __post_init__(self):
+        self.dimensions = self.embedder.dimensions
+
+    @property
+    def model(self) -> str:
+        return f"{type(self.embedder).__name__}:{getattr(self.embedder, 'id', '')}:{self.embedder.dimensions}"
+
+    def get_embedding(self, text: str) -> list[float]:
+        return get_embedding_cache().get_or_compute(self.model, text, lambda: self.embedder.get_embedding(text))
+
+    async def async_get_embedding(self, text: str) -> list[float]:
+        return await get_embedding_cache().aget_or_compute(
+            self.model, text, lambda: self.embedder.async_get_embedding(text)
+        )
+
+    # Documents: embedded once at ingestion, not worth caching
+    def get_embedding_and_usage(self, text: str) -> tuple[list[float], dict | None]:
+        return self.embedder.get_embedding_and_usage(text)
+
+    async def async_get_embedding_and_usage(self, text: str) -> tuple[list[float], dict | None]:
+        return await self.embedder.async_get_embedding_and_usage(text)
+
+
+class CachedEmbedding(BaseEmbedding):
+    """LlamaIndex embed model serving query embeddings of ``embed_model`` from the cache."""
+
+    embed_model: BaseEmbedding = Field(description="Embed model computing the embeddings")
+
+    def __init__(self, embed_model: BaseEmbedding, **kwargs: Any):
+        super().__init__(
+            embed_model=embed_model,
+            model_name=embed_model.model_name,
+            embed_batch_size=embed_model.embed_batch_size,
+            **kwargs,
+        )
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def model(self) -> str:
+        dimensions = getattr(self.embed_model, "dimensions", None)
+        return f"{self.embed_model.class_name()}:{self.embed_model.model_name}:{dimensions}"
+
+    def _get_query_embedding(self, query: str) -> list[float]:
+        return get_embedding_cache().get_or_compute(
+            self.model, query, lambda: self.embed_model.get_query_embedding(query)
+        )
+
+    async def _aget_query_embedding(self, query: str) -> list[float]:
+        return await get_embedding_cache().aget_or_compute(
+            self.model, query, lambda: self.embed_model.aget_query_embedding(query)
+        )
+
+    def _get_text_embedding(self, text: str) -> list[float]:
+        return self.embed_model.get_text_embedding(text)
+
+    async def _aget_text_embedding(self, text: str) -> list[float]:
+        return await self.embed_model.aget_text_embedding(text)
+
+    def _get_text_embeddings(self, texts: list[str]) -> list[list[float]]:
+        return self.embed_model.get_text_embedding_batch(texts)
+
+
+def cached_embed_model(embed_model: BaseEmbedding | None = None) -> CachedEmbedding:
+    """``embed_model`` (default: the LlamaIndex Settings one) with cached query embeddings."""
+    if embed_model is None:
+        from llama_index.core import Settings
+
+        embed_model = Settings.embed_model
+    return CachedEmbedding(embed_model)
@@ -0,0 +1,321 @@
+"""
+Bulk file import service.
+
+Registers many files at once for integration imports (Google Drive, SharePoint,
+Confluence, ...). Compared with calling ``File.objects.create`` per file it:
+
+- resolves every collection path in one pass (one read per tree level),
+- checks for already-imported files with a single set-based query,
+- uploads blobs to storage concurrently through a bounded thread pool,
+- inserts the rows with ``bulk_create`` and queues ingestion as one batch.
+"""
+
+import logging
+import os
+from collections.abc import Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from apps.opie.models import (
+    Collection,
+    File,
+    FileKnowledgeBaseLink,
+    StorageBucket,
+    build_file_storage_path,
+    build_unique_filename,
+    detect_file_type,
+)
+from apps.opie.tasks import dispatch_ingestion_jobs_from_batch
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FileImportItem:
+    """
+    A single file to import.
+
+    ``content`` is any file-like object readable by ``default_storage.save``.
+    ``collection`` takes precedence over ``collection_path`` (folder names from the root).
+    """
+
+    title: str
+    content: Any
+    collection: Collection | None = None
+    collection_path: tuple[str, ...] = ()
+    description: str | None = None
+    file_type: str | None = None
+    size: int | None = None
+    source: str | None = None
+    external_id: str | None = None
+
+
+@dataclass
+class FileImportResult:
+    created: list[File] = field(default_factory=list)
+    existing: dict[int, File] = field(default_factory=dict)
+    failed: list[tuple[FileImportItem, str]] = field(default_factory=list)
+    collections_created: int = 0
+    ingestion_queued: int = 0
+    files_by_index: dict[int, File] = field(default_factory=dict)
+
+    def file_for(self, item_index: int) -> File | None:
+        """The created or pre-existing File for the item at ``item_index`` in the import batch"""
+        return self.files_by_index.get(item_index)
+
+
+class FileImportService:
+    """Bulk import API for ``apps.opie.models.File``."""
+
+    def __init__(
+        self,
+        uploaded_by,
+        team=None,
+        storage_bucket: StorageBucket | None = None,
+        knowledge_bases: Sequence | None = None,
+        is_global: bool = False,
+        max_workers: int | None = None,
+        batch_size: int = 500,
+    ):
+        self.uploaded_by = uploaded_by
+        self.team = team
+        self.storage_bucket = storage_bucket
+        self.knowledge_bases = list(knowledge_bases or [])
+        self.is_global = is_global
+        self.max_workers = max_workers or getattr(settings, "FILE_IMPORT_MAX_WORKERS", 8)
+        self.batch_size = batch_size
+
+    # ------------------------------------------------------------------
+    # Collections
+    # ------------------------------------------------------------------
+
+    def resolve_collections(
+        self, paths: Iterable[tuple[str, ...]], description_prefix: str = "Imported"
+    ) -> tuple[dict[tuple[str, ...], Collection], int]:
+        """
+        Resolve (and create where missing) every collection path, level by level.
+        Issues one read per tree depth; only the missing collections are then created one by one,
+        with ``get_or_create`` so a concurrent import creating the same folder is reused.
+        """
+        wanted = set()
+        for path in paths:
+            for depth in range(1, len(path) + 1):
+                wanted.add(tuple(path[:depth]))
+
+        resolved: dict[tuple[str, ...], Collection] = {}
+        created_count = 0
+        max_depth = max((len(path) for path in wanted), default=0)
+
+        for depth in range(1, max_depth + 1):
+            level = [path for path in wanted if len(path) == depth]
+            parents = {path: resolved.get(path[:-1]) if depth > 1 else None for path in level}
+            parent_ids = {parent.id for parent in parents.values() if parent}
+
+            candidates = Collection.objects.filter(name__in={path[-1] for path in level})
+            if depth == 1:
+                candidates = candidates.filter(parent__isnull=True)
+            else:
+                candidates = candidates.filter(parent_id__in=parent_ids)
+            existing = {(c.parent_id, c.name): c for c in candidates}
+
+            for path in level:
+                parent = parents[path]
+                key = (parent.id if parent else None, path[-1])
+                if key in existing:
+                    resolved[path] = existing[key]
+                    continue
+                resolved[path], created = Collection.objects.get_or_create(
+                    name=path[-1],
+                    parent=parent,
+                    defaults={"description": f"{description_prefix}: {path[-1]}", "collection_type": "folder"},
+                )
+                created_count += created
+
+        return resolved, created_count
+
+    # ------------------------------------------------------------------
+    # Uploads
+    # ------------------------------------------------------------------
+
+    def _upload(self, item: FileImportItem) -> tuple[str, str, str, int]:
+        """Upload one blob; returns (storage name, storage path, original filename, size)"""
+        unique_filename, original_filename = build_unique_filename(item.title)
+        saved_name = default_storage.save(unique_filename, item.content)
+        # The storage may rename the blob (e.g. on a name clash)
+        storage_path = build_file_storage_path(
+            self.storage_bucket, os.path.basename(saved_name), is_global=self.is_global, uploaded_by=self.uploaded_by
+        )
+        size = item.size
+        if size is None:
+            size = getattr(item.content, "size", None) or 0
+        return saved_name, storage_path, original_filename, size
+
+    def _upload_all(self, items: list[FileImportItem]) -> list[tuple[str, str, str, int] | None]:
+        def upload(item):
+            try:
+                return self._upload(item)
+            except Exception as e:
+                logger.error(f"❌ Failed to upload {item.title}: {e}")
+                return e
+
+        if self.max_workers <= 1 or len(items) <= 1:
+            return [upload(item) for item in items]
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="file-import") as executor:
+            return list(executor.map(upload, items))
+
+    # ------------------------------------------------------------------
+    # Import
+    # ------------------------------------------------------------------
+
+    def import_files(self, items: Sequence[FileImportItem], skip_existing: bool = True) -> FileImportResult:
+        """
+        Import ``items`` and return the created rows. Items whose title already exists
+        in the target collection for this user are returned in ``existing`` (keyed by
+        their index in ``items``) instead of being uploaded again.
+        """
+        result = FileImportResult()
+        by_index = result.files_by_index
+        if not items:
+            return result
+
+        if not self.storage_bucket:
+            self.storage_bucket = StorageBucket.get_system_bucket()
+
+        paths = {item.collection_path for item in items if item.collection is None and item.collection_path}
+        collections, result.collections_created = self.resolve_collections(paths)
+
+        def target_collection(item):
+            if item.collection is not None:
+                return item.collection
+            return collections.get(tuple(item.collection_path)) if item.collection_path else None
+
+        targets = [target_collection(item) for item in items]
+
+        pending: list[int] = list(range(len(items)))
+        if skip_existing:
+            existing = {
+                (f.collection_id, f.title): f
+                for f in File.objects.filter(
+                    uploaded_by=self.uploaded_by, title__in={item.title for item in items}
+                ).only("id", "uuid", "title", "collection_id", "storage_path")
+            }
+            pending = []
+            for index, item in enumerate(items):
+                match = existing.get((getattr(targets[index], "id", None), item.title))
+                if match:
+                    result.existing[index] = match
+                    by_index[index] = match
+                else:
+                    pending.append(index)
+
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start : start + self.batch_size]
+            uploads = self._upload_all([items[index] for index in batch])
+
+            rows = []
+            row_indexes = []
+            for index, upload in zip(batch, uploads, strict=True):
+                item = items[index]
+                if isinstance(upload, Exception) or upload is None:
+                    result.failed.append((item, str(upload)))
+                    continue
+                saved_name, storage_path, original_filename, size = upload
+                rows.append(
+                    File(
+                        title=item.title,
+                        description=item.description,
+                        file=saved_name,
+                        file_type=item.file_type or detect_file_type(item.title),
+                        storage_bucket=self.storage_bucket,
+                        storage_path=storage_path,
+                        original_path=original_filename,
+                        uploaded_by=self.uploaded_by,
+                        team=self.team,
+                        collection=targets[index],
+                        collection_order=0,
+                        source=item.source,
+                        is_global=self.is_global,
+                        auto_ingest=bool(self.knowledge_bases),
+                        filesize=size,
+                        file_size=size,
+                    )
+                )
+                row_indexes.append(index)
+
+            with transaction.atomic():
+                created = File.objects.bulk_create(rows)
+                links = self._create_links(created)
+
+            for index, file_obj in zip(row_indexes, created, strict=True):
+                by_index[index] = file_obj
+            result.created.extend(created)
+            result.ingestion_queued += self._queue_ingestion(links)
+
+        logger.info(
+            f"📥 Bulk import finished: {len(result.created)} created, {len(result.existing)} existing, "
+            f"{len(result.failed)} failed, {result.collections_created} collections created"
+        )
+        return result
+
+    # ------------------------------------------------------------------
+    # Ingestion
+    # ------------------------------------------------------------------
+
+    def _create_links(self, files: list[File]) -> list[FileKnowledgeBaseLink]:
+        if not self.knowledge_bases or not files:
+            return []
+        links = []
+        for kb in self.knowledge_bases:
+            strategy_config = kb.chunking_strategy.strategy_config if kb.chunking_strategy else {}
+            for file_obj in files:
+                links.append(
+                    FileKnowledgeBaseLink(
+                        file=file_obj,
+                        knowledge_base=kb,
+                        ingestion_status="pending",
+                        embedding_model=kb.model_provider.embedder_id if kb.model_provider else None,
+                        chunk_size=strategy_config.get("chunk_size", 0),
+                        chunk_overlap=strategy_config.get("chunk_overlap", 0),
+                    )
+                )
+        return FileKnowledgeBaseLink.objects.bulk_create(links)
+
+    def _queue_ingestion(self, links: list[FileKnowledgeBaseLink]) -> int:
+        """Queue every new link for ingestion with a single Celery dispatch"""
+        if not links:
+            return 0
+
+        file_info_list = []
+        for link in links:
+            kb = link.knowledge_base
+            file_info_list.append(
+                {
+                    "gcs_path": link.file.storage_path,
+                    "vector_table_name": kb.vector_table_name,
+                    "file_uuid": str(link.file.uuid),
+                    "link_id": link.id,
+                    "embedding_provider": getattr(kb.model_provider, "provider", None),
+                    "embedding_model": getattr(kb.model_provider, "embedder_id", None),
+                    "chunk_size": link.chunk_size,
+                    "chunk_overlap": link.chunk_overlap,
+                    "original_filename": link.file.title,
+                    "user_uuid": str(self.uploaded_by.uuid) if self.uploaded_by else None,
+                    "team_id": self.team.id if self.team else None,
+                    "knowledgebase_id": kb.knowledgebase_id,
+                }
+            )
+
+        try:
+            dispatch_ingestion_jobs_from_batch.delay(file_info_list)
+        except Exception as e:
+            logger.error(f"❌ Failed to dispatch Celery task for batch ingestion: {e}")
+            FileKnowledgeBaseLink.objects.filter(id__in=[link.id for link in links]).update(
+                ingestion_status="failed", ingestion_error=f"Celery dispatch error: {str(e)[:255]}"
+            )
+            return 0
+        return len(file_info_list)
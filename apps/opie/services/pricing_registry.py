@@ -0,0 +1,140 @@
+"""
+In-process registry of model pricing and agent model metadata.
+
+Recording token usage at the end of every agent response needs the agent's name and its
+model's provider, name and prices. The registry keeps the ModelProvider rows and the
+agents seen so far in memory, so these lookups don't read the database on every response.
+Entries expire after ``OPIE_PRICING_REGISTRY_TTL`` seconds. When the rows are saved or
+deleted (see ``apps.opie.signals``) they are dropped right away in this process, and a
+generation counter in the shared cache is bumped once the write commits, so the other
+processes reload them on their next lookup.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+MODELS_GENERATION_KEY = "opie:pricing:models:generation"
+AGENT_GENERATION_KEY = "opie:pricing:agent:{agent_id}:generation"
+
+
+@dataclass(frozen=True)
+class ModelPricing:
+    provider: str
+    model_name: str
+    input_cost_per_1M: float
+    output_cost_per_1M: float
+
+
+@dataclass(frozen=True)
+class AgentModel:
+    agent_id: str
+    name: str
+    model_id: int | None
+
+
+def compute_cost(pricing: ModelPricing | None, input_tokens: int, output_tokens: int) -> float:
+    """Cost of a response given the model pricing, 0 when the model is unknown."""
+    if pricing is None:
+        return 0.0
+    input_cost = pricing.input_cost_per_1M * input_tokens / 1000000
+    output_cost = pricing.output_cost_per_1M * output_tokens / 1000000
+    return input_cost + output_cost
+
+
+def _bump_generation(key: str):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+class PricingRegistry:
+    """Thread-safe TTL map of model pricing by ModelProvider id and agent metadata by agent_id."""
+
+    def __init__(self, ttl: int | None = None):
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._models: dict[int, ModelPricing] | None = None
+        self._models_expire_at = 0.0
+        self._models_generation = 0
+        self._agents: dict[str, tuple[AgentModel, float, int]] = {}
+
+    @property
+    def ttl(self) -> int:
+        return self._ttl if self._ttl is not None else settings.OPIE_PRICING_REGISTRY_TTL
+
+    def _load_models(self) -> dict[int, ModelPricing]:
+        from apps.opie.models import ModelProvider
+
+        return {
+            row["id"]: ModelPricing(
+                provider=row["provider"],
+                model_name=row["model_name"],
+                input_cost_per_1M=row["input_cost_per_1M"],
+                output_cost_per_1M=row["output_cost_per_1M"],
+            )
+            for row in ModelProvider.objects.values(
+                "id", "provider", "model_name", "input_cost_per_1M", "output_cost_per_1M"
+            )
+        }
+
+    def get_pricing(self, model_id: int | None) -> ModelPricing | None:
+        """Return the pricing of a ModelProvider, None if it does not exist."""
+        if model_id is None:
+            return None
+        generation = cache.get(MODELS_GENERATION_KEY, 0)
+        with self._lock:
+            if (
+                self._models is None
+                or time.monotonic() >= self._models_expire_at
+                or self._models_generation != generation
+            ):
+                self._models = self._load_models()
+                self._models_expire_at = time.monotonic() + self.ttl
+                self._models_generation = generation
+            return self._models.get(model_id)
+
+    def get_agent(self, agent_id: str) -> AgentModel:
+        """Return the agent metadata. Raise Agent.DoesNotExist for an unknown agent."""
+        from apps.opie.models import Agent
+
+        generation = cache.get(AGENT_GENERATION_KEY.format(agent_id=agent_id), 0)
+        with self._lock:
+            entry = self._agents.get(agent_id)
+            if entry is not None and time.monotonic() < entry[1] and entry[2] == generation:
+                return entry[0]
+
+        row = Agent.objects.values("agent_id", "name", "model_id").get(agent_id=agent_id)
+        agent = AgentModel(agent_id=row["agent_id"], name=row["name"], model_id=row["model_id"])
+        with self._lock:
+            self._agents[agent_id] = (agent, time.monotonic() + self.ttl, generation)
+        return agent
+
+    def invalidate_models(self):
+        """Drop the model pricing here, and in the other processes once the write commits."""
+        with self._lock:
+            self._models = None
+        transaction.on_commit(lambda: _bump_generation(MODELS_GENERATION_KEY))
+
+    def invalidate_agent(self, agent_id: str):
+        """Drop an agent's metadata here, and in the other processes once the write commits."""
+        with self._lock:
+            self._agents.pop(agent_id, None)
+        key = AGENT_GENERATION_KEY.format(agent_id=agent_id)
+        transaction.on_commit(lambda: _bump_generation(key))
+
+    def clear(self):
+        with self._lock:
+            self._models = None
+            self._agents.clear()
+
+
+pricing_registry = PricingRegistry()
@@ -0,0 +1,156 @@
+"""
+RBAC filter compiler for the vector tables.
+
+``RBACService.get_user_accessible_filters`` returns a Mongo-style dict
+(``{"$or": [{"user_uuid": ...}, {"team_id": {"$in": [...]}}, ...]}``). This module turns it
+into a single predicate over the ``metadata_`` column so access control is enforced inside
+the similarity query itself:
+
+    metadata_->>'user_uuid' = ANY(%s) OR metadata_->>'team_id' = ANY(%s) OR ...
+
+Each key is compared with one array parameter, so the statement shape only depends on which
+keys are present and the planner can use the per-key expression indexes created by
+``ensure_rbac_metadata_indexes`` (BitmapOr across the branches). Nothing is over-fetched and
+re-filtered in Python after top-k.
+"""
+
+import logging
+import re
+from collections.abc import Iterable
+from typing import Any
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# Metadata keys written by the ingestion service and used for access control
+RBAC_METADATA_KEYS = ("user_uuid", "team_id", "knowledgebase_id", "project_id")
+
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z0-9_]+$")
+
+# A branch is an AND of key -> allowed values; the compiled filter is an OR of branches
+Branch = dict[str, list[str]]
+
+
+class RBACFilterCompiler:
+    @staticmethod
+    def normalize(filters: dict[str, Any]) -> list[Branch]:
+        """
+        Flatten RBAC filters into OR-ed branches of ``{key: [values]}``.
+        Single-key branches on the same key are merged into one array.
+
+        An empty result means "no access".
+        """
+        if not filters:
+            return []
+
+        conditions = filters.get("$or", [filters])
+        merged: dict[str, list[str]] = {}
+        branches: list[Branch] = []
+
+        for condition in conditions:
+            branch: Branch = {}
+            for key, value in condition.items():
+                if key.startswith("$"):
+                    raise ValueError(f"Unsupported RBAC filter operator: {key}")
+                if isinstance(value, dict):
+                    if set(value) != {"$in"}:
+                        raise ValueError(f"Unsupported RBAC filter for {key}: {value}")
+                    values = [str(v) for v in value["$in"]]
+                else:
+                    values = [str(value)]
+                branch[key] = values
+
+            if not branch or any(not values for values in branch.values()):
+                # An empty $in can never match
+                continue
+            if len(branch) == 1:
+                key, values = next(iter(branch.items()))
+                existing = merged.setdefault(key, [])
+                existing.extend(v for v in values if v not in existing)
+            else:
+                branches.append(branch)
+
+        return [{key: values} for key, values in merged.items()] + branches
+
+    @staticmethod
+    def _column_expression(key: str, column: str) -> str:
+        # Keys are inlined (not bound) so the expression matches the index definition exactly
+        if not _IDENTIFIER_RE.match(key) or not _IDENTIFIER_RE.match(column):
+            raise ValueError(f"Invalid metadata key: {key}")
+        return f"{column}->>'{key}'"
+
+    @staticmethod
+    def compile_sql(filters: dict[str, Any], column: str = "metadata_") -> tuple[str, list[list[str]]]:
+        """
+        Compile RBAC filters to ``(sql, params)`` using DB-API ``%s`` placeholders.
+        Each param is a list, adapted by psycopg to a Postgres array.
+        """
+        branches = RBACFilterCompiler.normalize(filters)
+        if not branches:
+            return "FALSE", []
+
+        clauses = []
+        params: list[list[str]] = []
+        for branch in branches:
+            parts = []
+            for key, values in branch.items():
+                parts.append(f"{RBACFilterCompiler._column_expression(key, column)} = ANY(%s)")
+                params.append(values)
+            clauses.append(parts[0] if len(parts) == 1 else "(" + " AND ".join(parts) + ")")
+
+        return "(" + " OR ".join(clauses) + ")", params
+
+    @staticmethod
+    def compile_sqlalchemy(filters: dict[str, Any], column: str = "metadata_"):
+        """Same predicate as ``compile_sql``, as a SQLAlchemy clause with bound array params"""
+        import sqlalchemy
+        from sqlalchemy.dialects.postgresql import ARRAY
+
+        branches = RBACFilterCompiler.normalize(filters)
+        if not branches:
+            return sqlalchemy.false()
+
+        clauses = []
+        for branch in branches:
+            parts = [
+                sqlalchemy.literal_column(RBACFilterCompiler._column_expression(key, column), sqlalchemy.String)
+                == sqlalchemy.any_(sqlalchemy.bindparam("rbac", values, type_=ARRAY(sqlalchemy.String), unique=True))
+                for key, values in branch.items()
+            ]
+            clauses.append(parts[0] if len(parts) == 1 else sqlalchemy.and_(*parts))
+
+        return sqlalchemy.or_(*clauses)
+
+    @staticmethod
+    def matches(filters: dict[str, Any], metadata: dict[str, Any]) -> bool:
+        """Evaluate the compiled semantics against a node's metadata (for stores without SQL push-down)"""
+        if not metadata:
+            return False
+        for branch in RBACFilterCompiler.normalize(filters):
+            if all(key in metadata and str(metadata[key]) in values for key, values in branch.items()):
+                return True
+        return False
+
+
+def ensure_rbac_metadata_indexes(
+    table_name: str, schema: str = "public", keys: Iterable[str] = RBAC_METADATA_KEYS
+) -> list[str]:
+    """
+    Create one btree expression index per RBAC key on a vector table, e.g.
+
+        CREATE INDEX IF NOT EXISTS <table>_rbac_team_id_idx ON <schema>.<table> ((metadata_->>'team_id'))
+
+    ``= ANY(array)`` on these expressions is index-assisted, and the OR across keys becomes a
+    BitmapOr. Returns the statements executed.
+    """
+    statements = []
+    with connection.cursor() as cursor:
+        for key in keys:
+            expression = RBACFilterCompiler._column_expression(key, "metadata_")
+            index_name = f"{table_name}_rbac_{key}_idx"[:63]
+            sql = f'CREATE INDEX IF NOT EXISTS "{index_name}" ON "{schema}"."{table_name}" (({expression}))'
+            cursor.execute(sql)
+            statements.append(sql)
+    logger.info(f"Ensured {len(statements)} RBAC metadata indexes on {schema}.{table_name}")
+    return statements
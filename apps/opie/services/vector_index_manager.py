@@ -0,0 +1,462 @@
+"""
+ANN index management for the knowledge base vector tables.
+
+Tables used to get an ivfflat index with ``lists = 100`` when they were created, usually
+empty, and nothing rebuilt it as they grew. The manager sizes the index on the current row
+count instead:
+
+- below ``OPIE_VECTOR_INDEX_MIN_ROWS`` rows (or above the dimensions pgvector indexes for the
+  storage layout, see vector_storage), no ANN index is needed: an exact scan is fast and has
+  perfect recall. The HNSW index the ingestion service builds on new tables is kept;
+- up to ``OPIE_VECTOR_INDEX_HNSW_MAX_ROWS`` rows, HNSW;
+- above, ivfflat with ``lists ≈ sqrt(rows)``, cheaper to build and to keep in memory.
+
+Indexes are built ``CONCURRENTLY`` under a temporary name and swapped in, so writes keep
+flowing. After a build, recall@k is measured against exact search on a sample of the rows
+for increasing ``ivfflat.probes`` / ``hnsw.ef_search`` values, and recorded with the build
+time in ``VectorIndexBuild``. Queries then use the smallest value meeting the recall target
+of their knowledge base (see ``search_settings_for_knowledge_base``). Tables of binary-rerank
+knowledge bases are indexed on the binary quantization of their vectors, and calibrated on
+the reranked candidates their queries use.
+"""
+
+import logging
+import math
+import re
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+
+from apps.opie.services.vector_storage import StorageLayout, get_layout
+
+logger = logging.getLogger(__name__)
+
+EXACT = "exact"
+HNSW = "hnsw"
+IVFFLAT = "ivfflat"
+
+# pgvector can't index vector columns of more dimensions than this (halfvec: see vector_storage)
+MAX_INDEX_DIMENSIONS = 2000
+
+SEARCH_PARAMETERS = {HNSW: "hnsw.ef_search", IVFFLAT: "ivfflat.probes"}
+
+# Recall at which calibration stops trying larger search values
+RECALL_CEILING = 0.995
+
+# Key of the advisory lock held while indexes are managed (the command and the periodic task)
+ADVISORY_LOCK_ID = 0x0F1E_1DE7
+
+_VECTOR_TYPE_RE = re.compile(r"^(vector|halfvec)\((\d+)\)$")
+
+
+@dataclass(frozen=True)
+class AnnIndex:
+    name: str
+    method: str
+    options: dict[str, int]
+    valid: bool = True
+    # Built on binary_quantize(embedding) rather than the embedding
+    binary: bool = False
+
+
+@dataclass
+class VectorTable:
+    schema: str
+    name: str
+    dimensions: int | None
+    rows: int
+    indexes: list[AnnIndex] = field(default_factory=list)
+    storage: str = "vector"
+
+    @property
+    def layout(self) -> StorageLayout:
+        return get_layout(self.storage)
+
+    @property
+    def candidates(self) -> int:
+        """Rows reranked per result by queries of the table (1 unless binary-quantized)."""
+        return settings.OPIE_VECTOR_BINARY_RERANK_FACTOR if self.layout.binary else 1
+
+    @property
+    def qualified_name(self) -> str:
+        return f'"{self.schema}"."{self.name}"'
+
+    @property
+    def index_name(self) -> str:
+        return f"{self.name}_embedding_ann_idx"[:63]
+
+
+@dataclass(frozen=True)
+class IndexPlan:
+    method: str
+    reason: str
+    lists: int | None = None
+    m: int | None = None
+    ef_construction: int | None = None
+
+    @property
+    def search_parameter(self) -> str | None:
+        return SEARCH_PARAMETERS.get(self.method)
+
+    def search_values(self, k: int) -> list[int]:
+        """Search values tried by the recall calibration, increasing."""
+        if self.method == IVFFLAT:
+            values = [1]
+            while values[-1] * 2 < self.lists:
+                values.append(values[-1] * 2)
+            return values + [self.lists]
+        if self.method == HNSW:
+            return sorted({max(k, value) for value in (10, 20, 40, 80, 160, 320, 640, 1000)})
+        return []
+
+
+def plan_index(rows: int, dimensions: int | None, max_dimensions: int = MAX_INDEX_DIMENSIONS) -> IndexPlan:
+    """The ANN index a table of ``rows`` vectors of ``dimensions`` should have."""
+    if not dimensions or dimensions > max_dimensions:
+        return IndexPlan(EXACT, f"{dimensions or 'unknown'} dimensions can't be indexed")
+    if rows < settings.OPIE_VECTOR_INDEX_MIN_ROWS:
+        return IndexPlan(EXACT, f"{rows} rows, under {settings.OPIE_VECTOR_INDEX_MIN_ROWS}")
+    if rows <= settings.OPIE_VECTOR_INDEX_HNSW_MAX_ROWS:
+        return IndexPlan(HNSW, f"{rows} rows", m=16, ef_construction=64)
+    return IndexPlan(
+        IVFFLAT, f"{rows} rows, over {settings.OPIE_VECTOR_INDEX_HNSW_MAX_ROWS}", lists=round(math.sqrt(rows))
+    )
+
+
+def rebuild_reason(table: VectorTable, plan: IndexPlan) -> str | None:
+    """Why the ANN indexes of ``table`` don't match ``plan``, None when they do."""
+    if plan.method == EXACT:
+        if len(table.indexes) == 1 and table.indexes[0].valid and table.indexes[0].method == HNSW:
+            # Built by the ingestion service on the new table, kept current by the inserts
+            return None
+        return f"drop {len(table.indexes)} ANN indexes" if table.indexes else None
+    current = [index for index in table.indexes if index.valid]
+    if len(current) != 1 or len(table.indexes) != 1:
+        return f"{len(current)} valid ANN indexes of {len(table.indexes)}"
+    index = current[0]
+    if index.method != plan.method:
+        return f"{index.method} index, {plan.method} planned"
+    if index.binary != table.layout.binary:
+        return "binary quantization index, full vectors planned" if index.binary else "binary quantization planned"
+    if plan.method == IVFFLAT:
+        # Centroids are only computed at build time: rebuild once the table outgrew them
+        lists = index.options.get("lists", 0)
+        if not plan.lists / 2 <= lists <= plan.lists * 2:
+            return f"ivfflat lists = {lists}, {plan.lists} planned"
+    return None
+
+
+def index_sql(table: VectorTable, plan: IndexPlan, index_name: str) -> str:
+    if plan.method == HNSW:
+        method, options = "hnsw", f"m = {plan.m}, ef_construction = {plan.ef_construction}"
+    elif plan.method == IVFFLAT:
+        method, options = "ivfflat", f"lists = {plan.lists}"
+    else:
+        raise ValueError(f"No index for the {plan.method} plan")
+    return (
+        f'CREATE INDEX CONCURRENTLY "{index_name}" ON {table.qualified_name} '
+        f"USING {method} ({table.layout.index_expression(table.dimensions)} {table.layout.opclass}) "
+        f"WITH ({options})"
+    )
+
+
+def pick_search_value(calibration: dict[str, float], recall_target: float) -> int | None:
+    """The smallest calibrated search value reaching ``recall_target``, else the largest one."""
+    if not calibration:
+        return None
+    values = sorted(calibration.items(), key=lambda item: int(item[0]))
+    for value, recall in values:
+        if recall >= recall_target:
+            return int(value)
+    return int(values[-1][0])
+
+
+def _calibration_cache_key(table_name: str) -> str:
+    return f"opie:vector_index_calibration:{table_name.removeprefix('data_').lower()}"
+
+
+def invalidate_search_settings(table_name: str):
+    """Drop the cached calibration of ``table_name`` once the transaction recording a build commits."""
+    transaction.on_commit(lambda: cache.delete(_calibration_cache_key(table_name)))
+
+
+def search_settings(table_name: str, recall_target: float) -> dict[str, int]:
+    """
+    Postgres settings for an ANN query on ``table_name`` at ``recall_target``, from the last
+    calibration. The calibration is cached (``OPIE_VECTOR_INDEX_CALIBRATION_CACHE_TTL``) and
+    dropped when the manager records a new build.
+    """
+    from apps.opie.models import VectorIndexBuild
+
+    key = _calibration_cache_key(table_name)
+    calibrated = cache.get(key)
+    if calibrated is None:
+        build = (
+            VectorIndexBuild.objects.filter(table_name__in=[table_name, f"data_{table_name}"])
+            .exclude(status=VectorIndexBuild.Status.FAILED)
+            .order_by("-created_at")
+            .first()
+        )
+        # Tables never calibrated are cached too
+        calibrated = (build.search_parameter, build.calibration) if build else ("", {})
+        cache.set(key, calibrated, settings.OPIE_VECTOR_INDEX_CALIBRATION_CACHE_TTL)
+    search_parameter, calibration = calibrated
+    if not search_parameter:
+        return {}
+    value = pick_search_value(calibration, recall_target)
+    return {search_parameter: value} if value else {}
+
+
+def search_settings_for_knowledge_base(knowledge_base) -> dict[str, int]:
+    return search_settings(knowledge_base.vector_table_name, knowledge_base.recall_target)
+
+
+def find_vector_tables(table_names: list[str] | None = None) -> list[VectorTable]:
+    """The knowledge base vector tables with an ``embedding`` column, their size and ANN indexes."""
+    from apps.opie.models import KnowledgeBase, VectorStorage
+
+    if table_names is None:
+        table_names = [name for name in KnowledgeBase.objects.values_list("vector_table_name", flat=True) if name]
+    # LlamaIndex prefixes its tables with "data_"; agno and the ingestion service use the name as-is
+    candidates = {variant for name in table_names for variant in (name, name.lower(), f"data_{name}".lower())}
+    binary = {
+        variant
+        for name in KnowledgeBase.objects.filter(vector_storage=VectorStorage.BINARY_RERANK).values_list(
+            "vector_table_name", flat=True
+        )
+        for variant in (name.lower(), f"data_{name}".lower())
+    }
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT n.nspname, c.relname, format_type(a.atttypid, a.atttypmod), c.reltuples::bigint
+            FROM pg_attribute a
+            JOIN pg_class c ON c.oid = a.attrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE a.attname = 'embedding' AND c.relkind = 'r' AND NOT a.attisdropped AND c.relname = ANY(%s)
+            ORDER BY 1, 2
+            """,
+            [sorted(candidates)],
+        )
+        rows = cursor.fetchall()
+
+        tables = []
+        for schema, name, column_type, estimate in rows:
+            match = _VECTOR_TYPE_RE.match(column_type)
+            table = VectorTable(schema, name, int(match.group(2)) if match else None, estimate)
+            if match and match.group(1) == "halfvec":
+                table.storage = VectorStorage.HALFVEC
+            elif name in binary:
+                table.storage = VectorStorage.BINARY_RERANK
+            if estimate < 0:
+                # Never analyzed: count the rows once
+                cursor.execute(f"SELECT count(*) FROM {table.qualified_name}")
+                table.rows = cursor.fetchone()[0]
+            table.indexes = _ann_indexes(cursor, schema, name)
+            tables.append(table)
+    return tables
+
+
+def _ann_indexes(cursor, schema: str, table_name: str) -> list[AnnIndex]:
+    cursor.execute(
+        """
+        SELECT i.relname, am.amname, coalesce(i.reloptions, '{}'), ix.indisvalid,
+            pg_get_indexdef(i.oid) LIKE '%%binary_quantize%%'
+        FROM pg_index ix
+        JOIN pg_class i ON i.oid = ix.indexrelid
+        JOIN pg_class t ON t.oid = ix.indrelid
+        JOIN pg_namespace n ON n.oid = t.relnamespace
+        JOIN pg_am am ON am.oid = i.relam
+        WHERE n.nspname = %s AND t.relname = %s AND am.amname IN ('hnsw', 'ivfflat')
+        ORDER BY 1
+        """,
+        [schema, table_name],
+    )
+    indexes = []
+    for name, method, reloptions, valid, binary in cursor.fetchall():
+        options = {}
+        for option in reloptions:
+            key, _, value = option.partition("=")
+            if value.isdigit():
+                options[key] = int(value)
+        indexes.append(AnnIndex(name, method, options, valid, binary))
+    return indexes
+
+
+def build_index(table: VectorTable, plan: IndexPlan) -> float:
+    """
+    Build the planned index ``CONCURRENTLY`` under a temporary name, then drop the previous
+    ANN indexes and rename it. Returns the build time in seconds.
+    """
+    temporary_name = f"{table.name}_embedding_ann_new"[:63]
+    with connection.cursor() as cursor:
+        # A failed concurrent build leaves an invalid index behind
+        cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{table.schema}"."{temporary_name}"')
+        started = time.perf_counter()
+        if plan.method != EXACT:
+            cursor.execute(index_sql(table, plan, temporary_name))
+        elapsed = time.perf_counter() - started
+
+        for index in table.indexes:
+            if index.name != temporary_name:
+                cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{table.schema}"."{index.name}"')
+        if plan.method != EXACT:
+            cursor.execute(f'ALTER INDEX "{table.schema}"."{temporary_name}" RENAME TO "{table.index_name}"')
+    return elapsed
+
+
+def _sample_embeddings(cursor, table: VectorTable, sample_size: int) -> list[str]:
+    percent = min(100.0, 100.0 * sample_size * 4 / max(table.rows, 1))
+    cursor.execute(
+        f"SELECT embedding::text FROM {table.qualified_name} TABLESAMPLE BERNOULLI (%s) "
+        "WHERE embedding IS NOT NULL LIMIT %s",
+        [percent, sample_size],
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def nearest_sql(table: VectorTable, exact: bool = False) -> str:
+    """
+    Query of the ``%(k)s`` rows nearest to ``%(embedding)s``, as the knowledge base queries run
+    it: binary-quantized tables rerank ``%(candidates)s`` rows found by Hamming distance.
+    """
+    column_type = table.layout.column_type
+    nearest = f"ORDER BY embedding <=> %(embedding)s::{column_type} LIMIT %(k)s"
+    if exact or not table.layout.binary:
+        return f"SELECT id::text FROM {table.qualified_name} {nearest}"
+    bits = f"bit({int(table.dimensions)})"
+    return (
+        f"SELECT id::text FROM (SELECT id, embedding FROM {table.qualified_name} "
+        f"ORDER BY {table.layout.index_expression(table.dimensions)} <~> "
+        f"binary_quantize(%(embedding)s::vector)::{bits} LIMIT %(candidates)s) candidates {nearest}"
+    )
+
+
+def _nearest_ids(
+    cursor, table: VectorTable, embedding: str, k: int, settings_sql: list[str], exact: bool = False
+) -> set:
+    with transaction.atomic():
+        for statement in settings_sql:
+            cursor.execute(statement)
+        cursor.execute(nearest_sql(table, exact), {"embedding": embedding, "k": k, "candidates": k * table.candidates})
+        return {row[0] for row in cursor.fetchall()}
+
+
+def measure_recall(table: VectorTable, plan: IndexPlan, k: int, sample_size: int) -> dict[str, float]:
+    """
+    recall@k of the ANN index for each search value of ``plan``, against exact search, with
+    rows sampled from the table as queries. Stops at the first value reaching ``RECALL_CEILING``.
+    """
+    calibration = {}
+    with connection.cursor() as cursor:
+        queries = _sample_embeddings(cursor, table, sample_size)
+        if not queries:
+            return calibration
+        exact = [
+            _nearest_ids(cursor, table, query, k, ["SET LOCAL enable_indexscan = off"], exact=True) for query in queries
+        ]
+        # The index returns at most ef_search rows: never fewer than the candidates reranked
+        for value in plan.search_values(k * table.candidates):
+            settings_sql = ["SET LOCAL enable_seqscan = off", f"SET LOCAL {plan.search_parameter} = {int(value)}"]
+            found = sum(
+                len(_nearest_ids(cursor, table, query, k, settings_sql) & expected)
+                for query, expected in zip(queries, exact, strict=True)
+            )
+            recall = found / max(sum(len(expected) for expected in exact), 1)
+            calibration[str(value)] = round(recall, 4)
+            if recall >= RECALL_CEILING:
+                break
+    return calibration
+
+
+@contextmanager
+def _management_lock():
+    """
+    Yield whether the transaction-level advisory lock of the manager was taken. CREATE INDEX
+    CONCURRENTLY can't run in a transaction block, so the lock is held by a transaction on a
+    separate connection: it ends with that transaction, or its connection if the run dies,
+    and never outlives the run on a reused session.
+    """
+    lock_connection = connections.create_connection(DEFAULT_DB_ALIAS)
+    try:
+        lock_connection.set_autocommit(False)
+        with lock_connection.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_xact_lock(%s)", [ADVISORY_LOCK_ID])
+            acquired = cursor.fetchone()[0]
+        yield acquired
+    finally:
+        try:
+            lock_connection.rollback()
+        finally:
+            lock_connection.close()
+
+
+def manage_vector_indexes(
+    table_names: list[str] | None = None, dry_run: bool = False, force: bool = False, measure: bool = True
+) -> list[dict]:
+    """
+    Plan, rebuild when needed, and calibrate the ANN index of every knowledge base vector
+    table. Tables whose index matches the plan and is already calibrated are left alone.
+    Returns one summary per table; nothing is done if another run holds the lock.
+    """
+    from apps.opie.models import VectorIndexBuild
+
+    results = []
+    with nullcontext(True) if dry_run else _management_lock() as acquired:
+        if not acquired:
+            logger.info("Vector index management already running, skipped")
+            return results
+        for table in find_vector_tables(table_names):
+            plan = plan_index(table.rows, table.dimensions, table.layout.max_index_dimensions)
+            reason = rebuild_reason(table, plan) or ("forced" if force else None)
+            calibrated = VectorIndexBuild.objects.filter(
+                schema_name=table.schema, table_name=table.name, method=plan.method
+            ).exclude(status=VectorIndexBuild.Status.FAILED)
+            if reason is None and (plan.method == EXACT or not measure or calibrated.exists()):
+                results.append({"table": f"{table.schema}.{table.name}", "plan": plan, "action": "up to date"})
+                continue
+
+            action = f"rebuild ({reason})" if reason else "calibrate"
+            results.append({"table": f"{table.schema}.{table.name}", "plan": plan, "action": action})
+            if dry_run:
+                continue
+
+            build = VectorIndexBuild(
+                schema_name=table.schema,
+                table_name=table.name,
+                method=plan.method,
+                index_name=table.index_name if plan.method != EXACT else "",
+                row_count=table.rows,
+                lists=plan.lists,
+                m=plan.m,
+                ef_construction=plan.ef_construction,
+                search_parameter=plan.search_parameter or "",
+                recall_k=settings.OPIE_VECTOR_INDEX_RECALL_K,
+            )
+            try:
+                if reason:
+                    build.build_seconds = build_index(table, plan)
+                    build.status = (
+                        VectorIndexBuild.Status.DROPPED if plan.method == EXACT else VectorIndexBuild.Status.BUILT
+                    )
+                else:
+                    build.status = VectorIndexBuild.Status.CALIBRATED
+                if measure and plan.method != EXACT:
+                    build.calibration = measure_recall(
+                        table, plan, settings.OPIE_VECTOR_INDEX_RECALL_K, settings.OPIE_VECTOR_INDEX_RECALL_SAMPLE
+                    )
+                    build.sample_size = settings.OPIE_VECTOR_INDEX_RECALL_SAMPLE
+            except Exception as e:
+                logger.error(f"Vector index {action} of {table.schema}.{table.name} failed: {e}")
+                build.status = VectorIndexBuild.Status.FAILED
+                build.error = str(e)
+            build.save()
+            invalidate_search_settings(table.name)
+            results[-1]["build"] = build
+            logger.info(f"Vector index {action} of {table.schema}.{table.name}: {build}")
+    return results
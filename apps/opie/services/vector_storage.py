@@ -0,0 +1,320 @@
+"""
+Storage layouts of the knowledge base embeddings.
+
+Every chunk used to be stored as a full-precision ``vector`` in the shared knowledge base
+table, so tables and ANN indexes grow by 4 bytes per dimension per chunk. A knowledge base
+can instead pick (``KnowledgeBase.vector_storage``):
+
+- ``halfvec``: 16-bit floats, half the table and index size for a recall close to full precision;
+- ``binary_rerank``: full-precision vectors with the ANN index built on their binary
+  quantization (1 bit per dimension, ``bit_hamming_ops``). Queries take
+  ``OPIE_VECTOR_BINARY_RERANK_FACTOR × k`` candidates by Hamming distance, then rerank them
+  by exact cosine distance (see ``FullTextPGVectorStore.set_binary_rerank``);
+
+and, with an embedder trained for it (Matryoshka representation learning), keep only the first
+``KnowledgeBase.embedding_dimensions`` dimensions of each embedding. Cosine distance ignores
+the length of the vectors, so the truncated prefixes don't need renormalizing.
+
+The shared table has the default layout, so a knowledge base with another one gets a table
+of its own. ``migrate_storage`` copies the rows of an existing knowledge base to the table of
+its new layout, converting them, and switches it over.
+"""
+
+import logging
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class StorageLayout:
+    column_type: str
+    opclass: str
+    # pgvector can't index more dimensions than this with the opclass
+    max_index_dimensions: int
+    binary: bool = False
+    # Short code in the dedicated table names
+    code: str = ""
+
+    def index_expression(self, dimensions: int) -> str:
+        if self.binary:
+            return f"(binary_quantize(embedding)::bit({int(dimensions)}))"
+        return "embedding"
+
+
+LAYOUTS = {
+    "vector": StorageLayout("vector", "vector_cosine_ops", 2000, code="f32"),
+    "halfvec": StorageLayout("halfvec", "halfvec_cosine_ops", 4000, code="f16"),
+    "binary_rerank": StorageLayout("vector", "bit_hamming_ops", 64000, binary=True, code="bq"),
+}
+
+# Embedders trained so that a prefix of the embedding is an embedding, with their full size
+MATRYOSHKA_EMBEDDERS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+}
+
+# Columns of a LlamaIndex vector table copied by a migration (id is regenerated)
+_COPIED_COLUMNS = "text, metadata_, node_id"
+
+
+def get_layout(storage: str) -> StorageLayout:
+    try:
+        return LAYOUTS[storage]
+    except KeyError:
+        raise ValueError(f"Unknown vector storage: {storage}") from None
+
+
+def storage_table_name(knowledgebase_id: str, storage: str, dimensions: int | None = None) -> str:
+    """The dedicated vector table of a knowledge base stored with ``storage`` and ``dimensions``."""
+    from apps.opie.models import clean_table_name
+
+    return f"kb_{clean_table_name(knowledgebase_id)}_{get_layout(storage).code}{dimensions or ''}"
+
+
+def validate_vector_storage(knowledge_base) -> None:
+    """Raise ValidationError when the storage layout doesn't fit the knowledge base or its embedder."""
+    from apps.opie.models import KnowledgeBaseType, VectorStorage
+
+    storage, dimensions = knowledge_base.vector_storage, knowledge_base.embedding_dimensions
+    if storage == VectorStorage.VECTOR and not dimensions:
+        return
+    if knowledge_base.knowledge_type != KnowledgeBaseType.LLAMAINDEX:
+        raise ValidationError("Only LlamaIndex knowledge bases support other vector storages.")
+    if not dimensions:
+        return
+
+    embedder_id = getattr(knowledge_base.model_provider, "embedder_id", None)
+    full_dimensions = MATRYOSHKA_EMBEDDERS.get(embedder_id)
+    if full_dimensions is None:
+        raise ValidationError(
+            f"The embedder {embedder_id or '(none)'} can't be truncated: only "
+            f"{', '.join(sorted(MATRYOSHKA_EMBEDDERS))} embeddings keep their meaning when shortened."
+        )
+    if dimensions >= full_dimensions:
+        raise ValidationError(f"{embedder_id} embeddings have {full_dimensions} dimensions: keep fewer, or none.")
+    if dimensions > get_layout(storage).max_index_dimensions:
+        raise ValidationError(f"{storage} indexes have at most {get_layout(storage).max_index_dimensions} dimensions.")
+
+
+def ingestion_options(knowledgebase_id: str | None) -> dict:
+    """The storage fields of an ingestion request for the knowledge base (none for the default layout)."""
+    from apps.opie.models import KnowledgeBase, VectorStorage
+
+    if not knowledgebase_id:
+        return {}
+    values = (
+        KnowledgeBase.objects.filter(knowledgebase_id=knowledgebase_id)
+        .values("vector_storage", "embedding_dimensions")
+        .first()
+    )
+    if not values or (values["vector_storage"] == VectorStorage.VECTOR and not values["embedding_dimensions"]):
+        return {}
+    return values
+
+
+def query_embed_model(knowledge_base):
+    """LlamaIndex embed model producing query embeddings of the stored size, None for the default one."""
+    if not knowledge_base.embedding_dimensions:
+        return None
+    from llama_index.embeddings.openai import OpenAIEmbedding
+
+    return OpenAIEmbedding(
+        model=knowledge_base.model_provider.embedder_id, dimensions=knowledge_base.embedding_dimensions
+    )
+
+
+def conversion_sql(storage: str, dimensions: int, source_dimensions: int) -> str:
+    """SQL expression converting the ``embedding`` of a source row to the ``storage`` layout."""
+    if dimensions > source_dimensions:
+        raise ValueError(f"Can't grow {source_dimensions}-dimension embeddings to {dimensions}")
+    expression = "embedding"
+    if dimensions < source_dimensions:
+        expression = f"subvector(embedding, 1, {int(dimensions)})"
+    return f"{expression}::{get_layout(storage).column_type}({int(dimensions)})"
+
+
+def _create_table(table_name: str, schema: str, storage: str, dimensions: int) -> None:
+    # Created by LlamaIndex itself, so it matches the tables the ingestion service writes to
+    from llama_index.vector_stores.postgres import PGVectorStore
+
+    from apps.opie.agents.helpers.agent_helpers import get_db_url
+
+    db_url = get_db_url()
+    store = PGVectorStore(
+        connection_string=db_url,
+        async_connection_string=db_url.replace("postgresql://", "postgresql+asyncpg://"),
+        table_name=table_name,
+        schema_name=schema,
+        embed_dim=dimensions,
+        use_halfvec=get_layout(storage).column_type == "halfvec",
+        perform_setup=True,
+    )
+    store._initialize()
+
+
+def _copy_rows(source, target_name: str, where: str, params: list, expression: str, batch_size: int) -> int:
+    """Copy the rows in id order, a batch per transaction. Returns the rows copied."""
+    copied, after_id = 0, 0
+    target = f'"{source.schema}"."{target_name}"'
+    with connection.cursor() as cursor:
+        while True:
+            with transaction.atomic():
+                cursor.execute(
+                    f"SELECT id FROM {source.qualified_name} WHERE id > %s{where} ORDER BY id LIMIT %s",
+                    [after_id, *params, batch_size],
+                )
+                ids = [row[0] for row in cursor.fetchall()]
+                if not ids:
+                    return copied
+                cursor.execute(
+                    f"INSERT INTO {target} ({_COPIED_COLUMNS}, embedding) "
+                    f"SELECT {_COPIED_COLUMNS}, {expression} FROM {source.qualified_name} "
+                    "WHERE id = ANY(%s) ORDER BY id",
+                    [ids],
+                )
+            copied += len(ids)
+            after_id = ids[-1]
+
+
+def migrate_storage(
+    knowledge_base,
+    storage: str,
+    dimensions: int | None = None,
+    batch_size: int = 1000,
+    delete_source: bool = False,
+    dry_run: bool = False,
+    progress: Callable[[str], None] | None = None,
+) -> dict:
+    """
+    Move the embeddings of ``knowledge_base`` to the table of the ``storage`` / ``dimensions``
+    layout: create it, copy and convert the rows in batches, then, with writes to the old table
+    blocked, apply the rows added, changed or deleted meanwhile and point the knowledge base at
+    the new one, and
+    index it. Ingestions that resolved the old table before the switch and write after it still
+    land there. The old rows are only deleted with ``delete_source``. Returns a summary of the
+    migration.
+    """
+    from apps.opie.models import KnowledgeBase, VectorStorage
+    from apps.opie.services.vector_index_manager import find_vector_tables, manage_vector_indexes
+
+    progress = progress or logger.info
+    knowledge_base.vector_storage, knowledge_base.embedding_dimensions = storage, dimensions
+    validate_vector_storage(knowledge_base)
+    original = KnowledgeBase.objects.get(pk=knowledge_base.pk)
+
+    # LlamaIndex tables only: agno may have created a table under the bare name
+    llamaindex_name = f"data_{original.vector_table_name}".lower()
+    sources = [table for table in find_vector_tables([original.vector_table_name]) if table.name == llamaindex_name]
+    if len(sources) != 1 or not sources[0].dimensions:
+        raise ValueError(
+            f"Expected one vector table for {original.vector_table_name}, found {len(sources)}: "
+            "nothing ingested yet? Then set the storage directly, there is nothing to copy."
+        )
+    source = sources[0]
+    if original.embedding_dimensions and (not dimensions or dimensions > original.embedding_dimensions):
+        raise ValueError(
+            f"{original.knowledgebase_id} only stores {original.embedding_dimensions} dimensions: "
+            "re-ingest its files to store more."
+        )
+    target_dimensions = dimensions or source.dimensions
+    expression = conversion_sql(storage, target_dimensions, source.dimensions)
+
+    if storage == VectorStorage.VECTOR and not dimensions:
+        target_name = "kb_" + settings.PGVECTOR_TABLE_PREFIX
+    else:
+        target_name = storage_table_name(original.knowledgebase_id, storage, dimensions)
+    if target_name == original.vector_table_name:
+        raise ValueError(f"{original.knowledgebase_id} is already stored in {target_name}")
+
+    # The shared table holds every knowledge base in the default layout
+    shared = original.vector_table_name == "kb_" + settings.PGVECTOR_TABLE_PREFIX
+    where, params = (" AND metadata_->>'knowledgebase_id' = %s", [original.knowledgebase_id]) if shared else ("", [])
+    summary = {
+        "source": f"{source.schema}.{source.name}",
+        "target": f"{source.schema}.data_{target_name}",
+        "conversion": expression,
+        "copied": 0,
+        "updated": 0,
+        "removed": 0,
+    }
+    if dry_run:
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {source.qualified_name} WHERE true{where}", params)
+            summary["rows"] = cursor.fetchone()[0]
+        return summary
+
+    _create_table(target_name, source.schema, storage, target_dimensions)
+    target_table = f'"{source.schema}"."data_{target_name}"'
+    with connection.cursor() as cursor:
+        # Rows of an interrupted run: the knowledge base doesn't read them yet
+        if target_name == "kb_" + settings.PGVECTOR_TABLE_PREFIX:
+            cursor.execute(
+                f"DELETE FROM {target_table} WHERE metadata_->>'knowledgebase_id' = %s", [original.knowledgebase_id]
+            )
+        else:
+            cursor.execute(f"TRUNCATE {target_table}")
+
+    started = time.perf_counter()
+    copied = _copy_rows(source, f"data_{target_name}", where, params, expression, batch_size)
+    progress(f"Copied {copied} rows to {summary['target']} in {time.perf_counter() - started:.1f}s")
+
+    # SHARE mode blocks the writes to the old table, not its reads, until the switch commits. Rows
+    # written during the copy are matched by node_id: ids of concurrent inserts commit out of order
+    target_where, target_params = (
+        (" AND dst.metadata_->>'knowledgebase_id' = %s", [original.knowledgebase_id])
+        if target_name == "kb_" + settings.PGVECTOR_TABLE_PREFIX
+        else ("", [])
+    )
+    converted = f"SELECT {_COPIED_COLUMNS}, {expression} AS embedding FROM {source.qualified_name} WHERE true{where}"
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {source.qualified_name} IN SHARE MODE")
+        # Rows deleted from the old table, re-ingested files included
+        cursor.execute(
+            f"DELETE FROM {target_table} dst WHERE true{target_where} "
+            f"AND NOT EXISTS (SELECT 1 FROM {source.qualified_name} src WHERE src.node_id = dst.node_id{where})",
+            target_params + params,
+        )
+        removed = cursor.rowcount
+        cursor.execute(
+            f"UPDATE {target_table} dst SET text = src.text, metadata_ = src.metadata_, embedding = src.embedding "
+            f"FROM ({converted}) src WHERE dst.node_id = src.node_id{target_where} "
+            "AND (dst.text IS DISTINCT FROM src.text OR dst.metadata_::text IS DISTINCT FROM src.metadata_::text "
+            "OR dst.embedding IS DISTINCT FROM src.embedding)",
+            params + target_params,
+        )
+        updated = cursor.rowcount
+        cursor.execute(
+            f"INSERT INTO {target_table} ({_COPIED_COLUMNS}, embedding) "
+            f"SELECT {_COPIED_COLUMNS}, {expression} FROM {source.qualified_name} src WHERE true{where} "
+            f"AND NOT EXISTS (SELECT 1 FROM {target_table} dst WHERE dst.node_id = src.node_id) "
+            "ORDER BY id",
+            params,
+        )
+        late = cursor.rowcount
+        # queryset.update: save() keeps the storage fields, they describe the table's rows
+        KnowledgeBase.objects.filter(pk=original.pk).update(
+            vector_table_name=target_name, vector_storage=storage, embedding_dimensions=dimensions
+        )
+    summary.update(copied=copied + late, updated=updated, removed=removed)
+    progress(
+        f"Switched {original.knowledgebase_id} to {target_name}: "
+        f"{late} late rows copied, {updated} updated, {removed} removed"
+    )
+
+    if delete_source:
+        with connection.cursor() as cursor:
+            if shared:
+                cursor.execute(f"DELETE FROM {source.qualified_name} WHERE true{where}", params)
+            else:
+                cursor.execute(f"DROP TABLE {source.qualified_name}")
+        summary["deleted"] = True
+
+    summary["indexes"] = manage_vector_indexes(table_names=[target_name])
+    return summary
@@ -0,0 +1,21 @@
+"""
+Signal handlers keeping the in-process pricing registry in sync with writes.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Agent, ModelProvider
+from .services.pricing_registry import pricing_registry
+
+
+@receiver(post_save, sender=ModelProvider)
+@receiver(post_delete, sender=ModelProvider)
+def invalidate_pricing_on_model_provider_change(sender, instance, **kwargs):
+    pricing_registry.invalidate_models()
+
+
+@receiver(post_save, sender=Agent)
+@receiver(post_delete, sender=Agent)
+def invalidate_pricing_on_agent_change(sender, instance, **kwargs):
+    pricing_registry.invalidate_agent(instance.agent_id)
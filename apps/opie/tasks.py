@@ -237,6 +237,10 @@ def ingest_single_file_via_http_task(self, file_info: dict):
         "project_id": str(project_id) if project_id is not None else None,
         "custom_metadata": custom_metadata,
     }
+    # halfvec / truncated embeddings of the knowledge base (see services.vector_storage)
+    from apps.opie.services.vector_storage import ingestion_options
+
+    payload.update(ingestion_options(knowledgebase_id))
 
     print(f"Payload: {payload}")
 
@@ -530,3 +534,40 @@ def process_vault_ingestion(self, task_id):
             task.save()
             task.vault_file.save()
             logger.info(f"Ingestion task {task.id} finished with status: {task.status}")
+
+
+@shared_task
+def rollup_token_usage_task():
+    """
+    Fold new token usage records into the user and team summaries
+    """
+    from apps.opie.utils.token_usage import rollup_token_usage
+
+    return rollup_token_usage()
+
+
+@shared_task
+def rollup_agentos_metrics_task():
+    """
+    Roll up AgentOS daily metrics for the messages created since the last run, and refresh
+    the daily usage materialized view when it is enabled
+    """
+    from apps.opie.agentos.metrics_service import get_metrics_service
+
+    metrics_service = get_metrics_service()
+    result = metrics_service.rollup_since_watermark()
+    if settings.AGENTOS_METRICS_MATERIALIZED_VIEW:
+        metrics_service.create_daily_usage_view()
+        metrics_service.refresh_daily_usage_view()
+    return result
+
+
+@shared_task
+def manage_vector_indexes_task():
+    """
+    Resize, rebuild and calibrate the ANN indexes of the knowledge base vector tables
+    """
+    from apps.opie.services.vector_index_manager import manage_vector_indexes
+
+    results = manage_vector_indexes()
+    return [f"{result['table']}: {result['action']}" for result in results]
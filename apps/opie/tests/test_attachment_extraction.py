@@ -0,0 +1,112 @@
+"""
+Tests for the parallel, cached extraction of ephemeral chat attachments.
+"""
+
+import threading
+import uuid
+from types import SimpleNamespace
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, override_settings
+
+from apps.opie.services import attachment_extraction
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def _ephemeral_file(content, name="notes.txt", mime_type="text/plain"):
+    return SimpleNamespace(uuid=uuid.uuid4(), file=ContentFile(content, name=name), name=name, mime_type=mime_type)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AttachmentExtractionTest(SimpleTestCase):
+    """Test that attachments are extracted concurrently and parsed once per content."""
+
+    def setUp(self):
+        cache.clear()
+        self.reader = attachment_extraction._get_reader()
+
+    def test_texts_in_order(self):
+        """Test that the texts are returned in the order of the files."""
+        files = [_ephemeral_file(f"file {i}".encode()) for i in range(5)]
+
+        texts = async_to_sync(attachment_extraction.extract_texts)(files)
+
+        self.assertEqual(texts, [f"file {i}" for i in range(5)])
+
+    def test_same_content_parsed_once(self):
+        """Test that re-sent files and later turns reuse the cached text."""
+        first, resent = _ephemeral_file(b"same content"), _ephemeral_file(b"same content")
+
+        with mock.patch.object(self.reader, "read_file", wraps=self.reader.read_file) as read_file:
+            async_to_sync(attachment_extraction.extract_texts)([first])
+            async_to_sync(attachment_extraction.extract_texts)([resent])
+            first.file = None  # a later turn neither reads nor parses the file again
+            texts = async_to_sync(attachment_extraction.extract_texts)([first])
+
+        self.assertEqual(read_file.call_count, 1)
+        self.assertEqual(texts, ["same content"])
+
+    def test_turn_waits_for_extraction_started_at_upload(self):
+        """Test that a chat turn joins the extraction already pending for a file."""
+        ephemeral_file = _ephemeral_file(b"uploaded")
+        release = threading.Event()
+        calls = []
+
+        def slow_read_file(**kwargs):
+            calls.append(kwargs)
+            release.wait(5)
+            return "uploaded"
+
+        with mock.patch.object(self.reader, "read_file", side_effect=slow_read_file):
+            future = attachment_extraction.start_extraction(ephemeral_file)
+            self.assertIs(attachment_extraction.start_extraction(ephemeral_file), future)
+            release.set()
+            texts = async_to_sync(attachment_extraction.extract_texts)([ephemeral_file])
+
+        self.assertEqual(texts, ["uploaded"])
+        self.assertEqual(len(calls), 1)
+
+    def test_failed_extraction_not_cached(self):
+        """Test that a file that could not be parsed is parsed again on the next turn."""
+        ephemeral_file = _ephemeral_file(b"broken")
+
+        with mock.patch.object(self.reader, "read_file", return_value="Error reading file: boom") as read_file:
+            for _ in range(2):
+                texts = async_to_sync(attachment_extraction.extract_texts)([ephemeral_file])
+
+        self.assertEqual(texts, ["Error reading file: boom"])
+        self.assertEqual(read_file.call_count, 2)
+
+    def test_same_content_with_other_type_parsed_again(self):
+        """Test that the cached text is keyed by the file type and name, not only the content."""
+        with mock.patch.object(self.reader, "read_file", side_effect=["as text", "as markdown"]):
+            texts = async_to_sync(attachment_extraction.extract_texts)(
+                [_ephemeral_file(b"same"), _ephemeral_file(b"same", name="notes.md", mime_type="text/markdown")]
+            )
+
+        self.assertEqual(sorted(texts), ["as markdown", "as text"])
+
+    def test_extraction_claimed_by_another_process_is_awaited(self):
+        """Test that a process waits for the text of a file another process is extracting."""
+        ephemeral_file = _ephemeral_file(b"claimed elsewhere")
+        file_uuid = str(ephemeral_file.uuid)
+        cache.add(attachment_extraction._claim_cache_key(file_uuid), True)
+
+        def other_process():
+            text_key = attachment_extraction._text_cache_key(b"claimed elsewhere", "text/plain", "notes.txt")
+            cache.set(text_key, "from the other process")
+            cache.set(attachment_extraction._file_cache_key(file_uuid), text_key)
+            cache.delete(attachment_extraction._claim_cache_key(file_uuid))
+
+        timer = threading.Timer(0.2, other_process)
+        timer.start()
+        with mock.patch.object(self.reader, "read_file") as read_file:
+            texts = async_to_sync(attachment_extraction.extract_texts)([ephemeral_file])
+        timer.join()
+
+        read_file.assert_not_called()
+        self.assertEqual(texts, ["from the other process"])
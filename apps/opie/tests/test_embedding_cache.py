@@ -0,0 +1,198 @@
+"""
+Tests for the query embedding cache, with fake embedders.
+"""
+
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from unittest import mock
+
+from agno.knowledge.embedder.base import Embedder
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+
+from apps.opie.services import embedding_cache
+from apps.opie.services.embedding_cache import (
+    COALESCED,
+    LOCAL,
+    MISS,
+    SHARED,
+    CachedEmbedder,
+    CachedEmbedding,
+    QueryEmbeddingCache,
+    cache_key,
+)
+
+
+class FakeEmbedding(BaseEmbedding):
+    """
+    Deterministic LlamaIndex embeddings derived from a hash of the text, unit length, for
+    offline tests. ``calls`` counts the embedded texts.
+    """
+
+    dimensions: int = Field(default=1536, description="Dimensions of the embeddings")
+    _calls: int = PrivateAttr(default=0)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "FakeEmbedding"
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    def _embed(self, text: str) -> List[float]:
+        with self._lock:
+            self._calls += 1
+        return fake_embedding(text, self.dimensions)
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._embed(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+@dataclass
+class FakeEmbedder(Embedder):
+    """agno counterpart of FakeEmbedding."""
+
+    id: str = "fake"
+    calls: int = 0
+
+    def get_embedding(self, text: str) -> List[float]:
+        self.calls += 1
+        return fake_embedding(text, self.dimensions)
+
+    def get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        return self.get_embedding(text), None
+
+    async def async_get_embedding(self, text: str) -> List[float]:
+        return self.get_embedding(text)
+
+    async def async_get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        return self.get_embedding(text), None
+
+
+def fake_embedding(text: str, dimensions: int) -> List[float]:
+    digest = hashlib.shake_256(text.encode("utf-8")).digest(dimensions)
+    values = [byte - 127.5 for byte in digest]
+    norm = sum(value * value for value in values) ** 0.5
+    return [value / norm for value in values]
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    OPIE_QUERY_EMBEDDING_CACHE_SIZE=2,
+    OPIE_QUERY_EMBEDDING_CACHE_TTL=60,
+)
+class QueryEmbeddingCacheTest(SimpleTestCase):
+    """Test the tiers, the wrapped embedders and the hit ratio of the query embedding cache."""
+
+    def setUp(self):
+        cache.clear()
+        embedding_cache.reset_embedding_cache()
+
+    def tearDown(self):
+        embedding_cache.reset_embedding_cache()
+
+    def test_cache_key_normalizes_the_query(self):
+        """Test that whitespace doesn't change the key, case and the embedder model do."""
+        self.assertEqual(cache_key("model", "  What is\tRAG? "), cache_key("model", "What is RAG?"))
+        self.assertNotEqual(cache_key("model", "What is RAG?"), cache_key("model", "what is rag?"))
+        self.assertNotEqual(cache_key("model", "what is rag?"), cache_key("other", "what is rag?"))
+
+    def test_llamaindex_query_embeddings_served_by_tier(self):
+        """Test that a query is embedded once, then served locally, then from the shared tier."""
+        fake = FakeEmbedding(dimensions=8)
+        embed_model = CachedEmbedding(fake)
+
+        first = embed_model.get_query_embedding("What is RAG?")
+        self.assertEqual(embed_model.get_query_embedding("What is  RAG?"), first)
+        embedding_cache.reset_embedding_cache()  # another process: only Redis is shared
+        shared = embed_model.get_query_embedding("What is RAG?")
+
+        self.assertEqual(fake.calls, 1)
+        for value, expected in zip(shared, fake.get_query_embedding("What is RAG?"), strict=True):
+            self.assertAlmostEqual(value, expected, places=6)
+        self.assertEqual(embedding_cache.get_embedding_cache().requests[SHARED], 1)
+
+    def test_documents_are_not_cached(self):
+        """Test that text (document) embeddings always reach the embedder."""
+        fake = FakeEmbedding(dimensions=8)
+        embed_model = CachedEmbedding(fake)
+
+        embed_model.get_text_embedding("chunk")
+        embed_model.get_text_embedding("chunk")
+
+        self.assertEqual(fake.calls, 2)
+
+    def test_agno_embedder_and_hit_ratio(self):
+        """Test that agno query embeddings are cached, sync and async, and the hit ratio counted."""
+        fake = FakeEmbedder(dimensions=8)
+        embedder = CachedEmbedder(embedder=fake)
+
+        embedder.get_embedding("query")
+        asyncio.run(embedder.async_get_embedding("query"))
+        embedder.get_embedding_and_usage("document")
+
+        self.assertEqual(embedder.dimensions, 8)
+        self.assertEqual(fake.calls, 2)
+        stats = embedding_cache.get_embedding_cache().get_stats()
+        self.assertEqual((stats["requests"][LOCAL], stats["requests"][MISS]), (1, 1))
+        self.assertEqual(stats["hit_ratio"], 0.5)
+
+    def test_concurrent_requests_are_coalesced(self):
+        """Test that sub-agents embedding the same query at once call the embedder once."""
+        query_cache = QueryEmbeddingCache(local_max_entries=2, timeout=0)
+        started, waiting, release = threading.Event(), threading.Event(), threading.Event()
+        calls = []
+        claim = query_cache._claim
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return [1.0, 0.0]
+
+        def claim_and_signal(key):
+            future, owner = claim(key)
+            if not owner:
+                waiting.set()
+            return future, owner
+
+        with (
+            ThreadPoolExecutor(max_workers=2) as executor,
+            mock.patch.object(query_cache, "_claim", side_effect=claim_and_signal),
+        ):
+            first = executor.submit(query_cache.get_or_compute, "model", "query", compute)
+            started.wait(5)
+            second = executor.submit(query_cache.get_or_compute, "model", "query", compute)
+            waiting.wait(5)
+            release.set()
+            self.assertEqual(first.result(), second.result())
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(query_cache.requests[COALESCED], 1)
+
+    def test_local_lru_and_unavailable_shared_tier(self):
+        """Test that the local tier keeps the latest queries, and a failing Redis only costs a call."""
+        fake = FakeEmbedder(dimensions=4)
+        embedder = CachedEmbedder(embedder=fake)
+        for query in ("a", "b", "c"):
+            embedder.get_embedding(query)
+        self.assertEqual(len(embedding_cache.get_embedding_cache().local), 2)
+
+        embedding_cache.reset_embedding_cache()
+        with mock.patch.object(embedding_cache.cache, "get", side_effect=ConnectionError("down")):
+            embedder.get_embedding("d")
+        self.assertEqual(fake.calls, 4)
@@ -0,0 +1,161 @@
+"""
+Tests for the federated retriever, with fake per-table retrievers.
+"""
+
+import threading
+import time
+
+from django.test import SimpleTestCase, override_settings
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from apps.opie.agents.helpers import retrievers
+from apps.opie.agents.helpers.retrievers import ERROR, OK, TIMEOUT, FederatedRetriever, normalize_scores
+
+
+class FakeRetriever(BaseRetriever):
+    def __init__(self, results, delay=0.0, error=None, started=None):
+        super().__init__()
+        self.results = results
+        self.delay = delay
+        self.error = error
+        self.started = started
+
+    def _retrieve(self, query_bundle):
+        if self.started is not None:
+            self.started.wait(5)
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return [
+            NodeWithScore(node=TextNode(id_=node_id, text=text), score=score) for node_id, text, score in self.results
+        ]
+
+
+@override_settings(OPIE_FEDERATED_RETRIEVAL_WORKERS=4, OPIE_FEDERATED_RETRIEVAL_DEADLINE_MS=1000)
+class FederatedRetrieverTest(SimpleTestCase):
+    """Test the concurrency, deadline, score normalization, merge and latency report of the federated retriever."""
+
+    def setUp(self):
+        retrievers.reset_source_latency_stats()
+
+    def test_normalize_scores(self):
+        """Test that scores are scaled to [0, 1], and rankings without distinct scores scored by rank."""
+        nodes = [NodeWithScore(node=TextNode(text=str(score)), score=score) for score in (0.03, 0.02, 0.01)]
+        self.assertEqual([round(node.score, 6) for node in normalize_scores(nodes)], [1.0, 0.5, 0.0])
+
+        unscored = [NodeWithScore(node=TextNode(text="a")), NodeWithScore(node=TextNode(text="b"))]
+        self.assertEqual([node.score for node in normalize_scores(unscored)], [1.0, 0.5])
+
+    def test_sources_are_searched_concurrently(self):
+        """Test that each source runs while the others are still searching."""
+        barrier = threading.Barrier(2, timeout=5)
+
+        class BarrierRetriever(FakeRetriever):
+            def _retrieve(self, query_bundle):
+                barrier.wait()
+                return super()._retrieve(query_bundle)
+
+        federated = FederatedRetriever(
+            {"a": BarrierRetriever([("1", "one", 0.9)]), "b": BarrierRetriever([("2", "two", 0.8)])}, top_k=5
+        )
+
+        self.assertEqual({node.node.node_id for node in federated.retrieve("query")}, {"1", "2"})
+
+    def test_merge_normalizes_and_deduplicates(self):
+        """Test that scales don't favour a source, and chunks in several sources are kept once."""
+        federated = FederatedRetriever(
+            {
+                # RRF scores
+                "kb_shared": FakeRetriever([("1", "alpha", 0.032), ("2", "beta", 0.016), ("3", "gamma", 0.010)]),
+                # Cosine similarities: the same chunk (by text) and a weaker one
+                "kb_contracts_f16": FakeRetriever([("9", "beta ", 0.91), ("4", "delta", 0.85), ("5", "eps", 0.40)]),
+            },
+            top_k=3,
+        )
+
+        results = federated.retrieve("query")
+
+        self.assertEqual([node.node.node_id for node in results], ["1", "9", "4"])
+        self.assertEqual(results[1].score, 1.0)
+
+    def test_deadline_and_failures_drop_sources(self):
+        """Test that late and failing sources are left out and reported with their status and latency."""
+        release = threading.Event()
+        federated = FederatedRetriever(
+            {
+                "fast": FakeRetriever([("1", "one", 0.5)]),
+                "slow": FakeRetriever([("2", "two", 0.9)], started=release),
+                "broken": FakeRetriever([], error=RuntimeError("down")),
+            },
+            top_k=3,
+            deadline_ms=100,
+        )
+
+        started = time.perf_counter()
+        results = federated.retrieve("query")
+        elapsed = time.perf_counter() - started
+        release.set()
+
+        self.assertLess(elapsed, 1)
+        self.assertEqual([node.node.node_id for node in results], ["1"])
+        statuses = {report.source: report.status for report in federated.last_reports}
+        self.assertEqual(statuses, {"fast": OK, "slow": TIMEOUT, "broken": ERROR})
+        self.assertGreaterEqual(
+            next(report.latency_ms for report in federated.last_reports if report.source == "slow"), 100
+        )
+
+    def test_source_latency_stats(self):
+        """Test that per-source percentiles and late answers are aggregated for tail analysis."""
+        federated = FederatedRetriever(
+            {"fast": FakeRetriever([("1", "one", 0.5)]), "slow": FakeRetriever([("2", "two", 0.5)], delay=0.2)},
+            deadline_ms=50,
+        )
+        for _ in range(2):
+            federated.retrieve("query")
+        time.sleep(0.5)  # the late searches finish and record their latency
+
+        stats = retrievers.source_latency_stats()
+
+        self.assertEqual((stats["fast"]["samples"], stats["fast"][OK]), (2, 2))
+        self.assertEqual(stats["slow"][TIMEOUT], 2)
+        self.assertGreaterEqual(stats["slow"]["p95"], 200)
+        self.assertLessEqual(stats["fast"]["p50"], stats["fast"]["max"])
+
+    def test_query_embedded_once_before_the_deadline(self):
+        """Test that sources sharing an embed model get one embedding, computed outside the deadline."""
+        embedded = []
+
+        class SlowEmbedding:
+            def get_agg_embedding_from_queries(self, queries):
+                embedded.append(queries)
+                time.sleep(0.2)
+                return [1.0, 0.0]
+
+        class EmbeddingRetriever(FakeRetriever):
+            def _retrieve(self, query_bundle):
+                self.embedding = query_bundle.embedding
+                return super()._retrieve(query_bundle)
+
+        embed_model = SlowEmbedding()
+        sources = {"a": EmbeddingRetriever([("1", "one", 0.9)]), "b": EmbeddingRetriever([("2", "two", 0.8)])}
+        federated = FederatedRetriever(sources, deadline_ms=100, embed_models={"a": embed_model, "b": embed_model})
+
+        federated.retrieve("query")
+
+        self.assertEqual(embedded, [["query"]])
+        self.assertEqual([source.embedding for source in sources.values()], [[1.0, 0.0], [1.0, 0.0]])
+        self.assertEqual({report.status for report in federated.last_reports}, {OK})
+
+    def test_late_answer_used_when_every_source_misses(self):
+        """Test that a late answer is used rather than nothing, and a query no source answers raises."""
+        federated = FederatedRetriever(
+            {"slow": FakeRetriever([("1", "one", 0.5)], delay=0.1), "broken": FakeRetriever([], error=RuntimeError())},
+            deadline_ms=50,
+        )
+
+        self.assertEqual([node.node.node_id for node in federated.retrieve("query")], ["1"])
+
+        federated = FederatedRetriever({"broken": FakeRetriever([], error=RuntimeError("down"))}, deadline_ms=50)
+        with self.assertRaises(RuntimeError):
+            federated.retrieve("query")
@@ -0,0 +1,90 @@
+"""
+Tests for the bulk file import service used by integration imports.
+"""
+
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from apps.opie.models import Collection, File
+from apps.opie.services.file_import_service import FileImportItem, FileImportService
+
+User = get_user_model()
+
+IN_MEMORY_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+def _item(title, path=(), collection=None):
+    return FileImportItem(
+        title=title, content=ContentFile(b"content", name=title), collection_path=path, collection=collection
+    )
+
+
+@override_settings(STORAGES=IN_MEMORY_STORAGES)
+class FileImportServiceTest(TestCase):
+    """Test that files are imported in bulk into resolved collections."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="user", email="user@test.com", password="pass")
+        self.service = FileImportService(uploaded_by=self.user, max_workers=1, batch_size=2)
+
+    def test_batch_import(self):
+        """Test that every item is created across several batches and mapped back to its index."""
+        items = [_item("a.txt", ("Root",)), _item("b.txt", ("Root", "Child")), _item("c.txt")]
+
+        result = self.service.import_files(items)
+
+        self.assertEqual(len(result.created), 3)
+        self.assertEqual(result.collections_created, 2)
+        self.assertFalse(result.failed)
+        root = Collection.objects.get(name="Root", parent=None)
+        child = Collection.objects.get(name="Child", parent=root)
+        self.assertEqual(result.file_for(0).collection, root)
+        self.assertEqual(result.file_for(1).collection, child)
+        self.assertIsNone(result.file_for(2).collection)
+        self.assertEqual(File.objects.filter(uploaded_by=self.user).count(), 3)
+
+    def test_reuses_existing_collections(self):
+        """Test that collections already in the tree are reused rather than duplicated."""
+        root = Collection.objects.create(name="Root", collection_type="folder")
+        Collection.objects.create(name="Child", parent=root, collection_type="folder")
+
+        result = self.service.import_files([_item("a.txt", ("Root", "Child")), _item("b.txt", ("Root", "Other"))])
+
+        self.assertEqual(result.collections_created, 1)
+        self.assertEqual(Collection.objects.filter(name="Root").count(), 1)
+        self.assertEqual(Collection.objects.filter(name="Child").count(), 1)
+        self.assertEqual(result.file_for(1).collection.parent, root)
+
+    def test_existing_files_are_skipped(self):
+        """Test that a title already imported into the same collection is returned instead of uploaded."""
+        first = self.service.import_files([_item("a.txt", ("Root",))])
+
+        result = self.service.import_files([_item("a.txt", ("Root",)), _item("a.txt", ("Other",))])
+
+        self.assertEqual(result.existing, {0: first.file_for(0)})
+        self.assertEqual(len(result.created), 1)
+        self.assertEqual(File.objects.filter(title="a.txt").count(), 2)
+
+    def test_failed_upload_does_not_stop_the_batch(self):
+        """Test that an item whose upload fails is reported while the rest are imported."""
+        upload = FileImportService._upload
+
+        def flaky_upload(service, item):
+            if item.title == "broken.txt":
+                raise OSError("storage unavailable")
+            return upload(service, item)
+
+        with mock.patch.object(FileImportService, "_upload", autospec=True, side_effect=flaky_upload):
+            result = self.service.import_files([_item("ok.txt"), _item("broken.txt"), _item("also-ok.txt")])
+
+        self.assertEqual([item.title for item, _ in result.failed], ["broken.txt"])
+        self.assertIn("storage unavailable", result.failed[0][1])
+        self.assertIsNone(result.file_for(1))
+        self.assertEqual(sorted(f.title for f in result.created), ["also-ok.txt", "ok.txt"])
+        self.assertFalse(File.objects.filter(title="broken.txt").exists())
@@ -0,0 +1,65 @@
+"""
+Tests for the page-level PDF text extraction.
+"""
+
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apps.opie.agents.tools.filereader import FileReaderTools
+from apps.opie.utils import pdf_pages
+from apps.opie.utils.pdf_pages import iter_pdf_pages, synthetic_pdf
+
+
+class PdfPagesTest(SimpleTestCase):
+    """Test in-memory PDF extraction, in process and across the process pool."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.pdf = synthetic_pdf(20, chars_per_page=600)
+
+    def test_pages_in_order(self):
+        """Test that the pool yields the same pages, in the same order, as in process extraction."""
+        in_process = list(iter_pdf_pages(self.pdf, workers=1))
+        in_pool = list(iter_pdf_pages(self.pdf, workers=2, min_parallel_pages=1))
+
+        self.assertEqual([page.number for page in in_process], list(range(1, 21)))
+        self.assertIn("page3word0", in_process[2].text)
+        self.assertEqual(in_pool, in_process)
+
+    def test_stops_at_character_budget(self):
+        """Test that extraction stops after the page reaching the character budget."""
+        page_length = len(next(iter_pdf_pages(self.pdf, workers=1)).text)
+
+        for workers in (1, 2):
+            pages = list(iter_pdf_pages(self.pdf, max_chars=page_length * 2 + 1, workers=workers, min_parallel_pages=1))
+            self.assertEqual([page.number for page in pages], [1, 2, 3])
+
+    def test_pool_shared_across_extractions(self):
+        """Test that extractions reuse the same pool of worker processes."""
+        list(iter_pdf_pages(self.pdf, workers=2, min_parallel_pages=1))
+        executor = pdf_pages._executor
+
+        list(iter_pdf_pages(self.pdf, workers=2, min_parallel_pages=1))
+
+        self.assertIsNotNone(executor)
+        self.assertIs(pdf_pages._executor, executor)
+
+    def test_small_budget_extracted_in_process(self):
+        """Test that the pool is not used when the budget needs fewer pages than the threshold."""
+        page_length = len(next(iter_pdf_pages(self.pdf, workers=1)).text)
+
+        with mock.patch.object(pdf_pages, "_get_executor") as get_executor:
+            pages = list(iter_pdf_pages(self.pdf, max_chars=page_length * 2, workers=2, min_parallel_pages=10))
+
+        get_executor.assert_not_called()
+        self.assertEqual([page.number for page in pages], [1, 2])
+
+    def test_file_reader_formats_pages(self):
+        """Test that the file reader labels each page and truncates to max_chars."""
+        text = FileReaderTools().read_file(content=self.pdf, file_type="application/pdf", max_chars=1000)
+
+        self.assertTrue(text.startswith("--- Page 1 ---\npage1word0"))
+        self.assertTrue(text.endswith("... [truncated]"))
+        self.assertNotIn("--- Page 3 ---", text)
@@ -0,0 +1,253 @@
+"""
+Tests for append-only token usage records and their rollup into summaries.
+"""
+
+import datetime
+import zoneinfo
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.opie.models import Agent, ModelProvider, TeamTokenSummary, TokenUsage, TokenUsageBucket, UserTokenSummary
+from apps.opie.services.pricing_registry import ModelPricing, PricingRegistry, compute_cost, pricing_registry
+from apps.opie.utils.token_usage import (
+    create_token_usage_record,
+    record_agent_token_usage,
+    rollup_token_usage,
+    summarize_token_usage,
+)
+from apps.teams.models import Team
+
+User = get_user_model()
+
+
+def _record(user, total_tokens, cost, request_id=None):
+    return create_token_usage_record(
+        user=user,
+        session_id="session",
+        agent_id="agent",
+        agent_name="Agent",
+        chat_name="chat",
+        model_provider="openai",
+        model_name="gpt",
+        input_tokens=total_tokens // 2,
+        output_tokens=total_tokens - total_tokens // 2,
+        total_tokens=total_tokens,
+        user_msg="question",
+        assistant_msg="answer",
+        cost=cost,
+        request_id=request_id,
+    )
+
+
+class TokenUsageRollupTest(TestCase):
+    """Test that usage records are folded into the summaries by the rollup."""
+
+    def setUp(self):
+        self.team = Team.objects.create(name="Team", slug="team")
+        self.user = User.objects.create_user(username="user", email="user@test.com", password="pass")
+        self.user.team = self.team
+
+    def test_records_do_not_touch_summaries(self):
+        """Test that recording usage only appends a record."""
+        _record(self.user, 100, 0.5)
+
+        self.assertEqual(TokenUsage.objects.filter(rolled_up=False).count(), 1)
+        self.assertFalse(UserTokenSummary.objects.exists())
+        self.assertFalse(TeamTokenSummary.objects.exists())
+
+    def test_rollup_folds_records_once(self):
+        """Test that the rollup adds each record to the summaries exactly once."""
+        for _ in range(3):
+            _record(self.user, 100, 0.25)
+
+        self.assertEqual(rollup_token_usage(batch_size=2), 3)
+        self.assertEqual(rollup_token_usage(), 0)
+
+        user_summary = UserTokenSummary.objects.get(user=self.user)
+        self.assertEqual(user_summary.total_tokens, 300)
+        self.assertEqual(user_summary.cost, Decimal("0.75"))
+        self.assertLessEqual(user_summary.period_start, user_summary.period_end)
+
+        team_summary = TeamTokenSummary.objects.get(team=self.team)
+        self.assertEqual(team_summary.total_tokens, 300)
+
+        _record(self.user, 50, 0.0)
+        rollup_token_usage()
+        user_summary.refresh_from_db()
+        self.assertEqual(user_summary.total_tokens, 350)
+
+    def test_request_id_recorded_once(self):
+        """Test that a retried request is only recorded and counted once."""
+        first = _record(self.user, 100, 0.1, request_id="request-1")
+        second = _record(self.user, 100, 0.1, request_id="request-1")
+
+        self.assertEqual(first.pk, second.pk)
+        rollup_token_usage()
+        self.assertEqual(UserTokenSummary.objects.get(user=self.user).total_tokens, 100)
+
+    def test_rollup_scoped_to_user(self):
+        """Test that a rollup for one user leaves other users' records pending."""
+        other = User.objects.create_user(username="other", email="other@test.com", password="pass")
+        _record(self.user, 100, 0.1)
+        _record(other, 50, 0.1)
+
+        self.assertEqual(rollup_token_usage(user=self.user), 1)
+        self.assertTrue(TokenUsage.objects.filter(user=other, rolled_up=False).exists())
+        self.assertFalse(UserTokenSummary.objects.filter(user=other).exists())
+
+
+class TokenUsageSummaryTest(TestCase):
+    """Test that summaries read from the hourly buckets match the raw records."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="user", email="user@test.com", password="pass")
+        self.hour = timezone.now().replace(minute=0, second=0, microsecond=0) - datetime.timedelta(hours=3)
+
+    def _record_at(self, created_at, total_tokens, model_name="gpt"):
+        usage = _record(self.user, total_tokens, 0.5)
+        TokenUsage.objects.filter(pk=usage.pk).update(created_at=created_at, model_name=model_name)
+        return usage
+
+    def test_buckets_and_pending_records_add_up(self):
+        """Test that rolled-up and pending records are both counted, once."""
+        self._record_at(self.hour + datetime.timedelta(minutes=5), 100)
+        self._record_at(self.hour + datetime.timedelta(minutes=50), 200)
+        self._record_at(self.hour + datetime.timedelta(hours=1, minutes=5), 300, model_name="other")
+        rollup_token_usage()
+        self._record_at(self.hour + datetime.timedelta(hours=1, minutes=10), 400)
+
+        self.assertEqual(TokenUsageBucket.objects.count(), 2)
+
+        (total,) = summarize_token_usage(filters={"user_id": self.user.id})
+        self.assertEqual(total["total_tokens"], 1000)
+        self.assertEqual(total["request_count"], 4)
+        self.assertAlmostEqual(total["total_cost"], 2.0)
+        self.assertEqual(total["avg_tokens_per_request"], 250)
+
+        by_model = summarize_token_usage(group_by="model")
+        self.assertEqual(
+            [(row["model"], row["total_tokens"], row["request_count"]) for row in by_model],
+            [("gpt", 700, 3), ("other", 300, 1)],
+        )
+
+    def test_partial_hours_read_from_records(self):
+        """Test that a range starting or ending within an hour only counts the records inside it."""
+        self._record_at(self.hour + datetime.timedelta(minutes=5), 100)
+        self._record_at(self.hour + datetime.timedelta(minutes=50), 200)
+        self._record_at(self.hour + datetime.timedelta(hours=1, minutes=5), 300)
+        self._record_at(self.hour + datetime.timedelta(hours=2, minutes=30), 400)
+        rollup_token_usage()
+
+        summary = summarize_token_usage(
+            date_from=self.hour + datetime.timedelta(minutes=30),
+            date_to=self.hour + datetime.timedelta(hours=2, minutes=30),
+        )
+        self.assertEqual(summary[0]["total_tokens"], 900)
+        self.assertEqual(summary[0]["request_count"], 3)
+
+        summary = summarize_token_usage(
+            date_from=self.hour + datetime.timedelta(minutes=1),
+            date_to=self.hour + datetime.timedelta(minutes=10),
+        )
+        self.assertEqual(summary[0]["total_tokens"], 100)
+
+        self.assertEqual(summarize_token_usage(date_from=timezone.now()), [])
+
+    def test_range_bounds_in_fractional_offset_time_zone(self):
+        """Test that bounds are aligned on UTC hours, whatever the time zone they are given in."""
+        self._record_at(self.hour + datetime.timedelta(minutes=5), 100)
+        self._record_at(self.hour + datetime.timedelta(minutes=50), 200)
+        self._record_at(self.hour + datetime.timedelta(hours=1, minutes=5), 300)
+        rollup_token_usage()
+
+        # A whole hour in Kolkata (UTC+05:30) starts in the middle of a UTC hour
+        date_from = (self.hour + datetime.timedelta(minutes=30)).astimezone(zoneinfo.ZoneInfo("Asia/Kolkata"))
+        self.assertEqual(date_from.minute, 0)
+
+        (total,) = summarize_token_usage(date_from=date_from)
+        self.assertEqual(total["total_tokens"], 500)
+        self.assertEqual(total["request_count"], 2)
+
+    def test_missing_agent_grouped_and_filtered_as_one(self):
+        """Test that records without an agent match the buckets they were rolled up into."""
+        TokenUsage.objects.filter(pk=self._record_at(self.hour, 100).pk).update(agent_id=None)
+        rollup_token_usage()
+        TokenUsage.objects.filter(pk=self._record_at(self.hour, 200).pk).update(agent_id=None)
+
+        by_agent = summarize_token_usage(group_by="agent")
+        self.assertEqual([(row["agent_id"], row["total_tokens"]) for row in by_agent], [("", 300)])
+
+        for agent_id in (None, ""):
+            (total,) = summarize_token_usage(filters={"agent_id": agent_id})
+            self.assertEqual(total["total_tokens"], 300)
+
+
+class PricingRegistryTest(TestCase):
+    """Test that agent usage is priced from the in-process registry."""
+
+    def setUp(self):
+        pricing_registry.clear()
+        self.user = User.objects.create_user(username="user", email="user@test.com", password="pass")
+        self.model = ModelProvider.objects.create(
+            provider="openai", model_name="gpt-test", input_cost_per_1M=1.0, output_cost_per_1M=2.0
+        )
+        self.agent = Agent.objects.create(user=self.user, name="Pricing agent", model=self.model)
+
+    def tearDown(self):
+        pricing_registry.clear()
+
+    def _record(self, request_id):
+        return record_agent_token_usage(
+            user=self.user,
+            agent_id=self.agent.agent_id,
+            metrics={"input_tokens": [1000000], "output_tokens": 500000},
+            chat_name="chat",
+            user_msg="question",
+            assistant_msg="answer",
+            session_id="session",
+            request_id=request_id,
+        )
+
+    def test_compute_cost(self):
+        """Test the cost of a response from the model prices per million tokens."""
+        pricing = ModelPricing(provider="openai", model_name="gpt", input_cost_per_1M=1.0, output_cost_per_1M=4.0)
+
+        self.assertAlmostEqual(compute_cost(pricing, 500000, 250000), 1.5)
+        self.assertEqual(compute_cost(None, 500000, 250000), 0.0)
+
+    def test_recording_reads_no_agent_or_model_rows_once_warm(self):
+        """Test that only the idempotency lookup and the insert hit the database once warm."""
+        usage = self._record("request-1")
+        self.assertEqual(
+            (usage.model_provider, usage.model_name, usage.agent_name), ("openai", "gpt-test", "Pricing agent")
+        )
+        self.assertEqual(usage.input_tokens, 1000000)
+        self.assertAlmostEqual(usage.cost, 2.0)
+
+        with self.assertNumQueries(2):
+            self._record("request-2")
+
+    def test_model_provider_change_invalidates_pricing(self):
+        """Test that saving a model provider is reflected in the next recorded cost."""
+        self._record("request-1")
+
+        self.model.input_cost_per_1M = 3.0
+        self.model.save()
+
+        self.assertAlmostEqual(self._record("request-2").cost, 4.0)
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+    def test_changes_reach_other_processes_through_the_shared_cache(self):
+        """Test that a registry in another process reloads pricing once the change commits."""
+        other_process = PricingRegistry()
+        self.assertEqual(other_process.get_pricing(self.model.id).input_cost_per_1M, 1.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.model.input_cost_per_1M = 3.0
+            self.model.save()
+            self.assertEqual(other_process.get_pricing(self.model.id).input_cost_per_1M, 1.0)
+
+        self.assertEqual(other_process.get_pricing(self.model.id).input_cost_per_1M, 3.0)
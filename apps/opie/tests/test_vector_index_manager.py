@@ -0,0 +1,199 @@
+"""
+Tests for the ANN index planning, builds and search settings of the vector index manager.
+"""
+
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from apps.opie.services import vector_index_manager
+from apps.opie.services.vector_index_manager import (
+    EXACT,
+    HNSW,
+    IVFFLAT,
+    AnnIndex,
+    IndexPlan,
+    VectorTable,
+    build_index,
+    index_sql,
+    invalidate_search_settings,
+    manage_vector_indexes,
+    nearest_sql,
+    pick_search_value,
+    plan_index,
+    rebuild_reason,
+    search_settings,
+)
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def _mock_connection():
+    connection = mock.MagicMock()
+    cursor = connection.cursor.return_value.__enter__.return_value
+    return connection, cursor
+
+
+def _executed(cursor):
+    return [call.args[0] for call in cursor.execute.call_args_list]
+
+
+@override_settings(OPIE_VECTOR_INDEX_MIN_ROWS=10_000, OPIE_VECTOR_INDEX_HNSW_MAX_ROWS=2_000_000)
+class VectorIndexPlanTest(SimpleTestCase):
+    """Test the index chosen for a table size and when an index gets rebuilt."""
+
+    def test_plan_by_row_count(self):
+        """Test that small tables get no index, then HNSW, then ivfflat with lists = sqrt(rows)."""
+        self.assertEqual(plan_index(1_000, 1536).method, EXACT)
+        self.assertEqual(plan_index(50_000, 1536), IndexPlan(HNSW, "50000 rows", m=16, ef_construction=64))
+        plan = plan_index(10_000_000, 1536)
+        self.assertEqual((plan.method, plan.lists), (IVFFLAT, 3162))
+        self.assertEqual(plan_index(10_000_000, 3072).method, EXACT)
+
+    def test_rebuild_reason(self):
+        """Test that only a single valid index of the planned method and size is kept."""
+        table = VectorTable("ai", "kb_docs", 1536, 10_000_000)
+        plan = plan_index(table.rows, table.dimensions)
+
+        table.indexes = [AnnIndex("kb_docs_embedding_idx", IVFFLAT, {"lists": 100})]
+        self.assertEqual(rebuild_reason(table, plan), "ivfflat lists = 100, 3162 planned")
+        table.indexes = [AnnIndex("kb_docs_embedding_ann_idx", IVFFLAT, {"lists": 2500})]
+        self.assertIsNone(rebuild_reason(table, plan))
+        table.indexes.append(AnnIndex("kb_docs_embedding_ann_new", HNSW, {}, valid=False))
+        self.assertEqual(rebuild_reason(table, plan), "1 valid ANN indexes of 2")
+
+        small = VectorTable("ai", "kb_small", 1536, 500, [AnnIndex("kb_small_embedding_idx", IVFFLAT, {"lists": 100})])
+        self.assertEqual(rebuild_reason(small, plan_index(small.rows, small.dimensions)), "drop 1 ANN indexes")
+
+    def test_new_table_hnsw_index_kept(self):
+        """Test that the HNSW index built with a new table is kept while exact search is planned."""
+        table = VectorTable("ai", "data_kb_new", 1536, 500, [AnnIndex("data_kb_new_embedding_idx", HNSW, {})])
+
+        self.assertIsNone(rebuild_reason(table, plan_index(table.rows, table.dimensions)))
+        table.indexes = [AnnIndex("data_kb_new_embedding_idx", HNSW, {}, valid=False)]
+        self.assertEqual(rebuild_reason(table, plan_index(table.rows, table.dimensions)), "drop 1 ANN indexes")
+
+    def test_index_sql(self):
+        """Test that indexes are built concurrently with the planned parameters."""
+        table = VectorTable("ai", "kb_docs", 1536, 10_000_000)
+
+        self.assertEqual(
+            index_sql(table, plan_index(table.rows, 1536), "kb_docs_embedding_ann_new"),
+            'CREATE INDEX CONCURRENTLY "kb_docs_embedding_ann_new" ON "ai"."kb_docs" '
+            "USING ivfflat (embedding vector_cosine_ops) WITH (lists = 3162)",
+        )
+
+    @override_settings(OPIE_VECTOR_BINARY_RERANK_FACTOR=4)
+    def test_storage_layouts(self):
+        """Test the index expression, dimension limit and query of the halfvec and binary layouts."""
+        halfvec = VectorTable("ai", "kb_docs_f16", 3072, 50_000, storage="halfvec")
+        plan = plan_index(halfvec.rows, halfvec.dimensions, halfvec.layout.max_index_dimensions)
+        self.assertIn("USING hnsw (embedding halfvec_cosine_ops)", index_sql(halfvec, plan, "new"))
+
+        binary = VectorTable("ai", "kb_docs_bq", 1536, 50_000, storage="binary_rerank")
+        self.assertIn(
+            "USING hnsw ((binary_quantize(embedding)::bit(1536)) bit_hamming_ops)", index_sql(binary, plan, "new")
+        )
+        binary.indexes = [AnnIndex("kb_docs_bq_embedding_ann_idx", HNSW, {})]
+        self.assertEqual(rebuild_reason(binary, plan), "binary quantization planned")
+        self.assertEqual(binary.candidates, 4)
+        self.assertIn("LIMIT %(candidates)s) candidates ORDER BY embedding <=>", nearest_sql(binary))
+        self.assertNotIn("binary_quantize", nearest_sql(binary, exact=True))
+
+
+class SearchValueTest(SimpleTestCase):
+    """Test the calibration values and the search value picked for a recall target."""
+
+    def test_search_values(self):
+        """Test that probes double up to lists, and ef_search is never under k."""
+        self.assertEqual(IndexPlan(IVFFLAT, "", lists=20).search_values(10), [1, 2, 4, 8, 16, 20])
+        self.assertEqual(IndexPlan(HNSW, "", m=16, ef_construction=64).search_values(25)[:3], [25, 40, 80])
+
+    def test_pick_smallest_value_reaching_target(self):
+        """Test that the smallest value reaching the target is used, else the largest measured."""
+        calibration = {"40": 0.97, "10": 0.81, "20": 0.92}
+
+        self.assertEqual(pick_search_value(calibration, 0.9), 20)
+        self.assertEqual(pick_search_value(calibration, 0.99), 40)
+        self.assertIsNone(pick_search_value({}, 0.9))
+
+
+class VectorIndexBuildTest(SimpleTestCase):
+    """Test the SQL of the index swap and the lock of the manager."""
+
+    def test_build_swaps_index_concurrently(self):
+        """Test that the new index is built under a temporary name before the old one is dropped."""
+        table = VectorTable("ai", "kb_docs", 1536, 50_000, [AnnIndex("kb_docs_embedding_idx", IVFFLAT, {"lists": 100})])
+        connection, cursor = _mock_connection()
+
+        with mock.patch.object(vector_index_manager, "connection", connection):
+            build_index(table, plan_index(table.rows, table.dimensions))
+
+        statements = _executed(cursor)
+        self.assertEqual(statements[0], 'DROP INDEX CONCURRENTLY IF EXISTS "ai"."kb_docs_embedding_ann_new"')
+        self.assertTrue(statements[1].startswith('CREATE INDEX CONCURRENTLY "kb_docs_embedding_ann_new"'))
+        self.assertIn("USING hnsw", statements[1])
+        self.assertEqual(
+            statements[2:],
+            [
+                'DROP INDEX CONCURRENTLY IF EXISTS "ai"."kb_docs_embedding_idx"',
+                'ALTER INDEX "ai"."kb_docs_embedding_ann_new" RENAME TO "kb_docs_embedding_ann_idx"',
+            ],
+        )
+
+    def test_exact_plan_only_drops(self):
+        """Test that an exact search plan drops the ANN indexes without building one."""
+        table = VectorTable("ai", "kb_small", 1536, 500, [AnnIndex("kb_small_embedding_idx", IVFFLAT, {"lists": 100})])
+        connection, cursor = _mock_connection()
+
+        with mock.patch.object(vector_index_manager, "connection", connection):
+            build_index(table, plan_index(table.rows, table.dimensions))
+
+        self.assertEqual(
+            _executed(cursor),
+            [
+                'DROP INDEX CONCURRENTLY IF EXISTS "ai"."kb_small_embedding_ann_new"',
+                'DROP INDEX CONCURRENTLY IF EXISTS "ai"."kb_small_embedding_idx"',
+            ],
+        )
+
+    def test_run_skipped_while_locked(self):
+        """Test that the transaction-level lock is taken on its own connection, and released with it."""
+        lock_connection, cursor = _mock_connection()
+        cursor.fetchone.return_value = (False,)
+
+        with (
+            mock.patch.object(vector_index_manager.connections, "create_connection", return_value=lock_connection),
+            mock.patch.object(vector_index_manager, "find_vector_tables") as find_vector_tables,
+        ):
+            self.assertEqual(manage_vector_indexes(), [])
+
+        self.assertIn("pg_try_advisory_xact_lock", _executed(cursor)[0])
+        lock_connection.set_autocommit.assert_called_once_with(False)
+        lock_connection.rollback.assert_called_once()
+        lock_connection.close.assert_called_once()
+        find_vector_tables.assert_not_called()
+
+
+@override_settings(CACHES=LOCMEM_CACHE, OPIE_VECTOR_INDEX_CALIBRATION_CACHE_TTL=600)
+class SearchSettingsCacheTest(SimpleTestCase):
+    """Test that query settings reuse the cached calibration until a build is recorded."""
+
+    def test_calibration_cached_until_build(self):
+        """Test that the builds are read once per table, and again after a new build."""
+        vector_index_manager.cache.clear()
+        build = SimpleNamespace(search_parameter="hnsw.ef_search", calibration={"40": 0.91, "80": 0.97})
+
+        with (
+            mock.patch("apps.opie.models.VectorIndexBuild.objects") as objects,
+            mock.patch.object(vector_index_manager.transaction, "on_commit", side_effect=lambda callback: callback()),
+        ):
+            objects.filter.return_value.exclude.return_value.order_by.return_value.first.return_value = build
+            self.assertEqual(search_settings("kb_docs", 0.95), {"hnsw.ef_search": 80})
+            self.assertEqual(search_settings("kb_docs", 0.9), {"hnsw.ef_search": 40})
+            self.assertEqual(objects.filter.call_count, 1)
+
+            invalidate_search_settings("data_kb_docs")
+            self.assertEqual(search_settings("kb_docs", 0.95), {"hnsw.ef_search": 80})
+            self.assertEqual(objects.filter.call_count, 2)
@@ -0,0 +1,195 @@
+"""
+Page-level PDF text extraction.
+
+The PDF is parsed from memory, without a temporary file. Documents are extracted in the
+calling process, one page at a time as the iterator is consumed, unless the pool is
+enabled (``OPIE_PDF_EXTRACTION_WORKERS`` above 1), the document has at least
+``OPIE_PDF_PARALLEL_MIN_PAGES`` pages and the character budget, estimated from the first
+page, needs at least as many. The remaining pages are then split into a few batches
+extracted by a long-lived pool of worker processes, shared by all extractions of the
+process. A worker parses each document once, whichever of its batches it runs.
+
+Pages are yielded in order. Extraction stops as soon as the yielded text reaches the
+character budget, and the batches not started yet are cancelled.
+
+This module only depends on pypdf, so the pool workers start without loading Django.
+"""
+
+import hashlib
+import io
+import math
+import multiprocessing
+import threading
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+
+import pypdf
+
+BATCH_SIZE = 8
+
+
+@dataclass(frozen=True)
+class PdfPage:
+    number: int
+    text: str
+    error: str | None = None
+
+
+def _extract_page(reader: pypdf.PdfReader, index: int) -> PdfPage:
+    try:
+        return PdfPage(number=index + 1, text=reader.pages[index].extract_text() or "")
+    except Exception as e:
+        return PdfPage(number=index + 1, text="", error=str(e))
+
+
+# State of a pool worker: the last document it parsed, by content digest
+_worker_document: tuple[str, pypdf.PdfReader] | None = None
+
+
+def _extract_batch(digest: str, content: bytes, start: int, stop: int) -> list[PdfPage]:
+    global _worker_document
+    if _worker_document is None or _worker_document[0] != digest:
+        _worker_document = (digest, pypdf.PdfReader(io.BytesIO(content)))
+    return [_extract_page(_worker_document[1], index) for index in range(start, stop)]
+
+
+def _get_mp_context():
+    # Forking a process running threads (ASGI server, thread pools) is unsafe
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+_executor: ProcessPoolExecutor | None = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    """The process pool shared by the extractions of this process, started on first use."""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=_get_mp_context())
+            _executor_workers = workers
+        return _executor
+
+
+def _discard_executor(executor: ProcessPoolExecutor):
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_pdf_pages(
+    content: bytes,
+    max_chars: int | None = None,
+    workers: int | None = None,
+    min_parallel_pages: int | None = None,
+) -> Iterator[PdfPage]:
+    """
+    Yield the pages of a PDF in order, stopping after the page where the total length of
+    the texts yielded reaches ``max_chars``.
+    """
+    from django.conf import settings
+
+    workers = workers if workers is not None else settings.OPIE_PDF_EXTRACTION_WORKERS
+    if min_parallel_pages is None:
+        min_parallel_pages = settings.OPIE_PDF_PARALLEL_MIN_PAGES
+
+    pages = _iter_pages(content, max_chars, workers, min_parallel_pages)
+
+    total_chars = 0
+    try:
+        for page in pages:
+            yield page
+            total_chars += len(page.text)
+            if max_chars is not None and total_chars >= max_chars:
+                return
+    finally:
+        pages.close()
+
+
+def _iter_pages(content: bytes, max_chars: int | None, workers: int, min_parallel_pages: int) -> Iterator[PdfPage]:
+    reader = pypdf.PdfReader(io.BytesIO(content))
+    page_count = len(reader.pages)
+    next_index = 0
+    if workers > 1 and page_count >= min_parallel_pages:
+        first_page = _extract_page(reader, 0)
+        yield first_page
+        next_index = 1
+        # Pages the budget needs, if the other pages are about as long as the first one
+        pages_needed = page_count if max_chars is None else math.ceil(max_chars / max(len(first_page.text), 1))
+        if pages_needed >= min_parallel_pages:
+            pool_pages = _iter_pages_in_pool(content, next_index, page_count, workers)
+            try:
+                for page in pool_pages:
+                    yield page
+                    next_index = page.number
+            finally:
+                pool_pages.close()
+    for index in range(next_index, page_count):
+        yield _extract_page(reader, index)
+
+
+def _iter_pages_in_pool(content: bytes, start: int, page_count: int, workers: int) -> Iterator[PdfPage]:
+    """
+    Yield pages ``start`` to ``page_count`` extracted by the pool, stopping early if the pool
+    breaks (the caller extracts the remaining pages itself).
+    """
+    executor = _get_executor(workers)
+    digest = hashlib.sha256(content).hexdigest()
+    # A few large batches, each sending the content once, with a bounded window in flight
+    batch_size = max(BATCH_SIZE, math.ceil((page_count - start) / (workers * 2)))
+    batches = ((first, min(first + batch_size, page_count)) for first in range(start, page_count, batch_size))
+    in_flight = deque()
+    try:
+        for batch in batches:
+            in_flight.append(executor.submit(_extract_batch, digest, content, *batch))
+            if len(in_flight) >= workers * 2:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+    except BrokenProcessPool:
+        _discard_executor(executor)
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+
+def synthetic_pdf(page_count: int, chars_per_page: int = 2000) -> bytes:
+    """A PDF of ``page_count`` pages of text, for tests and benchmarks."""
+    from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+    writer = pypdf.PdfWriter()
+    font = DictionaryObject(
+        {
+            NameObject("/Type"): NameObject("/Font"),
+            NameObject("/Subtype"): NameObject("/Type1"),
+            NameObject("/BaseFont"): NameObject("/Helvetica"),
+        }
+    )
+    font_ref = writer._add_object(font)
+    words_per_line = 12
+    for number in range(1, page_count + 1):
+        page = writer.add_blank_page(width=612, height=792)
+        words = [f"page{number}word{i}" for i in range(chars_per_page // 12)]
+        lines = [" ".join(words[i : i + words_per_line]) for i in range(0, len(words), words_per_line)]
+        operations = ["BT", "/F1 6 Tf", "8 TL", "36 756 Td"]
+        operations += [f"({line}) Tj T*" for line in lines]
+        operations.append("ET")
+        stream = DecodedStreamObject()
+        stream.set_data("\n".join(operations).encode("latin-1"))
+        page[NameObject("/Contents")] = writer._add_object(stream)
+        page[NameObject("/Resources")] = DictionaryObject(
+            {NameObject("/Font"): DictionaryObject({NameObject("/F1"): font_ref})}
+        )
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
@@ -1,17 +1,22 @@
-from typing import Optional
-from apps.opie.models import TokenUsage, ModelProvider, UserTokenSummary, TeamTokenSummary
-from apps.opie.models import Agent as DjangoAgent
+import calendar
+import datetime
+import logging
+from decimal import Decimal
+from apps.opie.models import TokenUsage, TokenUsageBucket, UserTokenSummary, TeamTokenSummary
+from apps.opie.services.pricing_registry import compute_cost, pricing_registry
 from apps.users.models import CustomUser
 from apps.teams.models import Team
 from django.contrib.auth import get_user_model
-from typing import Dict, List, Optional, Union
-from django.db import transaction
-from django.db.models import F
+from typing import Dict, List, Optional
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncHour
 from django.utils import timezone
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
+
 
-@transaction.atomic
 def create_token_usage_record(
     user: Optional[CustomUser],
     session_id: str,
@@ -28,6 +33,13 @@ def create_token_usage_record(
     cost: float,
     request_id: Optional[str] = None,
 ):
+    """
+    Record the token usage of one response as a single append-only insert.
+
+    The user and team summaries are not touched here: ``rollup_token_usage`` folds new
+    records into them periodically, so concurrent responses of a team never wait on the
+    same summary row.
+    """
 
     team = None
     if user and hasattr(user, "team"):
@@ -55,26 +67,6 @@ def create_token_usage_record(
         request_id=request_id,
         cost=cost, 
     )
-    usersummary, _ = UserTokenSummary.objects.select_for_update().get_or_create(
-        user=user,
-        defaults=dict(
-            period_start=timezone.now().date().replace(day=1),
-        ),
-    )
-    cost=0.0
-    UserTokenSummary.objects.filter(pk=usersummary.pk).update(
-        total_tokens=F("total_tokens") + total_tokens,
-        cost=F("cost") + (cost or 0.0),
-    )
-
-    if team:
-        teamsummary, _ = TeamTokenSummary.objects.select_for_update().get_or_create(
-            team=team
-        )
-        TeamTokenSummary.objects.filter(pk=teamsummary.pk).update(
-            total_tokens=F("total_tokens") + total_tokens,
-            cost=F("cost") + (cost or 0.0),
-        )
     # def _enqueue():
     #     enrich_usage_cost.delay(usage_id=usage.id)
     #     notify_threshold_if_needed.delay(team=team.id)
@@ -82,6 +74,134 @@ def create_token_usage_record(
     return usage
 
 
+def _current_period():
+    today = timezone.now().date()
+    return today.replace(day=1), today.replace(day=calendar.monthrange(today.year, today.month)[1])
+
+
+def _summary_delta(cost):
+    return Decimal(str(round(cost or 0.0, 6)))
+
+
+BUCKET_KEY_FIELDS = ("team_id", "user_id", "agent_id", "model_provider", "model_name", "bucket_start")
+
+
+def _fold_into_buckets(records):
+    """Add the records to their hourly buckets, creating the buckets that don't exist yet."""
+    deltas = (
+        records.values(
+            "team_id",
+            "user_id",
+            "model_provider",
+            "model_name",
+            agent=Coalesce("agent_id", Value("")),
+            bucket=TruncHour("created_at", tzinfo=datetime.timezone.utc),
+        )
+        .annotate(
+            input=Sum("input_tokens"),
+            output=Sum("output_tokens"),
+            total=Sum("total_tokens"),
+            total_cost=Sum("cost"),
+            requests=Count("id"),
+        )
+        .order_by()
+    )
+    for delta in deltas:
+        key = dict(
+            team_id=delta["team_id"],
+            user_id=delta["user_id"],
+            agent_id=delta["agent"],
+            model_provider=delta["model_provider"],
+            model_name=delta["model_name"],
+            bucket_start=delta["bucket"],
+        )
+        if _add_to_bucket(key, delta):
+            continue
+        try:
+            with transaction.atomic():
+                TokenUsageBucket.objects.create(
+                    **key,
+                    input_tokens=delta["input"],
+                    output_tokens=delta["output"],
+                    total_tokens=delta["total"],
+                    cost=delta["total_cost"] or 0.0,
+                    request_count=delta["requests"],
+                )
+        except IntegrityError:
+            # A concurrent rollup created the bucket first
+            _add_to_bucket(key, delta)
+
+
+def _add_to_bucket(key, delta):
+    """Add a delta to an existing bucket, returning whether the bucket exists."""
+    return TokenUsageBucket.objects.filter(**key).update(
+        input_tokens=F("input_tokens") + delta["input"],
+        output_tokens=F("output_tokens") + delta["output"],
+        total_tokens=F("total_tokens") + delta["total"],
+        cost=F("cost") + (delta["total_cost"] or 0.0),
+        request_count=F("request_count") + delta["requests"],
+        updated_at=timezone.now(),
+    )
+
+
+def rollup_token_usage(batch_size: int = 5000, user: Optional[User] = None) -> int:
+    """
+    Fold token usage records that were not rolled up yet into the user and team summaries
+    and the hourly usage buckets, in batches. Records are claimed with SKIP LOCKED so concurrent rollups never count a
+    record twice, and each summary row is written once per batch. Only the records of
+    ``user`` are rolled up when given. Returns the number of records rolled up.
+    """
+    pending = TokenUsage.objects.filter(rolled_up=False)
+    if user is not None:
+        pending = pending.filter(user=user)
+
+    rolled_up = 0
+    while True:
+        with transaction.atomic():
+            ids = list(pending.select_for_update(skip_locked=True).order_by().values_list("id", flat=True)[:batch_size])
+            if not ids:
+                break
+            records = TokenUsage.objects.filter(id__in=ids).order_by()
+
+            period_start, period_end = _current_period()
+            for delta in (
+                records.filter(user__isnull=False)
+                .values("user_id")
+                .annotate(tokens=Sum("total_tokens"), total_cost=Sum("cost"))
+            ):
+                summary, _ = UserTokenSummary.objects.get_or_create(
+                    user_id=delta["user_id"],
+                    defaults=dict(period_start=period_start, period_end=period_end),
+                )
+                UserTokenSummary.objects.filter(pk=summary.pk).update(
+                    total_tokens=F("total_tokens") + delta["tokens"],
+                    cost=F("cost") + _summary_delta(delta["total_cost"]),
+                    updated_at=timezone.now(),
+                )
+
+            for delta in (
+                records.filter(team__isnull=False)
+                .values("team_id")
+                .annotate(tokens=Sum("total_tokens"), total_cost=Sum("cost"))
+            ):
+                summary, _ = TeamTokenSummary.objects.get_or_create(team_id=delta["team_id"])
+                TeamTokenSummary.objects.filter(pk=summary.pk).update(
+                    total_tokens=F("total_tokens") + delta["tokens"],
+                    cost=F("cost") + _summary_delta(delta["total_cost"]),
+                    updated_at=timezone.now(),
+                )
+
+            _fold_into_buckets(records)
+            records.update(rolled_up=True)
+        rolled_up += len(ids)
+        if len(ids) < batch_size:
+            break
+
+    if rolled_up:
+        logger.info(f"Rolled up {rolled_up} token usage records")
+    return rolled_up
+
+
 def record_agent_token_usage(
     user: User,
     agent_id: str,
@@ -92,23 +212,23 @@ def record_agent_token_usage(
     session_id: Optional[str] = None,
     request_id: Optional[str] = None,
 ) -> Optional[TokenUsage]:
+    """
+    Record the token usage of an agent response from its run metrics. The agent and model
+    metadata come from the in-process pricing registry, so no rows are read to price it.
+    """
 
     if not metrics:
         return None
-    
-    agent = DjangoAgent.objects.get(agent_id=agent_id)
+
+    agent = pricing_registry.get_agent(agent_id)
     agent_name = agent.name
     if not agent_id:
-        agent_name = ""    
-    model = ModelProvider.objects.get(id = agent.model_id)
-    
+        agent_name = ""
+    pricing = pricing_registry.get_pricing(agent.model_id)
+
     input_tokens = metrics.get("input_tokens", 0)
     output_tokens = metrics.get("output_tokens", 0)
     total_tokens = metrics.get("total_tokens", 0)
-    input_cost = model.input_cost_per_1M * input_tokens / 1000000
-    output_cost = model.output_cost_per_1M * output_tokens / 1000000
-
-    cost = input_cost + output_cost
 
     if isinstance(input_tokens, list):
         prompt_tokens = sum(input_tokens)
@@ -132,13 +252,119 @@ def record_agent_token_usage(
         input_tokens=prompt_tokens,
         output_tokens=completion_tokens,
         total_tokens=total_tokens,
-        model_provider=model.provider,
-        model_name=model.model_name,
+        model_provider=pricing.provider if pricing else "",
+        model_name=pricing.model_name if pricing else "",
         session_id=session_id,
         agent_id=agent_id,
         agent_name=agent_name,
         user_msg=user_msg,
         assistant_msg=assistant_msg,
         request_id=request_id,
-        cost = cost,
+        cost=compute_cost(pricing, prompt_tokens, completion_tokens),
     )
+
+
+# Group keys of usage summaries: (bucket fields, raw record fields, output names). Records
+# have no agent as NULL and buckets as "", so records are grouped on ``agent`` (see
+# ``summarize_token_usage``) to put both in the same group.
+SUMMARY_GROUPS = {
+    "user": (("user_id", "user__email"), ("user_id", "user__email"), ("user__id", "user__email")),
+    "team": (("team_id", "team__name"), ("team_id", "team__name"), ("team__id", "team__name")),
+    "agent": (("agent_id",), ("agent",), ("agent_id",)),
+    "provider": (("model_provider",), ("model_provider",), ("provider",)),
+    "model": (("model_name",), ("model_name",), ("model",)),
+}
+
+
+def _floor_hour(value):
+    # Buckets are UTC hours, which don't line up with local hours in zones with a
+    # fractional offset
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value.astimezone(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _ceil_hour(value):
+    floored = _floor_hour(value)
+    return floored if floored == value else floored + datetime.timedelta(hours=1)
+
+
+def summarize_token_usage(
+    filters: Optional[Dict] = None,
+    date_from: Optional[datetime.datetime] = None,
+    date_to: Optional[datetime.datetime] = None,
+    group_by: Optional[str] = None,
+) -> List[Dict]:
+    """
+    Token usage totals, grouped by one of ``SUMMARY_GROUPS`` or overall when ``group_by`` is
+    None, for the records matching ``filters`` (lookups valid on both TokenUsage and
+    TokenUsageBucket) and created between ``date_from`` and ``date_to`` (inclusive).
+
+    Hours entirely within the range are read from the hourly buckets. The raw table is only
+    read for the records not rolled up yet and for the partial hours at both ends of the
+    range, so the cost does not grow with the retained history.
+    """
+    filters = dict(filters or {})
+    bucket_fields, record_fields, output_fields = SUMMARY_GROUPS[group_by] if group_by else ((), (), ())
+
+    records = TokenUsage.objects.annotate(agent=Coalesce("agent_id", Value("")))
+    if "agent_id" in filters:
+        agent_id = filters.pop("agent_id") or ""
+        buckets = TokenUsageBucket.objects.filter(agent_id=agent_id, **filters)
+        records = records.filter(agent=agent_id, **filters)
+    else:
+        buckets = TokenUsageBucket.objects.filter(**filters)
+        records = records.filter(**filters)
+    pending = Q(rolled_up=False)
+    if date_from:
+        aligned_from = _ceil_hour(date_from)
+        buckets = buckets.filter(bucket_start__gte=aligned_from)
+        records = records.filter(created_at__gte=date_from)
+        pending |= Q(created_at__lt=aligned_from)
+    if date_to:
+        aligned_to = _floor_hour(date_to)
+        buckets = buckets.filter(bucket_start__lt=aligned_to)
+        records = records.filter(created_at__lte=date_to)
+        pending |= Q(created_at__gte=aligned_to)
+    records = records.filter(pending)
+
+    totals = {}
+    parts = (
+        (buckets, bucket_fields, Sum("request_count")),
+        (records, record_fields, Count("id")),
+    )
+    for queryset, fields, request_count in parts:
+        aggregates = dict(
+            total_tokens=Sum("total_tokens"),
+            prompt_tokens=Sum("input_tokens"),
+            completion_tokens=Sum("output_tokens"),
+            total_cost=Sum("cost"),
+            request_count=request_count,
+        )
+        if fields:
+            rows = queryset.order_by().values(*fields).annotate(**aggregates)
+        else:
+            rows = [queryset.aggregate(**aggregates)]
+        for row in rows:
+            key = tuple(row[field] for field in fields)
+            total = totals.setdefault(
+                key,
+                dict(
+                    zip(output_fields, key, strict=True),
+                    total_tokens=0,
+                    prompt_tokens=0,
+                    completion_tokens=0,
+                    total_cost=0.0,
+                    request_count=0,
+                ),
+            )
+            total["total_tokens"] += row["total_tokens"] or 0
+            total["prompt_tokens"] += row["prompt_tokens"] or 0
+            total["completion_tokens"] += row["completion_tokens"] or 0
+            total["total_cost"] += row["total_cost"] or 0.0
+            total["request_count"] += row["request_count"] or 0
+
+    summary = [total for total in totals.values() if total["request_count"]]
+    for total in summary:
+        total["avg_tokens_per_request"] = total["total_tokens"] / total["request_count"]
+    return sorted(summary, key=lambda total: total["total_tokens"], reverse=True)
@@ -41,7 +41,7 @@ from slack_sdk import WebClient
 
 from apps.opie.agents.helpers.agent_helpers import get_schema
 from apps.opie.utils.gcs_utils import ingest_single_file
-from apps.opie.utils.token_usage import create_token_usage_record
+from apps.opie.utils.token_usage import SUMMARY_GROUPS, create_token_usage_record, summarize_token_usage
 from apps.slack_integration.models import SlackWorkspace
 
 # === External SDKs ===
@@ -3526,58 +3526,58 @@ class TokenUsageViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = TokenUsageSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = PageNumberPagination
-    
-    def get_queryset(self):
-        """Filter token usage based on user permissions and query parameters"""
-        queryset = TokenUsage.objects.select_related("user", "team").all()
-        
+
+    def get_usage_filters(self):
+        """Lookups restricting token usage to the user's permissions and the query parameters"""
+        filters = {}
+
         # Filter by team if user is not staff
         if not self.request.user.is_staff:
-            user_teams = self.request.user.teams.all()
-            queryset = queryset.filter(team__in=user_teams)
-        
-        # Apply filters
+            filters["team__in"] = self.request.user.teams.all()
+
         user_id = self.request.query_params.get("user_id")
         if user_id:
-            queryset = queryset.filter(user_id=user_id)
-        
+            filters["user_id"] = user_id
+
         team_id = self.request.query_params.get("team_id")
         if team_id:
-            queryset = queryset.filter(team_id=team_id)
-        
-        operation_type = self.request.query_params.get("operation_type")
-        if operation_type:
-            queryset = queryset.filter(operation_type=operation_type)
-        
+            filters["team_id"] = team_id
+
         provider = self.request.query_params.get("provider")
         if provider:
-            queryset = queryset.filter(provider=provider)
-        
+            filters["model_provider"] = provider
+
         model = self.request.query_params.get("model")
         if model:
-            queryset = queryset.filter(model=model)
-        
+            filters["model_name"] = model
+
+        return filters
+
+    def get_date_param(self, name):
+        """Parse an ISO datetime query parameter, None if missing or invalid"""
+        from django.utils.dateparse import parse_datetime
+
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            return parse_datetime(value)
+        except (ValueError, TypeError):
+            return None
+
+    def get_queryset(self):
+        """Filter token usage based on user permissions and query parameters"""
+        queryset = TokenUsage.objects.select_related("user", "team").filter(**self.get_usage_filters())
+
         # Date range filtering
-        date_from = self.request.query_params.get("date_from")
+        date_from = self.get_date_param("date_from")
         if date_from:
-            try:
-                from django.utils.dateparse import parse_datetime
-                date_from = parse_datetime(date_from)
-                if date_from:
-                    queryset = queryset.filter(created_at__gte=date_from)
-            except (ValueError, TypeError):
-                pass
-        
-        date_to = self.request.query_params.get("date_to")
+            queryset = queryset.filter(created_at__gte=date_from)
+
+        date_to = self.get_date_param("date_to")
         if date_to:
-            try:
-                from django.utils.dateparse import parse_datetime
-                date_to = parse_datetime(date_to)
-                if date_to:
-                    queryset = queryset.filter(created_at__lte=date_to)
-            except (ValueError, TypeError):
-                pass
-        
+            queryset = queryset.filter(created_at__lte=date_to)
+
         return queryset.order_by("-created_at")
     
     @extend_schema(
@@ -3588,100 +3588,51 @@ class TokenUsageViewSet(viewsets.ReadOnlyModelViewSet):
                 name="group_by",
                 type=str,
                 location=OpenApiParameter.QUERY,
-                description="Group by field (user, team, operation_type, provider, model)",
-                enum=["user", "team", "operation_type", "provider", "model"]
+                description="Group by field (user, team, agent, provider, model)",
+                enum=["user", "team", "agent", "provider", "model"],
             ),
             OpenApiParameter(
-                name="date_from",
-                type=str,
-                location=OpenApiParameter.QUERY,
-                description="Start date (ISO format)"
+                name="date_from", type=str, location=OpenApiParameter.QUERY, description="Start date (ISO format)"
             ),
             OpenApiParameter(
-                name="date_to",
-                type=str,
-                location=OpenApiParameter.QUERY,
-                description="End date (ISO format)"
+                name="date_to", type=str, location=OpenApiParameter.QUERY, description="End date (ISO format)"
             ),
-        ]
+        ],
     )
     @action(detail=False, methods=["get"])
     def summary(self, request):
-        """Get aggregated token usage statistics"""
-        from django.db.models import Sum, Count, Avg
-        from django.db.models.functions import TruncDate
-        
-        queryset = self.get_queryset()
-        
-        # Date range filtering
-        date_from = request.query_params.get("date_from")
-        if date_from:
-            try:
-                from django.utils.dateparse import parse_datetime
-                date_from = parse_datetime(date_from)
-                if date_from:
-                    queryset = queryset.filter(created_at__gte=date_from)
-            except (ValueError, TypeError):
-                pass
-        
-        date_to = request.query_params.get("date_to")
-        if date_to:
-            try:
-                from django.utils.dateparse import parse_datetime
-                date_to = parse_datetime(date_to)
-                if date_to:
-                    queryset = queryset.filter(created_at__lte=date_to)
-            except (ValueError, TypeError):
-                pass
-        
-        group_by = request.query_params.get("group_by", "operation_type")
-        
+        """
+        Get aggregated token usage statistics, read from the hourly usage buckets plus the
+        records that are not in a bucket yet
+        """
+        date_from = self.get_date_param("date_from")
+        date_to = self.get_date_param("date_to")
+
+        group_by = request.query_params.get("group_by", "model")
+
         # Validate group_by field
-        valid_group_fields = ["user", "team", "operation_type", "provider", "model"]
+        valid_group_fields = list(SUMMARY_GROUPS)
         if group_by not in valid_group_fields:
             return Response(
                 {"error": f"Invalid group_by field. Must be one of: {valid_group_fields}"},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        # Aggregate data
-        if group_by == "user":
-            summary = queryset.values("user__email", "user__id").annotate(
-                total_tokens=Sum("total_tokens"),
-                prompt_tokens=Sum("prompt_tokens"),
-                completion_tokens=Sum("completion_tokens"),
-                total_cost=Sum("cost_usd"),
-                request_count=Count("id"),
-                avg_tokens_per_request=Avg("total_tokens")
-            ).order_by("-total_tokens")
-        elif group_by == "team":
-            summary = queryset.values("team__name", "team__id").annotate(
-                total_tokens=Sum("total_tokens"),
-                prompt_tokens=Sum("prompt_tokens"),
-                completion_tokens=Sum("completion_tokens"),
-                total_cost=Sum("cost_usd"),
-                request_count=Count("id"),
-                avg_tokens_per_request=Avg("total_tokens")
-            ).order_by("-total_tokens")
-        else:
-            summary = queryset.values(group_by).annotate(
-                total_tokens=Sum("total_tokens"),
-                prompt_tokens=Sum("prompt_tokens"),
-                completion_tokens=Sum("completion_tokens"),
-                total_cost=Sum("cost_usd"),
-                request_count=Count("id"),
-                avg_tokens_per_request=Avg("total_tokens")
-            ).order_by("-total_tokens")
-        
-        return Response({
-            "group_by": group_by,
-            "summary": list(summary),
-            "total_records": queryset.count(),
-            "date_range": {
-                "from": date_from,
-                "to": date_to
+
+        summary = summarize_token_usage(
+            filters=self.get_usage_filters(),
+            date_from=date_from,
+            date_to=date_to,
+            group_by=group_by,
+        )
+
+        return Response(
+            {
+                "group_by": group_by,
+                "summary": summary,
+                "total_records": sum(row["request_count"] for row in summary),
+                "date_range": {"from": date_from, "to": date_to},
             }
-        })
+        )
     
     @action(detail=False, methods=["get"], url_path="usersummary")
     def users_token_summary(self, request):
@@ -3716,9 +3667,6 @@ class TokenUsageViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=["get"], url_path="user")
     def user_token_by_user(self, request):
         """Get token usage records for a specific user"""
-        from django.db.models import Avg, Count, Sum
-        from django.utils.dateparse import parse_datetime
-
         user = self.request.user
         user_id = self.request.user.id
 
@@ -3731,18 +3679,6 @@ class TokenUsageViewSet(viewsets.ReadOnlyModelViewSet):
         try:
             queryset = self.get_queryset().filter(user_id=user_id)
 
-            date_from = request.query_params.get("date_from")
-            if date_from:
-                date_from = parse_datetime(date_from)
-                if date_from:
-                    queryset = queryset.filter(created_at__gte=date_from)
-
-            date_to = request.query_params.get("date_to")
-            if date_to:
-                date_to = parse_datetime(date_to)
-                if date_to:
-                    queryset = queryset.filter(created_at__lte=date_to)
-
             # Handle empty queryset
             if not queryset.exists():
                 return Response({
@@ -3754,17 +3690,16 @@ class TokenUsageViewSet(viewsets.ReadOnlyModelViewSet):
                     "records": []
                 })
 
-            stats = queryset.aggregate(
-                total_tokens=Sum("total_tokens"),
-                total_cost=Sum("cost"),
-                request_count=Count("id"),
+            totals = summarize_token_usage(
+                filters={**self.get_usage_filters(), "user_id": user_id},
+                date_from=self.get_date_param("date_from"),
+                date_to=self.get_date_param("date_to"),
             )
-            
-            # Ensure stats values are not None
+            totals = totals[0] if totals else {}
             stats = {
-                "total_tokens": stats.get("total_tokens") or 0,
-                "total_cost": stats.get("total_cost") or 0,
-                "request_count": stats.get("request_count") or 0,
+                "total_tokens": totals.get("total_tokens") or 0,
+                "total_cost": totals.get("total_cost") or 0,
+                "request_count": totals.get("request_count") or 0,
             }
             
             queryset = queryset.order_by("-created_at")
@@ -168,6 +168,11 @@ class Base(Configuration):
 
     DJANGO_API_KEY_FOR_LLAMAINDEX = env("SYSTEM_API_KEY", default="")
 
+    # Verified API keys are cached so service-to-service callbacks skip re-hashing the key.
+    # Shared (Redis) entries are dropped on revoke; process-local entries expire within seconds.
+    API_KEY_CACHE_TTL = env.int("API_KEY_CACHE_TTL", default=300)
+    API_KEY_LOCAL_CACHE_TTL = env.int("API_KEY_LOCAL_CACHE_TTL", default=5)
+
     # Quick-start development settings - unsuitable for production
     # See https://docs.djangoproject.com/en/stable/howto/deployment/checklist/
 
@@ -807,6 +812,21 @@ class Base(Configuration):
 
     CELERY_BROKER_URL = CELERY_RESULT_BACKEND = REDIS_URL
     CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+    # Periodic tasks, registered in the beat database by the bootstrap_celery_tasks command
+    SCHEDULED_TASKS = {
+        "rollup-token-usage": {
+            "task": "apps.opie.tasks.rollup_token_usage_task",
+            "schedule": timedelta(minutes=1),
+        },
+        "manage-vector-indexes": {
+            "task": "apps.opie.tasks.manage_vector_indexes_task",
+            "schedule": timedelta(hours=6),
+        },
+        "reconcile-document-versions": {
+            "task": "apps.docs.tasks.reconcile_document_versions",
+            "schedule": timedelta(hours=1),
+        },
+    }
     # Debug info without exposing sensitive data
     # print(f"CELERY_BROKER_URL configured: {REDIS_URL.split('@')[-1] if '@' in REDIS_URL else 'localhost'}")
     # print(f"CELERY_RESULT_BACKEND configured: {REDIS_URL.split('@')[-1] if '@' in REDIS_URL else 'localhost'}")
@@ -824,6 +844,11 @@ class Base(Configuration):
             },
         },
     }
+    # Group chat messages are written in batches of this many messages, or this many
+    # milliseconds after the first pending one
+    GROUP_CHAT_PERSIST_BATCH_SIZE = env.int("GROUP_CHAT_PERSIST_BATCH_SIZE", default=50)
+    GROUP_CHAT_PERSIST_INTERVAL_MS = env.int("GROUP_CHAT_PERSIST_INTERVAL_MS", default=250)
+    GROUP_CHAT_HISTORY_PAGE_SIZE = env.int("GROUP_CHAT_HISTORY_PAGE_SIZE", default=50)
 
     # Health Checks
     # A list of tokens that can be used to access the health check endpoint
@@ -949,6 +974,18 @@ class Base(Configuration):
     GOOGLE_CLIENT_SECRET = env("GOOGLE_CLIENT_SECRET", default="")
     GOOGLE_REDIRECT_URI = env("GOOGLE_REDIRECT_URI", default="http://localhost:8000/integrations/gdrive/oauth/callback/")
 
+    # === Google Drive Sync ===
+    # Number of files downloaded and uploaded to storage concurrently per sync
+    GOOGLE_DRIVE_SYNC_MAX_WORKERS = env.int("GOOGLE_DRIVE_SYNC_MAX_WORKERS", default=4)
+    # A queued or running sync that hasn't reported progress for this long is considered lost
+    GOOGLE_DRIVE_SYNC_STALE_MINUTES = env.int("GOOGLE_DRIVE_SYNC_STALE_MINUTES", default=30)
+    # Files registered per bulk insert during a sync
+    GOOGLE_DRIVE_SYNC_BATCH_SIZE = env.int("GOOGLE_DRIVE_SYNC_BATCH_SIZE", default=25)
+
+    # === Bulk File Import ===
+    # Concurrent storage uploads used by FileImportService
+    FILE_IMPORT_MAX_WORKERS = env.int("FILE_IMPORT_MAX_WORKERS", default=8)
+
     LOGGING = {
         "version": 1,
         "disable_existing_loggers": False,
@@ -1036,10 +1073,56 @@ class Base(Configuration):
     # === LlamaIndex Settings ===
     LLAMAINDEX_INGESTION_URL = env("CLOUD_RUN_BASE_URL", default="http://127.0.0.1:8080")
     SYSTEM_API_KEY = env("SYSTEM_API_KEY", default="")
+    # Seconds the in-process model pricing and agent metadata stay cached for token usage recording
+    OPIE_PRICING_REGISTRY_TTL = env.int("OPIE_PRICING_REGISTRY_TTL", default=300)
+    # Ephemeral chat attachments: parallel text extraction workers and extracted text cache lifetime
+    OPIE_ATTACHMENT_EXTRACTION_WORKERS = env.int("OPIE_ATTACHMENT_EXTRACTION_WORKERS", default=4)
+    OPIE_ATTACHMENT_TEXT_CACHE_TTL = env.int("OPIE_ATTACHMENT_TEXT_CACHE_TTL", default=60 * 60 * 24)
+    # How long a process extracting an attachment keeps other processes waiting for its result
+    OPIE_ATTACHMENT_EXTRACTION_CLAIM_TTL = env.int("OPIE_ATTACHMENT_EXTRACTION_CLAIM_TTL", default=120)
+    # PDFs of at least this many pages are extracted by a pool of worker processes, when the
+    # pool is enabled with more than one worker
+    OPIE_PDF_EXTRACTION_WORKERS = env.int("OPIE_PDF_EXTRACTION_WORKERS", default=1)
+    OPIE_PDF_PARALLEL_MIN_PAGES = env.int("OPIE_PDF_PARALLEL_MIN_PAGES", default=32)
+    # ANN indexes of the vector tables (see apps.opie.services.vector_index_manager): exact search
+    # under the minimum size, HNSW up to the maximum, ivfflat above; recall@k calibration sample
+    OPIE_VECTOR_INDEX_MIN_ROWS = env.int("OPIE_VECTOR_INDEX_MIN_ROWS", default=10_000)
+    OPIE_VECTOR_INDEX_HNSW_MAX_ROWS = env.int("OPIE_VECTOR_INDEX_HNSW_MAX_ROWS", default=2_000_000)
+    OPIE_VECTOR_INDEX_RECALL_K = env.int("OPIE_VECTOR_INDEX_RECALL_K", default=10)
+    OPIE_VECTOR_INDEX_RECALL_SAMPLE = env.int("OPIE_VECTOR_INDEX_RECALL_SAMPLE", default=50)
+    # How long queries reuse the last calibration of a table (dropped when a new one is recorded)
+    OPIE_VECTOR_INDEX_CALIBRATION_CACHE_TTL = env.int("OPIE_VECTOR_INDEX_CALIBRATION_CACHE_TTL", default=60 * 10)
+    # Binary-quantized vector storage: candidates found by Hamming distance and reranked, per result
+    OPIE_VECTOR_BINARY_RERANK_FACTOR = env.int("OPIE_VECTOR_BINARY_RERANK_FACTOR", default=4)
+    # Query embeddings cached per process (entries) and in Redis (seconds, 0 disables the tier)
+    OPIE_QUERY_EMBEDDING_CACHE_SIZE = env.int("OPIE_QUERY_EMBEDDING_CACHE_SIZE", default=2048)
+    OPIE_QUERY_EMBEDDING_CACHE_TTL = env.int("OPIE_QUERY_EMBEDDING_CACHE_TTL", default=60 * 60 * 24 * 7)
+    # Knowledge searches spanning several vector tables: shared search threads, and the deadline
+    # (milliseconds) after which the tables that haven't answered are left out
+    OPIE_FEDERATED_RETRIEVAL_WORKERS = env.int("OPIE_FEDERATED_RETRIEVAL_WORKERS", default=16)
+    OPIE_FEDERATED_RETRIEVAL_DEADLINE_MS = env.int("OPIE_FEDERATED_RETRIEVAL_DEADLINE_MS", default=2500)
+
+    # AgentOS metrics incremental rollups (see apps.opie.agentos.metrics_service)
+    AGENTOS_METRICS_ROLLUP_LAG_SECONDS = env.int("AGENTOS_METRICS_ROLLUP_LAG_SECONDS", default=60)
+    AGENTOS_METRICS_ROLLUP_INITIAL_DAYS = env.int("AGENTOS_METRICS_ROLLUP_INITIAL_DAYS", default=1)
+    AGENTOS_METRICS_MATERIALIZED_VIEW = env.bool("AGENTOS_METRICS_MATERIALIZED_VIEW", default=False)
 
     # Cache timeout for the footer view in seconds
     FRONTEND_FOOTER_VIEW_CACHE_TIMEOUT = 3600
 
+    # Cache timeout for generation-keyed document access data (readable paths, attachment index)
+    DOCS_ACCESS_CACHE_TIMEOUT = env.int("DOCS_ACCESS_CACHE_TIMEOUT", default=60 * 60)
+
+    # Document content cache (see apps.docs.content_cache)
+    DOCS_CONTENT_BACKEND = env("DOCS_CONTENT_BACKEND", default="apps.docs.content_cache.GCSContentBackend")
+    DOCS_CONTENT_FILESYSTEM_ROOT = env("DOCS_CONTENT_FILESYSTEM_ROOT", default=str(BASE_DIR / "media" / "docs"))
+    DOCS_CONTENT_LOCAL_CACHE_MAX_BYTES = env.int("DOCS_CONTENT_LOCAL_CACHE_MAX_BYTES", default=64 * 1024 * 1024)
+    DOCS_CONTENT_SHARED_CACHE_MAX_BYTES = env.int("DOCS_CONTENT_SHARED_CACHE_MAX_BYTES", default=4 * 1024 * 1024)
+    DOCS_CONTENT_CACHE_TIMEOUT = env.int("DOCS_CONTENT_CACHE_TIMEOUT", default=24 * 60 * 60)
+
+    # Page size of the document versions listing, served from the local version index
+    DOCUMENT_VERSIONS_PAGE_SIZE = env.int("DOCUMENT_VERSIONS_PAGE_SIZE", default=50)
+
     # OIDC Settings
     OIDC_RP_CLIENT_ID = env("OIDC_RP_CLIENT_ID", default="")
     OIDC_RP_CLIENT_SECRET = env("OIDC_RP_CLIENT_SECRET", default="")
@@ -1077,6 +1160,10 @@ class Base(Configuration):
     AI_BASE_URL = env("AI_BASE_URL", default=None)
     AI_MODEL = env("AI_MODEL", default=None)
     AI_ALLOW_REACH_FROM = env("AI_ALLOW_REACH_FROM", default="authenticated")
+    AI_PROVIDER = env("AI_PROVIDER", default="apps.docs.services.ai_providers.OpenAIProvider")
+    AI_RESPONSE_CACHE_TIMEOUT = env.int("AI_RESPONSE_CACHE_TIMEOUT", default=7 * 24 * 60 * 60)
+    AI_STREAM_MAX_CONCURRENCY_PER_USER = env.int("AI_STREAM_MAX_CONCURRENCY_PER_USER", default=2)
+    AI_STREAM_TIMEOUT = env.int("AI_STREAM_TIMEOUT", default=5 * 60)
     AI_DOCUMENT_RATE_THROTTLE_RATES = {
         "minute": 5,
         "hour": 100,
@@ -21,7 +21,7 @@ from llama_index.embeddings.openai import OpenAIEmbedding
 from llama_index.readers.gcs import GCSReader
 from llama_index.vector_stores.postgres import PGVectorStore
 from pydantic import BaseModel, Field
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.asyncio import create_async_engine
 from tqdm import tqdm
 
@@ -129,8 +129,33 @@ logger.setLevel(logging.INFO)
 IDEMPOTENCY_KEY_CACHE = {}
 
 
+# HNSW index of new vector tables: it needs no training data, so it is built on the empty table
+# and kept current by the inserts (ivfflat centroids computed from no rows would be useless).
+# Existing tables are left to the Django vector index manager (manage_vector_indexes), which
+# switches the index as the table grows.
+HNSW_INDEX_M = 16
+HNSW_INDEX_EF_CONSTRUCTION = 64
+HNSW_INDEX_EF_SEARCH = 40
+
+
+def new_table_hnsw_kwargs(engine, vector_table_name, use_halfvec=False):
+    """PGVectorStore ``hnsw_kwargs`` building the HNSW index, or None when the table already exists."""
+    with engine.connect() as conn:
+        exists = conn.execute(
+            text("SELECT to_regclass(:name) IS NOT NULL"), {"name": f'"{SCHEMA_NAME}"."data_{vector_table_name}"'}
+        ).scalar()
+    if exists:
+        return None
+    return {
+        "hnsw_m": HNSW_INDEX_M,
+        "hnsw_ef_construction": HNSW_INDEX_EF_CONSTRUCTION,
+        "hnsw_ef_search": HNSW_INDEX_EF_SEARCH,
+        "hnsw_dist_method": "halfvec_cosine_ops" if use_halfvec else "vector_cosine_ops",
+    }
+
+
 @lru_cache(maxsize=1)
-def get_vector_store(vector_table_name, current_embed_dim):
+def get_vector_store(vector_table_name, current_embed_dim, use_halfvec=False):
     # Async engine
     async_engine = create_async_engine(
         POSTGRES_URL.replace("postgresql://", "postgresql+asyncpg://"),
@@ -152,8 +177,10 @@ def get_vector_store(vector_table_name, current_embed_dim):
         async_engine=async_engine,
         table_name=vector_table_name,
         embed_dim=current_embed_dim,
+        use_halfvec=use_halfvec,
         schema_name=SCHEMA_NAME,
         perform_setup=True,
+        hnsw_kwargs=new_table_hnsw_kwargs(engine, vector_table_name, use_halfvec),
     )
 
 # === Utility Functions ===
@@ -308,6 +335,10 @@ class FileIngestRequest(BaseModel):
     strategy_config: dict[str, Any] | None = Field(None, description="Configuration for the selected chunking strategy.")
     batch_size: int | None = Field(20, description="Number of documents to process in each batch")
     progress_update_frequency: int | None = Field(10, description="Minimum percentage points between progress updates")
+    vector_storage: str = Field("vector", description="'vector', 'halfvec' or 'binary_rerank' (full vectors)")
+    embedding_dimensions: int | None = Field(
+        None, description="Keep only the first N dimensions of the embeddings (OpenAI text-embedding-3-*)"
+    )
 
     # ===== NEW METADATA FIELDS =====
     # Required metadata fields
@@ -399,12 +430,16 @@ def index_documents(docs, source: str, vector_table_name: str, embed_model):  #
     )
     # embedder = OpenAIEmbedding(model=EMBEDDING_MODEL, api_key=OPENAI_API_KEY) # Removed: embed_model is now passed
 
+    engine = create_engine(POSTGRES_URL)
+    hnsw_kwargs = new_table_hnsw_kwargs(engine, vector_table_name)
+    engine.dispose()
     vector_store = PGVectorStore(
         connection_string=POSTGRES_URL,
         async_connection_string=POSTGRES_URL.replace("postgresql://", "postgresql+asyncpg://"),
         table_name=vector_table_name,
         embed_dim=EMBED_DIM,
         schema_name=SCHEMA_NAME,
+        hnsw_kwargs=hnsw_kwargs,
     )
 
     storage_context = StorageContext.from_defaults(vector_store=vector_store)
@@ -542,7 +577,9 @@ async def process_single_file_stream(payload: FileIngestRequest, idempotency_key
         if payload.embedding_provider == "openai":
             if not OPENAI_API_KEY:
                 raise ValueError("OPENAI_API_KEY is not configured.")
-            embedder = OpenAIEmbedding(model=payload.embedding_model, api_key=OPENAI_API_KEY)
+            embedder = OpenAIEmbedding(
+                model=payload.embedding_model, api_key=OPENAI_API_KEY, dimensions=payload.embedding_dimensions
+            )
             if hasattr(embedder, "dimensions") and embedder.dimensions:
                 current_embed_dim = embedder.dimensions
         elif payload.embedding_provider == "google":
@@ -553,7 +590,9 @@ async def process_single_file_stream(payload: FileIngestRequest, idempotency_key
         else:
             raise ValueError(f"Unsupported embedding provider: {payload.embedding_provider}")
 
-        vector_store = get_vector_store(payload.vector_table_name, current_embed_dim)
+        vector_store = get_vector_store(
+            payload.vector_table_name, current_embed_dim, use_halfvec=payload.vector_storage == "halfvec"
+        )
         storage_context = StorageContext.from_defaults(vector_store=vector_store)
 
         # === Stage: Chunking ===
@@ -740,11 +779,13 @@ async def ensure_vector_table_exists(table_name: str):
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             UNIQUE(file_id, chunk_index)
         );
-        
-        CREATE INDEX IF NOT EXISTS {table_name}_embedding_idx 
-        ON {table_name} USING ivfflat (embedding vector_cosine_ops) 
-        WITH (lists = 100);
-        
+
+        -- HNSW rather than ivfflat: an ivfflat index built on the empty table has useless
+        -- centroids. The Django vector index manager (manage_vector_indexes) resizes it.
+        CREATE INDEX IF NOT EXISTS {table_name}_embedding_idx
+        ON {table_name} USING hnsw (embedding vector_cosine_ops)
+        WITH (m = {HNSW_INDEX_M}, ef_construction = {HNSW_INDEX_EF_CONSTRUCTION});
+
         CREATE INDEX IF NOT EXISTS {table_name}_file_id_idx 
         ON {table_name} (file_id);
         """
@@ -0,0 +1,237 @@
+"""
+Benchmark and regression gate of the chunking strategies.
+
+Runs every strategy of ``strategies.get_text_splitter`` over the fixed generated corpus of
+``tests/corpus.py`` and records, per strategy:
+
+- throughput in chunks per second (best of ``--repeat`` timed samples over the whole corpus);
+- peak memory allocated while chunking the corpus (tracemalloc, untimed run);
+- the chunk-size distribution, in characters;
+- a golden hash of the chunk boundaries of every document.
+
+The results are compared with the committed baseline (``tests/golden/chunking_baseline.json``):
+the run fails when a strategy's throughput drops more than ``--max-regression`` below the
+baseline, or when the chunks of any document differ from the golden hashes. After an
+intended change of the splitters or of the corpus, re-record the baseline with ``--update``.
+Throughput baselines depend on the machine, so record them where the gate runs.
+
+The chunks also depend on the version of the splitter library, which the baseline records:
+the boundaries are only compared when the installed version is the recorded one.
+
+Run from the service directory: ``python -m scripts.benchmark_chunking``.
+"""
+
+import argparse
+import hashlib
+import importlib.metadata
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from strategies import get_text_splitter  # noqa: E402
+from tests.corpus import chunking_corpus  # noqa: E402
+
+STRATEGIES = ("default", "presentation", "qa", "legislation", "paper")
+# The distributions whose version the chunk boundaries depend on
+SPLITTER_DISTRIBUTIONS = ("llama-index-core",)
+BASELINE_PATH = Path(__file__).resolve().parent.parent / "tests" / "golden" / "chunking_baseline.json"
+
+
+def chunk_texts(chunks: list) -> list[str]:
+    """The texts of a splitter's chunks; the legislation splitter returns dictionaries."""
+    return [chunk["text"] if isinstance(chunk, dict) else chunk for chunk in chunks]
+
+
+def boundary_digest(texts: list[str]) -> str:
+    """Hash of the chunk texts of a document, in order: changes with any chunk boundary."""
+    return hashlib.sha256(json.dumps(texts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def chunk_corpus(strategy: str, corpus: dict[str, str]) -> dict[str, list[str]]:
+    """The chunk texts of every document of the corpus with ``strategy``."""
+    splitter = get_text_splitter(strategy, {})
+    return {name: chunk_texts(splitter.split_text(text)) for name, text in corpus.items()}
+
+
+def size_distribution(sizes: list[int]) -> dict:
+    if not sizes:
+        return {"count": 0}
+    ordered = sorted(sizes)
+
+    def percentile(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    return {
+        "count": len(ordered),
+        "min": ordered[0],
+        "p50": percentile(0.5),
+        "p90": percentile(0.9),
+        "p99": percentile(0.99),
+        "max": ordered[-1],
+        "mean": round(statistics.fmean(ordered), 1),
+    }
+
+
+def measure(strategy: str, corpus: dict[str, str], repeat: int, min_time: float) -> dict:
+    """Throughput, peak memory, size distribution and golden hashes of one strategy."""
+    splitter = get_text_splitter(strategy, {})
+    texts = list(corpus.values())
+    # The first run also warms up the splitter (tokenizer loading, lazy imports)
+    chunks = {name: chunk_texts(splitter.split_text(text)) for name, text in corpus.items()}
+    chunk_count = sum(map(len, chunks.values()))
+
+    tracemalloc.start()
+    try:
+        for text in texts:
+            splitter.split_text(text)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # Fast strategies chunk the corpus in well under a millisecond: every timed sample
+    # repeats the corpus until it lasts at least ``min_time`` seconds
+    rounds = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for text in texts:
+                splitter.split_text(text)
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        rounds *= 2 if elapsed < min_time / 10 else max(2, int(min_time / max(elapsed, 1e-9)) + 1)
+
+    best = elapsed / rounds
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for text in texts:
+                splitter.split_text(text)
+        best = min(best, (time.perf_counter() - started) / rounds)
+
+    return {
+        "chunks_per_sec": round(chunk_count / best, 1),
+        "seconds": round(best, 6),
+        "peak_memory_mb": round(peak / 1024 / 1024, 2),
+        "chunk_chars": size_distribution([len(text) for texts in chunks.values() for text in texts]),
+        "documents": {name: boundary_digest(texts) for name, texts in chunks.items()},
+    }
+
+
+def splitter_versions() -> dict[str, str]:
+    """The installed versions of ``SPLITTER_DISTRIBUTIONS``."""
+    return {name: importlib.metadata.version(name) for name in SPLITTER_DISTRIBUTIONS}
+
+
+def version_mismatch(path: Path = BASELINE_PATH) -> str | None:
+    """Why the golden hashes of the baseline don't apply to the installed splitters, if they don't."""
+    recorded = load_baseline_versions(path)
+    installed = splitter_versions()
+    if recorded == installed:
+        return None
+    return f"baseline recorded with {recorded or 'unknown versions'}, installed {installed}: re-record it with --update"
+
+
+def compare(results: dict, baseline: dict, max_regression: float, check_boundaries: bool = True) -> list[str]:
+    """The failures of ``results`` against ``baseline``: boundary drift and throughput regressions."""
+    failures = []
+    for strategy, result in results.items():
+        expected = baseline.get(strategy)
+        if expected is None:
+            failures.append(f"{strategy}: no baseline, record one with --update")
+            continue
+
+        drifted = check_boundaries and sorted(
+            name
+            for name in result["documents"].keys() | expected["documents"].keys()
+            if result["documents"].get(name) != expected["documents"].get(name)
+        )
+        if drifted:
+            shown = ", ".join(drifted[:5]) + (f" and {len(drifted) - 5} more" if len(drifted) > 5 else "")
+            failures.append(f"{strategy}: chunk boundaries changed in {shown}")
+
+        floor = expected.get("chunks_per_sec", 0) * (1 - max_regression)
+        if result.get("chunks_per_sec") is not None and result["chunks_per_sec"] < floor:
+            failures.append(
+                f"{strategy}: {result['chunks_per_sec']} chunks/s, below {floor:.1f} "
+                f"({max_regression:.0%} under the baseline {expected['chunks_per_sec']})"
+            )
+    return failures
+
+
+def load_baseline(path: Path = BASELINE_PATH) -> dict:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())["strategies"]
+
+
+def load_baseline_versions(path: Path = BASELINE_PATH) -> dict:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text()).get("versions", {})
+
+
+def save_baseline(results: dict, path: Path = BASELINE_PATH):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    baseline = {"strategies": results, "versions": splitter_versions()}
+    path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--strategies", nargs="+", choices=STRATEGIES, default=list(STRATEGIES))
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per strategy (default: 5)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Shortest timed sample, in seconds (default: 0.2)")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.25,
+        help="Largest tolerated throughput drop under the baseline, as a fraction (default: 0.25)",
+    )
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="Baseline file")
+    parser.add_argument("--update", action="store_true", help="Record the results as the new baseline")
+    parser.add_argument("--output", type=Path, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    corpus = chunking_corpus()
+    print(f"{len(corpus)} documents, {sum(map(len, corpus.values()))} characters")
+    print(
+        f"{'strategy':<13} {'chunks':>7} {'chunks/s':>10} {'seconds':>9} {'peak MB':>8} "
+        f"{'min':>6} {'p50':>6} {'p90':>6} {'max':>7}"
+    )
+    results = {}
+    for strategy in args.strategies:
+        result = results[strategy] = measure(strategy, corpus, args.repeat, args.min_time)
+        sizes = result["chunk_chars"]
+        print(
+            f"{strategy:<13} {sizes['count']:>7} {result['chunks_per_sec']:>10} {result['seconds']:>9.6f} "
+            f"{result['peak_memory_mb']:>8} {sizes.get('min', 0):>6} {sizes.get('p50', 0):>6} "
+            f"{sizes.get('p90', 0):>6} {sizes.get('max', 0):>7}"
+        )
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+
+    if args.update:
+        save_baseline({**load_baseline(args.baseline), **results}, args.baseline)
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    mismatch = version_mismatch(args.baseline)
+    if mismatch:
+        print(f"Chunk boundaries not compared, {mismatch}")
+    failures = compare(results, load_baseline(args.baseline), args.max_regression, check_boundaries=not mismatch)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
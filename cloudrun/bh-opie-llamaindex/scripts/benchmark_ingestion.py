@@ -0,0 +1,215 @@
+"""
+End-to-end offline benchmark of the ingestion path.
+
+Runs the service code of ``main.py`` unchanged, with its external services replaced by the
+local stand-ins of ``tests/local_backends.py``: GCS by a directory of generated files,
+OpenAI by deterministic hash-based embeddings with a configurable latency per call, and
+the pgvector database by a local Postgres (``BENCHMARK_POSTGRES_URL`` or a throwaway
+docker container). Two modes are measured:
+
+- ``stream``: ``process_single_file_stream`` (``/ingest-file``) once per file;
+- ``bulk``: ``ingest_gcs_docs`` (``/ingest-gcs``) over the whole prefix.
+
+Each reports files/sec, chunks/sec, embedding calls, database round-trips and the time
+spent in every stage of ``STAGE_WEIGHTS``, next to the weight the progress reports give it.
+In stream mode the "chunk" stage also includes the embedder and vector store setup; in bulk
+mode chunking happens inside the index build and is counted in "embed_index".
+
+Run from the service directory: ``python -m scripts.benchmark_ingestion``.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import ExitStack
+from functools import partial
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from tests.corpus import generate_faq, generate_prose  # noqa: E402
+from tests.local_backends import FakeEmbedding, LocalGCSReader, RoundTripCounter, local_postgres  # noqa: E402
+from tests.statutes import generate_statute  # noqa: E402
+
+BUCKET = "benchmark"
+PREFIX = "ingest/"
+
+
+def write_files(root: Path, count: int, size: int) -> list[str]:
+    """``count`` text files of about ``size`` characters, alternating reports, FAQs and statutes."""
+    generators = (
+        lambda seed: generate_prose(size, seed=seed),
+        lambda seed: generate_faq(max(size // 400, 1), seed=seed),
+        lambda seed: generate_statute(size, seed=seed),
+    )
+    directory = root / BUCKET / PREFIX
+    directory.mkdir(parents=True)
+    keys = []
+    for number in range(count):
+        key = f"{PREFIX}file-{number:04}.txt"
+        (root / BUCKET / key).write_text(generators[number % len(generators)](number))
+        keys.append(key)
+    return keys
+
+
+def load_service(postgres_url: str, dimensions: int):
+    """Import ``main`` configured for the local stand-ins; its settings are read at import time."""
+    os.environ.update(
+        {
+            "FORCE_LOCAL_ENV": "1",
+            "GCS_BUCKET_NAME": BUCKET,
+            "POSTGRES_URL": postgres_url,
+            "OPENAI_API_KEY": "benchmark",
+            "DJANGO_API_KEY": "benchmark",
+            "EMBED_DIM": str(dimensions),
+        }
+    )
+    import main
+
+    return main
+
+
+def _stage_report(stage_seconds: dict, weights: dict) -> dict:
+    total = sum(stage_seconds.values()) or 1.0
+    return {
+        stage: {
+            "seconds": round(stage_seconds.get(stage, 0.0), 4),
+            "share": round(stage_seconds.get(stage, 0.0) / total, 3),
+            "weight": weight,
+        }
+        for stage, weight in weights.items()
+    }
+
+
+async def run_stream(main, keys: list[str], table: str, options, reader_stats: dict) -> dict:
+    """Every file through ``process_single_file_stream``, timing the stages between progress updates."""
+    stage_seconds = dict.fromkeys(main.STAGE_WEIGHTS, 0.0)
+    for key in keys:
+        payload = main.FileIngestRequest(
+            file_path=f"gs://{BUCKET}/{key}",
+            vector_table_name=table,
+            file_uuid=str(uuid.uuid4()),
+            embedding_provider="openai",
+            embedding_model="benchmark",
+            strategy_id=options.strategy,
+            batch_size=options.batch_size,
+            user_uuid="benchmark",
+        )
+        downloaded = reader_stats.get("download", 0.0)
+        last = time.perf_counter()
+        async for line in main.process_single_file_stream(payload, idempotency_key=str(uuid.uuid4())):
+            update = json.loads(line)
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            if update["status"] == "failed":
+                raise RuntimeError(f"{key}: {update.get('error')}")
+            if update["stage"] == "parse":
+                download = reader_stats["download"] - downloaded
+                stage_seconds["download"] += download
+                stage_seconds["parse"] += elapsed - download
+            elif update["stage"] in stage_seconds:
+                stage_seconds[update["stage"]] += elapsed
+    return stage_seconds
+
+
+async def run_bulk(main, keys: list[str], table: str, options, reader_stats: dict) -> dict:
+    """The whole prefix through ``ingest_gcs_docs``; the index build is timed around ``index_documents``."""
+    stage_seconds = dict.fromkeys(main.STAGE_WEIGHTS, 0.0)
+    index_documents = main.index_documents
+
+    def timed_index_documents(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return index_documents(*args, **kwargs)
+        finally:
+            stage_seconds["embed_index"] += time.perf_counter() - started
+
+    with mock.patch.object(main, "index_documents", timed_index_documents):
+        result = await main.ingest_gcs_docs(main.IngestRequest(gcs_prefix=PREFIX, vector_table_name=table))
+    if result["indexed_documents"] < len(keys):
+        raise RuntimeError(f"Indexed {result['indexed_documents']} documents out of {len(keys)} files")
+    stage_seconds["download"] = reader_stats.get("download", 0.0)
+    stage_seconds["parse"] = reader_stats.get("parse", 0.0)
+    return stage_seconds
+
+
+def _drop_table(postgres_url: str, schema: str, table: str):
+    import psycopg2
+
+    with psycopg2.connect(postgres_url) as connection, connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS "{schema}"."data_{table}"')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=20, help="Number of generated files (default: 20)")
+    parser.add_argument("--file-size", type=int, default=50_000, help="Characters per file (default: 50000)")
+    parser.add_argument("--modes", nargs="+", choices=("stream", "bulk"), default=["stream", "bulk"])
+    parser.add_argument("--strategy", default="default", help="Chunking strategy of stream mode (default: default)")
+    parser.add_argument(
+        "--batch-size", type=int, default=20, help="Chunks per index batch in stream mode (default: 20)"
+    )
+    parser.add_argument(
+        "--embed-latency", type=float, default=0.05, help="Seconds per fake embedding call (default: 0.05)"
+    )
+    parser.add_argument("--dimensions", type=int, default=1536, help="Embedding dimensions (default: 1536)")
+    parser.add_argument("--output", type=Path, help="Also write the results to this JSON file")
+    options = parser.parse_args()
+
+    embedder = FakeEmbedding(dimensions=options.dimensions, latency=options.embed_latency)
+    results = {}
+    with ExitStack() as stack:
+        root = Path(stack.enter_context(tempfile.TemporaryDirectory()))
+        keys = write_files(root, options.files, options.file_size)
+        postgres_url = stack.enter_context(local_postgres())
+        service = load_service(postgres_url, options.dimensions)
+        stack.enter_context(mock.patch.object(service, "OpenAIEmbedding", lambda *args, **kwargs: embedder))
+
+        for mode in options.modes:
+            reader_stats = {}
+            stack.enter_context(
+                mock.patch.object(service, "GCSReader", partial(LocalGCSReader, root, stats=reader_stats))
+            )
+            table = f"benchmark_{mode}_{os.getpid()}"
+            run = run_stream if mode == "stream" else run_bulk
+            embedder.reset()
+            try:
+                with RoundTripCounter() as round_trips:
+                    started = time.perf_counter()
+                    stage_seconds = asyncio.run(run(service, keys, table, options, reader_stats))
+                    elapsed = time.perf_counter() - started
+            finally:
+                _drop_table(postgres_url, service.SCHEMA_NAME, table)
+            results[mode] = {
+                "files": len(keys),
+                "seconds": round(elapsed, 3),
+                "files_per_sec": round(len(keys) / elapsed, 2),
+                "chunks": embedder.texts,
+                "chunks_per_sec": round(embedder.texts / elapsed, 1),
+                "embedding_calls": embedder.calls,
+                "db_round_trips": round_trips.count,
+                "stages": _stage_report(stage_seconds, service.STAGE_WEIGHTS),
+            }
+
+    for mode, result in results.items():
+        print(
+            f"{mode}: {result['files']} files in {result['seconds']}s, {result['files_per_sec']} files/s, "
+            f"{result['chunks']} chunks ({result['chunks_per_sec']}/s), "
+            f"{result['embedding_calls']} embedding calls, {result['db_round_trips']} DB round-trips"
+        )
+        print(f"  {'stage':<12} {'seconds':>9} {'share':>6} {'weight':>7}")
+        for stage, timing in result["stages"].items():
+            print(f"  {stage:<12} {timing['seconds']:>9.3f} {timing['share']:>6.1%} {timing['weight']:>7.0%}")
+
+    if options.output:
+        options.output.write_text(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark the legislation splitter against the former regex-based splitter.
+
+Generated statutes of increasing sizes in three shapes: definition-dense acts, long acts
+with few definitions, and the worst case of the former definition pattern, long runs of
+letters and whitespace with a single definition. The former splitter is quadratic on the
+latter and is only timed up to ``--reference-max-size`` characters for it.
+
+Run from the service directory: ``python scripts/benchmark_legislation_splitter.py``.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from strategies.legislation_splitter import LegislationSplitter  # noqa: E402
+from tests.statutes import HEADER, ReferenceLegislationSplitter, generate_statute  # noqa: E402
+
+
+def letters_only_statute(size: int) -> str:
+    line = "the trustee of the scheme must hold the property of the scheme on trust for members\n"
+    body = line * (max(size - len(HEADER), 0) // len(line))
+    return f"{HEADER}wholesale client means a client that is not a retail client\n{body}"
+
+
+SHAPES = {
+    "dense": lambda size: generate_statute(size, seed=size, definition_ratio=0.3),
+    "sparse": lambda size: generate_statute(size, seed=size, definition_ratio=0.01),
+    "letters-only": letters_only_statute,
+}
+
+
+def _time(splitter, text):
+    started = time.perf_counter()
+    chunks = splitter.split_text(text)
+    return time.perf_counter() - started, chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument(
+        "--reference-max-size",
+        type=int,
+        default=200_000,
+        help="Largest letters-only statute timed with the former splitter (default: 200000)",
+    )
+    args = parser.parse_args()
+
+    print(f"{'shape':<13} {'size':>10} {'chunks':>7} {'single pass':>12} {'former':>10} {'speedup':>8}")
+    for shape, generate in SHAPES.items():
+        for size in args.sizes:
+            text = generate(size)
+            elapsed, chunks = _time(LegislationSplitter(), text)
+            if shape == "letters-only" and size > args.reference_max_size:
+                print(f"{shape:<13} {len(text):>10} {len(chunks):>7} {elapsed:>11.3f}s {'skipped':>10}")
+                continue
+            reference_elapsed, reference_chunks = _time(ReferenceLegislationSplitter(), text)
+            assert chunks == reference_chunks, f"{shape} statute of {size} characters split differently"
+            print(
+                f"{shape:<13} {len(text):>10} {len(chunks):>7} {elapsed:>11.3f}s {reference_elapsed:>9.3f}s "
+                f"{reference_elapsed / elapsed:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
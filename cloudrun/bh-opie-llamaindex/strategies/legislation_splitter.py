@@ -1,10 +1,170 @@
+from bisect import bisect_left
 from llama_index.core.node_parser import NodeParser
-from typing import Any, Dict
+from typing import Any, Dict, Iterator, NamedTuple
 import re
 import json
 from .base import BaseStrategy
 
 
+# Patterns are compiled once at import time instead of on every call.
+ACT_NAME_PATTERN = re.compile(r"(?:^|\n)([A-Z][A-Za-z\s&\(\)]+(?:Act|Regulations?)\s+\d{4})", re.MULTILINE)
+COMPILATION_NO_PATTERN = re.compile(r"Compilation\s+No\.?\s*(\d+)", re.IGNORECASE)
+COMPILATION_DATE_PATTERN = re.compile(r"Compilation\s+date:\s*(\d{1,2}\s+\w+\s+\d{4}|\d{4}-\d{2}-\d{2})", re.IGNORECASE)
+AUTHORISED_VERSION_PATTERN = re.compile(r"(C\d{4}C\d{5})")
+REGISTERED_DATE_PATTERN = re.compile(r"Registered:\s*(\d{1,2}\s+\w+\s+\d{4}|\d{4}-\d{2}-\d{2})", re.IGNORECASE)
+ISO_DATE_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}")
+LONG_DATE_PATTERN = re.compile(r"(\d{1,2})\s+(\w+)\s+(\d{4})", re.IGNORECASE)
+
+# Section headers: "Part 7 / Division 2", "Dictionary / s9", or a single "Section 12" / "s 12"
+PART_DIVISION_PATTERN = re.compile(
+    r"(?:Part\s+\d+[A-Z]?|Dictionary)\s*/\s*(?:Division\s+\d+|s\d+[A-Z]?)", re.IGNORECASE
+)
+SECTION_PATTERN = re.compile(r"(?:Section|s\.?)\s*(\d+[A-Z]?)", re.IGNORECASE)
+# Same languages with lazy quantifiers: each match ends at the shortest possible end
+_PART_DIVISION_SHORTEST = re.compile(
+    r"(?:Part\s+?\d+?[A-Z]??|Dictionary)\s*?/\s*?(?:Division\s+?\d+?|s\d+?[A-Z]??)", re.IGNORECASE
+)
+_SECTION_SHORTEST = re.compile(r"(?:Section|s\.??)\s*?(\d+?[A-Z]??)", re.IGNORECASE)
+
+SUBSECTION_PATTERN = re.compile(r"\(\d+\)")
+SECTION_NUMBER_PATTERN = re.compile(r"section\s+\d+")
+DEFINED_TERM_PATTERN = re.compile(r"^\*{0,2}([a-z\s]+?)\*{0,2}\s+means\b", re.IGNORECASE | re.MULTILINE)
+LIST_LETTER_PATTERN = re.compile(r"\(([a-z])\)")
+DOLLAR_PATTERN = re.compile(r"\$\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)\s*(?:million|m)?", re.IGNORECASE)
+
+# Building blocks of the definition tokenizer. The characters a defined term can be made
+# of (as in the former ``[a-z\s]`` of the definition pattern), and each "means" preceded by
+# whitespace. Group 1 is set when "means" is followed by whitespace and at least one more
+# character, which is what a definition needs; the body boundary only needs "means".
+_TERM_RUN_PATTERN = re.compile(r"[a-z\s]+", re.IGNORECASE)
+_MEANS_PATTERN = re.compile(r"(?<=\s)means(?=(\s.)?)", re.IGNORECASE | re.DOTALL)
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+class DefinitionBoundary(NamedTuple):
+    """Offsets of a definition in the text: ``text[term_start:term_end]`` means ``text[body_start:body_end]``."""
+
+    term_start: int
+    term_end: int
+    body_start: int
+    body_end: int
+
+
+class _TermRun(NamedTuple):
+    start: int
+    end: int
+    definitions: list  # offsets of the "means" that can start a definition
+    last_means: int  # offset of the last "means", -1 if none
+
+
+def _term_runs(text: str) -> list:
+    """The maximal runs of term characters containing a "means", with their "means" offsets."""
+    runs = []
+    matches = _MEANS_PATTERN.finditer(text)
+    means = next(matches, None)
+    for run in _TERM_RUN_PATTERN.finditer(text):
+        if means is None:
+            break
+        if means.start() >= run.end():
+            continue
+        definitions, last_means = [], -1
+        while means is not None and means.start() < run.end():
+            last_means = means.start()
+            if means.group(1) is not None:
+                definitions.append(means.start())
+            means = next(matches, None)
+        runs.append(_TermRun(run.start(), run.end(), definitions, last_means))
+    return runs
+
+
+def iter_definition_boundaries(text: str) -> Iterator[DefinitionBoundary]:
+    r"""
+    Yield the offsets of the definitions of ``text`` in order, as the former pattern
+    ``([a-z\s]+?)\s+means\s+(.+?)(?=\n[a-z\s]+?\s+means|\Z)`` (IGNORECASE | DOTALL) matched them.
+
+    That pattern rescanned the run of term characters following every candidate start and
+    every newline of a definition body, which is quadratic on long acts with few
+    definitions. Here the runs and the "means" are found in one pass each, and every
+    boundary is then located from them with a forward-only scan:
+
+    - a term starts at the first term character (from the end of the previous definition)
+      whose run has a "means" at least two characters further, and ends where the
+      whitespace before the first such "means" starts;
+    - a body starts after the whitespace following "means", and ends at the first newline
+      (after its first character) that is followed, in the same run, by at least two
+      characters and a "means", or at the end of the text.
+    """
+    length = len(text)
+    runs = _term_runs(text)
+    term_index = body_index = 0
+    position = 0
+
+    while True:
+        # Start of the term: first run, from the current position, with a usable "means"
+        while term_index < len(runs):
+            run = runs[term_index]
+            if run.end > position:
+                term_start = max(position, run.start)
+                candidate = bisect_left(run.definitions, term_start + 2)
+                if candidate < len(run.definitions):
+                    means = run.definitions[candidate]
+                    break
+            term_index += 1
+        else:
+            return
+
+        # The whitespace before "means" separates the term from it
+        term_end = means
+        while term_end > term_start + 1 and text[term_end - 1].isspace():
+            term_end -= 1
+
+        body_start = _WHITESPACE_PATTERN.match(text, means + 5).end()
+        if body_start == length:
+            body_start -= 1
+
+        # End of the body: the first newline followed by the term of another definition
+        body_end = length
+        while body_index < len(runs):
+            run = runs[body_index]
+            lowest = max(body_start + 1, run.start)
+            if run.end > lowest:
+                newline = text.find("\n", lowest, run.last_means - 2)
+                if newline != -1:
+                    body_end = newline
+                    break
+            body_index += 1
+
+        yield DefinitionBoundary(term_start, term_end, body_start, body_end)
+
+        position = body_end
+        if position >= length:
+            return
+
+
+class SectionReferences:
+    """
+    Section reference of every prefix of a text, as ``_extract_section_reference(text[:end])``.
+
+    The leftmost match within a prefix is the first match of the whole text, once the
+    prefix is long enough to hold its shortest form, so it is found once for all prefixes
+    instead of searching every prefix again.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        part_division = _PART_DIVISION_SHORTEST.search(text)
+        self.part_division = (part_division.start(), part_division.end()) if part_division else None
+        section = _SECTION_SHORTEST.search(text)
+        self.section = (section.start(), section.end()) if section else None
+
+    def before(self, end: int) -> str:
+        if self.part_division and self.part_division[1] <= end:
+            return PART_DIVISION_PATTERN.match(self.text, self.part_division[0], end).group(0).strip()
+        if self.section and self.section[1] <= end:
+            return f"s{SECTION_PATTERN.match(self.text, self.section[0], end).group(1)}"
+        return ""
+
+
 class LegislationSplitter(BaseStrategy):
     """
     Legislation-based splitter for Australian Acts.
@@ -16,27 +176,27 @@ class LegislationSplitter(BaseStrategy):
         metadata = {}
 
         # Extract Act name
-        act_match = re.search(r'(?:^|\n)([A-Z][A-Za-z\s&\(\)]+(?:Act|Regulations?)\s+\d{4})', text, re.MULTILINE)
+        act_match = ACT_NAME_PATTERN.search(text)
         if act_match:
             metadata['act'] = act_match.group(1).strip()
 
         # Extract compilation number
-        comp_no_match = re.search(r'Compilation\s+No\.?\s*(\d+)', text, re.IGNORECASE)
+        comp_no_match = COMPILATION_NO_PATTERN.search(text)
         if comp_no_match:
             metadata['compilation_no'] = int(comp_no_match.group(1))
 
         # Extract compilation date
-        comp_date_match = re.search(r'Compilation\s+date:\s*(\d{1,2}\s+\w+\s+\d{4}|\d{4}-\d{2}-\d{2})', text, re.IGNORECASE)
+        comp_date_match = COMPILATION_DATE_PATTERN.search(text)
         if comp_date_match:
             metadata['compilation_date'] = self._normalize_date(comp_date_match.group(1))
 
         # Extract authorised version
-        auth_match = re.search(r'(C\d{4}C\d{5})', text)
+        auth_match = AUTHORISED_VERSION_PATTERN.search(text)
         if auth_match:
             metadata['authorised_version'] = auth_match.group(1)
 
         # Extract registered date
-        reg_date_match = re.search(r'Registered:\s*(\d{1,2}\s+\w+\s+\d{4}|\d{4}-\d{2}-\d{2})', text, re.IGNORECASE)
+        reg_date_match = REGISTERED_DATE_PATTERN.search(text)
         if reg_date_match:
             metadata['registered_date'] = self._normalize_date(reg_date_match.group(1))
 
@@ -45,7 +205,7 @@ class LegislationSplitter(BaseStrategy):
     def _normalize_date(self, date_str: str) -> str:
         """Convert various date formats to YYYY-MM-DD."""
         # If already in YYYY-MM-DD format
-        if re.match(r'\d{4}-\d{2}-\d{2}', date_str):
+        if ISO_DATE_PATTERN.match(date_str):
             return date_str
 
         # Convert "17 March 2025" to "2025-03-17"
@@ -55,7 +215,7 @@ class LegislationSplitter(BaseStrategy):
             'september': '09', 'october': '10', 'november': '11', 'december': '12'
         }
 
-        match = re.match(r'(\d{1,2})\s+(\w+)\s+(\d{4})', date_str, re.IGNORECASE)
+        match = LONG_DATE_PATTERN.match(date_str)
         if match:
             day, month, year = match.groups()
             month_num = months.get(month.lower(), '01')
@@ -66,12 +226,12 @@ class LegislationSplitter(BaseStrategy):
     def _extract_section_reference(self, text: str) -> str:
         """Extract section/part/division reference."""
         # Try to match "Part X / Division Y / Section Z" or "Dictionary / s9"
-        ref_match = re.search(r'(?:Part\s+\d+[A-Z]?|Dictionary)\s*/\s*(?:Division\s+\d+|s\d+[A-Z]?)', text, re.IGNORECASE)
+        ref_match = PART_DIVISION_PATTERN.search(text)
         if ref_match:
             return ref_match.group(0).strip()
 
         # Try single section reference
-        sec_match = re.search(r'(?:Section|s\.?)\s*(\d+[A-Z]?)', text, re.IGNORECASE)
+        sec_match = SECTION_PATTERN.search(text)
         if sec_match:
             return f"s{sec_match.group(1)}"
 
@@ -83,9 +243,9 @@ class LegislationSplitter(BaseStrategy):
 
         if 'means' in text_lower or 'definition' in text_lower:
             return 'definition'
-        elif re.search(r'\(\d+\)', text):
+        elif SUBSECTION_PATTERN.search(text):
             return 'subsection'
-        elif re.search(r'section\s+\d+', text_lower):
+        elif SECTION_NUMBER_PATTERN.search(text_lower):
             return 'section'
 
         return 'content'
@@ -93,7 +253,7 @@ class LegislationSplitter(BaseStrategy):
     def _extract_term_from_definition(self, text: str) -> str:
         """Extract the term being defined from definition text."""
         # Pattern: "professional investor means" or "**professional investor** means"
-        term_match = re.search(r'^\*{0,2}([a-z\s]+?)\*{0,2}\s+means\b', text, re.IGNORECASE | re.MULTILINE)
+        term_match = DEFINED_TERM_PATTERN.search(text)
         if term_match:
             return term_match.group(1).strip()
 
@@ -101,7 +261,7 @@ class LegislationSplitter(BaseStrategy):
 
     def _extract_list_letters(self, text: str) -> list[str]:
         """Extract list markers like (a), (b), (c), etc."""
-        letters = re.findall(r'\(([a-z])\)', text.lower())
+        letters = LIST_LETTER_PATTERN.findall(text.lower())
         return sorted(list(set(letters)))
 
     def _extract_thresholds(self, text: str) -> dict:
@@ -109,8 +269,7 @@ class LegislationSplitter(BaseStrategy):
         thresholds = {}
 
         # Extract dollar amounts
-        dollar_pattern = r'\$\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)\s*(?:million|m)?'
-        dollar_matches = re.finditer(dollar_pattern, text, re.IGNORECASE)
+        dollar_matches = DOLLAR_PATTERN.finditer(text)
 
         for match in dollar_matches:
             amount_str = match.group(1).replace(',', '')
@@ -190,32 +349,18 @@ class LegislationSplitter(BaseStrategy):
         # Extract document-level metadata
         doc_metadata = self._extract_act_metadata(text)
 
-        # Split by major sections (definitions, sections, subsections)
-        # Pattern for section breaks
-        section_pattern = re.compile(
-            r'(?:^|\n)(?:'
-            r'(?:Section|s\.?)\s*(\d+[A-Z]?)|'  # Section markers
-            r'(\([a-z]\))|'  # List items (a), (b), etc.
-            r'(?:Part\s+\d+|Dictionary|Schedule\s+\d+)'  # Parts, Dictionary, Schedules
-            r')',
-            re.MULTILINE | re.IGNORECASE
-        )
-
-        # For now, create chunks based on definitions (look for "means" keyword)
-        definition_pattern = re.compile(
-            r'([a-z\s]+?)\s+means\s+(.+?)(?=\n[a-z\s]+?\s+means|\Z)',
-            re.IGNORECASE | re.DOTALL
-        )
-
-        for match in definition_pattern.finditer(text):
-            term = match.group(1).strip()
-            definition_text = match.group(2).strip()
+        # Definitions and the section reference preceding each of them, in one pass
+        section_references = SectionReferences(text)
+
+        for boundary in iter_definition_boundaries(text):
+            term = text[boundary.term_start : boundary.term_end].strip()
+            definition_text = text[boundary.body_start : boundary.body_end].strip()
 
             # Extract metadata for this chunk
             chunk_metadata = doc_metadata.copy()
 
             # Add chunk-specific metadata
-            chunk_metadata['part_division'] = self._extract_section_reference(text[:match.start()])
+            chunk_metadata["part_division"] = section_references.before(boundary.term_start)
             chunk_metadata['term'] = term
             chunk_metadata['term_type'] = 'definition'
 
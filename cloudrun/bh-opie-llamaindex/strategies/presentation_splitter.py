@@ -13,6 +13,28 @@ class PresentationSplitter(BaseStrategy):
         """Returns the text as a single-element list, preserving the entire slide content."""
         return [text] if text and text.strip() else []
 
+    def create_splitter(self) -> NodeParser:
+        """
+        Create and return a NodeParser producing one node per slide.
+
+        Returns:
+            A NodeParser instance delegating to split_text
+        """
+        from llama_index.core.bridge.pydantic import PrivateAttr
+        from llama_index.core.node_parser import TextSplitter
+
+        class PresentationNodeParser(TextSplitter):
+            _splitter: "PresentationSplitter" = PrivateAttr()
+
+            def __init__(self, splitter_instance):
+                super().__init__()
+                self._splitter = splitter_instance
+
+            def split_text(self, text: str) -> list[str]:
+                return self._splitter.split_text(text)
+
+        return PresentationNodeParser(self)
+
     def _parse_nodes(self, documents: list, **kwargs) -> list:
         """Passthrough for compatibility with NodeParser interface if needed."""
         return documents
\ No newline at end of file
@@ -1,11 +1,36 @@
 from llama_index.core.node_parser import TokenTextSplitter, NodeParser
 from typing import Any
 import re
+from .base import BaseStrategy
 
-class QASplitter:
+
+class QASplitter(BaseStrategy):
     """
     Splits text based on a Question/Answer format. Each Q&A pair becomes a chunk.
     """
+
+    def create_splitter(self) -> NodeParser:
+        """
+        Create and return a NodeParser producing one node per Q&A pair.
+
+        Returns:
+            A NodeParser instance delegating to split_text
+        """
+        from llama_index.core.bridge.pydantic import PrivateAttr
+        from llama_index.core.node_parser import TextSplitter
+
+        class QANodeParser(TextSplitter):
+            _splitter: "QASplitter" = PrivateAttr()
+
+            def __init__(self, splitter_instance):
+                super().__init__()
+                self._splitter = splitter_instance
+
+            def split_text(self, text: str) -> list[str]:
+                return self._splitter.split_text(text)
+
+        return QANodeParser(self)
+
     def split_text(self, text: str) -> list[str]:
         """
         Uses regex to find questions (e.g., starting with "Q:") and splits the
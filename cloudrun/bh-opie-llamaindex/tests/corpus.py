@@ -0,0 +1,83 @@
+"""
+Fixed corpus of generated documents for the chunking benchmark and regression suite.
+
+Every document is generated from a fixed seed, so the corpus, and the chunks each strategy
+makes of it, only change when a generator or a splitter does.
+"""
+
+import random
+
+from tests.statutes import WORDS, generate_statute
+
+PROSE_WORDS = WORDS + (
+    "report quarter revenue growth customer market strategy risk team delivery platform "
+    "analysis forecast budget approval review policy compliance operations".split()
+)
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(PROSE_WORDS) for _ in range(rng.randint(4, 28))]
+    if rng.random() < 0.05:
+        words.append("x" * rng.randint(20, 120))  # long identifiers, URLs, hashes
+    sentence = " ".join(words)
+    return sentence[0].upper() + sentence[1:] + rng.choice([".", ".", ".", "?", "!", ";"])
+
+
+def generate_prose(size: int, seed: int = 0) -> str:
+    """A report of about ``size`` characters: headings, paragraphs and bullet lists."""
+    rng = random.Random(seed)
+    paragraphs = []
+    length = 0
+    while length < size:
+        roll = rng.random()
+        if roll < 0.1:
+            paragraph = f"{rng.randint(1, 20)}. {_sentence(rng).rstrip('.?!;').title()}"
+        elif roll < 0.25:
+            paragraph = "\n".join(f"- {_sentence(rng)}" for _ in range(rng.randint(2, 8)))
+        else:
+            paragraph = " ".join(_sentence(rng) for _ in range(rng.randint(1, 12)))
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+
+def generate_faq(questions: int, seed: int = 0) -> str:
+    """A FAQ with a preamble and ``questions`` question/answer pairs in the supported prefixes."""
+    rng = random.Random(seed)
+    lines = [_sentence(rng)]
+    for number in range(1, questions + 1):
+        prefix = rng.choice(["Q:", "Question:", f"{number}. Q.", "  q:"])
+        lines.append(f"{prefix} {_sentence(rng).rstrip('.?!;')}?")
+        answer = " ".join(_sentence(rng) for _ in range(rng.randint(1, 6)))
+        lines.append(f"{rng.choice(['A:', 'Answer:', ''])} {answer}".strip())
+        if rng.random() < 0.2:
+            lines.append("")
+    return "\n".join(lines)
+
+
+def generate_slides(count: int, seed: int = 0) -> list[str]:
+    """``count`` slides, one document each as the presentation loader provides them."""
+    rng = random.Random(seed)
+    slides = []
+    for number in range(1, count + 1):
+        if rng.random() < 0.05:
+            slides.append("  \n")  # blank slide
+            continue
+        bullets = "\n".join(f"• {_sentence(rng)}" for _ in range(rng.randint(0, 6)))
+        slides.append(f"Slide {number}: {_sentence(rng).rstrip('.?!;').title()}\n{bullets}")
+    return slides
+
+
+def chunking_corpus() -> dict[str, str]:
+    """The benchmark corpus, by document name. Every strategy is run over every document."""
+    corpus = {
+        "prose-small": generate_prose(2_000, seed=1),
+        "prose-large": generate_prose(150_000, seed=2),
+        "faq": generate_faq(300, seed=3),
+        "statute-dense": generate_statute(150_000, seed=4, definition_ratio=0.3),
+        "statute-sparse": generate_statute(100_000, seed=5, definition_ratio=0.02),
+        "empty": "",
+    }
+    for number, slide in enumerate(generate_slides(120, seed=6), start=1):
+        corpus[f"slide-{number:03}"] = slide
+    return corpus
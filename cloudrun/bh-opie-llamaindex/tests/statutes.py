@@ -0,0 +1,153 @@
+"""
+Synthetic statutes for the legislation splitter tests and benchmarks, and the regex-based
+splitter the single-pass tokenizer replaced, kept as the reference for equivalence tests.
+"""
+
+import random
+import re
+
+from strategies.legislation_splitter import LegislationSplitter
+
+HEADER = (
+    "Corporations Act 2001\n"
+    "Compilation No. 142\n"
+    "Compilation date: 17 March 2025\n"
+    "Registered: 2 April 2025\n"
+    "C2025C00123\n\n"
+)
+
+WORDS = (
+    "person body corporate financial product professional investor control fund gross income "
+    "net assets relevant interest securities entity scheme trustee director company holder "
+    "the a of in to for by under with any other that which is are may must not"
+).split()
+
+TERMS = (
+    "professional investor",
+    "financial product",
+    "associate",
+    "body corporate",
+    "wholesale client",
+    "relevant interest",
+    "Managed investment scheme",
+    "CONTROL",
+)
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _definition(rng: random.Random) -> str:
+    term = rng.choice(TERMS)
+    separator = rng.choice([" ", "  ", "\t", " \n "])
+    lines = [f"{term}{separator}{rng.choice(['means', 'MEANS', 'Means'])} {_sentence(rng, rng.randint(3, 12))}"]
+    for letter in "abcd"[: rng.randint(0, 4)]:
+        line = f"({letter}) {_sentence(rng, rng.randint(2, 8))}"
+        if rng.random() < 0.3:
+            amount = rng.choice(["$2.5 million", "$10,000,000", "$ 500,000", "$250m", "$1,000.50"])
+            line += f" {rng.choice(['net assets of', 'controls funds of', 'gross income of', 'at least'])} {amount}"
+        lines.append(line + rng.choice([";", ".", ""]))
+    return "\n".join(lines)
+
+
+def _prose(rng: random.Random) -> str:
+    line = _sentence(rng, rng.randint(5, 30))
+    roll = rng.random()
+    if roll < 0.1:
+        line += " meanspirited means"  # "means" without a definition body, or glued to a word
+    elif roll < 0.2:
+        line = f"{rng.randint(1, 99)} {line}."
+    elif roll < 0.3:
+        line += f" (see s{rng.randint(1, 999)})"
+    return line
+
+
+def _heading(rng: random.Random, section: int) -> str:
+    return rng.choice(
+        [
+            f"Part {rng.randint(1, 12)} / Division {rng.randint(1, 9)}",
+            f"Dictionary / s{section}",
+            f"Section {section}{rng.choice(['', 'A', 'B'])}",
+            f"s. {section}",
+            f"Schedule {rng.randint(1, 4)}",
+            "Definitions",
+        ]
+    )
+
+
+def generate_statute(size: int, seed: int = 0, definition_ratio: float = 0.3) -> str:
+    """
+    A statute of about ``size`` characters of headings, definitions and prose.
+    ``definition_ratio`` is the share of paragraphs that are definitions.
+    """
+    rng = random.Random(seed)
+    parts = [HEADER]
+    length = len(HEADER)
+    section = 1
+    while length < size:
+        roll = rng.random()
+        if roll < 0.1:
+            paragraph = _heading(rng, section)
+            section += 1
+        elif roll < 0.1 + definition_ratio:
+            paragraph = _definition(rng)
+        else:
+            paragraph = "\n".join(_prose(rng) for _ in range(rng.randint(1, 6)))
+        paragraph += rng.choice(["\n", "\n\n", "\n \n"])
+        parts.append(paragraph)
+        length += len(paragraph)
+    return "".join(parts)
+
+
+class ReferenceLegislationSplitter(LegislationSplitter):
+    """The splitter before the single-pass tokenizer: one regex over the whole text."""
+
+    def split_text(self, text: str) -> list[dict]:
+        if not text or not text.strip():
+            return []
+
+        chunks = []
+        doc_metadata = self._extract_act_metadata(text)
+        definition_pattern = re.compile(
+            r"([a-z\s]+?)\s+means\s+(.+?)(?=\n[a-z\s]+?\s+means|\Z)", re.IGNORECASE | re.DOTALL
+        )
+
+        for match in definition_pattern.finditer(text):
+            term = match.group(1).strip()
+            definition_text = match.group(2).strip()
+
+            chunk_metadata = doc_metadata.copy()
+            chunk_metadata["part_division"] = self._extract_section_reference(text[: match.start()])
+            chunk_metadata["term"] = term
+            chunk_metadata["term_type"] = "definition"
+
+            letters = self._extract_list_letters(definition_text)
+            if letters:
+                chunk_metadata["letters"] = letters
+
+            thresholds = self._extract_thresholds(definition_text)
+            if thresholds:
+                chunk_metadata["thresholds"] = thresholds
+
+            chunk_id = self._generate_chunk_id(
+                chunk_metadata.get("act", "unknown"),
+                chunk_metadata.get("compilation_no", 0),
+                term,
+                chunk_metadata.get("part_division", ""),
+            )
+
+            chunks.append({"id": chunk_id, "text": f"{term} means {definition_text}", "metadata": chunk_metadata})
+
+        if not chunks:
+            chunk_metadata = doc_metadata.copy()
+            chunk_metadata["term_type"] = "content"
+            chunks.append(
+                {
+                    "id": f"{doc_metadata.get('act', 'unknown').lower().replace(' ', '-')}-content",
+                    "text": text.strip(),
+                    "metadata": chunk_metadata,
+                }
+            )
+
+        return chunks
@@ -0,0 +1,71 @@
+"""
+Chunk boundaries of every strategy on the benchmark corpus against the golden hashes.
+
+Throughput is only gated by the benchmark itself (``python -m scripts.benchmark_chunking``),
+timings in a test run are too noisy. After an intended change of the chunks, or an upgrade
+of the splitter library the baseline was recorded with, re-record the baseline with
+``python -m scripts.benchmark_chunking --update``.
+"""
+
+import pytest
+from scripts.benchmark_chunking import (
+    STRATEGIES,
+    boundary_digest,
+    chunk_corpus,
+    compare,
+    load_baseline,
+    save_baseline,
+    version_mismatch,
+)
+
+from tests.corpus import chunking_corpus
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    return chunking_corpus()
+
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+def test_chunk_boundaries_match_golden_hashes(strategy, corpus):
+    """Every document of the corpus is split exactly as recorded in the baseline."""
+    mismatch = version_mismatch()
+    if mismatch:
+        pytest.skip(mismatch)
+    expected = load_baseline()[strategy]["documents"]
+
+    digests = {name: boundary_digest(texts) for name, texts in chunk_corpus(strategy, corpus).items()}
+
+    assert digests.keys() == expected.keys()
+    assert [name for name in digests if digests[name] != expected[name]] == []
+
+
+def test_compare_reports_drift_and_throughput_regressions():
+    """Changed or missing documents and throughput under the tolerance are failures."""
+    baseline = {
+        "qa": {"chunks_per_sec": 1000.0, "documents": {"faq": "a", "empty": "b"}},
+        "default": {"chunks_per_sec": 1000.0, "documents": {"faq": "c"}},
+    }
+    results = {
+        "qa": {"chunks_per_sec": 700.0, "documents": {"faq": "changed"}},
+        "default": {"chunks_per_sec": 800.0, "documents": {"faq": "c"}},
+        "paper": {"chunks_per_sec": 10.0, "documents": {}},
+    }
+
+    failures = compare(results, baseline, max_regression=0.25)
+
+    assert failures == [
+        "qa: chunk boundaries changed in empty, faq",
+        "qa: 700.0 chunks/s, below 750.0 (25% under the baseline 1000.0)",
+        "paper: no baseline, record one with --update",
+    ]
+
+
+def test_version_mismatch_reported(tmp_path):
+    """Golden hashes recorded with another splitter version are not compared."""
+    path = tmp_path / "baseline.json"
+    save_baseline({}, path)
+    assert version_mismatch(path) is None
+
+    path.write_text('{"strategies": {}, "versions": {"llama-index-core": "0.10.0"}}')
+    assert "re-record it with --update" in version_mismatch(path)
@@ -0,0 +1,109 @@
+"""
+Equivalence of the single-pass legislation splitter with the former regex-based one.
+
+Run from the service directory: ``python -m pytest tests``.
+"""
+
+import random
+
+import pytest
+from strategies.legislation_splitter import LegislationSplitter, SectionReferences, iter_definition_boundaries
+
+from tests.statutes import ReferenceLegislationSplitter, generate_statute
+
+FRAGMENTS = [
+    "means",
+    "MEANS",
+    " means ",
+    "\nmeans",
+    "means\n",
+    "meanspirited",
+    "a",
+    "term",
+    "x y",
+    " ",
+    "  ",
+    "\n",
+    "\t",
+    "\n\n",
+    ".",
+    ",",
+    ";",
+    ":",
+    "(a)",
+    "(b)",
+    "(1)",
+    "$5",
+    "$2.5 million",
+    "$ 1,000,000",
+    "m",
+    "Part 3 / Division 2",
+    "Part 4B / s12",
+    "Dictionary / s9",
+    "Section 7",
+    "s. 12A",
+    "s5",
+    "Sections 9",
+    "net assets",
+    "control",
+    "gross",
+    "Act 2001",
+    "1",
+    "-",
+    "ſ",
+]
+
+
+def _random_text(rng: random.Random) -> str:
+    return "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 40)))
+
+
+def test_boundaries_match_former_pattern_on_random_texts():
+    """Every definition boundary matches the former pattern, on texts made of tricky fragments."""
+    import re
+
+    pattern = re.compile(r"([a-z\s]+?)\s+means\s+(.+?)(?=\n[a-z\s]+?\s+means|\Z)", re.IGNORECASE | re.DOTALL)
+    rng = random.Random(0)
+    for _ in range(20000):
+        text = _random_text(rng)
+        expected = [(m.start(1), m.end(1), m.start(2), m.end(2)) for m in pattern.finditer(text)]
+        assert [tuple(b) for b in iter_definition_boundaries(text)] == expected, repr(text)
+
+
+def test_section_references_match_prefix_search():
+    """The section reference of every prefix is the one found by searching the prefix itself."""
+    splitter = LegislationSplitter()
+    rng = random.Random(1)
+    for _ in range(2000):
+        text = _random_text(rng)
+        references = SectionReferences(text)
+        for end in range(len(text) + 1):
+            assert references.before(end) == splitter._extract_section_reference(text[:end]), (text, end)
+
+
+@pytest.mark.parametrize(
+    "size, seed, definition_ratio",
+    [
+        (2_000, 0, 0.3),
+        (50_000, 1, 0.3),
+        (200_000, 2, 0.02),
+        (1_000_000, 3, 0.3),
+        (5_000_000, 4, 0.3),
+    ],
+)
+def test_split_text_matches_reference_on_generated_statutes(size, seed, definition_ratio):
+    """Chunks, ids and metadata are identical to the former splitter on generated statutes."""
+    text = generate_statute(size, seed=seed, definition_ratio=definition_ratio)
+
+    chunks = LegislationSplitter().split_text(text)
+
+    assert len(chunks) > 1
+    assert chunks == ReferenceLegislationSplitter().split_text(text)
+
+
+def test_split_text_without_definitions():
+    """A text without definitions is returned as a single content chunk."""
+    chunks = LegislationSplitter().split_text("Corporations Act 2001\nNothing to define here.")
+
+    assert chunks == ReferenceLegislationSplitter().split_text("Corporations Act 2001\nNothing to define here.")
+    assert chunks[0]["metadata"]["term_type"] == "content"
@@ -0,0 +1,68 @@
+"""
+Local stand-ins of GCS, the embedding API and the database round-trip counter.
+"""
+
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from tests.local_backends import FakeEmbedding, LocalGCSReader, RoundTripCounter
+
+
+@pytest.fixture
+def bucket(tmp_path):
+    (tmp_path / "bucket" / "ingest" / "nested").mkdir(parents=True)
+    (tmp_path / "bucket" / "ingest" / "a.txt").write_text("first file")
+    (tmp_path / "bucket" / "ingest" / "nested" / "b.txt").write_text("second file")
+    (tmp_path / "bucket" / "other.txt").write_text("outside the prefix")
+    return tmp_path
+
+
+def test_local_gcs_reader_lists_and_loads_by_prefix(bucket):
+    """Objects under the prefix are listed and loaded; download and parse times are recorded."""
+    stats = {}
+    reader = LocalGCSReader(bucket, bucket="bucket", prefix="ingest/", stats=stats, service_account_key_path="x")
+
+    assert reader.list_resources() == ["ingest/a.txt", "ingest/nested/b.txt"]
+    assert [document.text for document in reader.load_data()] == ["first file", "second file"]
+    assert stats.keys() == {"download", "parse"}
+
+
+def test_local_gcs_reader_loads_a_single_key(bucket):
+    """A reader for one key loads that object only, and fails on a missing one."""
+    assert [document.text for document in LocalGCSReader(bucket, bucket="bucket", key="other.txt").load_data()] == [
+        "outside the prefix"
+    ]
+    with pytest.raises(FileNotFoundError):
+        LocalGCSReader(bucket, bucket="bucket", key="missing.txt").load_data()
+
+
+def test_fake_embedding_is_deterministic_and_counts_calls():
+    """Vectors depend on the text only, have unit length, and each batch is one call."""
+    embedder = FakeEmbedding(dimensions=16, embed_batch_size=2)
+
+    vectors = embedder.get_text_embedding_batch(["a", "b", "a"])
+
+    assert vectors[0] == vectors[2] != vectors[1]
+    assert len(vectors[0]) == 16
+    assert sum(value * value for value in vectors[0]) == pytest.approx(1.0)
+    assert (embedder.calls, embedder.texts) == (2, 3)
+
+    asyncio.run(embedder.aget_query_embedding("a"))
+    assert (embedder.calls, embedder.texts) == (3, 4)
+    embedder.reset()
+    assert (embedder.calls, embedder.texts) == (0, 0)
+
+
+def test_round_trip_counter_counts_statements_while_active():
+    """Every statement executed inside the block is counted, none after it."""
+    engine = create_engine("sqlite://")
+
+    with RoundTripCounter() as round_trips, engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        connection.execute(text("SELECT 2"))
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 3"))
+
+    assert round_trips.count == 2
@@ -0,0 +1,23 @@
+"""
+NodeParsers returned by the Q&A and presentation strategies.
+
+Run from the service directory: ``python -m pytest tests``.
+"""
+
+from llama_index.core import Document
+from strategies.presentation_splitter import PresentationSplitter
+from strategies.qa_splitter import QASplitter
+
+
+def test_qa_node_parser_one_node_per_pair():
+    text = "Q: What is it?\nA: A test.\nQ: Why?\nA: Coverage."
+    nodes = QASplitter().create_splitter().get_nodes_from_documents([Document(text=text)])
+
+    assert [node.get_content() for node in nodes] == ["Q: What is it?\nA: A test.", "Q: Why?\nA: Coverage."]
+
+
+def test_presentation_node_parser_keeps_slide_whole():
+    text = "Slide title\n\n" + "bullet point " * 500
+    nodes = PresentationSplitter().create_splitter().get_nodes_from_documents([Document(text=text)])
+
+    assert [node.get_content() for node in nodes] == [text]